@@ -74,9 +74,13 @@ class DatabaseManager:
         """Delete instance from session"""
         self.db.delete(instance)
     
-    def query(self, model):
-        """Create a query for the model"""
-        return self.db.query(model)
+    def query(self, *entities):
+        """Create a query for the model (or columns)"""
+        return self.db.query(*entities)
+    
+    def execute(self, statement, params=None):
+        """Execute a Core statement (bulk UPDATE/INSERT) in this session"""
+        return self.db.execute(statement, params)
     
     def get(self, model, id):
         """Get model by ID"""
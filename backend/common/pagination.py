@@ -0,0 +1,56 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import and_, or_, desc, asc
+
+from .exceptions import ValidationError
+
+def encode_cursor(created_at: datetime, row_id: UUID) -> str:
+    """Encode a (created_at, id) position as an opaque cursor string"""
+    payload = json.dumps({"c": created_at.isoformat(), "i": str(row_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload["c"]), UUID(payload["i"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValidationError("cursor", f"invalid pagination cursor ({str(e)})")
+
+def apply_keyset(query, created_column, id_column, cursor: Optional[str], descending: bool = True):
+    """Order a query by (created_at, id) and seek past the cursor position.
+
+    The tie-breaker on id keeps the ordering total, so rows sharing a
+    created_at value are never skipped or repeated between pages.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        if descending:
+            query = query.filter(or_(
+                created_column < created_at,
+                and_(created_column == created_at, id_column < row_id)
+            ))
+        else:
+            query = query.filter(or_(
+                created_column > created_at,
+                and_(created_column == created_at, id_column > row_id)
+            ))
+
+    direction = desc if descending else asc
+    return query.order_by(direction(created_column), direction(id_column))
+
+def fetch_keyset_page(query, limit: int) -> Tuple[List[Any], Optional[str]]:
+    """Fetch one keyset page and the cursor for the page after it.
+
+    Reads limit + 1 rows so the next page can be detected without a count.
+    """
+    rows = query.limit(limit + 1).all()
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if has_next else None
+    return rows, next_cursor
@@ -0,0 +1,45 @@
+"""
+Shared pytest fixtures.
+
+Database tests run against the PostgreSQL server named by TEST_DATABASE_URL
+(the code relies on ON CONFLICT, RETURNING and Postgres operators, so SQLite
+is not a substitute) and are skipped when it is not set.
+"""
+
+import os
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+@pytest.fixture(scope="session")
+def pg_engine():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+
+    import database.entities  # noqa: F401  (registers every table)
+    from database.core import Base
+
+    engine = create_engine(TEST_DATABASE_URL, pool_size=20)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE SCHEMA IF NOT EXISTS core"))
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def pg_session(pg_engine):
+    session = sessionmaker(bind=pg_engine, autoflush=False)()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+@pytest.fixture
+def tenant_id() -> str:
+    """A fresh tenant per test, so tests sharing the database never see each other's rows"""
+    return f"test-{uuid.uuid4()}"
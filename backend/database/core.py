@@ -52,12 +52,13 @@ def create_core_tables():
         UserPasswordReset, UserLoginAttempt, UserProfile
     )
     from database.entities.tenant import Tenant, TenantUser, TenantApiKey, TenantSubscription, TenantUsage
-    from database.entities.order import Order, OrderItem, OrderFulfillment, OrderNote, OrderStatusHistory
+    from database.entities.order import Order, OrderItem, OrderFulfillment, OrderNote, OrderStatusHistory, OrderNumberSequence, DailyOrderRollup
     from database.entities.template import EtsyProductTemplate, TemplateCategory, TemplateVersion, TemplateTag
     from database.entities.design import DesignImage, DesignVariant, DesignCollection, DesignCollectionItem, DesignAnalytics
     from database.entities.mockup import Mockup, MockupImage, MockupMaskData, MockupDesignAssociation, MockupTemplate, MockupBatch
     from database.entities.canvas import CanvasConfig, SizeConfig, CanvasPreset, CanvasMaterial
     from database.entities.shopify import ShopifyProductTemplate, ShopifyProductSync, ShopifyOrderSync, ShopifyWebhook, ShopifyCollectionSync, ShopifyBatchOperation
+    from database.entities.integration import IntegrationSyncState
     
     # Debug: Print what tables are registered
     print(f"Tables registered in metadata: {list(Base.metadata.tables.keys())}")
@@ -155,6 +156,36 @@ def create_core_tables():
             CREATE INDEX IF NOT EXISTS idx_tenant_usage_tenant_id ON core.tenant_usage(tenant_id);
             CREATE INDEX IF NOT EXISTS idx_tenant_usage_metric ON core.tenant_usage(metric_name, period_start);
         """))
+        
+        # Keep daily_order_rollups in step with every write to orders (skipped when already current)
+        from database.rollups import install_order_rollup_triggers
+        install_order_rollup_triggers(conn)
+        
+        # Databases created before orders.external_id existed: the column only. The backfill and
+        # its unique index are the one-off migrations/backfill_order_external_ids.py
+        conn.execute(text("ALTER TABLE orders ADD COLUMN IF NOT EXISTS external_id VARCHAR(100)"))
+        
+        # Soft delete for items of tables created before order_items carried it
+        conn.execute(text("""
+            ALTER TABLE order_items ADD COLUMN IF NOT EXISTS is_deleted BOOLEAN DEFAULT FALSE;
+            ALTER TABLE order_items ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP WITH TIME ZONE;
+            CREATE INDEX IF NOT EXISTS ix_order_items_is_deleted ON order_items (is_deleted);
+        """))
+        
+        # Shop domain of Shopify connections, used to route webhooks to their owner
+        conn.execute(text("""
+            ALTER TABLE third_party_oauth_tokens ADD COLUMN IF NOT EXISTS shop_domain VARCHAR(255);
+            CREATE INDEX IF NOT EXISTS ix_third_party_oauth_tokens_shop_domain
+                ON third_party_oauth_tokens (shop_domain);
+        """))
+        
+        # Webhook dedupe and claim indexes for tables created before they were declared
+        conn.execute(text("""
+            CREATE UNIQUE INDEX IF NOT EXISTS uq_shopify_webhooks_webhook_id
+                ON shopify_webhooks (webhook_id);
+            CREATE INDEX IF NOT EXISTS idx_shopify_webhooks_status_created
+                ON shopify_webhooks (processing_status, created_at);
+        """))
         conn.commit()
 
 def create_tenant_schema(tenant_id: str, schema_name: str):
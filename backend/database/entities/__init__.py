@@ -9,9 +9,10 @@ from .user import (
 from .template import EtsyProductTemplate, TemplateCategory, TemplateVersion, TemplateTag, design_template_association, template_custom_tags
 from .design import DesignImage, DesignVariant, DesignCollection, DesignCollectionItem, DesignAnalytics, design_size_config_association
 from .mockup import Mockup, MockupImage, MockupMaskData, MockupDesignAssociation, MockupTemplate, MockupBatch
-from .order import Order, OrderItem, OrderFulfillment, OrderNote, OrderStatusHistory
+from .order import Order, OrderItem, OrderFulfillment, OrderNote, OrderStatusHistory, OrderNumberSequence, DailyOrderRollup
 from .canvas import CanvasConfig, SizeConfig, CanvasPreset, CanvasMaterial, canvas_material_compatibility
 from .shopify import ShopifyProductTemplate, ShopifyProductSync, ShopifyOrderSync, ShopifyWebhook, ShopifyCollectionSync, ShopifyBatchOperation, shopify_template_tags
+from .integration import IntegrationSyncState
 
 # Export all entities for easy importing
 __all__ = [
@@ -37,7 +38,7 @@ __all__ = [
     'Mockup', 'MockupImage', 'MockupMaskData', 'MockupDesignAssociation', 'MockupTemplate', 'MockupBatch',
     
     # Order entities
-    'Order', 'OrderItem', 'OrderFulfillment', 'OrderNote', 'OrderStatusHistory',
+    'Order', 'OrderItem', 'OrderFulfillment', 'OrderNote', 'OrderStatusHistory', 'OrderNumberSequence', 'DailyOrderRollup',
     
     # Canvas entities
     'CanvasConfig', 'SizeConfig', 'CanvasPreset', 'CanvasMaterial',
@@ -46,6 +47,9 @@ __all__ = [
     'ShopifyProductTemplate', 'ShopifyProductSync', 'ShopifyOrderSync', 'ShopifyWebhook', 
     'ShopifyCollectionSync', 'ShopifyBatchOperation',
     
+    # Integration entities
+    'IntegrationSyncState',
+    
     # Association tables
     'design_template_association', 'template_custom_tags', 'design_size_config_association',
     'canvas_material_compatibility', 'shopify_template_tags'
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from .base import MultiTenantBase
+
+class IntegrationSyncState(MultiTenantBase):
+    """High-water mark of an incremental marketplace sync, per shop and resource"""
+    __tablename__ = 'integration_sync_states'
+    __table_args__ = (
+        Index('idx_integration_sync_states_tenant_id', 'tenant_id'),
+        UniqueConstraint('tenant_id', 'platform', 'shop_id', 'resource', name='uq_integration_sync_states_cursor'),
+    )
+    
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    platform = Column(String(50), nullable=False)  # etsy, shopify
+    shop_id = Column(String(100), nullable=False)  # Marketplace shop identifier
+    resource = Column(String(50), nullable=False)  # orders, listings, ...
+    
+    # Newest marketplace modification time already applied; the next run resumes from here
+    watermark = Column(DateTime(timezone=True), nullable=True)
+    last_synced_at = Column(DateTime(timezone=True), nullable=True)
+    last_result = Column(JSON, default=dict)  # Counts from the most recent run
+    
+    def __repr__(self):
+        return f"<IntegrationSyncState(platform='{self.platform}', shop='{self.shop_id}', resource='{self.resource}', watermark='{self.watermark}')>"
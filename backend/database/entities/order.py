@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DateTime, Text, Float, Integer, ForeignKey, JSON, DECIMAL
+from sqlalchemy import Column, String, Boolean, DateTime, Text, Float, Integer, ForeignKey, JSON, DECIMAL, Index, Date, BigInteger, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 from .base import MultiTenantBase, UserScopedMixin, SoftDeleteMixin, AuditMixin
@@ -6,6 +6,13 @@ from .base import MultiTenantBase, UserScopedMixin, SoftDeleteMixin, AuditMixin
 class Order(MultiTenantBase, SoftDeleteMixin, AuditMixin):
     """Orders from various sources (Etsy, Shopify, etc.)"""
     __tablename__ = 'orders'
+    __table_args__ = (
+        Index('idx_orders_tenant_id', 'tenant_id'),
+        # Keyset pagination seeks on (created_at, id) within a user's orders
+        Index('idx_orders_user_created_id', 'user_id', 'created_at', 'id'),
+        # Conflict target for marketplace upserts (manual orders leave external_id NULL)
+        UniqueConstraint('tenant_id', 'platform', 'external_id', name='uq_orders_tenant_platform_external_id'),
+    )
     
     # User relationship (nullable for external orders)
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=True, index=True)
@@ -14,6 +21,7 @@ class Order(MultiTenantBase, SoftDeleteMixin, AuditMixin):
     etsy_receipt_id = Column(Integer, nullable=True, index=True)  # Etsy receipt ID
     etsy_order_id = Column(Integer, nullable=True, index=True)   # Etsy order ID
     shopify_order_id = Column(Integer, nullable=True, index=True) # Shopify order ID
+    external_id = Column(String(100), nullable=True)             # Marketplace order key (receipt/order ID)
     platform = Column(String(50), nullable=False, index=True)    # etsy, shopify, manual, etc.
     
     # Order identification
@@ -130,7 +138,7 @@ class Order(MultiTenantBase, SoftDeleteMixin, AuditMixin):
     def __repr__(self):
         return f"<Order(id='{self.id}', number='{self.order_number}', status='{self.status}', total=${self.total_amount})>"
 
-class OrderItem(MultiTenantBase, UserScopedMixin):
+class OrderItem(MultiTenantBase, UserScopedMixin, SoftDeleteMixin):
     """Individual items within an order"""
     __tablename__ = 'order_items'
     
@@ -327,4 +335,43 @@ class OrderStatusHistory(MultiTenantBase, UserScopedMixin):
     changed_by_user = relationship('User', foreign_keys=[changed_by])
     
     def __repr__(self):
-        return f"<OrderStatusHistory(order_id='{self.order_id}', {self.old_status} -> {self.new_status})>"
\ No newline at end of file
+        return f"<OrderStatusHistory(order_id='{self.order_id}', {self.old_status} -> {self.new_status})>"
+
+class OrderNumberSequence(MultiTenantBase):
+    """Per-tenant, per-day counter backing internal order numbers"""
+    __tablename__ = 'order_number_sequences'
+    __table_args__ = (
+        Index('idx_order_number_sequences_tenant_id', 'tenant_id'),
+        UniqueConstraint('tenant_id', 'sequence_date', name='uq_order_number_sequences_tenant_date'),
+    )
+    
+    sequence_date = Column(Date, nullable=False)
+    last_value = Column(BigInteger, nullable=False, default=0)  # Highest number handed out
+    
+    def __repr__(self):
+        return f"<OrderNumberSequence(tenant_id='{self.tenant_id}', date='{self.sequence_date}', last={self.last_value})>"
+
+class DailyOrderRollup(MultiTenantBase):
+    """Order counts and totals per (tenant, user, day, platform, status).
+
+    Maintained by statement-level triggers on orders (see database/rollups.py)
+    and rebuildable with `python -m services.order.rollups`. Soft-deleted
+    orders and orders without a user are not counted.
+    """
+    __tablename__ = 'daily_order_rollups'
+    __table_args__ = (
+        Index('idx_daily_order_rollups_tenant_id', 'tenant_id'),
+        UniqueConstraint('tenant_id', 'user_id', 'day', 'platform', 'status', name='uq_daily_order_rollups_bucket'),
+        Index('idx_daily_order_rollups_user_day', 'user_id', 'day'),
+    )
+    
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    day = Column(Date, nullable=False)  # UTC day of Order.created_at
+    platform = Column(String(50), nullable=False)
+    status = Column(String(50), nullable=False)
+    
+    order_count = Column(BigInteger, nullable=False, default=0)
+    total_amount = Column(DECIMAL(14, 2), nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<DailyOrderRollup(day='{self.day}', platform='{self.platform}', status='{self.status}', orders={self.order_count})>"
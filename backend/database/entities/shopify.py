@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Boolean, JSON, Text, DECIMAL, DateTime, ForeignKey, Table
+from sqlalchemy import Column, String, Integer, Boolean, JSON, Text, DECIMAL, DateTime, ForeignKey, Table, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from uuid import uuid4
@@ -96,6 +96,12 @@ class ShopifyOrderSync(MultiTenantBase, TimestampMixin, UserScopedMixin):
 class ShopifyWebhook(MultiTenantBase, TimestampMixin):
     """Track Shopify webhook events"""
     __tablename__ = 'shopify_webhooks'
+    __table_args__ = (
+        # Shopify redelivers with the same X-Shopify-Webhook-Id; duplicates are dropped on insert
+        Index('uq_shopify_webhooks_webhook_id', 'webhook_id', unique=True),
+        # Worker claims the oldest pending events first
+        Index('idx_shopify_webhooks_status_created', 'processing_status', 'created_at'),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
     webhook_id = Column(String(50))  # Shopify webhook ID
@@ -154,6 +154,7 @@ class ThirdPartyOAuthToken(MultiTenantBase):
     expires_at = Column(DateTime(timezone=True), nullable=False)
     scope = Column(Text, nullable=True)
     token_type = Column(String(20), default='Bearer')
+    shop_domain = Column(String(255), nullable=True, index=True)  # Shopify: the connected *.myshopify.com shop
     
     # Relationships
     user = relationship('User', back_populates='third_party_tokens')
@@ -0,0 +1,118 @@
+"""
+Trigger maintenance for daily_order_rollups.
+
+Statement-level triggers with transition tables turn every INSERT, UPDATE or
+DELETE on orders (including bulk statements that bypass the ORM) into one
+aggregated upsert of per-bucket deltas.
+
+Each trigger holds a shared per-tenant advisory lock until its transaction
+commits. A rebuild takes the same lock exclusively, so a rebuild only waits
+for writers of its own tenant and their deltas never interleave with it.
+
+Each trigger carries a comment with a hash of the definitions below, so
+startup only replaces them (which locks orders) when they have changed.
+"""
+
+import hashlib
+
+from sqlalchemy import text
+
+# Bucket key and measures for a set of order rows, signed by :sign
+_BUCKET_SELECT = """
+    SELECT tenant_id, user_id, (created_at AT TIME ZONE 'UTC')::date AS day,
+           platform, COALESCE(status, 'pending') AS status,
+           {sign} AS order_count, {sign} * COALESCE(total_amount, 0) AS total_amount
+    FROM {rows}
+    WHERE user_id IS NOT NULL AND NOT COALESCE(is_deleted, FALSE)
+"""
+
+# Advisory lock key guarding one tenant's rollups
+ROLLUP_LOCK_KEY = "hashtext('daily_order_rollups:' || {tenant_id})"
+
+# Recomputes rollups from orders; {filters} narrows the rows (tenant, day range)
+REBUILD_SQL = """
+    INSERT INTO daily_order_rollups
+        (id, tenant_id, user_id, day, platform, status, order_count, total_amount, created_at, updated_at)
+    SELECT gen_random_uuid(), tenant_id, user_id, (created_at AT TIME ZONE 'UTC')::date,
+           platform, COALESCE(status, 'pending'), COUNT(*), COALESCE(SUM(total_amount), 0), now(), now()
+    FROM orders
+    WHERE user_id IS NOT NULL
+      AND NOT COALESCE(is_deleted, FALSE)
+      {filters}
+    GROUP BY tenant_id, user_id, (created_at AT TIME ZONE 'UTC')::date, platform, COALESCE(status, 'pending')
+"""
+
+_LOCK_TENANTS = """
+    PERFORM pg_advisory_xact_lock_shared({lock_key})
+    FROM (SELECT DISTINCT tenant_id FROM ({rows}) AS touched ORDER BY tenant_id) AS tenants;
+"""
+
+_UPSERT_DELTAS = """
+    INSERT INTO daily_order_rollups
+        (id, tenant_id, user_id, day, platform, status, order_count, total_amount, created_at, updated_at)
+    SELECT gen_random_uuid(), tenant_id, user_id, day, platform, status,
+           SUM(order_count), SUM(total_amount), now(), now()
+    FROM ({deltas}) AS deltas
+    GROUP BY tenant_id, user_id, day, platform, status
+    HAVING SUM(order_count) <> 0 OR SUM(total_amount) <> 0
+    ON CONFLICT (tenant_id, user_id, day, platform, status) DO UPDATE SET
+        order_count = daily_order_rollups.order_count + EXCLUDED.order_count,
+        total_amount = daily_order_rollups.total_amount + EXCLUDED.total_amount,
+        updated_at = now();
+"""
+
+ORDER_ROLLUP_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION apply_order_rollup_deltas() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        {_LOCK_TENANTS.format(lock_key=ROLLUP_LOCK_KEY.format(tenant_id='tenant_id::text'), rows='SELECT tenant_id FROM new_rows')}
+        {_UPSERT_DELTAS.format(deltas=_BUCKET_SELECT.format(sign=1, rows='new_rows'))}
+    ELSIF TG_OP = 'DELETE' THEN
+        {_LOCK_TENANTS.format(lock_key=ROLLUP_LOCK_KEY.format(tenant_id='tenant_id::text'), rows='SELECT tenant_id FROM old_rows')}
+        {_UPSERT_DELTAS.format(deltas=_BUCKET_SELECT.format(sign=-1, rows='old_rows'))}
+    ELSE
+        {_LOCK_TENANTS.format(lock_key=ROLLUP_LOCK_KEY.format(tenant_id='tenant_id::text'), rows='SELECT tenant_id FROM old_rows UNION SELECT tenant_id FROM new_rows')}
+        {_UPSERT_DELTAS.format(deltas=_BUCKET_SELECT.format(sign=-1, rows='old_rows') + ' UNION ALL ' + _BUCKET_SELECT.format(sign=1, rows='new_rows'))}
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+ORDER_ROLLUP_TRIGGERS = {
+    'orders_rollup_insert': "AFTER INSERT ON orders REFERENCING NEW TABLE AS new_rows",
+    'orders_rollup_update': "AFTER UPDATE ON orders REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows",
+    'orders_rollup_delete': "AFTER DELETE ON orders REFERENCING OLD TABLE AS old_rows",
+}
+
+ORDER_ROLLUP_VERSION = hashlib.sha256(
+    (ORDER_ROLLUP_FUNCTION_SQL + repr(sorted(ORDER_ROLLUP_TRIGGERS.items()))).encode()
+).hexdigest()[:16]
+
+def install_order_rollup_triggers(conn) -> bool:
+    """Create or replace the orders -> daily_order_rollups triggers when they are missing or outdated.
+
+    Returns whether anything was installed. The first install also builds the
+    rollups of the orders already stored, since the triggers only see later
+    writes. Installing the triggers blocks order writes until the caller
+    commits, so none fall between the two.
+    """
+    installed = dict(conn.execute(text("""
+        SELECT tgname, obj_description(oid, 'pg_trigger') FROM pg_trigger
+        WHERE tgrelid = 'orders'::regclass AND tgname = ANY(:names)
+    """), {'names': list(ORDER_ROLLUP_TRIGGERS)}).all())
+    if all(installed.get(name) == ORDER_ROLLUP_VERSION for name in ORDER_ROLLUP_TRIGGERS):
+        return False
+
+    conn.execute(text(ORDER_ROLLUP_FUNCTION_SQL))
+    for name, timing in ORDER_ROLLUP_TRIGGERS.items():
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {name} ON orders"))
+        conn.execute(text(
+            f"CREATE TRIGGER {name} {timing} FOR EACH STATEMENT EXECUTE FUNCTION apply_order_rollup_deltas()"
+        ))
+        conn.execute(text(f"COMMENT ON TRIGGER {name} ON orders IS '{ORDER_ROLLUP_VERSION}'"))
+
+    if 'orders_rollup_insert' not in installed:
+        conn.execute(text("DELETE FROM daily_order_rollups"))
+        conn.execute(text(REBUILD_SQL.format(filters="")))
+    return True
@@ -8,6 +8,7 @@ import logging
 from common.auth import get_current_user
 from common.database import get_database_manager
 from database.core import create_core_tables
+from services.common.http import close_async_http_clients
 
 # Import service routers
 from services.auth.controller import router as auth_router
@@ -24,6 +25,9 @@ from services.third_party.controller import router as third_party_router
 from services.common.health import router as health_router
 from services.common.metrics import router as metrics_router
 
+# Register session listeners that invalidate cache tags on commit
+import services.common.cache_tags  # noqa: F401
+
 logger = logging.getLogger(__name__)
 
 @asynccontextmanager
@@ -41,6 +45,7 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down Printer SaaS Backend...")
+    await close_async_http_clients()
 
 # Create FastAPI application
 app = FastAPI(
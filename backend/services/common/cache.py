@@ -1,86 +1,651 @@
 # services/common/cache.py
-import redis
-import json
+"""
+Two-tier tenant cache.
+
+Reads go to a bounded in-process LRU first, then Redis, then the wrapped
+function. Values are stored as JSON produced by pydantic from the function's
+return annotation (never pickle), so cached data cannot execute code on load
+and decodes back into the same models the services return.
+
+Recomputation is single-flight: concurrent callers in a process share one
+computation, and a short Redis lock elects one refresher across processes.
+Entries can be refreshed probabilistically before they expire and, when
+stale_ttl is set, served stale while another caller refreshes them.
+"""
+
+import asyncio
 import hashlib
+import inspect
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+import typing
+import uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from functools import wraps
-from typing import Any, Optional, Callable
-import pickle
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import redis
+from pydantic import TypeAdapter
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+LOCAL_MAX_ENTRIES = int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", "2048"))
+# Local copies live at most this long so other processes' writes converge quickly
+LOCAL_MAX_TTL = float(os.getenv("CACHE_LOCAL_TTL", "30"))
+# Seconds to skip Redis after a connection error instead of timing out per request
+REDIS_RETRY_AFTER = float(os.getenv("CACHE_REDIS_RETRY_AFTER", "10"))
+# How long a process trusts its copy of a tag version before re-reading Redis
+TAG_VERSION_TTL = float(os.getenv("CACHE_TAG_VERSION_TTL", "1"))
+# Tag version keys outlive every entry that can reference them
+TAG_TTL = int(os.getenv("CACHE_TAG_TTL", str(7 * 86400)))
+# Recompute lock lifetime and how long losers wait for the winner's result
+LOCK_TTL = float(os.getenv("CACHE_LOCK_TTL", "30"))
+LOCK_WAIT = float(os.getenv("CACHE_LOCK_WAIT", "5"))
+# XFetch beta: > 1 refreshes earlier, 0 disables early refresh
+EARLY_REFRESH_BETA = float(os.getenv("CACHE_EARLY_REFRESH_BETA", "1.0"))
+HEADER_PEEK_BYTES = 1024
+KEY_VERSION = "v2"
+
+redis_client = redis.Redis.from_url(
+    REDIS_URL,
+    decode_responses=False,
+    socket_timeout=0.25,
+    socket_connect_timeout=0.25
+)
+
+_stats: Counter = Counter()
+_stats_lock = threading.Lock()
+
+def _count(event: str, namespace: str) -> None:
+    with _stats_lock:
+        _stats[event] += 1
+        _stats[f"{namespace}.{event}"] += 1
+
+def cache_stats() -> Dict[str, int]:
+    """Snapshot of hit/miss/eviction counters, overall and per namespace"""
+    with _stats_lock:
+        snapshot = dict(_stats)
+    snapshot["local_entries"] = len(_local)
+    return snapshot
 
-redis_client = redis.Redis.from_url(REDIS_URL, decode_responses=False)
+class _LocalLRU:
+    """Thread-safe LRU of serialized values with per-entry expiry"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, data = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return data
+
+    def set(self, key: str, data: bytes, ttl: float) -> int:
+        """Store data and return how many entries were evicted to make room"""
+        evicted = 0
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        return evicted
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+class _TagVersions:
+    """Short-lived copies of tag versions so local hits need no Redis round trip"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._versions: Dict[str, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, tag_key: str, ignore_expiry: bool = False) -> Optional[int]:
+        with self._lock:
+            entry = self._versions.get(tag_key)
+        if entry is None or (not ignore_expiry and entry[0] <= time.monotonic()):
+            return None
+        return entry[1]
+
+    def set(self, tag_key: str, version: int) -> None:
+        with self._lock:
+            self._versions[tag_key] = (time.monotonic() + self.ttl, version)
+
+_local = _LocalLRU(LOCAL_MAX_ENTRIES)
+_local_tags = _TagVersions(TAG_VERSION_TTL)
+_redis_retry_at = 0.0
+
+def _redis_call(method: str, *args):
+    """Run a Redis command, treating an unreachable Redis as a cache miss"""
+    return _redis_run(lambda client: getattr(client, method)(*args))
+
+def _redis_run(operation: Callable[[redis.Redis], Any]):
+    """Run operation(redis_client), returning None while Redis is unreachable"""
+    global _redis_retry_at
+    if time.monotonic() < _redis_retry_at:
+        return None
+    try:
+        return operation(redis_client)
+    except redis.RedisError as e:
+        _redis_retry_at = time.monotonic() + REDIS_RETRY_AFTER
+        _count("redis_errors", "redis")
+        logger.warning(f"Redis cache unavailable, using local tier only: {e}")
+        return None
+
+# Delete the lock only if this caller still owns it
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+class CacheEntry(NamedTuple):
+    """A cached payload and the metadata stored in its header"""
+    data: bytes
+    expires_at: float  # Epoch seconds after which the entry is stale
+    delta: float  # Seconds the value took to compute
+
+    def is_fresh(self, now: float) -> bool:
+        return now < self.expires_at
+
+    def should_refresh(self, now: float, beta: float) -> bool:
+        """XFetch: refresh early with a probability that rises towards expiry"""
+        if not self.is_fresh(now):
+            return True
+        if beta <= 0 or self.delta <= 0:
+            return False
+        return now - self.delta * beta * math.log(1.0 - random.random()) >= self.expires_at
 
 class TenantCache:
-    def __init__(self, tenant_id: str):
+    """Tenant-scoped cache over the local LRU and Redis tiers.
+
+    Entries record the versions of the tags they depend on (e.g.
+    orders:{user_id}); bumping a tag makes every dependent entry stale in
+    O(1) without enumerating keys. Dead entries are reclaimed by their TTL
+    or by sweep_stale_entries.
+    """
+
+    def __init__(self, tenant_id: str, namespace: str = "default"):
         self.tenant_id = tenant_id
-        self.key_prefix = f"tenant:{tenant_id}"
-    
+        self.namespace = namespace
+        self.key_prefix = f"{KEY_VERSION}:tenant:{tenant_id}"
+
     def cache_key(self, key: str) -> str:
         """Generate tenant-scoped cache key"""
-        return f"{self.key_prefix}:{key}"
-    
-    def get(self, key: str) -> Optional[Any]:
-        """Get cached value"""
+        return f"{self.key_prefix}:c:{self.namespace}:{key}"
+
+    def tag_key(self, tag: str) -> str:
+        """Redis key holding a tag's current version"""
+        return f"{self.key_prefix}:tag:{tag}"
+
+    def lock_key(self, key: str) -> str:
+        """Redis key of the recompute lock for an entry"""
+        return f"{self.key_prefix}:lock:{self.namespace}:{key}"
+
+    def tag_versions(self, tags: Iterable[str]) -> Dict[str, int]:
+        """Current version of each tag (0 if never bumped)"""
+        versions: Dict[str, int] = {}
+        missing = []
+        for tag in tags:
+            version = _local_tags.get(self.tag_key(tag))
+            if version is None:
+                missing.append(tag)
+            else:
+                versions[tag] = version
+
+        if missing:
+            values = _redis_call("mget", [self.tag_key(tag) for tag in missing])
+            for index, tag in enumerate(missing):
+                tag_key = self.tag_key(tag)
+                if values is None:
+                    # Redis unavailable: fall back to versions bumped in this process
+                    versions[tag] = _local_tags.get(tag_key, ignore_expiry=True) or 0
+                else:
+                    versions[tag] = int(values[index] or 0)
+                    _local_tags.set(tag_key, versions[tag])
+        return versions
+
+    def bump_tags(self, tags: Iterable[str]) -> None:
+        """Invalidate every entry that depends on any of the tags"""
+        tags = sorted(set(tags))
+        if not tags:
+            return
+
+        def bump(client):
+            pipe = client.pipeline(transaction=False)
+            for tag in tags:
+                pipe.incr(self.tag_key(tag))
+                pipe.expire(self.tag_key(tag), TAG_TTL)
+            return pipe.execute()
+
+        results = _redis_run(bump)
+        for index, tag in enumerate(tags):
+            tag_key = self.tag_key(tag)
+            if results is None:
+                version = (_local_tags.get(tag_key, ignore_expiry=True) or 0) + 1
+            else:
+                version = int(results[index * 2])
+            _local_tags.set(tag_key, version)
+        _count("tag_bumps", self.namespace)
+
+    def get_entry(self, key: str, versions: Dict[str, int]) -> Optional[CacheEntry]:
+        """Get the entry from the nearest tier, if its tags are current.
+
+        The entry may be past its expiry when it was stored with a stale_ttl;
+        callers decide whether a stale entry is usable.
+        """
+        if not CACHE_ENABLED:
+            return None
+
         cache_key = self.cache_key(key)
-        data = redis_client.get(cache_key)
-        if data:
-            return pickle.loads(data)
+        envelope = _local.get(cache_key)
+        if envelope is not None:
+            entry = _open_envelope(envelope, versions)
+            if entry is not None:
+                _count("local_hits", self.namespace)
+                return entry
+            _local.delete(cache_key)
+
+        envelope = _redis_call("get", cache_key)
+        if envelope is not None:
+            entry = _open_envelope(envelope, versions)
+            if entry is not None:
+                _count("redis_hits", self.namespace)
+                ttl = _redis_call("pttl", cache_key)
+                local_ttl = min(LOCAL_MAX_TTL, ttl / 1000) if ttl and ttl > 0 else LOCAL_MAX_TTL
+                self._store_local(cache_key, envelope, local_ttl)
+                return entry
+            _count("stale", self.namespace)
+
+        _count("misses", self.namespace)
         return None
-    
-    def set(self, key: str, value: Any, expire: int = 3600) -> None:
-        """Set cached value with expiration"""
+
+    def get_raw(self, key: str, versions: Dict[str, int]) -> Optional[bytes]:
+        """Get the serialized value if a fresh copy is cached"""
+        entry = self.get_entry(key, versions)
+        if entry is None or not entry.is_fresh(time.time()):
+            return None
+        return entry.data
+
+    def set_raw(self, key: str, data: bytes, versions: Dict[str, int], expire: int = 3600,
+                delta: float = 0.0, stale_ttl: int = 0) -> None:
+        """Store a serialized value in both tiers.
+
+        The entry is stamped with the tag versions it was computed under and
+        kept for stale_ttl seconds past its expiry so it can be served stale.
+        """
+        if not CACHE_ENABLED:
+            return
+
         cache_key = self.cache_key(key)
-        redis_client.setex(cache_key, expire, pickle.dumps(value))
-    
+        envelope = _seal_envelope(data, versions, time.time() + expire, delta)
+        self._store_local(cache_key, envelope, min(LOCAL_MAX_TTL, expire + stale_ttl))
+        _redis_call("setex", cache_key, expire + stale_ttl, envelope)
+
+    def get(self, key: str, adapter: TypeAdapter, versions: Optional[Dict[str, int]] = None) -> Optional[Any]:
+        """Get cached value, decoded with the given TypeAdapter"""
+        data = self.get_raw(key, versions or {})
+        if data is None:
+            return None
+        return self.decode(key, data, adapter)
+
+    def set(self, key: str, value: Any, adapter: TypeAdapter, expire: int = 3600,
+            versions: Optional[Dict[str, int]] = None, delta: float = 0.0, stale_ttl: int = 0) -> None:
+        """Set cached value with expiration"""
+        self.set_raw(key, adapter.dump_json(value), versions or {}, expire, delta, stale_ttl)
+
+    def decode(self, key: str, data: bytes, adapter: TypeAdapter) -> Optional[Any]:
+        """Decode a payload, discarding entries written by an incompatible model version"""
+        try:
+            return adapter.validate_json(data)
+        except ValueError as e:
+            logger.warning(f"Discarding undecodable cache entry {self.cache_key(key)}: {e}")
+            self.delete(key)
+            return None
+
     def delete(self, key: str) -> None:
-        """Delete cached value"""
+        """Delete cached value from both tiers"""
         cache_key = self.cache_key(key)
-        redis_client.delete(cache_key)
-    
-    def invalidate_pattern(self, pattern: str) -> None:
-        """Invalidate all keys matching pattern"""
-        pattern_key = self.cache_key(pattern)
-        keys = redis_client.keys(pattern_key)
-        if keys:
-            redis_client.delete(*keys)
-
-def cache_tenant_data(expire: int = 3600, key_suffix: str = None):
-    """Decorator for caching tenant-specific data"""
+        _local.delete(cache_key)
+        _redis_call("delete", cache_key)
+
+    def acquire_lock(self, key: str, ttl: float = LOCK_TTL) -> Optional[str]:
+        """Try to become the process that recomputes key; returns a token or None.
+
+        When Redis is unreachable every process proceeds, relying on the
+        in-process single-flight alone.
+        """
+        token = uuid.uuid4().hex
+        acquired = _redis_run(lambda client: bool(client.set(self.lock_key(key), token, nx=True, px=int(ttl * 1000))))
+        if acquired is None:
+            return token
+        return token if acquired else None
+
+    def release_lock(self, key: str, token: str) -> None:
+        """Release a lock taken by acquire_lock, if it is still ours"""
+        _redis_call("eval", _RELEASE_LOCK_SCRIPT, 1, self.lock_key(key), token)
+
+    def _store_local(self, cache_key: str, data: bytes, ttl: float) -> None:
+        evicted = _local.set(cache_key, data, ttl)
+        if evicted:
+            with _stats_lock:
+                _stats["evictions"] += evicted
+
+def _seal_envelope(data: bytes, versions: Dict[str, int], expires_at: float, delta: float) -> bytes:
+    """Prefix data with a one-line JSON header of its tag versions, expiry and compute time"""
+    header = {"t": versions, "x": round(expires_at, 3), "d": round(delta, 3)}
+    return json.dumps(header, separators=(",", ":"), sort_keys=True).encode() + b"\n" + data
+
+def _read_header(envelope: bytes) -> Optional[Dict[str, Any]]:
+    header, separator, _ = envelope.partition(b"\n")
+    if not separator:
+        return None
+    try:
+        return json.loads(header)
+    except ValueError:
+        return None
+
+def _open_envelope(envelope: bytes, versions: Dict[str, int]) -> Optional[CacheEntry]:
+    """Return the entry if its recorded tag versions are all still current"""
+    header = _read_header(envelope)
+    if header is None:
+        return None
+    if any(versions.get(tag, 0) != version for tag, version in header.get("t", {}).items()):
+        return None
+    return CacheEntry(envelope.partition(b"\n")[2], float(header.get("x", 0)), float(header.get("d", 0)))
+
+def invalidate_tags(tenant_id: str, tags: Iterable[str]) -> None:
+    """Bump tag versions for a tenant, making dependent entries stale"""
+    TenantCache(tenant_id, "tags").bump_tags(tags)
+
+def sweep_stale_entries(batch_size: int = 500) -> int:
+    """Delete Redis entries whose tags have been bumped since they were written.
+
+    Walks the keyspace incrementally with SCAN (never KEYS), peeking at each
+    entry's header rather than loading whole values. Returns keys removed.
+    """
+    removed = 0
+    batch: List[bytes] = []
+
+    def sweep(keys: List[bytes]) -> int:
+        pipe = redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.getrange(key, 0, HEADER_PEEK_BYTES - 1)
+        headers = pipe.execute()
+
+        tag_keys: Dict[bytes, List[bytes]] = {}
+        recorded: Dict[bytes, Dict[str, int]] = {}
+        for key, head in zip(keys, headers):
+            header = _read_header(head) if head else None
+            versions = header.get("t") if header else None
+            if versions:
+                prefix = key.split(b":c:", 1)[0]
+                recorded[key] = versions
+                tag_keys[key] = [prefix + b":tag:" + tag.encode() for tag in versions]
+
+        unique_tag_keys = sorted({tag_key for keys_for_entry in tag_keys.values() for tag_key in keys_for_entry})
+        if not unique_tag_keys:
+            return 0
+        current = dict(zip(unique_tag_keys, redis_client.mget(unique_tag_keys)))
+
+        dead = [
+            key for key, versions in recorded.items()
+            if any(int(current[tag_key] or 0) != version
+                   for tag_key, version in zip(tag_keys[key], versions.values()))
+        ]
+        if dead:
+            redis_client.unlink(*dead)
+        return len(dead)
+
+    for key in redis_client.scan_iter(match=f"{KEY_VERSION}:tenant:*:c:*", count=batch_size):
+        batch.append(key)
+        if len(batch) >= batch_size:
+            removed += sweep(batch)
+            batch = []
+    if batch:
+        removed += sweep(batch)
+
+    with _stats_lock:
+        _stats["swept"] += removed
+    logger.info(f"Cache sweep removed {removed} stale entries")
+    return removed
+
+class _SingleFlight:
+    """Coalesces concurrent computations of the same key within a process"""
+
+    def __init__(self):
+        self._calls: Dict[Any, Any] = {}
+        self._lock = threading.Lock()
+
+    def claim(self, key: Any, factory: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Return (future, True) for the caller that should compute, else the in-flight future"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = factory()
+            self._calls[key] = future
+            return future, True
+
+    def finish(self, key: Any, future: Any) -> None:
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+_flights = _SingleFlight()
+
+def _argument_key(args: tuple, kwargs: Dict[str, Any]) -> str:
+    """Stable short hash of call arguments (UUIDs, ints, strings, dates)"""
+    parts = [repr(arg) if not isinstance(arg, str) else arg for arg in args]
+    parts.extend(f"{name}={kwargs[name]!r}" for name in sorted(kwargs))
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:16]
+
+def cache_tenant_data(
+    expire: int = 3600,
+    namespace: Optional[str] = None,
+    tags: Iterable[str] = (),
+    cache_if: Optional[Callable[[Any], bool]] = None,
+    stale_ttl: int = 0,
+    early_refresh_beta: float = EARLY_REFRESH_BETA
+):
+    """Decorator for caching tenant-specific service method results.
+
+    The wrapped method's instance must expose the tenant as self.db.tenant_id.
+    Results are keyed by namespace (default: the method's qualified name) and
+    the call arguments, and serialized from the method's return annotation.
+    tags are templates over the method's arguments, e.g. "orders:{user_id}";
+    bumping any of them invalidates the entry. cache_if can reject results
+    that should not be stored (e.g. partial data).
+
+    Misses are recomputed once per key: other callers in the process wait for
+    that result, and other processes wait on a Redis lock. With stale_ttl,
+    an expired entry is returned immediately to everyone except the caller
+    refreshing it (and if the refresh fails). early_refresh_beta tunes
+    probabilistic refresh ahead of expiry; 0 disables it.
+
+    Waiting for another caller blocks the calling thread when the method is
+    synchronous. Call it from plain def routes or worker threads, never
+    directly from a coroutine. Coroutine methods wait with asyncio instead,
+    and make their Redis calls in worker threads so the event loop never
+    blocks on Redis.
+    """
     def decorator(func: Callable) -> Callable:
+        cache_namespace = namespace or func.__qualname__
+        signature = inspect.signature(func)
+        adapter_holder: Dict[str, TypeAdapter] = {}
+
+        def get_adapter() -> TypeAdapter:
+            # Resolved lazily so forward references in annotations are importable
+            if "adapter" not in adapter_holder:
+                return_type = typing.get_type_hints(func).get("return", Any)
+                adapter_holder["adapter"] = TypeAdapter(return_type)
+            return adapter_holder["adapter"]
+
+        def lookup(service, args, kwargs):
+            cache = TenantCache(service.db.tenant_id, cache_namespace)
+            key = _argument_key(args, kwargs)
+            arguments = signature.bind(service, *args, **kwargs).arguments
+            # Versions are read before computing, so a write that lands
+            # mid-computation leaves the stored entry already stale
+            versions = cache.tag_versions(tag.format(**arguments) for tag in tags)
+            return cache, key, versions, cache.get_entry(key, versions)
+
+        def decode(cache: TenantCache, key: str, entry: Optional[CacheEntry]) -> Optional[Any]:
+            return cache.decode(key, entry.data, get_adapter()) if entry is not None else None
+
+        def store(cache: TenantCache, key: str, versions: Dict[str, int], result: Any, delta: float) -> None:
+            if cache_if is None or cache_if(result):
+                cache.set(key, result, get_adapter(), expire, versions, delta, stale_ttl)
+
+        def usable(entry: Optional[CacheEntry]) -> bool:
+            # Still fresh (early refresh in progress elsewhere) or within its stale window
+            return entry is not None and (stale_ttl > 0 or entry.is_fresh(time.time()))
+
+        def fresh_entry(cache: TenantCache, key: str, versions: Dict[str, int]) -> Optional[CacheEntry]:
+            entry = cache.get_entry(key, versions)
+            return entry if entry is not None and entry.is_fresh(time.time()) else None
+
+        if inspect.iscoroutinefunction(func):
+            async def refresh_async(self, args, kwargs, cache, key, versions, entry):
+                token = await asyncio.to_thread(cache.acquire_lock, key)
+                if token is None:
+                    if usable(entry):
+                        _count("stale_served", cache_namespace)
+                        return decode(cache, key, entry)
+                    deadline = time.monotonic() + LOCK_WAIT
+                    while time.monotonic() < deadline:
+                        await asyncio.sleep(0.05)
+                        waited = await asyncio.to_thread(fresh_entry, cache, key, versions)
+                        if waited is not None:
+                            _count("lock_waits", cache_namespace)
+                            return decode(cache, key, waited)
+                try:
+                    started = time.monotonic()
+                    result = await func(self, *args, **kwargs)
+                    await asyncio.to_thread(store, cache, key, versions, result, time.monotonic() - started)
+                    return result
+                except Exception as e:
+                    if stale_ttl > 0 and entry is not None:
+                        logger.warning(f"Serving stale {cache_namespace} after refresh failed: {e}")
+                        _count("stale_served", cache_namespace)
+                        return decode(cache, key, entry)
+                    raise
+                finally:
+                    if token is not None:
+                        await asyncio.to_thread(cache.release_lock, key, token)
+
+            @wraps(func)
+            async def async_wrapper(self, *args, **kwargs):
+                cache, key, versions, entry = await asyncio.to_thread(lookup, self, args, kwargs)
+                if entry is not None and not entry.should_refresh(time.time(), early_refresh_beta):
+                    cached_result = decode(cache, key, entry)
+                    if cached_result is not None:
+                        return cached_result
+                    entry = None
+
+                flight_key = (id(asyncio.get_running_loop()), cache.cache_key(key))
+                future, leader = _flights.claim(flight_key, lambda: asyncio.get_running_loop().create_future())
+                if not leader:
+                    if usable(entry):
+                        _count("stale_served", cache_namespace)
+                        return decode(cache, key, entry)
+                    _count("coalesced", cache_namespace)
+                    return await asyncio.shield(future)
+
+                try:
+                    result = await refresh_async(self, args, kwargs, cache, key, versions, entry)
+                    future.set_result(result)
+                    return result
+                except BaseException as e:
+                    future.set_exception(e)
+                    # Mark retrieved so an unawaited failure does not log a warning
+                    future.exception()
+                    raise
+                finally:
+                    _flights.finish(flight_key, future)
+            return async_wrapper
+
+        def refresh(self, args, kwargs, cache, key, versions, entry):
+            token = cache.acquire_lock(key)
+            if token is None:
+                if usable(entry):
+                    _count("stale_served", cache_namespace)
+                    return decode(cache, key, entry)
+                # Another process is computing; poll briefly for its result
+                deadline = time.monotonic() + LOCK_WAIT
+                while time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    waited = fresh_entry(cache, key, versions)
+                    if waited is not None:
+                        _count("lock_waits", cache_namespace)
+                        return decode(cache, key, waited)
+            try:
+                started = time.monotonic()
+                result = func(self, *args, **kwargs)
+                store(cache, key, versions, result, time.monotonic() - started)
+                return result
+            except Exception as e:
+                if stale_ttl > 0 and entry is not None:
+                    logger.warning(f"Serving stale {cache_namespace} after refresh failed: {e}")
+                    _count("stale_served", cache_namespace)
+                    return decode(cache, key, entry)
+                raise
+            finally:
+                if token is not None:
+                    cache.release_lock(key, token)
+
         @wraps(func)
-        async def wrapper(tenant_id: str, *args, **kwargs):
-            cache = TenantCache(tenant_id)
-            
-            # Generate cache key from function name and parameters
-            if key_suffix:
-                cache_key = f"{func.__name__}:{key_suffix}"
-            else:
-                # Create hash of parameters for unique key
-                params_hash = hashlib.md5(
-                    json.dumps({"args": args, "kwargs": kwargs}, sort_keys=True).encode()
-                ).hexdigest()[:8]
-                cache_key = f"{func.__name__}:{params_hash}"
-            
-            # Try to get from cache
-            cached_result = cache.get(cache_key)
-            if cached_result is not None:
-                return cached_result
-            
-            # Execute function and cache result
-            result = await func(tenant_id, *args, **kwargs)
-            cache.set(cache_key, result, expire)
-            
-            return result
+        def wrapper(self, *args, **kwargs):
+            cache, key, versions, entry = lookup(self, args, kwargs)
+            if entry is not None and not entry.should_refresh(time.time(), early_refresh_beta):
+                cached_result = decode(cache, key, entry)
+                if cached_result is not None:
+                    return cached_result
+                entry = None
+
+            flight_key = cache.cache_key(key)
+            future, leader = _flights.claim(flight_key, Future)
+            if not leader:
+                if usable(entry):
+                    _count("stale_served", cache_namespace)
+                    return decode(cache, key, entry)
+                _count("coalesced", cache_namespace)
+                try:
+                    return future.result(timeout=LOCK_WAIT + LOCK_TTL)
+                except FutureTimeoutError:
+                    return func(self, *args, **kwargs)
+
+            try:
+                result = refresh(self, args, kwargs, cache, key, versions, entry)
+                future.set_result(result)
+                return result
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            finally:
+                _flights.finish(flight_key, future)
         return wrapper
     return decorator
-
-# Usage examples
-@cache_tenant_data(expire=1800, key_suffix="analytics")
-async def get_tenant_analytics(tenant_id: str, date_range: str) -> Dict[str, Any]:
-    """Cached analytics data"""
-    # Expensive analytics computation here
-    pass
-
-@cache_tenant_data(expire=300)  # 5 minutes for frequently changing data
-async def get_etsy_listings(tenant_id: str, page: int = 1) -> Dict[str, Any]:
-    """Cached Etsy listings with pagination"""
-    # API call to Etsy
-    pass
\ No newline at end of file
@@ -0,0 +1,80 @@
+"""
+Cache tag invalidation driven by database writes.
+
+A before_flush listener records which cache tags each flushed row affects;
+the tags are bumped only once the transaction commits, so readers never
+cache data from a transaction that later rolls back. Core statements that
+bypass the ORM (bulk updates) call mark_cache_tags themselves.
+"""
+
+import logging
+from typing import Dict, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from database.entities import (
+    Order, OrderItem, OrderNote, OrderStatusHistory, OrderFulfillment,
+    EtsyProductTemplate, ThirdPartyOAuthToken,
+    ShopifyProductSync, ShopifyOrderSync, ShopifyCollectionSync
+)
+from .cache import invalidate_tags
+
+logger = logging.getLogger(__name__)
+
+_SESSION_KEY = "cache_tags"
+
+# Entity -> tag template, formatted with the row's attributes
+ENTITY_TAGS = {
+    Order: "orders:{user_id}",
+    OrderItem: "orders:{user_id}",
+    OrderNote: "orders:{user_id}",
+    OrderStatusHistory: "orders:{user_id}",
+    OrderFulfillment: "orders:{user_id}",
+    EtsyProductTemplate: "templates:{user_id}",
+    ThirdPartyOAuthToken: "integration:{provider}",
+    ShopifyProductSync: "integration:shopify",
+    ShopifyOrderSync: "integration:shopify",
+    ShopifyCollectionSync: "integration:shopify",
+}
+
+def _pending(session: Session) -> Set[Tuple[str, str]]:
+    return session.info.setdefault(_SESSION_KEY, set())
+
+def mark_cache_tags(db_manager, *tags: str) -> None:
+    """Bump tags for the manager's tenant when its session next commits"""
+    pending = _pending(db_manager.db)
+    pending.update((db_manager.tenant_id, tag) for tag in tags)
+
+@event.listens_for(Session, "before_flush")
+def _collect_flushed_tags(session, flush_context, instances):
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        template = ENTITY_TAGS.get(type(instance))
+        tenant_id = getattr(instance, "tenant_id", None)
+        if template is None or tenant_id is None:
+            continue
+        tag = template.format(
+            user_id=getattr(instance, "user_id", None),
+            provider=getattr(instance, "provider", None)
+        )
+        _pending(session).add((tenant_id, tag))
+
+@event.listens_for(Session, "after_commit")
+def _bump_committed_tags(session):
+    pending = session.info.pop(_SESSION_KEY, None)
+    if not pending:
+        return
+
+    by_tenant: Dict[str, Set[str]] = {}
+    for tenant_id, tag in pending:
+        by_tenant.setdefault(tenant_id, set()).add(tag)
+    for tenant_id, tags in by_tenant.items():
+        try:
+            invalidate_tags(tenant_id, tags)
+        except Exception as e:
+            # Entries still expire by TTL; never fail a committed write over the cache
+            logger.warning(f"Failed to invalidate cache tags {sorted(tags)} for tenant {tenant_id}: {e}")
+
+@event.listens_for(Session, "after_rollback")
+def _discard_tags(session):
+    session.info.pop(_SESSION_KEY, None)
@@ -0,0 +1,67 @@
+# services/common/http.py
+"""
+Shared async HTTP connection pools for marketplace clients.
+
+One httpx.AsyncClient per (pool name, event loop) keeps TCP/TLS connections
+alive across requests and tenants instead of reconnecting per call. HTTP/2 is
+used when the h2 package is installed, multiplexing concurrent calls to the
+same marketplace over a single connection.
+"""
+
+import asyncio
+import logging
+import os
+import random
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_clients: Dict[Tuple[str, int], httpx.AsyncClient] = {}
+
+def get_async_http_client(name: str, headers: Optional[Dict[str, str]] = None) -> httpx.AsyncClient:
+    """Get the pooled client for name on the running event loop.
+
+    Clients are bound to the loop that created them, so each loop (the API
+    server's, or a worker's asyncio.run) gets its own pool.
+    """
+    loop = asyncio.get_running_loop()
+    key = (name, id(loop))
+    client = _clients.get(key)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            headers=headers,
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+            )
+        )
+        _clients[key] = client
+        logger.debug(f"Opened {name} HTTP pool (http2={HTTP2_AVAILABLE})")
+    return client
+
+async def close_async_http_clients() -> None:
+    """Close every pool created on the running loop (call on shutdown)"""
+    loop_id = id(asyncio.get_running_loop())
+    for key in [key for key in _clients if key[1] == loop_id]:
+        await _clients.pop(key).aclose()
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Exponential backoff with full jitter for retry attempt (0-based)"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
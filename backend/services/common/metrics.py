@@ -1,14 +1,16 @@
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy import text, func, and_
+from sqlalchemy import text, and_
 from sqlalchemy.orm import Session
 from typing import Dict, Any, Optional
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import logging
 import os
 
 from database.core import get_db
 from database.entities.order import Order
 from database.entities.template import EtsyProductTemplate
+from services.order.rollups import OrderRollupService
+from services.common.cache import cache_stats
 from common.auth import get_tenant_context
 
 logger = logging.getLogger(__name__)
@@ -158,7 +160,7 @@ async def performance_metrics(
 ) -> Dict[str, Any]:
     """Get performance metrics for the specified time period"""
     
-    start_time = datetime.now() - timedelta(hours=hours)
+    start_time = datetime.now(timezone.utc) - timedelta(hours=hours)
     
     metrics = {
         "timestamp": datetime.now().isoformat(),
@@ -168,41 +170,8 @@ async def performance_metrics(
     }
     
     try:
-        # Recent order activity using SQLAlchemy ORM with subqueries for aggregation
-        order_query = db.query(Order).filter(
-            and_(
-                Order.tenant_id == tenant_id,
-                Order.created_at >= start_time,
-                Order.is_deleted == False
-            )
-        )
-        
-        total_orders = order_query.count()
-        completed_orders = order_query.filter(Order.status == 'completed').count()
-        
-        # Use scalar subqueries for aggregate functions
-        avg_order_value = db.query(func.avg(Order.total_amount)).filter(
-            and_(
-                Order.tenant_id == tenant_id,
-                Order.created_at >= start_time,
-                Order.is_deleted == False
-            )
-        ).scalar() or 0
-        
-        total_revenue = db.query(func.sum(Order.total_amount)).filter(
-            and_(
-                Order.tenant_id == tenant_id,
-                Order.created_at >= start_time,
-                Order.is_deleted == False
-            )
-        ).scalar() or 0
-        
-        metrics["orders"] = {
-            "total": total_orders,
-            "completed": completed_orders,
-            "average_value": float(avg_order_value),
-            "total_revenue": float(total_revenue)
-        }
+        # Recent order activity from the daily rollups (raw rows only for the partial first day)
+        metrics["orders"] = OrderRollupService(db, tenant_id).summarize_since(start_time)
         
         # Template usage using SQLAlchemy ORM
         template_query = db.query(EtsyProductTemplate).filter(
@@ -221,6 +190,9 @@ async def performance_metrics(
             "active": active_templates
         }
         
+        # Process-wide cache counters (local tier is per worker process)
+        metrics["cache"] = cache_stats()
+        
     except Exception as e:
         logger.error(f"Failed to get performance metrics: {e}")
         metrics["error"] = str(e)
@@ -0,0 +1,284 @@
+# services/common/rate_budget.py
+"""
+Marketplace call budgets shared by every API and worker process.
+
+Each budget is a token bucket stored in Redis under (platform, scope) and
+updated only through Lua scripts, so concurrent processes see one consistent
+level. Clients acquire a token before each call and feed back what the
+marketplace reports (remaining calls, 429s), which keeps the shared level
+honest even when other apps use the same quota.
+
+Priorities: interactive callers may queue behind the current level, while
+background callers only take a token when at least BACKGROUND_RESERVE of the
+bucket would still be left, so dashboard requests are served first when a
+sync is saturating the quota. If Redis is unreachable, budgets fall back to
+an in-process bucket with the same rules.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from enum import Enum
+from typing import Dict, Optional, Tuple
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Fraction of each bucket that background work must leave for interactive calls
+BACKGROUND_RESERVE = float(os.getenv("RATE_BUDGET_BACKGROUND_RESERVE", "0.25"))
+# Longest a caller waits for a token before giving up
+INTERACTIVE_MAX_WAIT = float(os.getenv("RATE_BUDGET_INTERACTIVE_MAX_WAIT", "10"))
+BACKGROUND_MAX_WAIT = float(os.getenv("RATE_BUDGET_BACKGROUND_MAX_WAIT", "300"))
+# Seconds to use the local fallback after a Redis error before trying Redis again
+REDIS_RETRY_AFTER = float(os.getenv("RATE_BUDGET_REDIS_RETRY_AFTER", "10"))
+KEY_PREFIX = "ratelimit"
+
+redis_client = redis.Redis.from_url(
+    REDIS_URL,
+    decode_responses=False,
+    socket_timeout=0.25,
+    socket_connect_timeout=0.25
+)
+
+class Priority(str, Enum):
+    INTERACTIVE = "interactive"
+    BACKGROUND = "background"
+
+class RateBudgetExhausted(Exception):
+    """No token became available within the caller's max wait"""
+
+    def __init__(self, key: str, retry_after: float):
+        super().__init__(f"Rate budget {key} exhausted, retry after {retry_after:.1f} seconds")
+        self.retry_after = retry_after
+
+# Bucket hash fields: t=tokens, ts=last refill time, c/r=learned capacity and rate.
+# Returns {granted, wait seconds as a string} (Lua numbers are truncated to integers on return).
+_RESERVE_SCRIPT = """
+local state = redis.call('HMGET', KEYS[1], 't', 'ts', 'c', 'r')
+local capacity = tonumber(state[3]) or tonumber(ARGV[1])
+local rate = tonumber(state[4]) or tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local floor = tonumber(ARGV[4]) * capacity
+local max_wait = tonumber(ARGV[5])
+local now = tonumber(ARGV[6])
+
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+
+local granted = 1
+local wait = 0
+local available = tokens - floor
+if available >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - available) / rate
+    if floor == 0 and wait <= max_wait then
+        tokens = tokens - cost
+    else
+        granted = 0
+    end
+end
+
+redis.call('HSET', KEYS[1], 't', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 60000)
+return {granted, tostring(wait)}
+"""
+
+# Lower the level to what the marketplace reports (never raise it: our level
+# also counts calls still in flight), optionally minus a penalty after a 429,
+# and learn a new capacity/rate when the marketplace reports one.
+_ADJUST_SCRIPT = """
+local state = redis.call('HMGET', KEYS[1], 't', 'ts', 'c', 'r')
+local capacity = tonumber(ARGV[7]) or tonumber(state[3]) or tonumber(ARGV[1])
+local rate = tonumber(ARGV[8]) or tonumber(state[4]) or tonumber(ARGV[2])
+local now = tonumber(ARGV[5])
+
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+
+local ceiling = tonumber(ARGV[3])
+if ceiling then
+    tokens = math.min(tokens, ceiling)
+end
+local penalty = tonumber(ARGV[4])
+if penalty > 0 then
+    tokens = math.min(tokens, -penalty * rate)
+end
+
+redis.call('HSET', KEYS[1], 't', tostring(tokens), 'ts', tostring(now), 'c', tostring(capacity), 'r', tostring(rate))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 60000)
+return tostring(tokens)
+"""
+
+_reserve = redis_client.register_script(_RESERVE_SCRIPT)
+_adjust = redis_client.register_script(_ADJUST_SCRIPT)
+
+_redis_retry_at = 0.0
+
+def _redis_script(script, key: str, args: list):
+    """Run a budget script, returning None while Redis is unreachable"""
+    global _redis_retry_at
+    if time.monotonic() < _redis_retry_at:
+        return None
+    try:
+        return script(keys=[key], args=args)
+    except redis.RedisError as e:
+        _redis_retry_at = time.monotonic() + REDIS_RETRY_AFTER
+        logger.warning(f"Rate budget Redis unavailable, using local buckets for {REDIS_RETRY_AFTER:.0f}s: {e}")
+        return None
+
+class _LocalBucket:
+    """In-process copy of the Lua bucket, used while Redis is unreachable"""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated_at = time.time()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self, cost: float, floor: float, max_wait: float, now: float) -> Tuple[bool, float]:
+        with self._lock:
+            self._refill(now)
+            available = self.tokens - floor * self.capacity
+            if available >= cost:
+                self.tokens -= cost
+                return True, 0.0
+            wait = (cost - available) / self.rate
+            if floor == 0 and wait <= max_wait:
+                self.tokens -= cost
+                return True, wait
+            return False, wait
+
+    def adjust(self, ceiling: Optional[float], penalty: float, now: float,
+               capacity: Optional[float], rate: Optional[float]) -> float:
+        with self._lock:
+            if capacity is not None:
+                self.capacity = capacity
+            if rate is not None:
+                self.rate = rate
+            self._refill(now)
+            if ceiling is not None:
+                self.tokens = min(self.tokens, ceiling)
+            if penalty > 0:
+                self.tokens = min(self.tokens, -penalty * self.rate)
+            return self.tokens
+
+class RateBudget:
+    """Shared token bucket for one (platform, scope) pair"""
+
+    def __init__(self, platform: str, scope: str, capacity: float, refill_rate: float):
+        self.key = f"{KEY_PREFIX}:{platform}:{scope}"
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self._local = _LocalBucket(capacity, refill_rate)
+
+    def reserve(self, cost: float = 1.0, priority: Priority = Priority.INTERACTIVE,
+                max_wait: float = 0.0) -> Tuple[bool, float]:
+        """Try to take cost tokens; return (granted, seconds to wait).
+
+        A grant with a positive wait is a queued reservation: the caller must
+        sleep that long before sending. A refusal means nothing was taken and
+        the caller may retry after the wait.
+        """
+        floor = BACKGROUND_RESERVE if priority == Priority.BACKGROUND else 0.0
+        now = time.time()
+        result = _redis_script(_reserve, self.key, [
+            self.capacity, self.refill_rate, cost, floor, max_wait, now
+        ])
+        if result is None:
+            return self._local.reserve(cost, floor, max_wait, now)
+        granted, wait = result
+        return bool(int(granted)), float(wait)
+
+    def _adjust(self, ceiling: Optional[float] = None, penalty: float = 0.0,
+                capacity: Optional[float] = None, rate: Optional[float] = None) -> float:
+        """Apply an adjustment and return the resulting level"""
+        if capacity is not None:
+            self.capacity = capacity
+        if rate is not None:
+            self.refill_rate = rate
+        now = time.time()
+        result = _redis_script(_adjust, self.key, [
+            self.capacity, self.refill_rate,
+            "" if ceiling is None else ceiling, penalty, now,
+            "" if capacity is None else capacity,
+            "" if rate is None else rate
+        ])
+        if result is None:
+            return self._local.adjust(ceiling, penalty, now, capacity, rate)
+        return float(result)
+
+    def observe(self, remaining: float, capacity: Optional[float] = None,
+                refill_rate: Optional[float] = None) -> None:
+        """Sync with the remaining calls the marketplace reported"""
+        self._adjust(ceiling=remaining, capacity=capacity, rate=refill_rate)
+
+    def throttled(self, retry_after: float) -> None:
+        """Record a 429: hold every process off for retry_after seconds"""
+        self._adjust(penalty=max(retry_after, 0.0))
+
+    def remaining(self) -> int:
+        """Tokens currently available (without taking any)"""
+        return max(0, int(self._adjust()))
+
+    def _max_wait(self, priority: Priority, max_wait: Optional[float]) -> float:
+        if max_wait is not None:
+            return max_wait
+        return BACKGROUND_MAX_WAIT if priority == Priority.BACKGROUND else INTERACTIVE_MAX_WAIT
+
+    async def acquire(self, cost: float = 1.0, priority: Priority = Priority.INTERACTIVE,
+                      max_wait: Optional[float] = None) -> None:
+        """Wait (without blocking the event loop) until a call may be sent.
+
+        The Redis round trip runs in a worker thread, so a slow Redis delays
+        only this caller.
+        """
+        deadline = time.monotonic() + self._max_wait(priority, max_wait)
+        while True:
+            budget_left = deadline - time.monotonic()
+            granted, wait = await asyncio.to_thread(self.reserve, cost, priority, max(budget_left, 0.0))
+            if not granted and wait > budget_left:
+                raise RateBudgetExhausted(self.key, wait)
+            if wait > 0:
+                logger.debug(f"Rate budget {self.key} waiting {wait:.2f}s ({priority.value})")
+                await asyncio.sleep(wait)
+            if granted:
+                return
+
+    def acquire_blocking(self, cost: float = 1.0, priority: Priority = Priority.INTERACTIVE,
+                         max_wait: Optional[float] = None) -> None:
+        """Blocking variant of acquire for synchronous clients"""
+        deadline = time.monotonic() + self._max_wait(priority, max_wait)
+        while True:
+            budget_left = deadline - time.monotonic()
+            granted, wait = self.reserve(cost, priority, max(budget_left, 0.0))
+            if not granted and wait > budget_left:
+                raise RateBudgetExhausted(self.key, wait)
+            if wait > 0:
+                logger.debug(f"Rate budget {self.key} sleeping {wait:.2f}s ({priority.value})")
+                time.sleep(wait)
+            if granted:
+                return
+
+_budgets: Dict[str, RateBudget] = {}
+_budgets_lock = threading.Lock()
+
+def get_rate_budget(platform: str, scope: str, capacity: float, refill_rate: float) -> RateBudget:
+    """Process-wide handle for a budget (the level itself lives in Redis)"""
+    key = f"{platform}:{scope}"
+    with _budgets_lock:
+        budget = _budgets.get(key)
+        if budget is None:
+            budget = _budgets[key] = RateBudget(platform, scope, capacity, refill_rate)
+        return budget
@@ -0,0 +1,19 @@
+# services/common/storage.py
+"""
+Local file storage for uploads and generated images.
+
+Rows store paths relative to the storage root (e.g. "<tenant>/designs/...").
+storage_path resolves one on disk under LOCAL_STORAGE_PATH and storage_url
+gives its public URL under LOCAL_STORAGE_URL.
+"""
+
+import os
+
+STORAGE_ROOT = os.getenv("LOCAL_STORAGE_PATH", "uploads")
+STORAGE_URL = os.getenv("LOCAL_STORAGE_URL", "/uploads")
+
+def storage_path(relative_path: str) -> str:
+    return os.path.join(STORAGE_ROOT, relative_path)
+
+def storage_url(relative_path: str) -> str:
+    return f"{STORAGE_URL.rstrip('/')}/{relative_path}"
@@ -20,8 +20,11 @@ def get_dashboard_service(db_manager: DatabaseManager = Depends(get_database_man
     """Dependency to get dashboard service"""
     return DashboardService(db_manager)
 
+# Plain def routes: the service blocks while it waits for its marketplace sections,
+# so FastAPI runs these in its threadpool instead of on the event loop
+
 @router.get("/", response_model=CompleteDashboard)
-async def get_complete_dashboard(
+def get_complete_dashboard(
     current_user: UserOrAdminDep,
     dashboard_service: DashboardService = Depends(get_dashboard_service)
 ):
@@ -34,7 +37,7 @@ async def get_complete_dashboard(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/overview", response_model=DashboardOverview)
-async def get_dashboard_overview(
+def get_dashboard_overview(
     current_user: UserOrAdminDep,
     dashboard_service: DashboardService = Depends(get_dashboard_service)
 ):
@@ -47,7 +50,7 @@ async def get_dashboard_overview(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/metrics", response_model=DashboardMetrics)
-async def get_dashboard_metrics(
+def get_dashboard_metrics(
     current_user: UserOrAdminDep,
     dashboard_service: DashboardService = Depends(get_dashboard_service),
     days: int = Query(30, ge=1, le=365, description="Number of days to analyze")
@@ -61,7 +64,7 @@ async def get_dashboard_metrics(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/alerts", response_model=List[DashboardAlert])
-async def get_dashboard_alerts(
+def get_dashboard_alerts(
     current_user: UserOrAdminDep,
     dashboard_service: DashboardService = Depends(get_dashboard_service)
 ):
@@ -73,7 +76,7 @@ async def get_dashboard_alerts(
         return []
 
 @router.get("/quick-actions", response_model=List[DashboardQuickAction])
-async def get_quick_actions(
+def get_quick_actions(
     current_user: UserOrAdminDep,
     dashboard_service: DashboardService = Depends(get_dashboard_service)
 ):
@@ -85,7 +88,7 @@ async def get_quick_actions(
         return []
 
 @router.get("/summary", response_model=dict)
-async def get_dashboard_summary(
+def get_dashboard_summary(
     current_user: UserOrAdminDep,
     dashboard_service: DashboardService = Depends(get_dashboard_service)
 ):
@@ -41,6 +41,7 @@ class DashboardOverview(BaseModel):
     
     # System status
     last_updated: datetime = Field(default_factory=datetime.now)
+    stale_sections: List[str] = Field(default_factory=list)  # Sections that timed out or failed
 
 class DashboardMetrics(BaseModel):
     """Detailed dashboard metrics"""
@@ -67,6 +68,7 @@ class DashboardMetrics(BaseModel):
     conversion_rate: float = 0.0
     average_order_value: Decimal = Decimal('0')
     customer_satisfaction: Optional[float] = None
+    stale_sections: List[str] = Field(default_factory=list)
 
 class DashboardAlert(BaseModel):
     """Dashboard alert/notification"""
@@ -107,5 +109,6 @@ class CompleteDashboard(BaseModel):
     alerts: List[DashboardAlert] = Field(default_factory=list)
     quick_actions: List[DashboardQuickAction] = Field(default_factory=list)
     widgets: List[DashboardWidget] = Field(default_factory=list)
+    stale_sections: List[str] = Field(default_factory=list)  # Sections served partially or not at all
     
     model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
@@ -1,107 +1,101 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from uuid import UUID
 from datetime import datetime, timezone, timedelta
 from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 import logging
+import os
+import time
 
 from .models import (
     DashboardOverview, DashboardMetrics, DashboardAlert,
     DashboardQuickAction, DashboardWidget, CompleteDashboard
 )
-from database.entities import User, Order, EtsyProductTemplate, ThirdPartyOAuthToken
+from database.core import SessionLocal
+from database.entities import User, EtsyProductTemplate, ThirdPartyOAuthToken
 from common.database import DatabaseManager
 from common.exceptions import UserNotFound, DashboardDataError
-from services.etsy.service import EtsyService
 from services.order.service import OrderService
+from services.order.rollups import OrderRollupService
 from services.template.service import TemplateService
-from services.shopify.service import ShopifyService
+from services.common.cache import cache_tenant_data
 
 logger = logging.getLogger(__name__)
 
+# Time budget (seconds) for each marketplace section of a dashboard load
+SECTION_TIMEOUTS = {
+    'etsy': float(os.getenv("DASHBOARD_ETSY_TIMEOUT", "4.0")),
+    'shopify': float(os.getenv("DASHBOARD_SHOPIFY_TIMEOUT", "4.0")),
+}
+
+# Seconds a fully loaded dashboard is served from cache; partial loads are not cached
+DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "60"))
+DASHBOARD_CACHE_TAGS = ("orders:{user_id}", "templates:{user_id}", "integration:etsy", "integration:shopify")
+
+# Shared pool for marketplace sections; sections that overrun their budget
+# finish in the background instead of holding up the response
+_section_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("DASHBOARD_SECTION_WORKERS", "16")),
+    thread_name_prefix="dashboard-section"
+)
+
+def _marketplace_service_class(name: str):
+    if name == 'etsy':
+        from services.etsy.service import EtsyService
+        return EtsyService
+    from services.shopify.service import ShopifyService
+    return ShopifyService
+
+def _run_marketplace_section(name: str, tenant_id: str, user_id: UUID, detail: Optional[str]) -> Dict[str, Any]:
+    """Load one marketplace's status (and optional detail) on its own session.
+
+    Runs on a worker thread, so it must not touch the request's session.
+    name is 'etsy' or 'shopify'; detail is None (status only), 'shop' or 'dashboard'.
+    """
+    session = SessionLocal()
+    try:
+        service = _marketplace_service_class(name)(DatabaseManager(session, tenant_id))
+        result = {'status': service.get_integration_status(user_id), 'shop': None, 'dashboard': None, 'error': None}
+        
+        if result['status'].is_connected and detail:
+            try:
+                if detail == 'dashboard':
+                    result['dashboard'] = service.get_dashboard_data(user_id)
+                else:
+                    result['shop'] = service.get_shop_info(user_id)
+            except Exception as e:
+                result['error'] = str(e)
+        
+        return result
+    finally:
+        session.close()
+
 class DashboardService:
     """Service for dashboard data aggregation and management"""
     
     def __init__(self, db_manager: DatabaseManager):
         self.db = db_manager
-        self.etsy_service = EtsyService(db_manager)
-        self.shopify_service = ShopifyService(db_manager)
         self.order_service = OrderService(db_manager)
+        self.rollup_service = OrderRollupService(db_manager, db_manager.tenant_id)
         self.template_service = TemplateService(db_manager)
     
+    @cache_tenant_data(expire=DASHBOARD_CACHE_TTL, namespace="dashboard.overview", tags=DASHBOARD_CACHE_TAGS,
+                       cache_if=lambda overview: not overview.stale_sections)
     def get_dashboard_overview(self, user_id: UUID) -> DashboardOverview:
         """Get dashboard overview data"""
         try:
-            # Validate user exists
-            user = self.db.query(User).filter(User.id == user_id, User.is_active == True).first()
-            if not user:
-                raise UserNotFound(user_id)
+            user = self._get_active_user(user_id)
+            sections = self._start_marketplace_sections(user_id, detail='shop')
             
-            # Get order statistics
+            # Local stats run on this thread while the marketplaces respond
             order_stats = self._get_order_statistics(user_id)
-            
-            # Get template statistics
             template_stats = self._get_template_statistics(user_id)
             
-            # Get Etsy integration status
-            etsy_status = self.etsy_service.get_integration_status(user_id)
-            etsy_shop_name = None
-            etsy_last_sync = None
-            
-            if etsy_status.is_connected:
-                try:
-                    etsy_shop = self.etsy_service.get_shop_info(user_id)
-                    etsy_shop_name = etsy_shop.shop_name
-                    etsy_last_sync = etsy_status.last_sync
-                except Exception as e:
-                    logger.warning(f"Could not get Etsy shop info: {e}")
-            
-            # Get Shopify integration status
-            shopify_status = self.shopify_service.get_integration_status(user_id)
-            shopify_shop_name = None
-            shopify_last_sync = None
-            
-            if shopify_status.is_connected:
-                try:
-                    shopify_shop = self.shopify_service.get_shop_info(user_id)
-                    shopify_shop_name = shopify_shop.name
-                    shopify_last_sync = shopify_status.last_sync
-                except Exception as e:
-                    logger.warning(f"Could not get Shopify shop info: {e}")
-            
-            return DashboardOverview(
-                user_id=user_id,
-                tenant_id=self.db.tenant_id,
-                shop_name=user.shop_name,
-                
-                # Order stats
-                total_orders=order_stats['total_orders'],
-                pending_orders=order_stats['pending_orders'],
-                processing_orders=order_stats['processing_orders'],
-                completed_orders=order_stats['completed_orders'],
-                total_revenue=order_stats['total_revenue'],
-                this_month_revenue=order_stats['this_month_revenue'],
-                
-                # Template stats
-                total_templates=template_stats['total_templates'],
-                active_templates=template_stats['active_templates'],
-                
-                # Recent activity
-                recent_orders_count=order_stats.get('recent_count', 0),
-                recent_templates_count=template_stats.get('recent_count', 0),
-                
-                # Etsy integration
-                etsy_connected=etsy_status.is_connected,
-                etsy_shop_name=etsy_shop_name,
-                etsy_last_sync=etsy_last_sync,
-                
-                # Shopify integration
-                shopify_connected=shopify_status.is_connected,
-                shopify_shop_name=shopify_shop_name,
-                shopify_last_sync=shopify_last_sync,
-                
-                last_updated=datetime.now(timezone.utc)
-            )
+            marketplaces, stale = self._collect_marketplace_sections(sections)
+            return self._build_overview(user, order_stats, template_stats, marketplaces, stale)
             
+        except UserNotFound:
+            raise
         except Exception as e:
             logger.error(f"Error getting dashboard overview for user {user_id}: {str(e)}")
             raise DashboardDataError(f"Failed to get dashboard overview: {str(e)}")
@@ -109,87 +103,271 @@ class DashboardService:
     def get_dashboard_metrics(self, user_id: UUID, days: int = 30) -> DashboardMetrics:
         """Get detailed dashboard metrics"""
         try:
-            end_date = datetime.now(timezone.utc)
-            start_date = end_date - timedelta(days=days)
+            sections = self._start_marketplace_sections(user_id, detail='dashboard')
+            local_metrics = self._get_local_metrics(user_id, days)
+            marketplaces, stale = self._collect_marketplace_sections(sections)
+            return self._build_metrics(local_metrics, marketplaces, stale)
             
-            # Get order metrics
-            orders_by_status = self._get_orders_by_status(user_id, start_date, end_date)
-            orders_by_platform = self._get_orders_by_platform(user_id, start_date, end_date)
-            revenue_by_month = self._get_revenue_by_month(user_id, start_date, end_date)
+        except Exception as e:
+            logger.error(f"Error getting dashboard metrics for user {user_id}: {str(e)}")
+            raise DashboardDataError(f"Failed to get dashboard metrics: {str(e)}")
+    
+    def get_dashboard_alerts(self, user_id: UUID) -> List[DashboardAlert]:
+        """Get dashboard alerts and notifications"""
+        try:
+            sections = self._start_marketplace_sections(user_id, detail='dashboard')
+            order_stats = self._get_order_statistics(user_id)
+            template_stats = self._get_template_statistics(user_id)
+            marketplaces, _ = self._collect_marketplace_sections(sections)
+            return self._build_alerts(order_stats, template_stats, marketplaces)
             
-            # Get template metrics
-            templates_by_category = self._get_templates_by_category(user_id)
-            most_used_templates = self._get_most_used_templates(user_id)
+        except Exception as e:
+            logger.error(f"Error getting dashboard alerts for user {user_id}: {str(e)}")
+            return []
+    
+    def get_quick_actions(self, user_id: UUID) -> List[DashboardQuickAction]:
+        """Get quick action buttons for dashboard"""
+        sections = self._start_marketplace_sections(user_id, detail=None)
+        marketplaces, _ = self._collect_marketplace_sections(sections)
+        return self._build_quick_actions(marketplaces)
+    
+    @cache_tenant_data(expire=DASHBOARD_CACHE_TTL, namespace="dashboard.complete", tags=DASHBOARD_CACHE_TAGS,
+                       cache_if=lambda dashboard: not dashboard.stale_sections)
+    def get_complete_dashboard(self, user_id: UUID) -> CompleteDashboard:
+        """Get complete dashboard data.
+
+        The Etsy and Shopify sections are fetched concurrently, each within
+        its own time budget, while local statistics are read on this thread.
+        A section that times out or fails is left out and listed in
+        stale_sections instead of failing the whole dashboard.
+        """
+        try:
+            user = self._get_active_user(user_id)
+            sections = self._start_marketplace_sections(user_id, detail='dashboard')
+            
+            order_stats = self._get_order_statistics(user_id)
+            template_stats = self._get_template_statistics(user_id)
+            local_metrics = self._get_local_metrics(user_id)
             
-            # Get Etsy metrics if connected
-            etsy_metrics = None
-            etsy_status = self.etsy_service.get_integration_status(user_id)
-            if etsy_status.is_connected:
-                try:
-                    etsy_dashboard = self.etsy_service.get_dashboard_data(user_id)
-                    etsy_metrics = {
-                        'shop_views': etsy_dashboard.shop_stats.total_views,
-                        'shop_favorites': etsy_dashboard.shop_stats.total_favorites,
-                        'conversion_rate': etsy_dashboard.shop_stats.conversion_rate,
-                        'shop_rating': etsy_dashboard.shop_stats.shop_rating,
-                        'total_reviews': etsy_dashboard.shop_stats.total_reviews,
-                        'low_stock_count': len(etsy_dashboard.low_stock_listings),
-                        'pending_orders_count': len(etsy_dashboard.pending_orders)
-                    }
-                except Exception as e:
-                    logger.warning(f"Could not get Etsy metrics: {e}")
+            marketplaces, stale = self._collect_marketplace_sections(sections)
             
-            # Get Shopify metrics if connected
-            shopify_metrics = None
-            shopify_status = self.shopify_service.get_integration_status(user_id)
-            if shopify_status.is_connected:
-                try:
-                    shopify_dashboard = self.shopify_service.get_dashboard_data(user_id)
-                    shopify_metrics = {
-                        'total_products': shopify_dashboard.shop_stats.total_products,
-                        'total_orders': shopify_dashboard.shop_stats.total_orders,
-                        'total_revenue': float(shopify_dashboard.shop_stats.total_revenue),
-                        'average_order_value': float(shopify_dashboard.shop_stats.average_order_value),
-                        'pending_orders_count': shopify_dashboard.shop_stats.pending_orders,
-                        'low_stock_count': len(shopify_dashboard.low_stock_products),
-                        'collections_count': shopify_dashboard.shop_stats.total_collections
-                    }
-                except Exception as e:
-                    logger.warning(f"Could not get Shopify metrics: {e}")
+            overview = self._build_overview(user, order_stats, template_stats, marketplaces, stale)
+            metrics = self._build_metrics(local_metrics, marketplaces, stale)
+            alerts = self._build_alerts(order_stats, template_stats, marketplaces)
+            quick_actions = self._build_quick_actions(marketplaces)
             
-            # Calculate performance metrics
-            total_orders = sum(orders_by_status.values())
-            total_revenue = sum(month['revenue'] for month in revenue_by_month)
-            avg_order_value = Decimal(str(total_revenue / total_orders)) if total_orders > 0 else Decimal('0')
+            # Default widgets
+            widgets = [
+                DashboardWidget(
+                    id="revenue_chart",
+                    title="Revenue Overview",
+                    type="chart",
+                    position={"x": 0, "y": 0, "width": 6, "height": 4},
+                    config={"chart_type": "line", "data_source": "revenue_by_month"}
+                ),
+                DashboardWidget(
+                    id="order_status",
+                    title="Order Status",
+                    type="metric",
+                    position={"x": 6, "y": 0, "width": 3, "height": 2},
+                    config={"metric": "orders_by_status"}
+                ),
+                DashboardWidget(
+                    id="recent_orders",
+                    title="Recent Orders",
+                    type="table",
+                    position={"x": 0, "y": 4, "width": 6, "height": 4},
+                    config={"data_source": "recent_orders", "limit": 10}
+                )
+            ]
             
-            return DashboardMetrics(
-                period_start=start_date,
-                period_end=end_date,
-                orders_by_status=orders_by_status,
-                orders_by_platform=orders_by_platform,
-                revenue_by_month=revenue_by_month,
-                templates_by_category=templates_by_category,
-                most_used_templates=most_used_templates,
-                etsy_metrics=etsy_metrics,
-                shopify_metrics=shopify_metrics,
-                average_order_value=avg_order_value,
-                conversion_rate=etsy_metrics.get('conversion_rate', 0.0) if etsy_metrics else 0.0
+            return CompleteDashboard(
+                overview=overview,
+                metrics=metrics,
+                alerts=alerts,
+                quick_actions=quick_actions,
+                widgets=widgets,
+                stale_sections=stale
             )
             
+        except UserNotFound:
+            raise
         except Exception as e:
-            logger.error(f"Error getting dashboard metrics for user {user_id}: {str(e)}")
-            raise DashboardDataError(f"Failed to get dashboard metrics: {str(e)}")
+            logger.error(f"Error getting complete dashboard for user {user_id}: {str(e)}")
+            raise DashboardDataError(f"Failed to get dashboard data: {str(e)}")
     
-    def get_dashboard_alerts(self, user_id: UUID) -> List[DashboardAlert]:
-        """Get dashboard alerts and notifications"""
-        alerts = []
+    # Section fan-out
+    
+    def _start_marketplace_sections(self, user_id: UUID, detail: Optional[str]) -> Dict[str, Tuple[Any, float]]:
+        """Submit the Etsy and Shopify sections and return their futures with deadlines"""
+        started = time.monotonic()
+        sections = {}
         
-        try:
-            # Check Etsy integration status
-            etsy_status = self.etsy_service.get_integration_status(user_id)
+        for name in SECTION_TIMEOUTS:
+            # Shopify's status check already loads the shop, so skip the extra call
+            section_detail = None if (name == 'shopify' and detail == 'shop') else detail
+            future = _section_executor.submit(
+                _run_marketplace_section, name, self.db.tenant_id, user_id, section_detail
+            )
+            sections[name] = (future, started + SECTION_TIMEOUTS[name])
+        
+        return sections
+    
+    def _collect_marketplace_sections(
+        self, sections: Dict[str, Tuple[Any, float]]
+    ) -> Tuple[Dict[str, Optional[Dict[str, Any]]], List[str]]:
+        """Wait for each section until its deadline; missing or failed ones are stale"""
+        results: Dict[str, Optional[Dict[str, Any]]] = {}
+        stale: List[str] = []
+        
+        for name, (future, deadline) in sections.items():
+            try:
+                results[name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                if results[name]['error']:
+                    logger.warning(f"Dashboard section {name} partially failed: {results[name]['error']}")
+                    stale.append(name)
+            except FutureTimeoutError:
+                logger.warning(f"Dashboard section {name} exceeded its {SECTION_TIMEOUTS[name]}s budget")
+                results[name] = None
+                stale.append(name)
+            except Exception as e:
+                logger.warning(f"Dashboard section {name} failed: {e}")
+                results[name] = None
+                stale.append(name)
+        
+        return results, stale
+    
+    # Builders
+    
+    def _build_overview(
+        self,
+        user: User,
+        order_stats: Dict[str, Any],
+        template_stats: Dict[str, Any],
+        marketplaces: Dict[str, Optional[Dict[str, Any]]],
+        stale: List[str]
+    ) -> DashboardOverview:
+        """Assemble the overview from local stats and marketplace sections"""
+        etsy = marketplaces.get('etsy')
+        etsy_connected = bool(etsy and etsy['status'].is_connected)
+        etsy_shop_name = None
+        if etsy_connected:
+            if etsy['shop']:
+                etsy_shop_name = etsy['shop'].shop_name
+            elif etsy['dashboard']:
+                etsy_shop_name = etsy['dashboard'].shop_info.shop_name
+            else:
+                etsy_shop_name = etsy['status'].shop_name
+        
+        shopify = marketplaces.get('shopify')
+        shopify_connected = bool(shopify and shopify['status'].is_connected)
+        
+        return DashboardOverview(
+            user_id=user.id,
+            tenant_id=self.db.tenant_id,
+            shop_name=user.shop_name,
             
-            # Check Shopify integration status
-            shopify_status = self.shopify_service.get_integration_status(user_id)
+            # Order stats
+            total_orders=order_stats['total_orders'],
+            pending_orders=order_stats['pending_orders'],
+            processing_orders=order_stats['processing_orders'],
+            completed_orders=order_stats['completed_orders'],
+            total_revenue=order_stats['total_revenue'],
+            this_month_revenue=order_stats['this_month_revenue'],
+            
+            # Template stats
+            total_templates=template_stats['total_templates'],
+            active_templates=template_stats['active_templates'],
+            
+            # Recent activity
+            recent_orders_count=order_stats.get('recent_count', 0),
+            recent_templates_count=template_stats.get('recent_count', 0),
+            
+            # Etsy integration
+            etsy_connected=etsy_connected,
+            etsy_shop_name=etsy_shop_name,
+            etsy_last_sync=etsy['status'].last_sync if etsy_connected else None,
+            
+            # Shopify integration
+            shopify_connected=shopify_connected,
+            shopify_shop_name=shopify['status'].shop_name if shopify_connected else None,
+            shopify_last_sync=shopify['status'].last_sync if shopify_connected else None,
+            
+            stale_sections=stale,
+            last_updated=datetime.now(timezone.utc)
+        )
+    
+    def _build_metrics(
+        self,
+        local_metrics: Dict[str, Any],
+        marketplaces: Dict[str, Optional[Dict[str, Any]]],
+        stale: List[str]
+    ) -> DashboardMetrics:
+        """Assemble detailed metrics from local aggregates and marketplace dashboards"""
+        etsy_metrics = None
+        etsy = marketplaces.get('etsy')
+        if etsy and etsy['dashboard']:
+            etsy_dashboard = etsy['dashboard']
+            etsy_metrics = {
+                'shop_views': etsy_dashboard.shop_stats.total_views,
+                'shop_favorites': etsy_dashboard.shop_stats.total_favorites,
+                'conversion_rate': etsy_dashboard.shop_stats.conversion_rate,
+                'shop_rating': etsy_dashboard.shop_stats.shop_rating,
+                'total_reviews': etsy_dashboard.shop_stats.total_reviews,
+                'low_stock_count': len(etsy_dashboard.low_stock_listings),
+                'pending_orders_count': len(etsy_dashboard.pending_orders)
+            }
+        
+        shopify_metrics = None
+        shopify = marketplaces.get('shopify')
+        if shopify and shopify['dashboard']:
+            shopify_dashboard = shopify['dashboard']
+            shopify_metrics = {
+                'total_products': shopify_dashboard.shop_stats.total_products,
+                'total_orders': shopify_dashboard.shop_stats.total_orders,
+                'total_revenue': float(shopify_dashboard.shop_stats.total_revenue),
+                'average_order_value': float(shopify_dashboard.shop_stats.average_order_value),
+                'pending_orders_count': shopify_dashboard.shop_stats.pending_orders,
+                'low_stock_count': len(shopify_dashboard.low_stock_products),
+                'collections_count': shopify_dashboard.shop_stats.total_collections
+            }
+        
+        # Calculate performance metrics
+        orders_by_status = local_metrics['orders_by_status']
+        revenue_by_month = local_metrics['revenue_by_month']
+        total_orders = sum(orders_by_status.values())
+        total_revenue = sum(month['revenue'] for month in revenue_by_month)
+        avg_order_value = Decimal(str(total_revenue / total_orders)) if total_orders > 0 else Decimal('0')
+        
+        return DashboardMetrics(
+            period_start=local_metrics['period_start'],
+            period_end=local_metrics['period_end'],
+            orders_by_status=orders_by_status,
+            orders_by_platform=local_metrics['orders_by_platform'],
+            revenue_by_month=revenue_by_month,
+            templates_by_category=local_metrics['templates_by_category'],
+            most_used_templates=local_metrics['most_used_templates'],
+            etsy_metrics=etsy_metrics,
+            shopify_metrics=shopify_metrics,
+            average_order_value=avg_order_value,
+            conversion_rate=etsy_metrics.get('conversion_rate', 0.0) if etsy_metrics else 0.0,
+            stale_sections=stale
+        )
+    
+    def _build_alerts(
+        self,
+        order_stats: Dict[str, Any],
+        template_stats: Dict[str, Any],
+        marketplaces: Dict[str, Optional[Dict[str, Any]]]
+    ) -> List[DashboardAlert]:
+        """Derive alerts; sections that did not load in time produce no alerts"""
+        alerts = []
+        etsy = marketplaces.get('etsy')
+        shopify = marketplaces.get('shopify')
+        
+        # Check Etsy integration status
+        if etsy:
+            etsy_status = etsy['status']
             if not etsy_status.is_connected:
                 alerts.append(DashboardAlert(
                     id="etsy_not_connected",
@@ -210,8 +388,10 @@ class DashboardService:
                     action_text="Reconnect",
                     priority="high"
                 ))
-            
-            # Check Shopify integration status
+        
+        # Check Shopify integration status
+        if shopify:
+            shopify_status = shopify['status']
             if not shopify_status.is_connected:
                 alerts.append(DashboardAlert(
                     id="shopify_not_connected",
@@ -232,108 +412,93 @@ class DashboardService:
                     action_text="Reconnect",
                     priority="high"
                 ))
+        
+        # Check for pending orders
+        pending_count = order_stats['pending_orders']
+        if pending_count > 5:
+            alerts.append(DashboardAlert(
+                id="pending_orders",
+                type="warning",
+                title="Pending Orders",
+                message=f"You have {pending_count} pending orders that need attention.",
+                action_url="/orders?status=pending",
+                action_text="View Orders",
+                priority="normal"
+            ))
+        
+        # Check template count
+        if template_stats['total_templates'] == 0:
+            alerts.append(DashboardAlert(
+                id="no_templates",
+                type="info",
+                title="Create Your First Template",
+                message="Start by creating your first product template to streamline your listings.",
+                action_url="/templates/create",
+                action_text="Create Template",
+                priority="normal"
+            ))
+        
+        # Check for Etsy-specific alerts
+        if etsy and etsy['dashboard']:
+            etsy_dashboard = etsy['dashboard']
             
-            # Check for recent orders
-            recent_orders = self.order_service.get_orders(user_id, limit=5)
-            pending_count = len([o for o in recent_orders.orders if o.status == 'pending'])
-            
-            if pending_count > 5:
+            # Low stock alert
+            if len(etsy_dashboard.low_stock_listings) > 0:
                 alerts.append(DashboardAlert(
-                    id="pending_orders",
+                    id="low_stock",
                     type="warning",
-                    title="Pending Orders",
-                    message=f"You have {pending_count} pending orders that need attention.",
-                    action_url="/orders?status=pending",
-                    action_text="View Orders",
+                    title="Low Stock Items",
+                    message=f"{len(etsy_dashboard.low_stock_listings)} listings are running low on stock.",
+                    action_url="/etsy/listings?filter=low_stock",
+                    action_text="View Listings",
                     priority="normal"
                 ))
             
-            # Check template count
-            template_stats = self.template_service.get_template_stats(user_id)
-            if template_stats.total_templates == 0:
+            # Vacation mode alert
+            if etsy_dashboard.shop_info.is_vacation:
                 alerts.append(DashboardAlert(
-                    id="no_templates",
+                    id="vacation_mode",
                     type="info",
-                    title="Create Your First Template",
-                    message="Start by creating your first product template to streamline your listings.",
-                    action_url="/templates/create",
-                    action_text="Create Template",
-                    priority="normal"
+                    title="Shop in Vacation Mode",
+                    message="Your Etsy shop is currently in vacation mode.",
+                    action_url="/etsy/shop/settings",
+                    action_text="Manage Shop",
+                    priority="low"
                 ))
+        
+        # Check for Shopify-specific alerts
+        if shopify and shopify['dashboard']:
+            shopify_dashboard = shopify['dashboard']
             
-            # Check for Etsy-specific alerts
-            if etsy_status.is_connected:
-                try:
-                    etsy_dashboard = self.etsy_service.get_dashboard_data(user_id)
-                    
-                    # Low stock alert
-                    if len(etsy_dashboard.low_stock_listings) > 0:
-                        alerts.append(DashboardAlert(
-                            id="low_stock",
-                            type="warning",
-                            title="Low Stock Items",
-                            message=f"{len(etsy_dashboard.low_stock_listings)} listings are running low on stock.",
-                            action_url="/etsy/listings?filter=low_stock",
-                            action_text="View Listings",
-                            priority="normal"
-                        ))
-                    
-                    # Vacation mode alert
-                    if etsy_dashboard.shop_info.is_vacation:
-                        alerts.append(DashboardAlert(
-                            id="vacation_mode",
-                            type="info",
-                            title="Shop in Vacation Mode",
-                            message="Your Etsy shop is currently in vacation mode.",
-                            action_url="/etsy/shop/settings",
-                            action_text="Manage Shop",
-                            priority="low"
-                        ))
-                        
-                except Exception as e:
-                    logger.warning(f"Could not check Etsy alerts: {e}")
-            
-            # Check for Shopify-specific alerts
-            if shopify_status.is_connected:
-                try:
-                    shopify_dashboard = self.shopify_service.get_dashboard_data(user_id)
-                    
-                    # Low stock alert
-                    if len(shopify_dashboard.low_stock_products) > 0:
-                        alerts.append(DashboardAlert(
-                            id="shopify_low_stock",
-                            type="warning",
-                            title="Low Stock Products",
-                            message=f"{len(shopify_dashboard.low_stock_products)} products are running low on stock.",
-                            action_url="/shopify/products?filter=low_stock",
-                            action_text="View Products",
-                            priority="normal"
-                        ))
-                    
-                    # Draft products alert
-                    draft_count = shopify_dashboard.shop_stats.draft_products
-                    if draft_count > 5:
-                        alerts.append(DashboardAlert(
-                            id="shopify_draft_products",
-                            type="info",
-                            title="Draft Products",
-                            message=f"You have {draft_count} draft products that could be published.",
-                            action_url="/shopify/products?status=draft",
-                            action_text="Review Drafts",
-                            priority="low"
-                        ))
-                        
-                except Exception as e:
-                    logger.warning(f"Could not check Shopify alerts: {e}")
-            
-            return alerts
+            # Low stock alert
+            if len(shopify_dashboard.low_stock_products) > 0:
+                alerts.append(DashboardAlert(
+                    id="shopify_low_stock",
+                    type="warning",
+                    title="Low Stock Products",
+                    message=f"{len(shopify_dashboard.low_stock_products)} products are running low on stock.",
+                    action_url="/shopify/products?filter=low_stock",
+                    action_text="View Products",
+                    priority="normal"
+                ))
             
-        except Exception as e:
-            logger.error(f"Error getting dashboard alerts for user {user_id}: {str(e)}")
-            return []
+            # Draft products alert
+            draft_count = shopify_dashboard.shop_stats.draft_products
+            if draft_count > 5:
+                alerts.append(DashboardAlert(
+                    id="shopify_draft_products",
+                    type="info",
+                    title="Draft Products",
+                    message=f"You have {draft_count} draft products that could be published.",
+                    action_url="/shopify/products?status=draft",
+                    action_text="Review Drafts",
+                    priority="low"
+                ))
+        
+        return alerts
     
-    def get_quick_actions(self, user_id: UUID) -> List[DashboardQuickAction]:
-        """Get quick action buttons for dashboard"""
+    def _build_quick_actions(self, marketplaces: Dict[str, Optional[Dict[str, Any]]]) -> List[DashboardQuickAction]:
+        """Build quick action buttons, enabled per connected marketplace"""
         actions = [
             DashboardQuickAction(
                 id="create_template",
@@ -393,125 +558,54 @@ class DashboardService:
             )
         ]
         
-        # Enable/disable actions based on user status
-        etsy_status = self.etsy_service.get_integration_status(user_id)
-        shopify_status = self.shopify_service.get_integration_status(user_id)
-        
+        # Enable/disable actions based on integration status; a section that
+        # did not load in time leaves its actions enabled
         for action in actions:
-            if action.category == "etsy":
-                action.is_enabled = etsy_status.is_connected
-            elif action.category == "shopify":
-                action.is_enabled = shopify_status.is_connected
+            section = marketplaces.get(action.category)
+            if section:
+                action.is_enabled = section['status'].is_connected
         
         return actions
     
-    def get_complete_dashboard(self, user_id: UUID) -> CompleteDashboard:
-        """Get complete dashboard data"""
-        try:
-            overview = self.get_dashboard_overview(user_id)
-            metrics = self.get_dashboard_metrics(user_id)
-            alerts = self.get_dashboard_alerts(user_id)
-            quick_actions = self.get_quick_actions(user_id)
-            
-            # Default widgets
-            widgets = [
-                DashboardWidget(
-                    id="revenue_chart",
-                    title="Revenue Overview",
-                    type="chart",
-                    position={"x": 0, "y": 0, "width": 6, "height": 4},
-                    config={"chart_type": "line", "data_source": "revenue_by_month"}
-                ),
-                DashboardWidget(
-                    id="order_status",
-                    title="Order Status",
-                    type="metric",
-                    position={"x": 6, "y": 0, "width": 3, "height": 2},
-                    config={"metric": "orders_by_status"}
-                ),
-                DashboardWidget(
-                    id="recent_orders",
-                    title="Recent Orders",
-                    type="table",
-                    position={"x": 0, "y": 4, "width": 6, "height": 4},
-                    config={"data_source": "recent_orders", "limit": 10}
-                )
-            ]
-            
-            return CompleteDashboard(
-                overview=overview,
-                metrics=metrics,
-                alerts=alerts,
-                quick_actions=quick_actions,
-                widgets=widgets
-            )
-            
-        except Exception as e:
-            logger.error(f"Error getting complete dashboard for user {user_id}: {str(e)}")
-            raise DashboardDataError(f"Failed to get dashboard data: {str(e)}")
-    
     # Helper methods
     
-    def _get_order_statistics(self, user_id: UUID) -> Dict[str, Any]:
-        """Get order statistics"""
-        from sqlalchemy import func
-        
-        # Basic counts
-        total_orders = self.db.query(Order).filter(
-            Order.user_id == user_id,
-            Order.is_deleted == False
-        ).count()
-        
-        pending_orders = self.db.query(Order).filter(
-            Order.user_id == user_id,
-            Order.status == 'pending',
-            Order.is_deleted == False
-        ).count()
-        
-        processing_orders = self.db.query(Order).filter(
-            Order.user_id == user_id,
-            Order.status == 'processing',
-            Order.is_deleted == False
-        ).count()
-        
-        completed_orders = self.db.query(Order).filter(
-            Order.user_id == user_id,
-            Order.status.in_(['completed', 'delivered']),
-            Order.is_deleted == False
-        ).count()
-        
-        # Revenue calculation
-        total_revenue = self.db.query(func.sum(Order.total_amount)).filter(
-            Order.user_id == user_id,
-            Order.status.in_(['completed', 'delivered']),
-            Order.is_deleted == False
-        ).scalar() or Decimal('0')
+    def _get_active_user(self, user_id: UUID) -> User:
+        """Load the active user or raise UserNotFound"""
+        user = self.db.query(User).filter(User.id == user_id, User.is_active == True).first()
+        if not user:
+            raise UserNotFound(user_id)
+        return user
+    
+    def _get_local_metrics(self, user_id: UUID, days: int = 30) -> Dict[str, Any]:
+        """Get the database-backed parts of the dashboard metrics"""
+        end_date = datetime.now(timezone.utc)
+        start_date = end_date - timedelta(days=days)
         
-        # This month revenue
-        month_start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        this_month_revenue = self.db.query(func.sum(Order.total_amount)).filter(
-            Order.user_id == user_id,
-            Order.status.in_(['completed', 'delivered']),
-            Order.created_at >= month_start,
-            Order.is_deleted == False
-        ).scalar() or Decimal('0')
+        order_aggregates = self.rollup_service.get_order_aggregates(user_id, start_date, end_date)
         
-        # Recent orders count
-        week_ago = datetime.now() - timedelta(days=7)
-        recent_count = self.db.query(Order).filter(
-            Order.user_id == user_id,
-            Order.created_at >= week_ago,
-            Order.is_deleted == False
-        ).count()
+        return {
+            'period_start': start_date,
+            'period_end': end_date,
+            'orders_by_status': order_aggregates['orders_by_status'],
+            'orders_by_platform': order_aggregates['orders_by_platform'],
+            'revenue_by_month': self._get_revenue_by_month(user_id, start_date, end_date),
+            'templates_by_category': self._get_templates_by_category(user_id),
+            'most_used_templates': self._get_most_used_templates(user_id)
+        }
+    
+    def _get_order_statistics(self, user_id: UUID) -> Dict[str, Any]:
+        """Get order statistics"""
+        aggregates = self.rollup_service.get_order_aggregates(user_id)
+        orders_by_status = aggregates['orders_by_status']
         
         return {
-            'total_orders': total_orders,
-            'pending_orders': pending_orders,
-            'processing_orders': processing_orders,
-            'completed_orders': completed_orders,
-            'total_revenue': total_revenue,
-            'this_month_revenue': this_month_revenue,
-            'recent_count': recent_count
+            'total_orders': aggregates['total_orders'],
+            'pending_orders': orders_by_status.get('pending', 0),
+            'processing_orders': orders_by_status.get('processing', 0),
+            'completed_orders': orders_by_status.get('completed', 0) + orders_by_status.get('delivered', 0),
+            'total_revenue': aggregates['total_revenue'],
+            'this_month_revenue': aggregates['this_month_revenue'],
+            'recent_count': aggregates['recent_count']
         }
     
     def _get_template_statistics(self, user_id: UUID) -> Dict[str, Any]:
@@ -541,70 +635,9 @@ class DashboardService:
             'recent_count': recent_count
         }
     
-    def _get_orders_by_status(self, user_id: UUID, start_date: datetime, end_date: datetime) -> Dict[str, int]:
-        """Get order counts by status"""
-        from sqlalchemy import func
-        
-        result = self.db.query(
-            Order.status,
-            func.count(Order.id).label('count')
-        ).filter(
-            Order.user_id == user_id,
-            Order.created_at >= start_date,
-            Order.created_at <= end_date,
-            Order.is_deleted == False
-        ).group_by(Order.status).all()
-        
-        return {row.status: row.count for row in result}
-    
-    def _get_orders_by_platform(self, user_id: UUID, start_date: datetime, end_date: datetime) -> Dict[str, int]:
-        """Get order counts by platform"""
-        from sqlalchemy import func
-        
-        result = self.db.query(
-            Order.platform,
-            func.count(Order.id).label('count')
-        ).filter(
-            Order.user_id == user_id,
-            Order.created_at >= start_date,
-            Order.created_at <= end_date,
-            Order.is_deleted == False
-        ).group_by(Order.platform).all()
-        
-        return {row.platform: row.count for row in result}
-    
     def _get_revenue_by_month(self, user_id: UUID, start_date: datetime, end_date: datetime) -> List[Dict[str, Any]]:
         """Get revenue by month"""
-        from sqlalchemy import func, extract
-        
-        result = self.db.query(
-            extract('year', Order.created_at).label('year'),
-            extract('month', Order.created_at).label('month'),
-            func.sum(Order.total_amount).label('revenue'),
-            func.count(Order.id).label('orders')
-        ).filter(
-            Order.user_id == user_id,
-            Order.created_at >= start_date,
-            Order.created_at <= end_date,
-            Order.status.in_(['completed', 'delivered']),
-            Order.is_deleted == False
-        ).group_by(
-            extract('year', Order.created_at),
-            extract('month', Order.created_at)
-        ).order_by(
-            extract('year', Order.created_at),
-            extract('month', Order.created_at)
-        ).all()
-        
-        return [
-            {
-                'year': int(row.year),
-                'month': int(row.month),
-                'revenue': float(row.revenue or 0),
-                'orders': row.orders
-            }
-            for row in result
-        ]
+        return self.rollup_service.get_revenue_by_month(user_id, start_date, end_date)
     
     def _get_templates_by_category(self, user_id: UUID) -> Dict[str, int]:
         """Get template counts by category"""
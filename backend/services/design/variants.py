@@ -0,0 +1,229 @@
+# services/design/variants.py
+"""
+DesignVariant generation for uploaded designs.
+
+Uploads land as DesignImage rows with processing_status "pending"; a
+scheduled worker task claims them (FOR UPDATE SKIP LOCKED) and writes the
+standard variants next to the original:
+
+    thumbnail    max 400 px   WebP, AVIF and PNG   for listing grids
+    web          max 1600 px  WebP, AVIF and PNG   for detail views
+    print-ready  full size    PNG at 300 dpi
+
+Each file is its own DesignVariant row, so clients can pick the smallest
+format they support. Downscaled variants are never made from a full decode
+when that can be avoided: JPEG sources are opened per variant in draft mode,
+which lets libjpeg decode straight to 1/2, 1/4 or 1/8 scale, and every resize
+uses reducing_gap so most of the reduction is a cheap box reduce before the
+Lanczos pass. Variants are rotated upright from the EXIF orientation. AVIF
+needs the optional pillow-avif-plugin.
+
+A design left in "processing" longer than DESIGN_VARIANT_CLAIM_TIMEOUT (its
+worker died) is claimed again.
+"""
+
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import ExifTags, Image, ImageOps
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from database.core import SessionLocal
+from database.entities import DesignImage, DesignVariant
+from services.common.storage import storage_path, storage_url
+
+try:
+    import pillow_avif  # noqa: F401
+    AVIF_AVAILABLE = True
+except ImportError:
+    AVIF_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+VARIANT_BATCH_SIZE = int(os.getenv("DESIGN_VARIANT_BATCH_SIZE", "20"))
+# Seconds after which a design still marked processing is claimed again
+VARIANT_CLAIM_TIMEOUT = int(os.getenv("DESIGN_VARIANT_CLAIM_TIMEOUT", "900"))
+# Resample from at least this many times the target size after the box reduce
+REDUCING_GAP = 3.0
+PRINT_DPI = 300
+
+@dataclass(frozen=True)
+class VariantSpec:
+    name: str
+    max_size: Optional[int]  # longest side in pixels; None keeps the original size
+    formats: Tuple[str, ...]
+    quality: int = 85
+
+DESIGN_VARIANTS = (
+    VariantSpec('thumbnail', 400, ('webp', 'avif', 'png'), quality=80),
+    VariantSpec('web', 1600, ('webp', 'avif', 'png'), quality=85),
+    VariantSpec('print-ready', None, ('png',))
+)
+
+SAVE_FORMATS = {'webp': 'WEBP', 'avif': 'AVIF', 'png': 'PNG'}
+# EXIF orientations that rotate by 90 or 270 degrees, swapping width and height
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+def _target_size(size: Tuple[int, int], max_size: Optional[int]) -> Tuple[int, int]:
+    width, height = size
+    if max_size is None or max(width, height) <= max_size:
+        return width, height
+    scale = max_size / max(width, height)
+    return max(round(width * scale), 1), max(round(height * scale), 1)
+
+def _resize(image: Image.Image, target: Tuple[int, int]) -> Image.Image:
+    if target == image.size:
+        return image
+    return image.resize(target, Image.LANCZOS, reducing_gap=REDUCING_GAP)
+
+def _normalize_mode(image: Image.Image) -> Image.Image:
+    if image.mode in ('RGB', 'RGBA'):
+        return image
+    if image.mode in ('P', 'LA', 'PA') or 'transparency' in image.info:
+        return image.convert('RGBA')
+    return image.convert('RGB')
+
+def _save(image: Image.Image, path: str, image_format: str, spec: VariantSpec) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if image_format == 'PNG':
+        dpi = (PRINT_DPI, PRINT_DPI) if spec.max_size is None else None
+        image.save(path, 'PNG', optimize=spec.max_size is not None, **({'dpi': dpi} if dpi else {}))
+    elif image_format == 'WEBP':
+        image.save(path, 'WEBP', quality=spec.quality, method=4)
+    else:
+        image.save(path, image_format, quality=spec.quality)
+
+def _upright_size(image: Image.Image) -> Tuple[Tuple[int, int], bool]:
+    """Size of the image once rotated by its EXIF orientation, and whether that swaps the axes"""
+    swapped = image.getexif().get(ExifTags.Base.Orientation) in TRANSPOSED_ORIENTATIONS
+    width, height = image.size
+    return ((height, width) if swapped else (width, height)), swapped
+
+def generate_variants(design: DesignImage) -> List[Dict[str, Any]]:
+    """Write every standard variant of a design and return their design_variants rows"""
+    source = storage_path(design.file_path)
+    base = f"{design.tenant_id}/designs/variants/{design.id}"
+    rows = []
+    full: Optional[Image.Image] = None  # full-size upright decode, shared by the variants that need one
+    try:
+        for spec in DESIGN_VARIANTS:
+            formats = [image_format for image_format in spec.formats if image_format != 'avif' or AVIF_AVAILABLE]
+            with Image.open(source) as opened:
+                size, swapped = _upright_size(opened)
+                target = _target_size(size, spec.max_size)
+                if opened.format == 'JPEG' and target != size:
+                    # libjpeg decodes at the smallest DCT scale (1/2 to 1/8) still covering target * REDUCING_GAP
+                    requested = (round(target[0] * REDUCING_GAP), round(target[1] * REDUCING_GAP))
+                    opened.draft('RGB', requested[::-1] if swapped else requested)
+                    image = _resize(_normalize_mode(ImageOps.exif_transpose(opened)), target)
+                else:
+                    if full is None:
+                        full = _normalize_mode(ImageOps.exif_transpose(opened))
+                    image = _resize(full, target)
+
+            try:
+                for image_format in formats:
+                    relative_path = f"{base}/{spec.name}.{image_format}"
+                    path = storage_path(relative_path)
+                    _save(image, path, SAVE_FORMATS[image_format], spec)
+                    rows.append({
+                        'tenant_id': design.tenant_id,
+                        'user_id': design.user_id,
+                        'original_design_id': design.id,
+                        'variant_name': spec.name,
+                        'filename': os.path.basename(relative_path),
+                        'file_path': relative_path,
+                        'file_url': storage_url(relative_path),
+                        'file_size': os.path.getsize(path),
+                        'width_pixels': image.width,
+                        'height_pixels': image.height,
+                        'dpi': PRINT_DPI if spec.max_size is None else None,
+                        'format': image_format,
+                        'quality': spec.quality if image_format != 'png' else None
+                    })
+            finally:
+                if image is not full:
+                    image.close()
+    finally:
+        if full is not None:
+            full.close()
+    return rows
+
+def generate_pending_variants(batch_size: int = VARIANT_BATCH_SIZE) -> Dict[str, int]:
+    """Claim pending uploads in batches and generate their variants until none are left"""
+    totals = {'designs': 0, 'variants': 0, 'failed': 0}
+    session = SessionLocal()
+    try:
+        while True:
+            designs = _claim_designs(session, batch_size)
+            if not designs:
+                break
+            for design in designs:
+                _process_design(session, design, totals)
+    finally:
+        session.close()
+
+    if any(totals.values()):
+        logger.info(f"Design variants generated: {totals}")
+    return totals
+
+def _claim_designs(session: Session, batch_size: int) -> List[DesignImage]:
+    table = DesignImage.__table__
+    stale_before = datetime.now(timezone.utc) - timedelta(seconds=VARIANT_CLAIM_TIMEOUT)
+    claimable = (
+        select(table.c.id)
+        .where(
+            table.c.is_deleted == False,
+            or_(
+                table.c.processing_status == 'pending',
+                and_(table.c.processing_status == 'processing', table.c.updated_at < stale_before)
+            )
+        )
+        .order_by(table.c.created_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    claimed = session.execute(
+        update(table)
+        .where(table.c.id.in_(claimable.scalar_subquery()))
+        .values(processing_status='processing', updated_at=func.now())
+        .returning(table.c.id)
+    ).scalars().all()
+    session.commit()
+    if not claimed:
+        return []
+    return session.query(DesignImage).filter(DesignImage.id.in_(claimed)).all()
+
+def _process_design(session: Session, design: DesignImage, totals: Dict[str, int]) -> None:
+    if not design.is_raster:
+        # Vector sources are rasterized at print time, not here
+        design.processing_status = 'completed'
+        design.processed_at = datetime.now(timezone.utc)
+        session.commit()
+        return
+    try:
+        rows = generate_variants(design)
+    except Exception as e:
+        logger.error(f"Variant generation failed for design {design.id}: {e}")
+        design.processing_status = 'failed'
+        design.processing_error = str(e)
+        session.commit()
+        totals['failed'] += 1
+        return
+
+    # Regenerating replaces the previous set
+    session.execute(delete(DesignVariant.__table__).where(DesignVariant.__table__.c.original_design_id == design.id))
+    session.execute(insert(DesignVariant.__table__), rows)
+    original = next(row for row in rows if row['variant_name'] == 'print-ready')
+    design.width_pixels = design.width_pixels or original['width_pixels']
+    design.height_pixels = design.height_pixels or original['height_pixels']
+    design.processing_status = 'completed'
+    design.processing_error = None
+    design.processed_at = datetime.now(timezone.utc)
+    session.commit()
+    totals['designs'] += 1
+    totals['variants'] += len(rows)
@@ -0,0 +1,452 @@
+import asyncio
+import os
+import logging
+from contextlib import aclosing
+from datetime import datetime
+from typing import Optional, Dict, Any, List, AsyncIterator
+
+import httpx
+
+from .client import BaseEtsyClient, USER_AGENT, flatten_taxonomy
+from .models import (
+    EtsyTokenResponse, EtsyShop, EtsyUser, EtsyListing, EtsyReceipt,
+    EtsyTransaction, EtsyTaxonomy, EtsyShippingProfile, EtsyShopSection
+)
+from services.common.http import get_async_http_client, backoff_delay
+from services.common.rate_budget import RateBudgetExhausted
+from common.exceptions import (
+    EtsyAPIError, EtsyAuthError, EtsyRateLimitError, EtsyTokenExpiredError
+)
+
+logger = logging.getLogger(__name__)
+
+# Retries for 429s, 5xx responses and network errors before giving up
+ETSY_MAX_RETRIES = int(os.getenv("ETSY_MAX_RETRIES", "3"))
+# Longest Retry-After we are willing to wait inside a request
+ETSY_MAX_RETRY_AFTER = float(os.getenv("ETSY_MAX_RETRY_AFTER", "30"))
+# Etsy's maximum page size for offset-paginated collections
+ETSY_PAGE_SIZE = 100
+# Per-receipt transaction requests in flight at once; the shared budget still paces them
+ETSY_TRANSACTION_CONCURRENCY = int(os.getenv("ETSY_TRANSACTION_CONCURRENCY", "5"))
+
+class AsyncEtsyAPIClient(BaseEtsyClient):
+    """Non-blocking Etsy API client with the same method surface as EtsyAPIClient.
+
+    Requests go through the process-wide pooled connection manager, so
+    instances are cheap to create per request and waiting on Etsy (including
+    backoff) yields the event loop to other requests.
+    """
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        return get_async_http_client("etsy", headers={
+            'User-Agent': USER_AGENT,
+            'Accept': 'application/json'
+        })
+
+    async def exchange_code_for_token(self, code: str, code_verifier: str,
+                                      redirect_uri: str) -> EtsyTokenResponse:
+        """Exchange OAuth code for access token"""
+        try:
+            response = await self.http.post(
+                self.config.token_url,
+                data=self._authorization_code_form(code, code_verifier, redirect_uri)
+            )
+        except httpx.HTTPError as e:
+            logger.error(f"Network error during token exchange: {e}")
+            raise EtsyAuthError("Network error during token exchange")
+
+        if response.status_code != 200:
+            logger.error(f"Token exchange failed: {response.status_code} - {response.text}")
+            raise EtsyAuthError("Failed to exchange authorization code for token")
+
+        return self._parse_token_response(response.json())
+
+    async def refresh_access_token(self) -> EtsyTokenResponse:
+        """Refresh expired access token"""
+        data = self._refresh_token_form()
+
+        try:
+            response = await self.http.post(self.config.token_url, data=data)
+        except httpx.HTTPError as e:
+            logger.error(f"Network error during token refresh: {e}")
+            raise EtsyTokenExpiredError("Network error during token refresh")
+
+        if response.status_code != 200:
+            logger.error(f"Token refresh failed: {response.status_code} - {response.text}")
+            raise EtsyTokenExpiredError("Failed to refresh access token")
+
+        token_response = self._parse_token_response(response.json(), self.refresh_token)
+        self._apply_refreshed_token(token_response)
+        return token_response
+
+    async def ensure_valid_token(self):
+        """Ensure we have a valid access token"""
+        if not self.oauth_token:
+            raise EtsyAuthError("No access token available")
+
+        if self.is_token_expired():
+            logger.info("Access token expired, refreshing...")
+            await self.refresh_access_token()
+
+    async def test_token(self) -> bool:
+        """Test if current access token is valid"""
+        try:
+            response = await self._make_request('GET', '/application/openapi-ping')
+            return response.status_code == 200
+        except Exception:
+            return False
+
+    async def _handle_rate_limiting(self):
+        """Take a call from the shared budgets without blocking the event loop"""
+        try:
+            for budget in self._rate_budgets():
+                await budget.acquire(priority=self.priority)
+        except RateBudgetExhausted as e:
+            raise EtsyRateLimitError(str(e))
+
+    async def _make_request(self, method: str, endpoint: str, params: Optional[Dict] = None,
+                            data: Optional[Dict] = None, files: Optional[Dict] = None) -> httpx.Response:
+        """Make authenticated request to Etsy API, retrying transient failures with backoff"""
+        await self.ensure_valid_token()
+        url = f"{self.config.base_url}{endpoint}"
+
+        for attempt in range(ETSY_MAX_RETRIES + 1):
+            await self._handle_rate_limiting()
+            final_attempt = attempt == ETSY_MAX_RETRIES
+
+            try:
+                response = await self.http.request(
+                    method,
+                    url,
+                    params=params,
+                    json=data if data and not files else None,
+                    data=data if files else None,
+                    files=files,
+                    headers=self._auth_headers()
+                )
+            except httpx.HTTPError as e:
+                if final_attempt:
+                    logger.error(f"Network error making request to {url}: {e}")
+                    raise EtsyAPIError(f"Network error: {e}")
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+
+            await asyncio.to_thread(self._record_rate_limit, response)
+
+            if response.status_code == 429 and not final_attempt:
+                retry_after = float(response.headers.get('Retry-After', 0) or 0)
+                if retry_after > ETSY_MAX_RETRY_AFTER:
+                    self._check_response(response)
+                # The shared budget now holds every process off until Retry-After
+                continue
+
+            if response.status_code >= 500 and not final_attempt:
+                logger.warning(f"Etsy server error {response.status_code} on {endpoint}, retrying")
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+
+            self._check_response(response)
+            return response
+
+        raise EtsyRateLimitError("Etsy request retries exhausted")
+
+    async def _get_results(self, endpoint: str, params: Optional[Dict] = None) -> List[Dict[str, Any]]:
+        response = await self._make_request('GET', endpoint, params=params)
+        return response.json().get('results', [])
+
+    async def _iter_pages(self, endpoint: str, params: Dict[str, Any],
+                          page_size: int = ETSY_PAGE_SIZE) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield every page of an offset-paginated collection.
+
+        The next page is requested as soon as the current one arrives, so
+        the network round trip overlaps with the caller processing the page.
+        At most one page is buffered ahead.
+        """
+        page_size = min(page_size, ETSY_PAGE_SIZE)
+
+        async def fetch(offset: int) -> Dict[str, Any]:
+            response = await self._make_request('GET', endpoint, params={**params, 'limit': page_size, 'offset': offset})
+            return response.json()
+
+        offset = 0
+        pending = asyncio.ensure_future(fetch(offset))
+        try:
+            while pending is not None:
+                data = await pending
+                pending = None
+                results = data.get('results', [])
+                offset += len(results)
+
+                total = data.get('count')
+                if len(results) == page_size and (total is None or offset < total):
+                    pending = asyncio.ensure_future(fetch(offset))
+
+                if results:
+                    yield results
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    async def _resolve_shop_id(self, shop_id: Optional[int]) -> int:
+        if shop_id:
+            return shop_id
+        if not self.shop_id:
+            shops = await self.get_user_shops()
+            if not shops:
+                raise EtsyAPIError("No shop found for user")
+            self.shop_id = shops[0].shop_id
+        return self.shop_id
+
+    # User and Shop Methods
+    async def get_current_user(self) -> EtsyUser:
+        """Get current authenticated user info"""
+        response = await self._make_request('GET', '/application/users/me')
+        return EtsyUser(**response.json())
+
+    async def get_user_shops(self, user_id: Optional[int] = None) -> List[EtsyShop]:
+        """Get shops for a user"""
+        if not user_id:
+            user = await self.get_current_user()
+            user_id = user.user_id
+
+        results = await self._get_results(f'/application/users/{user_id}/shops')
+        return [EtsyShop(**shop) for shop in results]
+
+    async def get_shop(self, shop_id: Optional[int] = None) -> EtsyShop:
+        """Get shop information"""
+        shop_id = await self._resolve_shop_id(shop_id)
+        response = await self._make_request('GET', f'/application/shops/{shop_id}')
+        return EtsyShop(**response.json())
+
+    # Taxonomy Methods
+    async def get_seller_taxonomy(self) -> List[EtsyTaxonomy]:
+        """Get Etsy seller taxonomy"""
+        results = await self._get_results('/application/seller-taxonomy/nodes')
+        return [EtsyTaxonomy(**node) for node in results]
+
+    async def get_flat_taxonomy(self) -> List[Dict[str, Any]]:
+        """Get flattened taxonomy for easier use"""
+        return flatten_taxonomy(await self.get_seller_taxonomy())
+
+    # Shop Configuration Methods
+    async def get_shipping_profiles(self, shop_id: Optional[int] = None) -> List[EtsyShippingProfile]:
+        """Get shop shipping profiles"""
+        shop_id = shop_id or self.shop_id
+        results = await self._get_results(f'/application/shops/{shop_id}/shipping-profiles')
+        return [EtsyShippingProfile(**profile) for profile in results]
+
+    async def get_shop_sections(self, shop_id: Optional[int] = None) -> List[EtsyShopSection]:
+        """Get shop sections"""
+        shop_id = shop_id or self.shop_id
+        results = await self._get_results(f'/application/shops/{shop_id}/sections')
+        return [EtsyShopSection(**section) for section in results]
+
+    # Listing Methods
+    async def get_shop_listings(self, shop_id: Optional[int] = None, state: str = "active",
+                                limit: int = 100, offset: int = 0) -> List[EtsyListing]:
+        """Get shop listings"""
+        shop_id = shop_id or self.shop_id
+        params = {
+            'state': state,
+            'limit': min(limit, 100),  # Etsy max is 100
+            'offset': offset
+        }
+
+        results = await self._get_results(f'/application/shops/{shop_id}/listings', params=params)
+        return [EtsyListing(**listing) for listing in results]
+
+    async def iter_shop_listings(self, shop_id: Optional[int] = None, state: str = "active",
+                                 min_created: Optional[datetime] = None,
+                                 min_last_modified: Optional[datetime] = None,
+                                 page_size: int = ETSY_PAGE_SIZE) -> AsyncIterator[EtsyListing]:
+        """Stream every listing in the shop, newest first.
+
+        Etsy has no server-side date filter for listings, so pages are sorted
+        by the watermark field and iteration stops at the first listing older
+        than it. With both watermarks, min_last_modified drives the early stop
+        and min_created only filters.
+        """
+        shop_id = await self._resolve_shop_id(shop_id)
+        params = {
+            'state': state,
+            'sort_on': 'updated' if min_last_modified or not min_created else 'created',
+            'sort_order': 'desc'
+        }
+
+        async with aclosing(self._iter_pages(f'/application/shops/{shop_id}/listings', params, page_size)) as pages:
+            async for page in pages:
+                for listing_data in page:
+                    listing = EtsyListing(**listing_data)
+                    if min_last_modified and listing.last_modified_timestamp.timestamp() < min_last_modified.timestamp():
+                        return
+                    if min_created and listing.created_timestamp.timestamp() < min_created.timestamp():
+                        if min_last_modified:
+                            continue
+                        return
+                    yield listing
+
+    async def get_listing(self, listing_id: int) -> EtsyListing:
+        """Get specific listing"""
+        response = await self._make_request('GET', f'/application/listings/{listing_id}')
+        return EtsyListing(**response.json())
+
+    async def create_draft_listing(self, listing_data: Dict[str, Any], shop_id: Optional[int] = None) -> EtsyListing:
+        """Create a draft listing"""
+        shop_id = shop_id or self.shop_id
+        response = await self._make_request('POST', f'/application/shops/{shop_id}/listings', data=listing_data)
+        return EtsyListing(**response.json())
+
+    async def update_listing(self, listing_id: int, listing_data: Dict[str, Any],
+                             shop_id: Optional[int] = None) -> EtsyListing:
+        """Update existing listing"""
+        shop_id = shop_id or self.shop_id
+        response = await self._make_request('PATCH', f'/application/shops/{shop_id}/listings/{listing_id}',
+                                             data=listing_data)
+        return EtsyListing(**response.json())
+
+    async def upload_listing_image(self, listing_id: int, image_path: str,
+                                   shop_id: Optional[int] = None) -> Dict[str, Any]:
+        """Upload image to listing"""
+        shop_id = shop_id or self.shop_id
+
+        def read_image() -> bytes:
+            with open(image_path, 'rb') as image_file:
+                return image_file.read()
+
+        image_bytes = await asyncio.to_thread(read_image)
+        files = {'image': (os.path.basename(image_path), image_bytes)}
+        response = await self._make_request('POST',
+                                             f'/application/shops/{shop_id}/listings/{listing_id}/images',
+                                             files=files)
+        return response.json()
+
+    # Order Methods
+    async def get_shop_receipts(self, shop_id: Optional[int] = None, was_paid: bool = True,
+                                was_shipped: bool = None, limit: int = 100, offset: int = 0) -> List[EtsyReceipt]:
+        """Get shop receipts (orders)"""
+        shop_id = shop_id or self.shop_id
+        params = {
+            'was_paid': str(was_paid).lower(),
+            'limit': min(limit, 100),
+            'offset': offset
+        }
+
+        if was_shipped is not None:
+            params['was_shipped'] = str(was_shipped).lower()
+
+        results = await self._get_results(f'/application/shops/{shop_id}/receipts', params=params)
+        return [EtsyReceipt(**receipt) for receipt in results]
+
+    async def iter_shop_receipts(self, shop_id: Optional[int] = None, was_paid: Optional[bool] = True,
+                                 was_shipped: Optional[bool] = None,
+                                 min_created: Optional[datetime] = None,
+                                 min_last_modified: Optional[datetime] = None,
+                                 page_size: int = ETSY_PAGE_SIZE) -> AsyncIterator[EtsyReceipt]:
+        """Stream every receipt in the shop, most recently changed first.
+
+        Watermarks are sent as Etsy's min_created/min_last_modified filters,
+        so the walk ends once the newer receipts are exhausted; the same
+        check is applied locally in case the filter is ignored.
+        """
+        shop_id = await self._resolve_shop_id(shop_id)
+        params = {
+            'sort_on': 'updated' if min_last_modified else 'created',
+            'sort_order': 'desc'
+        }
+        if was_paid is not None:
+            params['was_paid'] = str(was_paid).lower()
+        if was_shipped is not None:
+            params['was_shipped'] = str(was_shipped).lower()
+        if min_created:
+            params['min_created'] = int(min_created.timestamp())
+        if min_last_modified:
+            params['min_last_modified'] = int(min_last_modified.timestamp())
+
+        async with aclosing(self._iter_pages(f'/application/shops/{shop_id}/receipts', params, page_size)) as pages:
+            async for page in pages:
+                for receipt_data in page:
+                    receipt = EtsyReceipt(**receipt_data)
+                    if min_last_modified and receipt.last_modified_timestamp.timestamp() < min_last_modified.timestamp():
+                        return
+                    if min_created and receipt.creation_timestamp.timestamp() < min_created.timestamp():
+                        if min_last_modified:
+                            continue
+                        return
+                    yield receipt
+
+    async def get_receipt(self, receipt_id: int, shop_id: Optional[int] = None) -> EtsyReceipt:
+        """Get specific receipt"""
+        shop_id = shop_id or self.shop_id
+        response = await self._make_request('GET', f'/application/shops/{shop_id}/receipts/{receipt_id}')
+        return EtsyReceipt(**response.json())
+
+    async def get_receipt_transactions(self, receipt_id: int, shop_id: Optional[int] = None) -> List[EtsyTransaction]:
+        """Get transactions for a receipt"""
+        shop_id = shop_id or self.shop_id
+        results = await self._get_results(f'/application/shops/{shop_id}/receipts/{receipt_id}/transactions')
+        return [EtsyTransaction(**transaction) for transaction in results]
+
+    async def get_transactions_for_receipts(self, receipt_ids: List[int], shop_id: Optional[int] = None,
+                                            concurrency: int = ETSY_TRANSACTION_CONCURRENCY) -> Dict[int, List[EtsyTransaction]]:
+        """Fetch transactions for many receipts with at most concurrency requests in flight.
+
+        A receipt whose fetch fails is logged and left out of the result, so
+        one 404 or timeout does not discard the rest of the page.
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def fetch(receipt_id: int) -> List[EtsyTransaction]:
+            async with semaphore:
+                return await self.get_receipt_transactions(receipt_id, shop_id)
+
+        results = await asyncio.gather(*(fetch(receipt_id) for receipt_id in receipt_ids), return_exceptions=True)
+        transactions = {}
+        for receipt_id, result in zip(receipt_ids, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Could not sync transactions for receipt {receipt_id}: {result}")
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                transactions[receipt_id] = result
+        return transactions
+
+    async def update_receipt_tracking(self, receipt_id: int, tracking_code: str, carrier_name: str,
+                                      shop_id: Optional[int] = None) -> Dict[str, Any]:
+        """Update receipt tracking information"""
+        shop_id = shop_id or self.shop_id
+        data = {
+            'tracking_code': tracking_code,
+            'carrier_name': carrier_name
+        }
+
+        response = await self._make_request('POST', f'/application/shops/{shop_id}/receipts/{receipt_id}/tracking',
+                                             data=data)
+        return response.json()
+
+    # Analytics and Stats Methods
+    async def get_shop_stats(self, shop_id: Optional[int] = None) -> Dict[str, Any]:
+        """Get comprehensive shop statistics, fetching the independent parts concurrently"""
+        shop_id = await self._resolve_shop_id(shop_id)
+
+        shop, active_listings, recent_receipts = await asyncio.gather(
+            self.get_shop(shop_id),
+            self.get_shop_listings(shop_id, state="active", limit=1),
+            self.get_shop_receipts(shop_id, limit=50)
+        )
+
+        total_revenue = sum(
+            float(receipt.grandtotal.get('amount', 0)) if receipt.grandtotal else 0
+            for receipt in recent_receipts
+        )
+
+        return {
+            'shop_info': shop,
+            'total_listings': shop.listing_active_count,
+            'active_listings': len(active_listings) if active_listings else 0,
+            'total_orders': len(recent_receipts),
+            'total_revenue': total_revenue,
+            'recent_orders': recent_receipts[:10],
+            'shop_rating': shop.review_average,
+            'total_reviews': shop.review_count
+        }
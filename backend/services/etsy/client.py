@@ -21,15 +21,44 @@ from common.exceptions import (
     ValidationError, EtsyAPIError, EtsyAuthError, 
     EtsyRateLimitError, EtsyTokenExpiredError
 )
+from services.common.rate_budget import Priority, RateBudget, RateBudgetExhausted, get_rate_budget
 
 logger = logging.getLogger(__name__)
 
-class EtsyAPIClient:
-    """Comprehensive Etsy API client with OAuth, rate limiting, and multi-tenant support"""
+USER_AGENT = 'PrinterSaaS/1.0 (Etsy Integration)'
+# Etsy meters calls per application key: a per-second rate and a daily quota
+ETSY_RATE_LIMIT_PER_SECOND = int(os.getenv('ETSY_RATE_LIMIT_PER_SECOND', '10'))
+ETSY_RATE_LIMIT_PER_DAY = int(os.getenv('ETSY_RATE_LIMIT_PER_DAY', '10000'))
+
+def flatten_taxonomy(taxonomies: List[EtsyTaxonomy]) -> List[Dict[str, Any]]:
+    """Flatten taxonomy trees into sorted leaf entries with their full path"""
+    flat_list = []
+    
+    def flatten_node(node: EtsyTaxonomy, path: str = ""):
+        current_path = f"{path} > {node.name}" if path else node.name
+        
+        if not node.children:  # Leaf node
+            flat_list.append({
+                "id": node.id,
+                "name": node.name,
+                "full_path": current_path,
+                "level": node.level,
+                "parent_id": node.parent_id
+            })
+        
+        for child in node.children:
+            flatten_node(child, current_path)
+    
+    for taxonomy in taxonomies:
+        flatten_node(taxonomy)
+    
+    return sorted(flat_list, key=lambda x: x["name"].lower())
+
+class BaseEtsyClient:
+    """Credentials, OAuth helpers and response handling shared by the blocking and async clients"""
     
     def __init__(self, user_id: Optional[str] = None, tenant_id: Optional[str] = None):
         self.config = EtsyAPIConfig()
-        self.session = requests.Session()
         self.user_id = user_id
         self.tenant_id = tenant_id
         
@@ -46,18 +75,8 @@ class EtsyAPIClient:
         self.token_expiry: Optional[float] = None
         self.shop_id: Optional[int] = None
         
-        # Rate limiting
-        self._rate_limit_remaining = 10000  # Etsy allows 10,000 requests per day
-        self._rate_limit_reset = time.time() + 86400  # 24 hours
-        self._last_request_time = 0
-        self._min_request_interval = 0.1  # 100ms between requests
-        
-        # Session configuration
-        self.session.headers.update({
-            'User-Agent': 'PrinterSaaS/1.0 (Etsy Integration)',
-            'Accept': 'application/json',
-            'Content-Type': 'application/json'
-        })
+        # Rate limiting: background syncs yield the shared quota to interactive requests
+        self.priority = Priority.INTERACTIVE
     
     def set_credentials(self, access_token: str, refresh_token: Optional[str] = None, 
                        expires_at: Optional[datetime] = None, shop_id: Optional[int] = None):
@@ -66,12 +85,13 @@ class EtsyAPIClient:
         self.refresh_token = refresh_token
         self.token_expiry = expires_at.timestamp() if expires_at else None
         self.shop_id = shop_id
-        
-        # Update session headers
-        self.session.headers.update({
+    
+    def _auth_headers(self) -> Dict[str, str]:
+        """Headers authenticating a call with the current credentials"""
+        return {
             'x-api-key': self.client_id,
             'Authorization': f'Bearer {self.oauth_token}'
-        })
+        }
     
     def generate_oauth_data(self, redirect_uri: str) -> EtsyOAuthInitResponse:
         """Generate OAuth flow data with PKCE"""
@@ -103,17 +123,132 @@ class EtsyAPIClient:
         
         return oauth_data
     
+    def _authorization_code_form(self, code: str, code_verifier: str, redirect_uri: str) -> Dict[str, str]:
+        return {
+            'grant_type': 'authorization_code',
+            'client_id': self.client_id,
+            'redirect_uri': redirect_uri,
+            'code': code,
+            'code_verifier': code_verifier
+        }
+    
+    def _refresh_token_form(self) -> Dict[str, str]:
+        if not self.refresh_token:
+            raise EtsyTokenExpiredError("No refresh token available")
+        return {
+            'grant_type': 'refresh_token',
+            'client_id': self.client_id,
+            'refresh_token': self.refresh_token
+        }
+    
+    @staticmethod
+    def _parse_token_response(token_data: Dict[str, Any], fallback_refresh_token: Optional[str] = None) -> EtsyTokenResponse:
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=token_data['expires_in'])
+        return EtsyTokenResponse(
+            access_token=token_data['access_token'],
+            refresh_token=token_data.get('refresh_token', fallback_refresh_token),
+            expires_in=token_data['expires_in'],
+            token_type=token_data.get('token_type', 'Bearer'),
+            expires_at=expires_at
+        )
+    
+    def _apply_refreshed_token(self, token_response: EtsyTokenResponse) -> None:
+        """Store credentials from a successful refresh"""
+        self.oauth_token = token_response.access_token
+        if token_response.refresh_token:
+            self.refresh_token = token_response.refresh_token
+        self.token_expiry = token_response.expires_at.timestamp()
+    
+    def is_token_expired(self) -> bool:
+        """Check if access token is expired or about to expire"""
+        if not self.token_expiry:
+            return True
+        return time.time() > (self.token_expiry - 60)  # Refresh 1 minute before expiry
+    
+    def _rate_budgets(self) -> List[RateBudget]:
+        """Per-second and daily budgets shared by every process using this application key.
+
+        Listed in acquisition order: if the daily budget is exhausted, the
+        per-second token already taken refills within a second, whereas a
+        daily token spent on a request that never runs is lost for the day.
+        """
+        scope = self.client_id or 'default'
+        return [
+            get_rate_budget('etsy', scope, ETSY_RATE_LIMIT_PER_SECOND, ETSY_RATE_LIMIT_PER_SECOND),
+            get_rate_budget('etsy-daily', scope, ETSY_RATE_LIMIT_PER_DAY, ETSY_RATE_LIMIT_PER_DAY / 86400)
+        ]
+    
+    def _record_rate_limit(self, response) -> None:
+        """Sync the shared budgets with Etsy's reported quota (requests or httpx response)"""
+        per_second, daily = self._rate_budgets()
+        headers = response.headers
+        try:
+            if 'x-remaining-this-second' in headers:
+                limit = int(headers.get('x-limit-per-second', per_second.capacity))
+                per_second.observe(int(headers['x-remaining-this-second']), capacity=limit, refill_rate=limit)
+            
+            remaining_today = headers.get('x-remaining-today', headers.get('X-RateLimit-Remaining'))
+            if remaining_today is not None:
+                limit = int(headers.get('x-limit-per-day', daily.capacity))
+                daily.observe(int(remaining_today), capacity=limit, refill_rate=limit / 86400)
+        except (ValueError, TypeError):
+            logger.warning("Could not parse Etsy rate limit headers")
+        
+        if response.status_code == 429:
+            per_second.throttled(float(headers.get('Retry-After', 1) or 1))
+    
+    def _check_response(self, response) -> None:
+        """Raise the matching Etsy error for a failed response (requests or httpx)"""
+        # Handle rate limiting
+        if response.status_code == 429:
+            retry_after = int(response.headers.get('Retry-After', 60))
+            logger.warning(f"Rate limited, retrying after {retry_after} seconds")
+            raise EtsyRateLimitError(f"Rate limited, retry after {retry_after} seconds")
+        
+        # Handle authentication errors
+        if response.status_code == 401:
+            logger.error("Authentication failed, token may be invalid")
+            raise EtsyAuthError("Authentication failed")
+        
+        # Handle other client errors
+        if 400 <= response.status_code < 500:
+            error_data = response.json() if response.content else {}
+            error_msg = error_data.get('error_msg', f"Client error: {response.status_code}")
+            logger.error(f"Client error: {response.status_code} - {error_msg}")
+            raise EtsyAPIError(error_msg, status_code=response.status_code)
+        
+        # Handle server errors
+        if response.status_code >= 500:
+            logger.error(f"Server error: {response.status_code}")
+            raise EtsyAPIError("Etsy API server error", status_code=response.status_code)
+
+class EtsyAPIClient(BaseEtsyClient):
+    """Comprehensive Etsy API client with OAuth, rate limiting, and multi-tenant support"""
+    
+    def __init__(self, user_id: Optional[str] = None, tenant_id: Optional[str] = None):
+        super().__init__(user_id=user_id, tenant_id=tenant_id)
+        self.session = requests.Session()
+        
+        # Session configuration
+        self.session.headers.update({
+            'User-Agent': USER_AGENT,
+            'Accept': 'application/json',
+            'Content-Type': 'application/json'
+        })
+    
+    def set_credentials(self, access_token: str, refresh_token: Optional[str] = None, 
+                       expires_at: Optional[datetime] = None, shop_id: Optional[int] = None):
+        """Set OAuth credentials for API calls"""
+        super().set_credentials(access_token, refresh_token, expires_at, shop_id)
+        
+        # Update session headers
+        self.session.headers.update(self._auth_headers())
+    
     def exchange_code_for_token(self, code: str, code_verifier: str, 
                                redirect_uri: str) -> EtsyTokenResponse:
         """Exchange OAuth code for access token"""
         try:
-            data = {
-                'grant_type': 'authorization_code',
-                'client_id': self.client_id,
-                'redirect_uri': redirect_uri,
-                'code': code,
-                'code_verifier': code_verifier
-            }
+            data = self._authorization_code_form(code, code_verifier, redirect_uri)
             
             response = requests.post(self.config.token_url, data=data)
             
@@ -121,17 +256,7 @@ class EtsyAPIClient:
                 logger.error(f"Token exchange failed: {response.status_code} - {response.text}")
                 raise EtsyAuthError("Failed to exchange authorization code for token")
             
-            token_data = response.json()
-            
-            expires_at = datetime.now(timezone.utc) + timedelta(seconds=token_data['expires_in'])
-            
-            return EtsyTokenResponse(
-                access_token=token_data['access_token'],
-                refresh_token=token_data.get('refresh_token'),
-                expires_in=token_data['expires_in'],
-                token_type=token_data.get('token_type', 'Bearer'),
-                expires_at=expires_at
-            )
+            return self._parse_token_response(response.json())
             
         except requests.RequestException as e:
             logger.error(f"Network error during token exchange: {e}")
@@ -142,44 +267,22 @@ class EtsyAPIClient:
     
     def refresh_access_token(self) -> EtsyTokenResponse:
         """Refresh expired access token"""
-        if not self.refresh_token:
-            raise EtsyTokenExpiredError("No refresh token available")
+        data = self._refresh_token_form()
         
         try:
-            data = {
-                'grant_type': 'refresh_token',
-                'client_id': self.client_id,
-                'refresh_token': self.refresh_token
-            }
-            
             response = requests.post(self.config.token_url, data=data)
             
             if response.status_code != 200:
                 logger.error(f"Token refresh failed: {response.status_code} - {response.text}")
                 raise EtsyTokenExpiredError("Failed to refresh access token")
             
-            token_data = response.json()
+            token_response = self._parse_token_response(response.json(), self.refresh_token)
             
-            expires_at = datetime.now(timezone.utc) + timedelta(seconds=token_data['expires_in'])
+            # Update stored credentials and session headers
+            self._apply_refreshed_token(token_response)
+            self.session.headers.update(self._auth_headers())
             
-            # Update stored credentials
-            self.oauth_token = token_data['access_token']
-            if 'refresh_token' in token_data:
-                self.refresh_token = token_data['refresh_token']
-            self.token_expiry = expires_at.timestamp()
-            
-            # Update session headers
-            self.session.headers.update({
-                'Authorization': f'Bearer {self.oauth_token}'
-            })
-            
-            return EtsyTokenResponse(
-                access_token=token_data['access_token'],
-                refresh_token=token_data.get('refresh_token', self.refresh_token),
-                expires_in=token_data['expires_in'],
-                token_type=token_data.get('token_type', 'Bearer'),
-                expires_at=expires_at
-            )
+            return token_response
             
         except requests.RequestException as e:
             logger.error(f"Network error during token refresh: {e}")
@@ -188,12 +291,6 @@ class EtsyAPIClient:
             logger.error(f"Unexpected error during token refresh: {e}")
             raise EtsyTokenExpiredError("Unexpected error during token refresh")
     
-    def is_token_expired(self) -> bool:
-        """Check if access token is expired or about to expire"""
-        if not self.token_expiry:
-            return True
-        return time.time() > (self.token_expiry - 60)  # Refresh 1 minute before expiry
-    
     def ensure_valid_token(self):
         """Ensure we have a valid access token"""
         if not self.oauth_token:
@@ -212,15 +309,12 @@ class EtsyAPIClient:
             return False
     
     def _handle_rate_limiting(self):
-        """Handle rate limiting between requests"""
-        current_time = time.time()
-        
-        # Ensure minimum interval between requests
-        time_since_last = current_time - self._last_request_time
-        if time_since_last < self._min_request_interval:
-            time.sleep(self._min_request_interval - time_since_last)
-        
-        self._last_request_time = time.time()
+        """Take a call from the shared per-second and daily budgets"""
+        try:
+            for budget in self._rate_budgets():
+                budget.acquire_blocking(priority=self.priority)
+        except RateBudgetExhausted as e:
+            raise EtsyRateLimitError(str(e))
     
     def _make_request(self, method: str, endpoint: str, params: Optional[Dict] = None, 
                      data: Optional[Dict] = None, files: Optional[Dict] = None) -> requests.Response:
@@ -242,34 +336,8 @@ class EtsyAPIClient:
             )
             
             # Update rate limit info from headers
-            if 'X-RateLimit-Remaining' in response.headers:
-                self._rate_limit_remaining = int(response.headers['X-RateLimit-Remaining'])
-            
-            if 'X-RateLimit-Reset' in response.headers:
-                self._rate_limit_reset = int(response.headers['X-RateLimit-Reset'])
-            
-            # Handle rate limiting
-            if response.status_code == 429:
-                retry_after = int(response.headers.get('Retry-After', 60))
-                logger.warning(f"Rate limited, retrying after {retry_after} seconds")
-                raise EtsyRateLimitError(f"Rate limited, retry after {retry_after} seconds")
-            
-            # Handle authentication errors
-            if response.status_code == 401:
-                logger.error("Authentication failed, token may be invalid")
-                raise EtsyAuthError("Authentication failed")
-            
-            # Handle other client errors
-            if 400 <= response.status_code < 500:
-                error_data = response.json() if response.content else {}
-                error_msg = error_data.get('error_msg', f"Client error: {response.status_code}")
-                logger.error(f"Client error: {response.status_code} - {error_msg}")
-                raise EtsyAPIError(error_msg, status_code=response.status_code)
-            
-            # Handle server errors
-            if response.status_code >= 500:
-                logger.error(f"Server error: {response.status_code}")
-                raise EtsyAPIError("Etsy API server error", status_code=response.status_code)
+            self._record_rate_limit(response)
+            self._check_response(response)
             
             return response
             
@@ -320,28 +388,7 @@ class EtsyAPIClient:
     
     def get_flat_taxonomy(self) -> List[Dict[str, Any]]:
         """Get flattened taxonomy for easier use"""
-        taxonomies = self.get_seller_taxonomy()
-        flat_list = []
-        
-        def flatten_node(node: EtsyTaxonomy, path: str = ""):
-            current_path = f"{path} > {node.name}" if path else node.name
-            
-            if not node.children:  # Leaf node
-                flat_list.append({
-                    "id": node.id,
-                    "name": node.name,
-                    "full_path": current_path,
-                    "level": node.level,
-                    "parent_id": node.parent_id
-                })
-            
-            for child in node.children:
-                flatten_node(child, current_path)
-        
-        for taxonomy in taxonomies:
-            flatten_node(taxonomy)
-        
-        return sorted(flat_list, key=lambda x: x["name"].lower())
+        return flatten_taxonomy(self.get_seller_taxonomy())
     
     # Shop Configuration Methods
     def get_shipping_profiles(self, shop_id: Optional[int] = None) -> List[EtsyShippingProfile]:
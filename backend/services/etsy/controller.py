@@ -440,7 +440,7 @@ async def get_shop_info(
 ):
     """Get shop information from Etsy"""
     try:
-        return etsy_service.get_shop_info(current_user.get_uuid())
+        return await etsy_service.get_shop_info_async(current_user.get_uuid())
     except EtsyAuthError as e:
         raise HTTPException(status_code=401, detail=str(e))
     except EtsyAPIError as e:
@@ -462,7 +462,7 @@ async def get_user_info(
 # Configuration Endpoints
 
 @router.get("/taxonomies", response_model=List[Dict[str, Any]])
-async def get_taxonomies(
+def get_taxonomies(
     current_user: UserOrAdminDep,
     etsy_service: EtsyService = Depends(get_etsy_service)
 ):
@@ -488,7 +488,7 @@ async def get_shipping_profiles(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/shop-sections", response_model=List[EtsyShopSection])
-async def get_shop_sections(
+def get_shop_sections(
     current_user: UserOrAdminDep,
     etsy_service: EtsyService = Depends(get_etsy_service)
 ):
@@ -512,7 +512,7 @@ async def get_shop_listings(
 ):
     """Get shop listings from Etsy"""
     try:
-        return etsy_service.get_shop_listings(
+        return await etsy_service.get_shop_listings_async(
             user_id=current_user.get_uuid(),
             state=state,
             limit=limit,
@@ -557,7 +557,7 @@ async def get_shop_orders(
 ):
     """Get shop orders from Etsy"""
     try:
-        return etsy_service.get_shop_orders(
+        return await etsy_service.get_shop_orders_async(
             user_id=current_user.get_uuid(),
             was_paid=was_paid,
             was_shipped=was_shipped,
@@ -573,13 +573,13 @@ async def get_shop_orders(
 async def sync_orders(
     current_user: UserOrAdminDep,
     etsy_service: EtsyService = Depends(get_etsy_service),
-    limit: int = Query(50, ge=1, le=100, description="Number of orders to sync")
+    full_sync: bool = Query(False, description="Re-read every receipt instead of only those changed since the last sync")
 ):
-    """Sync Etsy orders to internal order system"""
+    """Sync Etsy orders changed since the last sync to the internal order system"""
     try:
-        return etsy_service.sync_orders_to_internal(
+        return await etsy_service.sync_orders_to_internal(
             user_id=current_user.get_uuid(),
-            limit=limit
+            full_sync=full_sync
         )
     except EtsyAuthError as e:
         raise HTTPException(status_code=401, detail=str(e))
@@ -589,7 +589,7 @@ async def sync_orders(
 # Dashboard Data Endpoints
 
 @router.get("/dashboard", response_model=EtsyDashboardData)
-async def get_dashboard_data(
+def get_dashboard_data(
     current_user: UserOrAdminDep,
     etsy_service: EtsyService = Depends(get_etsy_service)
 ):
@@ -602,7 +602,7 @@ async def get_dashboard_data(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/dashboard/stats", response_model=Dict[str, Any])
-async def get_dashboard_stats(
+def get_dashboard_stats(
     current_user: UserOrAdminDep,
     etsy_service: EtsyService = Depends(get_etsy_service)
 ):
@@ -659,7 +659,7 @@ async def sync_data(
             )
         else:
             # Run sync immediately for small operations
-            return etsy_service.sync_data(current_user.get_uuid(), sync_request)
+            return await etsy_service.sync_data(current_user.get_uuid(), sync_request)
             
     except EtsyAuthError as e:
         raise HTTPException(status_code=401, detail=str(e))
@@ -742,7 +742,7 @@ async def test_connection(
 # Analytics and Reporting
 
 @router.get("/analytics/revenue", response_model=Dict[str, Any])
-async def get_revenue_analytics(
+def get_revenue_analytics(
     current_user: UserOrAdminDep,
     etsy_service: EtsyService = Depends(get_etsy_service),
     days: int = Query(30, ge=1, le=365, description="Number of days to analyze")
@@ -768,7 +768,7 @@ async def get_revenue_analytics(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/analytics/listings", response_model=Dict[str, Any])
-async def get_listing_analytics(
+def get_listing_analytics(
     current_user: UserOrAdminDep,
     etsy_service: EtsyService = Depends(get_etsy_service)
 ):
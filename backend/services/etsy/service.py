@@ -1,25 +1,37 @@
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Tuple, Set, AsyncIterator
 from uuid import UUID
 from datetime import datetime, timezone, timedelta
 import logging
 import asyncio
+import os
+from contextlib import aclosing
 from decimal import Decimal
 
 from .client import EtsyAPIClient
+from .async_client import AsyncEtsyAPIClient
 from .models import (
     EtsyOAuthInitResponse, EtsyTokenResponse, EtsyIntegrationStatus,
     EtsyDashboardData, EtsyShopStats, EtsySyncRequest, EtsySyncResponse,
     EtsyShop, EtsyUser, EtsyListing, EtsyReceipt, EtsyTransaction,
     EtsyTaxonomy, EtsyShippingProfile, EtsyShopSection
 )
-from database.entities import User, ThirdPartyOAuthToken, Order, OrderItem, EtsyProductTemplate
+from database.entities import User, ThirdPartyOAuthToken, Order, EtsyProductTemplate, IntegrationSyncState
 from common.exceptions import (
     EtsyAPIError, EtsyAuthError, UserNotFound, ValidationError
 )
 from common.database import DatabaseManager
+from services.common.cache import cache_tenant_data
+from services.common.rate_budget import Priority
+from services.order.ingest import OrderIngestor
+from services.order.models import MarketplaceOrder, MarketplaceOrderItem, OrderPlatform
 
 logger = logging.getLogger(__name__)
 
+# Receipts applied per lookup/write round trip (one Etsy page)
+ETSY_SYNC_BATCH_SIZE = 100
+# Re-read this much before the watermark to absorb clock skew between Etsy's replicas
+ETSY_SYNC_OVERLAP_SECONDS = int(os.getenv("ETSY_SYNC_OVERLAP_SECONDS", "300"))
+
 class EtsyService:
     """Comprehensive Etsy integration service for multi-tenant SaaS"""
     
@@ -223,16 +235,34 @@ class EtsyService:
         
         return True
     
+    def _get_async_client(self, user_id: UUID) -> AsyncEtsyAPIClient:
+        """Async client carrying the user's credentials (connections are pooled process-wide)"""
+        self._setup_client_for_user(user_id)
+        client = AsyncEtsyAPIClient(user_id=str(user_id), tenant_id=self.db.tenant_id)
+        client.set_credentials(
+            access_token=self.client.oauth_token,
+            refresh_token=self.client.refresh_token,
+            expires_at=datetime.fromtimestamp(self.client.token_expiry, timezone.utc) if self.client.token_expiry else None,
+            shop_id=self.client.shop_id
+        )
+        return client
+    
     def get_shop_info(self, user_id: UUID) -> EtsyShop:
         """Get shop information for user"""
         self._setup_client_for_user(user_id)
         return self.client.get_shop()
     
+    async def get_shop_info_async(self, user_id: UUID) -> EtsyShop:
+        """Get shop information for user without blocking the event loop"""
+        client = await asyncio.to_thread(self._get_async_client, user_id)
+        return await client.get_shop()
+    
     def get_user_info(self, user_id: UUID) -> EtsyUser:
         """Get Etsy user information"""
         self._setup_client_for_user(user_id)
         return self.client.get_current_user()
     
+    @cache_tenant_data(expire=86400, namespace="etsy.taxonomies")
     def get_taxonomies(self, user_id: UUID) -> List[Dict[str, Any]]:
         """Get Etsy taxonomies for user"""
         self._setup_client_for_user(user_id)
@@ -243,6 +273,7 @@ class EtsyService:
         self._setup_client_for_user(user_id)
         return self.client.get_shipping_profiles()
     
+    @cache_tenant_data(expire=3600, namespace="etsy.shop_sections", tags=("integration:etsy",))
     def get_shop_sections(self, user_id: UUID) -> List[EtsyShopSection]:
         """Get shop sections for user's shop"""
         self._setup_client_for_user(user_id)
@@ -256,6 +287,23 @@ class EtsyService:
         self._setup_client_for_user(user_id)
         return self.client.get_shop_listings(state=state, limit=limit, offset=offset)
     
+    async def get_shop_listings_async(self, user_id: UUID, state: str = "active",
+                                      limit: int = 100, offset: int = 0) -> List[EtsyListing]:
+        """Get shop listings without blocking the event loop"""
+        client = await asyncio.to_thread(self._get_async_client, user_id)
+        return await client.get_shop_listings(state=state, limit=limit, offset=offset)
+    
+    async def iter_shop_listings(self, user_id: UUID, state: str = "active",
+                                 min_created: Optional[datetime] = None,
+                                 min_last_modified: Optional[datetime] = None) -> AsyncIterator[EtsyListing]:
+        """Stream every shop listing newer than the watermarks, one page in memory at a time"""
+        client = await asyncio.to_thread(self._get_async_client, user_id)
+        async with aclosing(client.iter_shop_listings(
+            state=state, min_created=min_created, min_last_modified=min_last_modified
+        )) as listings:
+            async for listing in listings:
+                yield listing
+    
     def create_listing_from_template(self, user_id: UUID, template_id: UUID, 
                                    custom_data: Optional[Dict[str, Any]] = None) -> EtsyListing:
         """Create Etsy listing from internal template"""
@@ -342,85 +390,184 @@ class EtsyService:
             offset=offset
         )
     
-    def sync_orders_to_internal(self, user_id: UUID, limit: int = 50) -> Dict[str, int]:
-        """Sync Etsy orders to internal order system"""
+    async def get_shop_orders_async(self, user_id: UUID, was_paid: bool = True,
+                                    was_shipped: Optional[bool] = None, limit: int = 100,
+                                    offset: int = 0) -> List[EtsyReceipt]:
+        """Get shop orders (receipts) without blocking the event loop"""
+        client = await asyncio.to_thread(self._get_async_client, user_id)
+        return await client.get_shop_receipts(
+            was_paid=was_paid,
+            was_shipped=was_shipped,
+            limit=limit,
+            offset=offset
+        )
+    
+    async def iter_shop_orders(self, user_id: UUID, was_paid: Optional[bool] = True,
+                               min_created: Optional[datetime] = None,
+                               min_last_modified: Optional[datetime] = None) -> AsyncIterator[EtsyReceipt]:
+        """Stream every shop receipt newer than the watermarks, one page in memory at a time"""
+        client = await asyncio.to_thread(self._get_async_client, user_id)
+        async with aclosing(client.iter_shop_receipts(
+            was_paid=was_paid, min_created=min_created, min_last_modified=min_last_modified
+        )) as receipts:
+            async for receipt in receipts:
+                yield receipt
+    
+    async def sync_orders_to_internal(self, user_id: UUID, full_sync: bool = False) -> Dict[str, int]:
+        """Incrementally sync Etsy orders to the internal order system.
+        
+        Only receipts modified since the shop's stored watermark are pulled
+        (everything when full_sync is set or on the first run). Receipts are
+        applied a page at a time through the bulk order ingestor, which upserts
+        on (platform, receipt ID) and inserts items from the transactions Etsy
+        embeds in each receipt. New receipts returned without them have their
+        transactions fetched concurrently before the page is written.
+        
+        Only the Etsy calls run on the event loop; every database step runs in
+        a worker thread.
+        """
         try:
-            self._setup_client_for_user(user_id)
-            
-            # Get recent orders from Etsy
-            etsy_receipts = self.client.get_shop_receipts(limit=limit)
-            
-            synced_count = 0
-            updated_count = 0
-            
-            for receipt in etsy_receipts:
-                # Check if order already exists
-                existing_order = self.db.query(Order).filter(
-                    Order.user_id == user_id,
-                    Order.etsy_receipt_id == receipt.receipt_id
-                ).first()
-                
-                if existing_order:
-                    # Update existing order
-                    existing_order.status = self._map_etsy_status_to_internal(receipt)
-                    existing_order.updated_at = datetime.now(timezone.utc)
-                    updated_count += 1
-                else:
-                    # Create new order
-                    order = Order(
-                        tenant_id=self.db.tenant_id,
-                        user_id=user_id,
-                        etsy_receipt_id=receipt.receipt_id,
-                        etsy_order_id=receipt.order_id,
-                        platform='etsy',
-                        order_number=str(receipt.receipt_id),
-                        status=self._map_etsy_status_to_internal(receipt),
-                        total_amount=Decimal(str(receipt.grandtotal.get('amount', 0))) if receipt.grandtotal else Decimal('0'),
-                        currency=receipt.grandtotal.get('currency_code', 'USD') if receipt.grandtotal else 'USD',
-                        customer_email=receipt.payment_email,
-                        customer_name=receipt.name,
-                        shipping_address=self._format_shipping_address(receipt),
-                        order_date=receipt.creation_timestamp,
-                        processing_notes=receipt.message_from_buyer,
-                        created_by=user_id
-                    )
-                    self.db.add(order)
-                    self.db.flush()  # Get order ID
-                    
-                    # Get and create order items
-                    try:
-                        transactions = self.client.get_receipt_transactions(receipt.receipt_id)
-                        for transaction in transactions:
-                            order_item = OrderItem(
-                                tenant_id=self.db.tenant_id,
-                                user_id=user_id,
-                                order_id=order.id,
-                                etsy_listing_id=transaction.listing_id,
-                                product_name=transaction.title,
-                                quantity=transaction.quantity,
-                                unit_price=Decimal(str(transaction.price.get('amount', 0))) if transaction.price else Decimal('0'),
-                                total_price=Decimal(str(transaction.price.get('amount', 0))) * transaction.quantity if transaction.price else Decimal('0'),
-                                customization_text=transaction.personalization,
-                                created_by=user_id
-                            )
-                            self.db.add(order_item)
-                    except Exception as e:
-                        logger.warning(f"Could not sync transactions for receipt {receipt.receipt_id}: {e}")
-                    
-                    synced_count += 1
-            
-            self.db.commit()
-            
-            logger.info(f"Synced {synced_count} new orders and updated {updated_count} orders for user {user_id}")
-            return {'synced': synced_count, 'updated': updated_count}
+            client = await asyncio.to_thread(self._get_async_client, user_id)
+            client.priority = Priority.BACKGROUND
+            shop_id = await client._resolve_shop_id(None)
+            
+            state = await asyncio.to_thread(self._get_sync_state, user_id, 'etsy', str(shop_id), 'orders')
+            since = None
+            if state.watermark and not full_sync:
+                since = state.watermark - timedelta(seconds=ETSY_SYNC_OVERLAP_SECONDS)
+            
+            totals = {'synced': 0, 'updated': 0}
+            newest = state.watermark
+            batch: List[EtsyReceipt] = []
+            
+            async with aclosing(client.iter_shop_receipts(shop_id=shop_id, min_last_modified=since)) as receipts:
+                async for receipt in receipts:
+                    batch.append(receipt)
+                    if newest is None or receipt.last_modified_timestamp > newest:
+                        newest = receipt.last_modified_timestamp
+                    if len(batch) >= ETSY_SYNC_BATCH_SIZE:
+                        await self._apply_receipt_batch(client, shop_id, user_id, batch, totals)
+                        batch = []
+            if batch:
+                await self._apply_receipt_batch(client, shop_id, user_id, batch, totals)
+            
+            # Advance the watermark only once every newer receipt has been applied
+            await asyncio.to_thread(self._save_sync_state, state, newest, totals)
+            
+            logger.info(f"Synced {totals['synced']} new orders and updated {totals['updated']} orders for user {user_id}")
+            return totals
             
         except Exception as e:
             logger.error(f"Error syncing orders for user {user_id}: {str(e)}")
-            self.db.rollback()
+            await asyncio.to_thread(self.db.rollback)
             raise EtsyAPIError(f"Failed to sync orders: {str(e)}")
     
+    def _get_sync_state(self, user_id: UUID, platform: str, shop_id: str, resource: str) -> IntegrationSyncState:
+        """Load (or start) the sync watermark row for a shop and resource"""
+        state = self.db.query(IntegrationSyncState).filter(
+            IntegrationSyncState.tenant_id == self.db.tenant_id,
+            IntegrationSyncState.platform == platform,
+            IntegrationSyncState.shop_id == shop_id,
+            IntegrationSyncState.resource == resource
+        ).first()
+        
+        if not state:
+            state = IntegrationSyncState(
+                tenant_id=self.db.tenant_id,
+                user_id=user_id,
+                platform=platform,
+                shop_id=shop_id,
+                resource=resource
+            )
+            self.db.add(state)
+        return state
+    
+    def _save_sync_state(self, state: IntegrationSyncState, watermark: Optional[datetime],
+                         totals: Dict[str, int]) -> None:
+        """Record a finished sync run and commit it"""
+        state.watermark = watermark
+        state.last_synced_at = datetime.now(timezone.utc)
+        state.last_result = totals
+        self.db.commit()
+    
+    async def _apply_receipt_batch(self, client: AsyncEtsyAPIClient, shop_id: int, user_id: UUID,
+                                   receipts: List[EtsyReceipt], totals: Dict[str, int]) -> None:
+        """Upsert one page of receipts through the bulk order ingestor (commits per chunk)"""
+        await self._fill_missing_transactions(client, shop_id, receipts)
+        result = await asyncio.to_thread(
+            OrderIngestor(self.db).ingest,
+            user_id, [self._marketplace_order(receipt) for receipt in receipts]
+        )
+        totals['synced'] += result.created
+        totals['updated'] += result.updated
+    
+    async def _fill_missing_transactions(self, client: AsyncEtsyAPIClient, shop_id: int,
+                                         receipts: List[EtsyReceipt]) -> None:
+        """Fetch transactions, concurrently, for new receipts that came back without them embedded"""
+        missing = {receipt.receipt_id: receipt for receipt in receipts if not receipt.transactions}
+        if not missing:
+            return
+        
+        # Items are only written for new orders, so existing ones need no transactions
+        existing = await asyncio.to_thread(
+            self._existing_external_ids, [str(receipt_id) for receipt_id in missing]
+        )
+        receipt_ids = [receipt_id for receipt_id in missing if str(receipt_id) not in existing]
+        if not receipt_ids:
+            return
+        
+        transactions = await client.get_transactions_for_receipts(receipt_ids, shop_id)
+        for receipt_id, receipt_transactions in transactions.items():
+            missing[receipt_id].transactions = [transaction.model_dump() for transaction in receipt_transactions]
+    
+    def _existing_external_ids(self, external_ids: List[str]) -> Set[str]:
+        """Which of these Etsy receipt IDs already have an internal order"""
+        return {
+            external_id for (external_id,) in self.db.query(Order.external_id).filter(
+                Order.tenant_id == self.db.tenant_id,
+                Order.platform == 'etsy',
+                Order.external_id.in_(external_ids)
+            ).all()
+        }
+    
+    def _marketplace_order(self, receipt: EtsyReceipt) -> MarketplaceOrder:
+        """Normalize an Etsy receipt (with its embedded transactions) for ingestion"""
+        items = []
+        for transaction_data in receipt.transactions:
+            try:
+                transaction = EtsyTransaction(**transaction_data)
+            except Exception as e:
+                logger.warning(f"Could not sync transaction for receipt {receipt.receipt_id}: {e}")
+                continue
+            
+            items.append(MarketplaceOrderItem(
+                product_name=transaction.title,
+                quantity=transaction.quantity,
+                unit_price=Decimal(str(transaction.price.get('amount', 0))) if transaction.price else Decimal('0'),
+                etsy_listing_id=transaction.listing_id,
+                customization_text=transaction.personalization
+            ))
+        
+        return MarketplaceOrder(
+            platform=OrderPlatform.ETSY,
+            external_id=str(receipt.receipt_id),
+            order_number=str(receipt.receipt_id),
+            status=self._map_etsy_status_to_internal(receipt),
+            total_amount=Decimal(str(receipt.grandtotal.get('amount', 0))) if receipt.grandtotal else Decimal('0'),
+            currency=receipt.grandtotal.get('currency_code', 'USD') if receipt.grandtotal else 'USD',
+            customer_email=receipt.payment_email,
+            customer_name=receipt.name,
+            shipping_address=self._format_shipping_address(receipt),
+            order_date=receipt.creation_timestamp,
+            processing_notes=receipt.message_from_buyer,
+            etsy_receipt_id=receipt.receipt_id,
+            etsy_order_id=receipt.order_id,
+            items=items
+        )
+    
     # Dashboard Data
     
+    @cache_tenant_data(expire=300, namespace="etsy.dashboard", tags=("integration:etsy",), stale_ttl=900)
     def get_dashboard_data(self, user_id: UUID) -> EtsyDashboardData:
         """Get comprehensive dashboard data from Etsy"""
         try:
@@ -518,12 +665,13 @@ class EtsyService:
     
     # Sync Operations
     
-    def sync_data(self, user_id: UUID, sync_request: EtsySyncRequest) -> EtsySyncResponse:
+    async def sync_data(self, user_id: UUID, sync_request: EtsySyncRequest) -> EtsySyncResponse:
         """Perform data sync based on request"""
         sync_id = f"sync_{user_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         
         try:
-            self._setup_client_for_user(user_id)
+            await asyncio.to_thread(self._setup_client_for_user, user_id)
+            self.client.priority = Priority.BACKGROUND
             
             records_processed = 0
             records_updated = 0
@@ -532,7 +680,9 @@ class EtsyService:
             
             if sync_request.sync_type in ['orders', 'all']:
                 try:
-                    order_result = self.sync_orders_to_internal(user_id, limit=100)
+                    order_result = await self.sync_orders_to_internal(
+                        user_id, full_sync=sync_request.force_full_sync
+                    )
                     records_created += order_result['synced']
                     records_updated += order_result['updated']
                     records_processed += order_result['synced'] + order_result['updated']
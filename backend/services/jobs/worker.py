@@ -1,9 +1,38 @@
 # services/jobs/worker.py
 from rq import Worker, Queue, Connection
 import redis
-from typing import Dict, Any
+from typing import Dict, Any, List
 import logging
 
+def load_mockup_templates(tenant_id: str, template_type: str) -> List[Dict[str, Any]]:
+    """Base images of a tenant's mockup templates in one category, decoded via the node's template cache"""
+    from database.core import SessionLocal
+    from database.entities import MockupTemplate
+    from services.common.storage import storage_path
+    from services.mockup.template_cache import load_template
+    
+    session = SessionLocal()
+    try:
+        templates = session.query(MockupTemplate).filter(
+            MockupTemplate.tenant_id == tenant_id,
+            MockupTemplate.category == template_type,
+            MockupTemplate.is_deleted == False
+        ).all()
+    finally:
+        session.close()
+    
+    loaded = []
+    for template in templates:
+        image_path = (template.template_settings or {}).get("image_path") or template.preview_image_path
+        if not image_path:
+            continue
+        loaded.append({
+            "name": template.name,
+            "image": load_template(storage_path(image_path)),  # read-only, shared by all processes on the node
+            "mask_data": template.mask_data or {}
+        })
+    return loaded
+
 # Job definitions
 async def process_bulk_listings(tenant_id: str, listings_data: List[Dict]) -> Dict[str, Any]:
     """Process bulk listing creation for a tenant"""
@@ -39,8 +68,9 @@ async def process_bulk_listings(tenant_id: str, listings_data: List[Dict]) -> Di
 
 def generate_mockup_images(tenant_id: str, design_id: str, mockup_config: Dict) -> Dict[str, Any]:
     """Generate mockup images for a design"""
-    import PIL.Image
-    import numpy as np
+    from PIL import Image
+    from services.mockup import CompositeSettings, composite_array
+    from services.mockup.template_cache import load_mask
     
     try:
         # Load design from MinIO
@@ -48,17 +78,20 @@ def generate_mockup_images(tenant_id: str, design_id: str, mockup_config: Dict)
         design_data = design_service.get_design(design_id)
         
         # Load base mockup templates
-        mockup_templates = load_mockup_templates(mockup_config["template_type"])
+        mockup_templates = load_mockup_templates(tenant_id, mockup_config["template_type"])
         
         generated_mockups = []
         
         for template in mockup_templates:
             # Apply design to template
-            mockup_image = apply_design_to_template(
+            settings = CompositeSettings.from_mask_data(mockup_config.get("mask_data") or template["mask_data"])
+            height, width = template["image"].shape[:2]
+            mockup_image = Image.fromarray(composite_array(
+                template["image"],
                 design_data["image_data"],
-                template,
-                mockup_config.get("mask_data", {})
-            )
+                settings,
+                mask=load_mask(settings.masks, (width, height))
+            ), 'RGBA')
             
             # Save mockup to MinIO
             mockup_path = f"{tenant_id}/mockups/{design_id}_{template['name']}.png"
@@ -0,0 +1,18 @@
+from .compositing import (
+    CompositeSettings,
+    apply_design_to_template,
+    composite,
+    composite_array,
+    render_mask
+)
+from .warp import WarpGrid, get_warp_grid
+
+__all__ = [
+    "CompositeSettings",
+    "apply_design_to_template",
+    "composite",
+    "composite_array",
+    "render_mask",
+    "WarpGrid",
+    "get_warp_grid"
+]
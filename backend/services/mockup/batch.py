@@ -0,0 +1,445 @@
+# services/mockup/batch.py
+"""
+Mockup batch execution on a process pool.
+
+A MockupBatch names its mockups in batch_settings["mockup_ids"]. Each design
+of those mockups rendered onto each of their template images (MockupImage
+rows that carry mask data) is one render. Renders on the same template are
+grouped into tasks of Mockup.batch_size designs, so the mask is rasterized
+once per task, and tasks run on a pool with one process per core since
+compositing is CPU bound.
+
+Tasks carry only the template's path. Workers take the decoded pixels from
+the node's template cache (memory-mapped .npy files on /dev/shm, see
+template_cache), so a 4000x4000 template (64 MB of RGBA) is decoded once per
+node and never pickled per task.
+
+Pending tasks wait in a heap ordered by batch priority and only as many as
+there are processes are handed to the pool. A higher-priority batch claimed
+while others run therefore starts on the next free process, ahead of their
+queued work (renders already running are not interrupted).
+
+Batches being rendered have their updated_at refreshed periodically. A
+"processing" batch whose updated_at is older than MOCKUP_BATCH_CLAIM_TIMEOUT
+was left by an executor that died; it is claimed again and rendered from
+the start, replacing the images it had already written.
+
+The task creates its own pool, so the Celery worker consuming the mockups
+queue cannot use the prefork pool (daemonic processes may not have
+children); run it with ``-P solo``, one per node.
+"""
+
+import heapq
+import itertools
+import logging
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from PIL import Image
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+from sqlalchemy.orm import Session, selectinload
+
+from database.core import SessionLocal
+from database.entities import Mockup, MockupBatch, MockupDesignAssociation, MockupImage
+from services.common.storage import storage_path
+from .compositing import CompositeSettings, composite_array
+from .template_cache import load_mask, load_template, template_cache_counters, template_cache_stats
+
+logger = logging.getLogger(__name__)
+
+# Render processes per node (0 = one per core)
+MOCKUP_RENDER_PROCESSES = int(os.getenv("MOCKUP_RENDER_PROCESSES", "0")) or os.cpu_count() or 1
+# Pending batches claimed per poll, and seconds between polls while rendering
+MOCKUP_BATCH_CLAIM_LIMIT = int(os.getenv("MOCKUP_BATCH_CLAIM_LIMIT", "2"))
+MOCKUP_BATCH_POLL_INTERVAL = float(os.getenv("MOCKUP_BATCH_POLL_INTERVAL", "5"))
+# Seconds between progress writes
+MOCKUP_PROGRESS_INTERVAL = float(os.getenv("MOCKUP_PROGRESS_INTERVAL", "2"))
+# Seconds without a heartbeat after which a processing batch is claimed again
+MOCKUP_BATCH_CLAIM_TIMEOUT = int(os.getenv("MOCKUP_BATCH_CLAIM_TIMEOUT", "600"))
+MOCKUP_BATCH_HEARTBEAT_INTERVAL = MOCKUP_BATCH_CLAIM_TIMEOUT / 4
+# Recent task completions the throughput estimate is measured over
+THROUGHPUT_WINDOW = 50
+
+OUTPUT_FORMATS = {'png': 'PNG', 'jpg': 'JPEG', 'jpeg': 'JPEG', 'webp': 'WEBP'}
+
+@dataclass
+class RenderJob:
+    design_id: str
+    design_path: str
+    file_path: str  # relative to the storage root, as stored on MockupImage
+
+@dataclass
+class RenderTask:
+    """Designs rendered onto one template by one pool process"""
+    batch_id: UUID
+    mockup_id: UUID
+    template_image_id: UUID
+    template_path: str
+    settings: CompositeSettings
+    jobs: List[RenderJob]
+    output_format: str = 'png'
+    output_quality: int = 95
+
+@dataclass
+class _BatchProgress:
+    tenant_id: str
+    user_id: UUID
+    priority: int
+    sequence: int
+    total: int = 0
+    completed: int = 0
+    failed: int = 0
+    remaining_tasks: int = 0
+    images: List[Dict[str, Any]] = field(default_factory=list)  # MockupImage rows not yet written
+    mockup_counts: Dict[UUID, List[int]] = field(default_factory=dict)  # mockup -> [completed, failed] not yet written
+    mockup_ids: List[UUID] = field(default_factory=list)
+    dirty: bool = True
+
+# Worker process side
+
+def _save(image: Image.Image, path: str, output_format: str, quality: int) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    image_format = OUTPUT_FORMATS.get(output_format, 'PNG')
+    if image_format == 'JPEG':
+        image.convert('RGB').save(path, image_format, quality=quality)
+    elif image_format == 'WEBP':
+        image.save(path, image_format, quality=quality)
+    else:
+        image.save(path, image_format)
+
+def render_task(task: RenderTask) -> Tuple[List[Dict[str, Any]], Counter]:
+    """Render every job of a task in a pool process; returns one outcome per job and the cache counter deltas"""
+    counters = Counter(template_cache_counters())
+    try:
+        template = load_template(task.template_path)
+        height, width = template.shape[:2]
+        mask = load_mask(task.settings.masks, (width, height))
+    except Exception as e:
+        outcomes = [{'design_id': job.design_id, 'ok': False, 'error': f"Template unavailable: {e}"} for job in task.jobs]
+        return outcomes, Counter(template_cache_counters()) - counters
+
+    outcomes = []
+    for job in task.jobs:
+        started = time.perf_counter()
+        outcome = {'design_id': job.design_id, 'file_path': job.file_path}
+        try:
+            with Image.open(job.design_path) as design:
+                result = composite_array(template, design, task.settings, mask=mask)
+            output_path = storage_path(job.file_path)
+            _save(Image.fromarray(result, 'RGBA'), output_path, task.output_format, task.output_quality)
+            outcome.update(ok=True, width=width, height=height, file_size=os.path.getsize(output_path))
+        except Exception as e:
+            outcome.update(ok=False, error=str(e))
+        outcome['seconds'] = time.perf_counter() - started
+        outcomes.append(outcome)
+    return outcomes, Counter(template_cache_counters()) - counters
+
+# Coordinating process side
+
+class MockupBatchExecutor:
+    """Claims pending MockupBatches and renders them on a process pool, highest priority first"""
+
+    def __init__(self, processes: int = MOCKUP_RENDER_PROCESSES):
+        self.processes = max(processes, 1)
+        self._queue: List[Tuple[int, int, int, RenderTask]] = []  # (-priority, batch sequence, task sequence, task)
+        self._sequence = itertools.count()
+        self._batches: Dict[UUID, _BatchProgress] = {}
+        self._completions: deque = deque(maxlen=THROUGHPUT_WINDOW)  # (monotonic time, renders)
+        self._cache_counters: Counter = Counter()  # template cache counters summed over the pool
+        self._last_heartbeat = time.monotonic()
+
+    def run(self) -> Dict[str, Any]:
+        """Render until no pending batch is left; returns batch/render counts and template cache stats"""
+        totals = {'batches': 0, 'rendered': 0, 'failed': 0}
+        session = SessionLocal()
+        try:
+            with ProcessPoolExecutor(max_workers=self.processes) as pool:
+                self._render(session, pool, totals)
+        finally:
+            session.close()
+
+        if any(totals.values()):
+            totals['template_cache'] = template_cache_stats(dict(self._cache_counters))
+            logger.info(f"Mockup batches rendered: {totals}")
+        return totals
+
+    def _render(self, session: Session, pool: ProcessPoolExecutor, totals: Dict[str, int]) -> None:
+        running: Dict[Future, RenderTask] = {}
+        last_poll = last_flush = time.monotonic()
+        totals['batches'] += self._admit(session)
+        while True:
+            if time.monotonic() - last_poll >= MOCKUP_BATCH_POLL_INTERVAL:
+                totals['batches'] += self._admit(session)
+                last_poll = time.monotonic()
+
+            # Keep the pool exactly full, so queued work stays in the priority heap
+            while self._queue and len(running) < self.processes:
+                task = heapq.heappop(self._queue)[-1]
+                running[pool.submit(render_task, task)] = task
+
+            if not running:
+                self._flush(session)
+                last_poll = time.monotonic()
+                admitted = self._admit(session)
+                if not admitted and not self._queue:
+                    break
+                totals['batches'] += admitted
+                continue
+
+            done, _ = wait(running, timeout=MOCKUP_BATCH_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = running.pop(future)
+                try:
+                    outcomes, cache_counters = future.result()
+                    self._cache_counters.update(cache_counters)
+                except Exception as e:
+                    outcomes = [{'design_id': job.design_id, 'ok': False, 'error': f"Render process failed: {e}"}
+                                for job in task.jobs]
+                self._record(task, outcomes, totals)
+
+            if time.monotonic() - last_flush >= MOCKUP_PROGRESS_INTERVAL:
+                self._flush(session)
+                last_flush = time.monotonic()
+
+    def _admit(self, session: Session) -> int:
+        """Claim the highest-priority pending (or abandoned) batches and queue their render tasks"""
+        table = MockupBatch.__table__
+        stale_before = datetime.now(timezone.utc) - timedelta(seconds=MOCKUP_BATCH_CLAIM_TIMEOUT)
+        claimable = (
+            select(table.c.id)
+            .where(or_(
+                table.c.status == 'pending',
+                and_(table.c.status == 'processing', table.c.updated_at < stale_before)
+            ))
+            .order_by(func.coalesce(table.c.priority, 0).desc(), table.c.created_at)
+            .limit(MOCKUP_BATCH_CLAIM_LIMIT)
+            .with_for_update(skip_locked=True)
+        )
+        statement = (
+            update(table)
+            .where(table.c.id.in_(claimable.scalar_subquery()))
+            .values(status='processing', started_at=func.now(), updated_at=func.now(),
+                    completed_mockups=0, failed_mockups=0)
+            .returning(table.c.id, table.c.tenant_id, table.c.user_id, table.c.priority, table.c.batch_settings)
+        )
+        batches = session.execute(statement).all()
+        session.commit()
+
+        for batch in batches:
+            try:
+                self._plan(session, batch)
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Could not plan mockup batch {batch.id}: {e}")
+                session.execute(
+                    update(table).where(table.c.id == batch.id)
+                    .values(status='failed', completed_at=func.now(), estimated_completion=None)
+                )
+                session.commit()
+        return len(batches)
+
+    def _plan(self, session: Session, batch) -> None:
+        """Queue (template, batch_size designs) tasks for every mockup of a batch"""
+        mockup_ids = [UUID(str(mockup_id)) for mockup_id in (batch.batch_settings or {}).get('mockup_ids', [])]
+        mockups = session.query(Mockup).options(
+            selectinload(Mockup.mockup_images).selectinload(MockupImage.mask_data),
+            selectinload(Mockup.mockup_designs).selectinload(MockupDesignAssociation.design_image)
+        ).filter(
+            Mockup.tenant_id == batch.tenant_id,
+            Mockup.id.in_(mockup_ids),
+            Mockup.is_deleted == False
+        ).all()
+
+        # Images from an abandoned earlier run of this batch are rendered again
+        images = MockupImage.__table__
+        session.execute(delete(images).where(
+            images.c.mockup_id.in_([mockup.id for mockup in mockups]),
+            images.c.image_type == 'variant',
+            images.c.mockup_metadata['batch_id'].as_string() == str(batch.id)
+        ))
+
+        priority = batch.priority or 0
+        progress = _BatchProgress(batch.tenant_id, batch.user_id, priority, next(self._sequence))
+        started = datetime.now(timezone.utc)
+        tasks: List[RenderTask] = []
+        for mockup in mockups:
+            progress.mockup_ids.append(mockup.id)
+            templates = [image for image in mockup.mockup_images if image.mask_data and image.image_type in (None, 'base')]
+            designs = [
+                association.design_image
+                for association in sorted(mockup.mockup_designs, key=lambda association: association.sort_order or 0)
+                if association.design_image is not None and not association.design_image.is_deleted
+            ]
+            output_format = (mockup.output_format or 'png').lower()
+            if output_format not in OUTPUT_FORMATS:
+                output_format = 'png'
+            size = max(mockup.batch_size or 1, 1)
+
+            for template in templates:
+                settings = CompositeSettings.from_mask_data(template.mask_data[0])
+                for start in range(0, len(designs), size):
+                    jobs = [
+                        RenderJob(
+                            str(design.id),
+                            storage_path(design.file_path),
+                            f"{batch.tenant_id}/mockups/{mockup.id}/{design.id}_{template.id}.{output_format}"
+                        )
+                        for design in designs[start:start + size]
+                    ]
+                    task = RenderTask(batch.id, mockup.id, template.id, storage_path(template.file_path), settings,
+                                      jobs, output_format, mockup.output_quality or 95)
+                    tasks.append(task)
+                    progress.total += len(jobs)
+
+            renders = len(templates) * len(designs)
+            mockup.total_images = renders
+            mockup.completed_images = 0
+            mockup.failed_images = 0
+            mockup.status = 'processing' if renders else 'completed'
+            mockup.processing_started_at = started
+        session.commit()
+
+        self._batches[batch.id] = progress
+        progress.remaining_tasks = len(tasks)
+        for task in tasks:
+            heapq.heappush(self._queue, (-priority, progress.sequence, next(self._sequence), task))
+
+    def _record(self, task: RenderTask, outcomes: List[Dict[str, Any]], totals: Dict[str, int]) -> None:
+        """Count a finished task and queue its MockupImage rows for the next flush"""
+        progress = self._batches[task.batch_id]
+        counts = progress.mockup_counts.setdefault(task.mockup_id, [0, 0])
+        processed_at = datetime.now(timezone.utc)
+        for outcome in outcomes:
+            if not outcome['ok']:
+                logger.warning(f"Mockup render of design {outcome['design_id']} failed: {outcome['error']}")
+                progress.failed += 1
+                counts[1] += 1
+                totals['failed'] += 1
+                continue
+            progress.completed += 1
+            counts[0] += 1
+            totals['rendered'] += 1
+            progress.images.append({
+                'tenant_id': progress.tenant_id,
+                'user_id': progress.user_id,
+                'mockup_id': task.mockup_id,
+                'filename': os.path.basename(outcome['file_path']),
+                'file_path': outcome['file_path'],
+                'image_type': 'variant',
+                'width_pixels': outcome['width'],
+                'height_pixels': outcome['height'],
+                'file_size': outcome['file_size'],
+                'format': task.output_format,
+                'processing_status': 'completed',
+                'processing_time_seconds': outcome['seconds'],
+                'processed_at': processed_at,
+                'mockup_metadata': {
+                    'batch_id': str(task.batch_id),
+                    'design_image_id': outcome['design_id'],
+                    'template_image_id': str(task.template_image_id)
+                }
+            })
+        progress.remaining_tasks -= 1
+        progress.dirty = True
+        self._completions.append((time.monotonic(), len(outcomes)))
+
+    def _throughput(self) -> Optional[float]:
+        """Renders per second over the recent completions"""
+        if len(self._completions) < 2:
+            return None
+        elapsed = self._completions[-1][0] - self._completions[0][0]
+        if elapsed <= 0:
+            return None
+        return sum(renders for _, renders in list(self._completions)[1:]) / elapsed
+
+    def _estimated_completion(self, progress: _BatchProgress) -> Optional[datetime]:
+        """Now plus the renders queued at or ahead of this batch, at the measured throughput"""
+        rate = self._throughput()
+        if rate is None:
+            return None
+        ahead = sum(
+            other.total - other.completed - other.failed
+            for other in self._batches.values()
+            if (-other.priority, other.sequence) <= (-progress.priority, progress.sequence)
+        )
+        return datetime.now(timezone.utc) + timedelta(seconds=ahead / rate)
+
+    def _flush(self, session: Session) -> None:
+        """Write rendered images, counters and estimates; settle finished batches"""
+        batches = MockupBatch.__table__
+        mockups = Mockup.__table__
+        finished = []
+        for batch_id, progress in self._batches.items():
+            if not progress.dirty:
+                continue
+            if progress.images:
+                session.execute(insert(MockupImage.__table__), progress.images)
+                progress.images = []
+            for mockup_id, (completed, failed) in progress.mockup_counts.items():
+                session.execute(
+                    update(mockups)
+                    .where(mockups.c.id == mockup_id, mockups.c.tenant_id == progress.tenant_id)
+                    .values(
+                        completed_images=func.coalesce(mockups.c.completed_images, 0) + completed,
+                        failed_images=func.coalesce(mockups.c.failed_images, 0) + failed
+                    )
+                )
+            progress.mockup_counts = {}
+
+            values = {'completed_mockups': progress.completed, 'failed_mockups': progress.failed,
+                      'total_mockups': progress.total}
+            if progress.remaining_tasks == 0:
+                values.update(
+                    status='failed' if progress.failed and not progress.completed else 'completed',
+                    completed_at=func.now(),
+                    estimated_completion=func.now()
+                )
+                finished.append(batch_id)
+            else:
+                values['estimated_completion'] = self._estimated_completion(progress)
+            session.execute(update(batches).where(batches.c.id == batch_id).values(**values))
+            progress.dirty = False
+
+        if finished:
+            self._settle_mockups(session, finished)
+        if time.monotonic() - self._last_heartbeat >= MOCKUP_BATCH_HEARTBEAT_INTERVAL:
+            # Batches without new results still show they are being rendered
+            owned = [batch_id for batch_id in self._batches if batch_id not in finished]
+            if owned:
+                session.execute(update(batches).where(batches.c.id.in_(owned)).values(updated_at=func.now()))
+            self._last_heartbeat = time.monotonic()
+        session.commit()
+        for batch_id in finished:
+            del self._batches[batch_id]
+
+    def _settle_mockups(self, session: Session, batch_ids: List[UUID]) -> None:
+        """Mark the mockups of finished batches completed, or failed when nothing rendered"""
+        queued = {queued[-1].mockup_id for queued in self._queue}
+        mockup_ids = set()
+        for batch_id in batch_ids:
+            mockup_ids.update(self._batches[batch_id].mockup_ids)
+        mockup_ids -= queued
+        if not mockup_ids:
+            return
+        table = Mockup.__table__
+        session.execute(
+            update(table)
+            .where(table.c.id.in_(mockup_ids), table.c.status == 'processing', table.c.completed_images > 0)
+            .values(status='completed', progress_percentage=100, processing_completed_at=func.now())
+        )
+        session.execute(
+            update(table)
+            .where(table.c.id.in_(mockup_ids), table.c.status == 'processing')
+            .values(status='failed', processing_completed_at=func.now(),
+                    processing_error='No mockup image could be rendered')
+        )
+
+def run_pending_batches() -> Dict[str, Any]:
+    """Render every pending MockupBatch on a pool sized to this node's cores"""
+    return MockupBatchExecutor().run()
@@ -0,0 +1,85 @@
+# services/mockup/benchmark.py
+"""
+Compare the vectorized compositor with naive per-pixel PIL compositing.
+
+    python -m services.mockup.benchmark --size 4000 --sample-rows 20
+
+The naive path (getpixel/putpixel with a Python blend per pixel) takes many
+minutes at 4000x4000, so it is timed on --sample-rows rows of the design
+region and extrapolated to the full region.
+"""
+
+import argparse
+import time
+
+import numpy as np
+from PIL import Image
+
+from .compositing import CompositeSettings, composite_array, place_design, render_mask
+
+def _synthetic_inputs(size: int):
+    rng = np.random.default_rng(0)
+    template = rng.integers(0, 256, (size, size, 4), dtype=np.uint8)
+    template[..., 3] = 255
+    design = rng.integers(0, 256, (size // 2, size // 2, 4), dtype=np.uint8)
+    return template, Image.fromarray(design, 'RGBA')
+
+def _naive_rows(template: Image.Image, placed: Image.Image, x: int, y: int,
+                mask: Image.Image, opacity: float, rows: int) -> int:
+    """Normal blend with mask and opacity, one getpixel/putpixel at a time; returns pixels done"""
+    design = placed.convert('RGBA')
+    pixels = 0
+    for row in range(min(rows, design.height)):
+        for column in range(design.width):
+            tx, ty = x + column, y + row
+            if not (0 <= tx < template.width and 0 <= ty < template.height):
+                continue
+            dr, dg, db, da = design.getpixel((column, row))
+            alpha = da / 255.0 * opacity * mask.getpixel((tx, ty)) / 255.0
+            tr, tg, tb, ta = template.getpixel((tx, ty))
+            template.putpixel((tx, ty), (
+                round(dr * alpha + tr * (1 - alpha)),
+                round(dg * alpha + tg * (1 - alpha)),
+                round(db * alpha + tb * (1 - alpha)),
+                ta
+            ))
+            pixels += 1
+    return pixels
+
+def run(size: int, sample_rows: int, repeats: int) -> None:
+    template, design = _synthetic_inputs(size)
+    margin = size // 8
+    settings = CompositeSettings(
+        masks=[{'type': 'rect', 'x': margin, 'y': margin, 'width': size - 2 * margin, 'height': size - 2 * margin}],
+        opacity=0.9
+    )
+    mask = render_mask(settings.masks, (size, size))
+
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        composite_array(template, design, settings, mask=mask)
+        timings.append(time.perf_counter() - started)
+    vectorized = min(timings)
+
+    placed, x, y = place_design(design, settings, mask.getbbox())
+    started = time.perf_counter()
+    pixels = _naive_rows(Image.fromarray(template, 'RGBA'), placed, x, y, mask, settings.opacity, sample_rows)
+    per_pixel = (time.perf_counter() - started) / max(pixels, 1)
+    naive = per_pixel * placed.width * placed.height
+
+    print(f"template {size}x{size}, design region {placed.width}x{placed.height}")
+    print(f"vectorized (best of {repeats}): {vectorized:8.3f} s")
+    print(f"naive PIL per-pixel (extrapolated from {pixels} px): {naive:8.1f} s")
+    print(f"speedup: {naive / vectorized:,.0f}x")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=4000)
+    parser.add_argument('--sample-rows', type=int, default=20)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+    run(args.size, args.sample_rows, args.repeats)
+
+if __name__ == '__main__':
+    main()
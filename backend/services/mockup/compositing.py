@@ -0,0 +1,300 @@
+# services/mockup/compositing.py
+"""
+Vectorized mockup compositing.
+
+A design is placed onto a mockup photo according to its MockupMaskData
+(masks, alignment, scale, rotation, offsets) and blended with NumPy on
+premultiplied-alpha float32 arrays. Only the region the placed design (and
+its shadow) covers is converted and blended; mask, opacity and blend mode are
+applied in one pass over that region and the rest of the template is copied
+untouched.
+
+Blend modes follow the W3C compositing formulas for premultiplied colors, so
+transparent design edges never pick up dark fringes.
+"""
+
+import logging
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+from .warp import get_warp_grid
+
+logger = logging.getLogger(__name__)
+
+BLEND_MODES = ('normal', 'multiply', 'screen', 'overlay')
+# Rec. 601 luma weights, used to re-apply the template's lighting to the design
+LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+@dataclass
+class CompositeSettings:
+    """Placement and blending parameters (the fields of MockupMaskData).
+
+    When points define a perspective or mesh warp they position the design,
+    and alignment, scale, rotation and offsets are not used.
+    """
+    masks: List[Dict[str, Any]] = field(default_factory=list)
+    points: List[Any] = field(default_factory=list)
+    alignment: str = 'center'
+    rotation_degrees: float = 0.0
+    scale_x: float = 1.0
+    scale_y: float = 1.0
+    offset_x: int = 0
+    offset_y: int = 0
+    blend_mode: str = 'normal'
+    opacity: float = 1.0
+    shadow_settings: Dict[str, Any] = field(default_factory=dict)
+    highlight_settings: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_mask_data(cls, mask_data: Union[Dict[str, Any], Any, None]) -> 'CompositeSettings':
+        """Build settings from a MockupMaskData row or its dict form (missing values keep defaults)"""
+        settings = cls()
+        if mask_data is None:
+            return settings
+        for setting in fields(cls):
+            if isinstance(mask_data, dict):
+                value = mask_data.get(setting.name)
+            else:
+                value = getattr(mask_data, setting.name, None)
+            if value is not None:
+                setattr(settings, setting.name, value)
+        return settings
+
+def render_mask(masks: List[Dict[str, Any]], size: Tuple[int, int]) -> Optional[Image.Image]:
+    """Rasterize mask objects into one 8-bit coverage image, or None when there are no masks.
+
+    Supported objects: {"type": "polygon", "points": [[x, y], ...]},
+    {"type": "rect" | "ellipse", "x", "y", "width", "height"}; each may set
+    "opacity" (0-1), "feather" (blur radius in px) and "invert". Coordinates
+    are template pixels; overlapping masks are combined by union.
+    """
+    if not masks:
+        return None
+
+    combined = Image.new('L', size, 0)
+    for mask in masks:
+        layer = Image.new('L', size, 0)
+        draw = ImageDraw.Draw(layer)
+        fill = int(round(255 * float(mask.get('opacity', 1.0))))
+        kind = mask.get('type', 'polygon')
+        if kind == 'polygon':
+            points = [_point(point) for point in mask.get('points', [])]
+            if len(points) < 3:
+                continue
+            draw.polygon(points, fill=fill)
+        elif kind in ('rect', 'ellipse'):
+            # PIL boxes include their far edge
+            box = (mask['x'], mask['y'], mask['x'] + mask['width'] - 1, mask['y'] + mask['height'] - 1)
+            (draw.rectangle if kind == 'rect' else draw.ellipse)(box, fill=fill)
+        else:
+            logger.warning(f"Ignoring unsupported mask type: {kind}")
+            continue
+
+        if mask.get('feather'):
+            layer = layer.filter(ImageFilter.GaussianBlur(float(mask['feather'])))
+        if mask.get('invert'):
+            layer = layer.point(lambda value: 255 - value)
+        combined = Image.fromarray(np.maximum(np.asarray(combined), np.asarray(layer)))
+    return combined
+
+def _point(point: Union[Dict[str, float], List[float], Tuple[float, float]]) -> Tuple[float, float]:
+    if isinstance(point, dict):
+        return float(point['x']), float(point['y'])
+    return float(point[0]), float(point[1])
+
+def place_design(design: Image.Image, settings: CompositeSettings,
+                 area: Tuple[int, int, int, int]) -> Tuple[Image.Image, int, int]:
+    """Fit, scale, rotate and align a design inside area; return the premultiplied layer and its top-left"""
+    left, top, right, bottom = area
+    area_width, area_height = right - left, bottom - top
+
+    # RGBa is premultiplied, so resampling and rotation never bleed color from transparent pixels
+    layer = design.convert('RGBa')
+    fit = min(area_width / layer.width, area_height / layer.height)
+    size = (
+        max(1, round(layer.width * fit * settings.scale_x)),
+        max(1, round(layer.height * fit * settings.scale_y))
+    )
+    if size != layer.size:
+        layer = layer.resize(size, Image.LANCZOS)
+    if settings.rotation_degrees:
+        # Positive degrees turn clockwise, as in the editor
+        layer = layer.rotate(-settings.rotation_degrees, resample=Image.BICUBIC, expand=True)
+
+    alignment = settings.alignment or 'center'
+    if 'left' in alignment:
+        x = left
+    elif 'right' in alignment:
+        x = right - layer.width
+    else:
+        x = left + (area_width - layer.width) // 2
+    if 'top' in alignment:
+        y = top
+    elif 'bottom' in alignment:
+        y = bottom - layer.height
+    else:
+        y = top + (area_height - layer.height) // 2
+
+    return layer, x + int(settings.offset_x or 0), y + int(settings.offset_y or 0)
+
+def premultiply(rgba: np.ndarray) -> np.ndarray:
+    """RGBA uint8 -> premultiplied float32 in [0, 1]"""
+    result = rgba.astype(np.float32)
+    result *= 1.0 / 255.0
+    result[..., :3] *= result[..., 3:4]
+    return result
+
+def unpremultiply(premultiplied: np.ndarray) -> np.ndarray:
+    """Premultiplied float32 in [0, 1] -> RGBA uint8"""
+    alpha = premultiplied[..., 3:4]
+    rgb = np.divide(premultiplied[..., :3], alpha, out=np.zeros_like(premultiplied[..., :3]), where=alpha > 0)
+    rgb *= 255.0
+    rgb += 0.5
+    np.clip(rgb, 0, 255, out=rgb)
+    result = np.empty(premultiplied.shape, dtype=np.uint8)
+    result[..., :3] = rgb
+    result[..., 3:4] = np.clip(alpha * 255.0 + 0.5, 0, 255)
+    return result
+
+def blend(backdrop: np.ndarray, source: np.ndarray, mode: str = 'normal') -> np.ndarray:
+    """Composite premultiplied source over premultiplied backdrop with a separable blend mode"""
+    sc, sa = source[..., :3], source[..., 3:4]
+    bc, ba = backdrop[..., :3], backdrop[..., 3:4]
+
+    result = np.empty_like(backdrop)
+    if mode == 'multiply':
+        result[..., :3] = sc * (1.0 - ba) + bc * (1.0 - sa) + sc * bc
+    elif mode == 'screen':
+        result[..., :3] = sc + bc - sc * bc
+    elif mode == 'overlay':
+        mixed = np.where(2.0 * bc <= ba, 2.0 * sc * bc, sa * ba - 2.0 * (ba - bc) * (sa - sc))
+        result[..., :3] = sc * (1.0 - ba) + bc * (1.0 - sa) + mixed
+    else:
+        np.multiply(bc, 1.0 - sa, out=result[..., :3])
+        result[..., :3] += sc
+    result[..., 3:4] = sa + ba * (1.0 - sa)
+    return result
+
+def _paste(canvas: np.ndarray, layer: np.ndarray, left: int, top: int) -> None:
+    """Copy layer into canvas at (left, top), clipping to the canvas"""
+    height, width = canvas.shape[:2]
+    x0, y0 = max(left, 0), max(top, 0)
+    x1, y1 = min(left + layer.shape[1], width), min(top + layer.shape[0], height)
+    if x0 < x1 and y0 < y1:
+        canvas[y0:y1, x0:x1] = layer[y0 - top:y1 - top, x0 - left:x1 - left]
+
+def _shadow_padding(shadow: Dict[str, Any]) -> int:
+    if not shadow.get('enabled'):
+        return 0
+    return int(abs(shadow.get('offset_x', 0)) + abs(shadow.get('offset_y', 0)) + 3 * shadow.get('blur', 0))
+
+def _shadow_layer(source: np.ndarray, shadow: Dict[str, Any]) -> np.ndarray:
+    """Premultiplied shadow cast by the source's alpha (shifted, blurred and tinted)"""
+    alpha = Image.fromarray(np.clip(source[..., 3] * 255.0 + 0.5, 0, 255).astype(np.uint8), 'L')
+    shifted = Image.new('L', alpha.size, 0)
+    shifted.paste(alpha, (int(shadow.get('offset_x', 0)), int(shadow.get('offset_y', 0))))
+    if shadow.get('blur'):
+        shifted = shifted.filter(ImageFilter.GaussianBlur(float(shadow['blur'])))
+
+    shadow_alpha = np.asarray(shifted, dtype=np.float32) * (float(shadow.get('opacity', 0.35)) / 255.0)
+    color = np.asarray(shadow.get('color', (0, 0, 0)), dtype=np.float32) / 255.0
+    layer = np.empty(source.shape, dtype=np.float32)
+    layer[..., :3] = shadow_alpha[..., None] * color
+    layer[..., 3] = shadow_alpha
+    return layer
+
+def _apply_highlights(source: np.ndarray, template_rgb: np.ndarray, highlight: Dict[str, Any]) -> None:
+    """Modulate the design by the template's local brightness so folds and lighting show through"""
+    strength = float(highlight.get('strength', 0.5))
+    luminance = template_rgb.astype(np.float32) @ LUMA_WEIGHTS
+    covered = source[..., 3] > 0
+    mean = float(luminance[covered].mean()) if covered.any() else 0.0
+    if mean <= 0:
+        return
+    shading = np.clip(luminance / mean, 0.0, 2.0)
+    source[..., :3] *= (1.0 + strength * (shading - 1.0))[..., None]
+    # Premultiplied color can never exceed alpha
+    np.minimum(source[..., :3], source[..., 3:4], out=source[..., :3])
+
+def _mask_bbox(mask: Union[Image.Image, np.ndarray, None]) -> Optional[Tuple[int, int, int, int]]:
+    """Bounding box of the nonzero mask pixels (like Image.getbbox), or None"""
+    if mask is None:
+        return None
+    if isinstance(mask, Image.Image):
+        return mask.getbbox()
+    rows = np.flatnonzero(mask.any(axis=1))
+    columns = np.flatnonzero(mask.any(axis=0))
+    if not len(rows):
+        return None
+    return int(columns[0]), int(rows[0]), int(columns[-1]) + 1, int(rows[-1]) + 1
+
+def composite_array(template: np.ndarray, design: Image.Image, settings: CompositeSettings,
+                    mask: Optional[Union[Image.Image, np.ndarray]] = None,
+                    layer: Optional[Tuple[Union[Image.Image, np.ndarray], int, int]] = None) -> np.ndarray:
+    """Composite a design onto an RGBA uint8 template array and return a new array.
+
+    mask is the rendered settings.masks as an 8-bit image or array (rendered
+    here when omitted). layer
+    is an already placed (RGBa image or premultiplied float32 array, x, y),
+    replacing the affine placement; when omitted, settings.points are used
+    for a perspective/mesh warp if they define one.
+    """
+    height, width = template.shape[:2]
+    if mask is None:
+        mask = render_mask(settings.masks, (width, height))
+    if layer is None:
+        warp_grid = get_warp_grid(settings.points, (width, height))
+        if warp_grid is not None:
+            layer = warp_grid.warp(design)
+        else:
+            area = _mask_bbox(mask) or (0, 0, width, height)
+            layer = place_design(design, settings, area)
+    placed, x, y = layer
+    if not isinstance(placed, np.ndarray):
+        placed = np.asarray(placed, dtype=np.float32) * (1.0 / 255.0)
+    placed_height, placed_width = placed.shape[:2]
+
+    # Work only on the region the design and its shadow can touch
+    pad = _shadow_padding(settings.shadow_settings)
+    x0, y0 = max(x - pad, 0), max(y - pad, 0)
+    x1, y1 = min(x + placed_width + pad, width), min(y + placed_height + pad, height)
+    result = template.copy()
+    if x0 >= x1 or y0 >= y1:
+        return result
+
+    source = np.zeros((y1 - y0, x1 - x0, 4), dtype=np.float32)
+    _paste(source, placed, x - x0, y - y0)
+    backdrop = premultiply(template[y0:y1, x0:x1])
+
+    opacity = min(max(float(settings.opacity), 0.0), 1.0)
+    coverage: Union[float, np.ndarray] = opacity
+    if mask is not None:
+        coverage = np.asarray(mask, dtype=np.float32)[y0:y1, x0:x1, None] * (opacity / 255.0)
+
+    if settings.shadow_settings.get('enabled'):
+        backdrop = blend(backdrop, _shadow_layer(source, settings.shadow_settings) * coverage, 'normal')
+    if settings.highlight_settings.get('enabled'):
+        _apply_highlights(source, template[y0:y1, x0:x1, :3], settings.highlight_settings)
+
+    mode = settings.blend_mode or 'normal'
+    if mode not in BLEND_MODES:
+        logger.warning(f"Unsupported blend mode {mode!r}, using normal")
+        mode = 'normal'
+
+    # Mask and opacity scale all four premultiplied channels, then one blend pass
+    source *= coverage
+    result[y0:y1, x0:x1] = unpremultiply(blend(backdrop, source, mode))
+    return result
+
+def composite(template: Image.Image, design: Image.Image, settings: CompositeSettings) -> Image.Image:
+    """Composite a design onto a template image"""
+    array = np.asarray(template.convert('RGBA'))
+    return Image.fromarray(composite_array(array, design, settings), 'RGBA')
+
+def apply_design_to_template(design: Image.Image, template: Image.Image,
+                             mask_data: Union[Dict[str, Any], Any, None]) -> Image.Image:
+    """Render a design onto a mockup template using its MockupMaskData (row or dict)"""
+    return composite(template, design, CompositeSettings.from_mask_data(mask_data))
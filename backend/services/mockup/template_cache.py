@@ -0,0 +1,177 @@
+# services/mockup/template_cache.py
+"""
+Decoded mockup templates shared by every process on a node.
+
+Template images are keyed by the SHA-256 of the encoded file, decoded once
+to RGBA and written as .npy files under MOCKUP_TEMPLATE_CACHE_DIR (tmpfs
+/dev/shm when available). Readers np.load them memory-mapped and read-only,
+so all worker processes map the same pages instead of each decoding and
+holding its own copy. Rendered masks are cached the same way, keyed by the
+mask objects and the template size.
+
+The directory is bounded by MOCKUP_TEMPLATE_CACHE_MB. A hit refreshes the
+file's mtime and each write removes the least recently used files until the
+total fits. Removing a file that another process has mapped is safe: its
+pages stay valid until that mapping is dropped.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .compositing import render_mask
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_DIR = os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'mockup-templates')
+TEMPLATE_CACHE_DIR = os.getenv("MOCKUP_TEMPLATE_CACHE_DIR", _DEFAULT_DIR)
+TEMPLATE_CACHE_MB = int(os.getenv("MOCKUP_TEMPLATE_CACHE_MB", "2048"))
+# Hits refresh the LRU timestamp at most this often (seconds), to avoid a metadata write per render
+TOUCH_INTERVAL = 60
+
+_stats: Counter = Counter()
+_stats_lock = threading.Lock()
+
+def _count(event: str, kind: str) -> None:
+    with _stats_lock:
+        _stats[event] += 1
+        _stats[f"{kind}.{event}"] += 1
+
+def template_cache_counters() -> Dict[str, int]:
+    """Hit/miss/eviction counters of this process, overall and per kind (template, mask)"""
+    with _stats_lock:
+        return dict(_stats)
+
+def template_cache_stats(counters: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """Counters (this process's unless given) with the hit rate and the shared directory's size"""
+    snapshot: Dict[str, Any] = dict(counters if counters is not None else template_cache_counters())
+    lookups = snapshot.get('hits', 0) + snapshot.get('misses', 0)
+    snapshot['hit_rate'] = round(snapshot.get('hits', 0) / lookups, 4) if lookups else None
+    entries = _entries()
+    snapshot['entries'] = len(entries)
+    snapshot['size_mb'] = round(sum(size for _, size, _ in entries) / (1024 * 1024), 1)
+    snapshot['budget_mb'] = TEMPLATE_CACHE_MB
+    return snapshot
+
+# Content hashes of template files, so an unchanged file is not re-read to find its key
+_digests: Dict[Tuple[str, int, int], str] = {}
+_digests_lock = threading.Lock()
+
+def _file_digest(path: str) -> str:
+    stat = os.stat(path)
+    identity = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    with _digests_lock:
+        digest = _digests.get(identity)
+    if digest is None:
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as handle:
+            for block in iter(lambda: handle.read(1 << 20), b''):
+                hasher.update(block)
+        digest = hasher.hexdigest()
+        with _digests_lock:
+            _digests[identity] = digest
+    return digest
+
+def _entries() -> List[Tuple[str, int, float]]:
+    """(path, size, mtime) of every cached array"""
+    entries = []
+    try:
+        with os.scandir(TEMPLATE_CACHE_DIR) as scan:
+            for entry in scan:
+                if not entry.name.endswith('.npy'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+    except FileNotFoundError:
+        pass
+    return entries
+
+def _load(path: str, kind: str) -> Optional[np.ndarray]:
+    try:
+        array = np.load(path, mmap_mode='r')
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        logger.warning(f"Discarding unreadable template cache file {path}: {e}")
+        _remove(path)
+        return None
+
+    _count('hits', kind)
+    try:
+        if time.time() - os.stat(path).st_mtime > TOUCH_INTERVAL:
+            os.utime(path)
+    except FileNotFoundError:
+        pass
+    return array
+
+def _remove(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+def _store(path: str, array: np.ndarray, kind: str) -> np.ndarray:
+    """Write atomically (concurrent writers of one key produce identical files), then map it"""
+    _count('misses', kind)
+    os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temporary, 'wb') as handle:
+            np.save(handle, np.ascontiguousarray(array))
+        os.replace(temporary, path)
+    except OSError as e:
+        # A full or read-only cache directory only costs the sharing, not the render
+        logger.warning(f"Could not write template cache file {path}: {e}")
+        _remove(temporary)
+        return array
+    _evict(keep=path)
+    return np.load(path, mmap_mode='r')
+
+def _evict(keep: str) -> None:
+    """Remove least recently used files until the directory fits the budget"""
+    budget = TEMPLATE_CACHE_MB * 1024 * 1024
+    entries = _entries()
+    total = sum(size for _, size, _ in entries)
+    if total <= budget:
+        return
+    for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+        if total <= budget:
+            break
+        if path == keep:
+            continue
+        if _remove(path):
+            _count('evictions', 'template' if os.path.basename(path).startswith('template-') else 'mask')
+        total -= size
+
+def load_template(path: str) -> np.ndarray:
+    """Read-only RGBA uint8 array of a template image, decoded at most once per node"""
+    cached = os.path.join(TEMPLATE_CACHE_DIR, f"template-{_file_digest(path)}.npy")
+    array = _load(cached, 'template')
+    if array is None:
+        with Image.open(path) as image:
+            array = _store(cached, np.asarray(image.convert('RGBA')), 'template')
+    return array
+
+def load_mask(masks: List[Dict[str, Any]], size: Tuple[int, int]) -> Optional[np.ndarray]:
+    """Read-only 8-bit coverage array of rendered mask objects (None when there are none)"""
+    if not masks:
+        return None
+    key = hashlib.sha256(json.dumps([masks, list(size)], sort_keys=True).encode('utf-8')).hexdigest()
+    cached = os.path.join(TEMPLATE_CACHE_DIR, f"mask-{key}.npy")
+    array = _load(cached, 'mask')
+    if array is None:
+        array = _store(cached, np.asarray(render_mask(masks, size)), 'mask')
+    return array
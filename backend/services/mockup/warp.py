@@ -0,0 +1,209 @@
+# services/mockup/warp.py
+"""
+Perspective and mesh warps of designs onto mockup positioning points.
+
+MockupMaskData.points either holds four corners (top-left, top-right,
+bottom-right, bottom-left) for a single homography, or a grid of rows of
+points for a mesh warp (a homography per cell, for mugs and shirt folds).
+
+The expensive part, inverting the mapping for every template pixel, depends
+only on the points and the template size, so it is computed once into a
+WarpGrid of normalized design coordinates and cached. Each grid also keeps
+the bilinear sampling plan (source indices and weights) for the design sizes
+it has seen, so rendering many designs onto the same mockup is a gather and
+a weighted sum per pixel.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+# Warp grids kept per process (each is up to ~16 bytes per covered template pixel)
+WARP_CACHE_SIZE = int(os.getenv("MOCKUP_WARP_CACHE_SIZE", "16"))
+# Design sizes whose sampling plans are kept per grid
+PLANS_PER_GRID = 2
+# Rows evaluated at once while inverting the mapping, and pixels sampled at once
+_ROW_CHUNK = 256
+_SAMPLE_CHUNK = 1 << 20
+
+def _point(point: Any) -> Tuple[float, float]:
+    if isinstance(point, dict):
+        return float(point['x']), float(point['y'])
+    return float(point[0]), float(point[1])
+
+def parse_points(points: Any) -> Optional[List[List[Tuple[float, float]]]]:
+    """Normalize points to a grid of rows (a 2x2 grid for four corners), or None if unusable"""
+    if not points:
+        return None
+    if all(isinstance(row, (list, tuple)) and row and isinstance(row[0], (list, tuple, dict)) for row in points):
+        grid = [[_point(point) for point in row] for row in points]
+        if len(grid) >= 2 and len(grid[0]) >= 2 and all(len(row) == len(grid[0]) for row in grid):
+            return grid
+        return None
+    if len(points) == 4:
+        top_left, top_right, bottom_right, bottom_left = (_point(point) for point in points)
+        return [[top_left, top_right], [bottom_left, bottom_right]]
+    return None
+
+def homography(source: Sequence[Tuple[float, float]], target: Sequence[Tuple[float, float]]) -> np.ndarray:
+    """3x3 matrix mapping four source points onto four target points"""
+    rows = []
+    values = []
+    for (x, y), (u, v) in zip(source, target):
+        rows.append([x, y, 1, 0, 0, 0, -u * x, -u * y])
+        rows.append([0, 0, 0, x, y, 1, -v * x, -v * y])
+        values.extend((u, v))
+    solution = np.linalg.solve(np.array(rows, dtype=np.float64), np.array(values, dtype=np.float64))
+    return np.append(solution, 1.0).reshape(3, 3)
+
+class _SamplingPlan:
+    """Bilinear gather for one design size: top-left source index and fractional weights per pixel"""
+
+    def __init__(self, u: np.ndarray, v: np.ndarray, size: Tuple[int, int]):
+        width, height = size
+        x = u * np.float32(width - 1)
+        y = v * np.float32(height - 1)
+        x0 = np.minimum(np.floor(x), width - 2).astype(np.int32)
+        y0 = np.minimum(np.floor(y), height - 2).astype(np.int32)
+        self.width = width
+        self.base = y0 * width + x0
+        self.fx = (x - x0)[:, None].astype(np.float32)
+        self.fy = (y - y0)[:, None].astype(np.float32)
+
+    def sample(self, flat: np.ndarray, start: int, stop: int) -> np.ndarray:
+        base = self.base[start:stop]
+        fx = self.fx[start:stop]
+        fy = self.fy[start:stop]
+        top = flat[base] * (1.0 - fx) + flat[base + 1] * fx
+        bottom = flat[base + self.width] * (1.0 - fx) + flat[base + self.width + 1] * fx
+        return top * (1.0 - fy) + bottom * fy
+
+class WarpGrid:
+    """Inverse mapping from a template region to normalized design coordinates"""
+
+    def __init__(self, left: int, top: int, width: int, height: int,
+                 positions: np.ndarray, u: np.ndarray, v: np.ndarray):
+        self.left = left
+        self.top = top
+        self.width = width
+        self.height = height
+        self.positions = positions  # flat indices into the region that the design covers
+        self.u = u
+        self.v = v
+        self._plans: "OrderedDict[Tuple[int, int], _SamplingPlan]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, grid: List[List[Tuple[float, float]]], template_size: Tuple[int, int]) -> 'WarpGrid':
+        """Invert the per-cell homographies over the bounding box of the points"""
+        template_width, template_height = template_size
+        xs = [x for row in grid for x, _ in row]
+        ys = [y for row in grid for _, y in row]
+        left, top = max(int(np.floor(min(xs))), 0), max(int(np.floor(min(ys))), 0)
+        right = min(int(np.ceil(max(xs))) + 1, template_width)
+        bottom = min(int(np.ceil(max(ys))) + 1, template_height)
+        width, height = max(right - left, 0), max(bottom - top, 0)
+
+        u = np.full((height, width), np.nan, dtype=np.float32)
+        v = np.full((height, width), np.nan, dtype=np.float32)
+        rows, columns = len(grid) - 1, len(grid[0]) - 1
+        unit = [(0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0)]
+        for row in range(rows):
+            for column in range(columns):
+                corners = [grid[row][column], grid[row][column + 1], grid[row + 1][column + 1], grid[row + 1][column]]
+                matrix = homography(corners, unit)
+                cell_left = max(int(np.floor(min(x for x, _ in corners))), left)
+                cell_right = min(int(np.ceil(max(x for x, _ in corners))) + 1, right)
+                cell_top = max(int(np.floor(min(y for _, y in corners))), top)
+                cell_bottom = min(int(np.ceil(max(y for _, y in corners))) + 1, bottom)
+                cls._invert_cell(matrix, (cell_left, cell_top, cell_right, cell_bottom), (left, top),
+                                 (row, column, rows, columns), u, v)
+
+        covered = ~np.isnan(u)
+        positions = np.flatnonzero(covered).astype(np.int32)
+        return cls(left, top, width, height, positions, u[covered], v[covered])
+
+    @staticmethod
+    def _invert_cell(matrix: np.ndarray, box: Tuple[int, int, int, int], origin: Tuple[int, int],
+                     cell: Tuple[int, int, int, int], u: np.ndarray, v: np.ndarray) -> None:
+        """Fill u/v for the pixels of box that fall inside one mesh cell"""
+        cell_left, cell_top, cell_right, cell_bottom = box
+        row, column, rows, columns = cell
+        if cell_left >= cell_right or cell_top >= cell_bottom:
+            return
+        # Sample at pixel centers
+        xs = np.arange(cell_left, cell_right, dtype=np.float64)[None, :] + 0.5
+        for chunk_top in range(cell_top, cell_bottom, _ROW_CHUNK):
+            chunk_bottom = min(chunk_top + _ROW_CHUNK, cell_bottom)
+            ys = np.arange(chunk_top, chunk_bottom, dtype=np.float64)[:, None] + 0.5
+            denominator = matrix[2, 0] * xs + matrix[2, 1] * ys + matrix[2, 2]
+            local_u = (matrix[0, 0] * xs + matrix[0, 1] * ys + matrix[0, 2]) / denominator
+            local_v = (matrix[1, 0] * xs + matrix[1, 1] * ys + matrix[1, 2]) / denominator
+            inside = (denominator > 0) & (local_u >= 0) & (local_u <= 1) & (local_v >= 0) & (local_v <= 1)
+
+            region = (slice(chunk_top - origin[1], chunk_bottom - origin[1]),
+                      slice(cell_left - origin[0], cell_right - origin[0]))
+            u[region] = np.where(inside, (column + local_u) / columns, u[region])
+            v[region] = np.where(inside, (row + local_v) / rows, v[region])
+
+    def _plan(self, size: Tuple[int, int]) -> _SamplingPlan:
+        with self._lock:
+            plan = self._plans.get(size)
+            if plan is not None:
+                self._plans.move_to_end(size)
+                return plan
+        plan = _SamplingPlan(self.u, self.v, size)
+        with self._lock:
+            self._plans[size] = plan
+            while len(self._plans) > PLANS_PER_GRID:
+                self._plans.popitem(last=False)
+        return plan
+
+    def warp(self, design: Image.Image) -> Tuple[np.ndarray, int, int]:
+        """Warp a design into a premultiplied float32 layer; return (layer, left, top) in template pixels"""
+        layer = design.convert('RGBa')
+        # Sampling far below the source resolution aliases, so shrink to the region first
+        target = (max(self.width, 2), max(self.height, 2))
+        if layer.width > 2 * target[0] or layer.height > 2 * target[1] or min(layer.size) < 2:
+            layer = layer.resize(target, Image.LANCZOS)
+
+        flat = np.asarray(layer, dtype=np.float32).reshape(-1, 4) * (1.0 / 255.0)
+        plan = self._plan(layer.size)
+        warped = np.zeros((self.height * self.width, 4), dtype=np.float32)
+        for start in range(0, len(self.positions), _SAMPLE_CHUNK):
+            stop = start + _SAMPLE_CHUNK
+            warped[self.positions[start:stop]] = plan.sample(flat, start, stop)
+        return warped.reshape(self.height, self.width, 4), self.left, self.top
+
+_grids: "OrderedDict[str, WarpGrid]" = OrderedDict()
+_grids_lock = threading.Lock()
+
+def get_warp_grid(points: Any, template_size: Tuple[int, int]) -> Optional[WarpGrid]:
+    """Cached warp grid for a mockup's points and size (None when the points do not define a warp)"""
+    grid = parse_points(points)
+    if grid is None:
+        return None
+
+    key = hashlib.sha1(json.dumps([grid, list(template_size)]).encode('utf-8')).hexdigest()
+    with _grids_lock:
+        warp_grid = _grids.get(key)
+        if warp_grid is not None:
+            _grids.move_to_end(key)
+            return warp_grid
+
+    warp_grid = WarpGrid.build(grid, template_size)
+    with _grids_lock:
+        _grids[key] = warp_grid
+        while len(_grids) > WARP_CACHE_SIZE:
+            _grids.popitem(last=False)
+    return warp_grid
+
+def warp_cache_info() -> Dict[str, int]:
+    with _grids_lock:
+        return {'grids': len(_grids), 'max_grids': WARP_CACHE_SIZE}
@@ -1,5 +1,6 @@
 from .controller import router as order_router
 from .service import OrderService
+from .ingest import OrderIngestor
 from .models import (
     OrderCreate,
     OrderUpdate,
@@ -9,12 +10,16 @@ from .models import (
     OrderStatus,
     FulfillmentStatus,
     PaymentStatus,
-    OrderPlatform
+    OrderPlatform,
+    MarketplaceOrder,
+    MarketplaceOrderItem,
+    OrderIngestResult
 )
 
 __all__ = [
     "order_router",
     "OrderService",
+    "OrderIngestor",
     "OrderCreate",
     "OrderUpdate", 
     "OrderResponse",
@@ -23,5 +28,8 @@ __all__ = [
     "OrderStatus",
     "FulfillmentStatus",
     "PaymentStatus",
-    "OrderPlatform"
+    "OrderPlatform",
+    "MarketplaceOrder",
+    "MarketplaceOrderItem",
+    "OrderIngestResult"
 ]
\ No newline at end of file
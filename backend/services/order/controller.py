@@ -67,21 +67,32 @@ async def get_orders(
     start_date: Optional[datetime] = Query(None, description="Filter orders from this date"),
     end_date: Optional[datetime] = Query(None, description="Filter orders to this date"),
     sort_by: str = Query("created_at", description="Sort field"),
-    sort_order: str = Query("desc", regex="^(asc|desc)$", description="Sort order")
+    sort_order: str = Query("desc", regex="^(asc|desc)$", description="Sort order"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
+    use_cursor: bool = Query(False, description="Use cursor pagination (sorted by created_at, skip ignored)"),
+    include_total: Optional[bool] = Query(
+        None, description="Include total_count (requires a full count query); by default only without a cursor"
+    )
 ):
     """Get all orders for the current user with filtering and pagination"""
-    return order_service.get_orders(
-        user_id=current_user.get_uuid(),
-        skip=skip,
-        limit=limit,
-        search=search,
-        status=status,
-        platform=platform,
-        start_date=start_date,
-        end_date=end_date,
-        sort_by=sort_by,
-        sort_order=sort_order
-    )
+    try:
+        return order_service.get_orders(
+            user_id=current_user.get_uuid(),
+            skip=skip,
+            limit=limit,
+            search=search,
+            status=status,
+            platform=platform,
+            start_date=start_date,
+            end_date=end_date,
+            sort_by=sort_by,
+            sort_order=sort_order,
+            cursor=cursor,
+            use_cursor=use_cursor,
+            include_total=include_total
+        )
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
 @router.get("/stats", response_model=OrderStatsResponse)
 async def get_order_stats(
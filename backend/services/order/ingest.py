@@ -0,0 +1,229 @@
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import Text, cast, func, literal_column, or_
+from sqlalchemy.dialects.postgresql import insert
+
+from database.entities import Order, OrderItem, OrderStatusHistory
+from common.database import DatabaseManager
+from services.common.cache_tags import mark_cache_tags
+from .models import MarketplaceOrder, OrderIngestResult
+from .numbering import get_order_number_allocator
+
+logger = logging.getLogger(__name__)
+
+# Orders per upsert statement; about 30 bind parameters each, well under
+# PostgreSQL's 65535-parameter limit
+INGEST_CHUNK_SIZE = int(os.getenv("ORDER_INGEST_CHUNK_SIZE", "500"))
+
+# Columns a marketplace may change after the order was first imported. Items
+# are only written for new orders, so items_count and total_quantity are
+# never rewritten from a later payload (it may not even carry the items).
+_SCALAR_UPDATE_COLUMNS = (
+    'order_number', 'status', 'payment_status', 'fulfillment_status',
+    'total_amount', 'tax_amount', 'shipping_amount', 'discount_amount', 'currency',
+    'customer_email', 'customer_name', 'processing_notes'
+)
+# JSON has no equality operator in PostgreSQL, so these are compared as text
+_JSON_UPDATE_COLUMNS = ('shipping_address', 'billing_address', 'order_metadata')
+
+class OrderIngestor:
+    """Writes marketplace orders with set-based statements keyed on (tenant, platform, external_id).
+
+    Each chunk is one INSERT ... ON CONFLICT DO UPDATE ... RETURNING for the
+    orders, followed by multi-row INSERTs for the items of newly created
+    orders and for status history. Conflicting rows are only rewritten when a
+    tracked column actually changed, so re-imports of unchanged orders cost no
+    row versions, trigger work or history entries.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, chunk_size: int = INGEST_CHUNK_SIZE):
+        self.db = db_manager
+        self.chunk_size = max(1, chunk_size)
+
+    def ingest(self, user_id: UUID, orders: Iterable[MarketplaceOrder],
+               trigger_source: str = 'sync') -> OrderIngestResult:
+        """Upsert orders for a user, committing once per chunk"""
+        result = OrderIngestResult()
+        chunk: List[MarketplaceOrder] = []
+        for order in orders:
+            chunk.append(order)
+            if len(chunk) >= self.chunk_size:
+                self._ingest_chunk(user_id, chunk, trigger_source, result)
+                chunk = []
+        if chunk:
+            self._ingest_chunk(user_id, chunk, trigger_source, result)
+        return result
+
+    def _ingest_chunk(self, user_id: UUID, orders: List[MarketplaceOrder],
+                      trigger_source: str, result: OrderIngestResult) -> None:
+        # A key may appear twice in one feed; ON CONFLICT cannot touch a row twice per statement
+        latest: Dict[Tuple[str, str], MarketplaceOrder] = {}
+        for order in orders:
+            latest[(order.platform.value, order.external_id)] = order
+        orders = list(latest.values())
+
+        existing = self._existing_statuses(orders)
+        new_count = sum(1 for order in orders if (order.platform.value, order.external_id) not in existing)
+        numbers = iter(get_order_number_allocator(self.db.db.get_bind()).allocate(self.db.tenant_id, new_count))
+
+        rows = []
+        for order in orders:
+            key = (order.platform.value, order.external_id)
+            rows.append(self._order_row(user_id, order, None if key in existing else next(numbers)))
+
+        try:
+            # subtotal is only tracked when the marketplace reports it; otherwise it was summed from the items
+            written = self._upsert(rows, update_subtotal=all(order.subtotal is not None for order in orders))
+
+            item_rows = []
+            history_rows = []
+            for order in orders:
+                key = (order.platform.value, order.external_id)
+                if key not in written:
+                    result.unchanged += 1
+                    continue
+                order_id, inserted = written[key]
+                result.order_ids[order.external_id] = order_id
+                old_status = existing.get(key)
+                if inserted:
+                    result.created += 1
+                    item_rows.extend(self._item_rows(user_id, order_id, order))
+                else:
+                    result.updated += 1
+                if inserted or old_status != order.status.value:
+                    history_rows.append(self._history_row(user_id, order_id, old_status, order, trigger_source))
+
+            if item_rows:
+                self.db.execute(insert(OrderItem), item_rows)
+            if history_rows:
+                self.db.execute(insert(OrderStatusHistory), history_rows)
+
+            # Core statements bypass the flush listener that invalidates cached order views
+            mark_cache_tags(self.db, f"orders:{user_id}")
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        logger.debug(f"Ingested {len(orders)} orders for user {user_id}: {len(item_rows)} items, {len(history_rows)} status changes")
+
+    def _existing_statuses(self, orders: List[MarketplaceOrder]) -> Dict[Tuple[str, str], str]:
+        """Current status of the orders in a chunk that already exist, by (platform, external_id)"""
+        platforms = {order.platform.value for order in orders}
+        rows = self.db.query(Order.platform, Order.external_id, Order.status).filter(
+            Order.tenant_id == self.db.tenant_id,
+            Order.platform.in_(platforms),
+            Order.external_id.in_([order.external_id for order in orders])
+        ).all()
+        return {(platform, external_id): status for platform, external_id, status in rows}
+
+    def _upsert(self, rows: List[Dict[str, Any]],
+                update_subtotal: bool = False) -> Dict[Tuple[str, str], Tuple[UUID, bool]]:
+        """Insert or update order rows; return (id, inserted) for every row written"""
+        table = Order.__table__
+        statement = insert(table).values(rows)
+        excluded = statement.excluded
+
+        scalar_columns = _SCALAR_UPDATE_COLUMNS + (('subtotal',) if update_subtotal else ())
+        changed = [table.c[column].is_distinct_from(excluded[column]) for column in scalar_columns]
+        changed.extend(
+            cast(table.c[column], Text).is_distinct_from(cast(excluded[column], Text))
+            for column in _JSON_UPDATE_COLUMNS
+        )
+        set_ = {column: excluded[column] for column in scalar_columns + _JSON_UPDATE_COLUMNS}
+        set_['updated_at'] = func.now()
+
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.tenant_id, table.c.platform, table.c.external_id],
+            set_=set_,
+            where=or_(*changed)
+        ).returning(
+            table.c.id,
+            table.c.platform,
+            table.c.external_id,
+            # xmax is 0 only on row versions created by a plain INSERT
+            literal_column('(xmax = 0)').label('inserted')
+        )
+
+        return {
+            (row.platform, row.external_id): (row.id, row.inserted)
+            for row in self.db.execute(statement)
+        }
+
+    def _order_row(self, user_id: UUID, order: MarketplaceOrder,
+                   internal_order_number: Optional[str]) -> Dict[str, Any]:
+        """Insert parameters for one order (every row carries the same keys)"""
+        items_subtotal = sum((item.unit_price * item.quantity for item in order.items), Decimal('0'))
+        return {
+            'id': uuid.uuid4(),
+            'tenant_id': self.db.tenant_id,
+            'user_id': user_id,
+            'platform': order.platform.value,
+            'external_id': order.external_id,
+            'etsy_receipt_id': order.etsy_receipt_id,
+            'etsy_order_id': order.etsy_order_id,
+            'shopify_order_id': order.shopify_order_id,
+            'order_number': order.order_number,
+            'internal_order_number': internal_order_number,
+            'status': order.status.value,
+            'payment_status': (order.payment_status.value if order.payment_status else 'pending'),
+            'fulfillment_status': (order.fulfillment_status.value if order.fulfillment_status else 'unfulfilled'),
+            'total_amount': order.total_amount,
+            'subtotal': order.subtotal if order.subtotal is not None else items_subtotal,
+            'tax_amount': order.tax_amount,
+            'shipping_amount': order.shipping_amount,
+            'discount_amount': order.discount_amount,
+            'currency': order.currency,
+            'customer_email': order.customer_email,
+            'customer_name': order.customer_name,
+            'shipping_address': order.shipping_address,
+            'billing_address': order.billing_address,
+            'items_count': len(order.items),
+            'total_quantity': sum(item.quantity for item in order.items),
+            'order_date': order.order_date or datetime.now(timezone.utc),
+            'processing_notes': order.processing_notes,
+            'order_metadata': order.metadata,
+            'created_by': user_id
+        }
+
+    def _item_rows(self, user_id: UUID, order_id: UUID, order: MarketplaceOrder) -> List[Dict[str, Any]]:
+        return [
+            {
+                'id': uuid.uuid4(),
+                'tenant_id': self.db.tenant_id,
+                'user_id': user_id,
+                'order_id': order_id,
+                'etsy_listing_id': item.etsy_listing_id,
+                'shopify_product_id': item.shopify_product_id,
+                'shopify_variant_id': item.shopify_variant_id,
+                'product_name': item.product_name,
+                'sku': item.sku,
+                'variant_name': item.variant_name,
+                'quantity': item.quantity,
+                'unit_price': item.unit_price,
+                'total_price': item.unit_price * item.quantity,
+                'customization_text': item.customization_text,
+                'created_by': user_id
+            }
+            for item in order.items
+        ]
+
+    def _history_row(self, user_id: UUID, order_id: UUID, old_status: Optional[str],
+                     order: MarketplaceOrder, trigger_source: str) -> Dict[str, Any]:
+        return {
+            'id': uuid.uuid4(),
+            'tenant_id': self.db.tenant_id,
+            'user_id': user_id,
+            'order_id': order_id,
+            'old_status': old_status,
+            'new_status': order.status.value,
+            'change_reason': f"Imported from {order.platform.value}" if old_status is None else f"Updated on {order.platform.value}",
+            'is_automatic': True,
+            'trigger_source': trigger_source
+        }
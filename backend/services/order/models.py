@@ -253,11 +253,12 @@ class OrderResponse(OrderBase):
 
 class OrderListResponse(BaseModel):
     orders: List[OrderResponse]
-    total_count: int
-    page: int
+    total_count: Optional[int] = None  # None when the count was skipped
+    page: Optional[int] = None  # None in cursor mode
     page_size: int
     has_next: bool
     has_prev: bool
+    next_cursor: Optional[str] = None
 
 class OrderStatsResponse(BaseModel):
     total_orders: int
@@ -343,4 +344,54 @@ class OrderBulkOperationResponse(BaseModel):
     failed: List[Dict[str, Any]]  # [{"id": UUID, "error": str}]
     total_requested: int
     total_successful: int
-    total_failed: int
\ No newline at end of file
+    total_failed: int
+
+# Marketplace ingestion
+
+class MarketplaceOrderItem(BaseModel):
+    """Line item of a marketplace order, normalized for bulk ingestion"""
+    product_name: str
+    quantity: int = 1
+    unit_price: Decimal = Decimal('0')
+    sku: Optional[str] = None
+    variant_name: Optional[str] = None
+    etsy_listing_id: Optional[int] = None
+    shopify_product_id: Optional[int] = None
+    shopify_variant_id: Optional[int] = None
+    customization_text: Optional[str] = None
+
+class MarketplaceOrder(BaseModel):
+    """Marketplace order normalized for bulk ingestion, keyed by (platform, external_id)"""
+    platform: OrderPlatform
+    external_id: str
+    order_number: Optional[str] = None
+    status: OrderStatus = OrderStatus.PENDING
+    payment_status: Optional[PaymentStatus] = None
+    fulfillment_status: Optional[FulfillmentStatus] = None
+    
+    total_amount: Decimal = Decimal('0')
+    subtotal: Optional[Decimal] = None
+    tax_amount: Decimal = Decimal('0')
+    shipping_amount: Decimal = Decimal('0')
+    discount_amount: Decimal = Decimal('0')
+    currency: str = 'USD'
+    
+    customer_email: Optional[str] = None
+    customer_name: Optional[str] = None
+    shipping_address: Dict[str, Any] = Field(default_factory=dict)
+    billing_address: Dict[str, Any] = Field(default_factory=dict)
+    
+    order_date: Optional[datetime] = None
+    processing_notes: Optional[str] = None
+    etsy_receipt_id: Optional[int] = None
+    etsy_order_id: Optional[int] = None
+    shopify_order_id: Optional[int] = None
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+    
+    items: List[MarketplaceOrderItem] = Field(default_factory=list)
+
+class OrderIngestResult(BaseModel):
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    order_ids: Dict[str, UUID] = Field(default_factory=dict)  # external_id -> order id (created/updated only)
@@ -0,0 +1,147 @@
+import os
+import threading
+import uuid
+from datetime import date, datetime, timezone
+from typing import Dict, List, Tuple
+
+from sqlalchemy import Integer, cast, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from database.entities import Order, OrderNumberSequence
+
+# Numbers reserved per round trip. 1 keeps numbering gap-free; larger blocks
+# let high-volume imports allocate without touching the counter row each time.
+DEFAULT_BLOCK_SIZE = int(os.getenv("ORDER_NUMBER_BLOCK_SIZE", "1"))
+
+class OrderNumberAllocator:
+    """Allocates ORD-YYYYMMDD-NNNN numbers from a per-tenant, per-day counter row.
+
+    Each reservation is a single INSERT ... ON CONFLICT DO UPDATE ... RETURNING
+    on its own short transaction, so concurrent creates never share a number
+    and the counter row lock is released immediately. Reserved blocks are kept
+    in the allocator and handed out locally until exhausted; numbers left in
+    a block when the process exits are skipped, never reused. Use
+    get_order_number_allocator so every request in a process shares one
+    allocator (and its blocks) per database.
+
+    A day's counter row starts from the highest ORD-YYYYMMDD-NNNN already
+    stored for that tenant and day, so numbers issued before the row existed
+    (by the earlier count-based numbering) are never handed out again.
+    """
+
+    def __init__(self, bind, block_size: int = DEFAULT_BLOCK_SIZE):
+        self.bind = bind
+        self.block_size = max(1, block_size)
+        self._blocks: Dict[Tuple[str, date], Tuple[int, int]] = {}  # (tenant, day) -> (next, last)
+        # One lock per (tenant, day), so a counter round trip only holds up
+        # allocations that would draw from the same block
+        self._key_locks: Dict[Tuple[str, date], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def next_number(self, tenant_id: str) -> str:
+        """Allocate a single internal order number"""
+        return self.allocate(tenant_id, 1)[0]
+
+    def allocate(self, tenant_id: str, count: int) -> List[str]:
+        """Allocate count internal order numbers for today"""
+        if count <= 0:
+            return []
+
+        today = datetime.now(timezone.utc).date()
+        key = (tenant_id, today)
+        sequences: List[int] = []
+
+        if self.block_size == 1:
+            last_value = self._reserve(tenant_id, today, count)
+            sequences.extend(range(last_value - count + 1, last_value + 1))
+            return self._format(today, sequences)
+
+        with self._key_lock(key):
+            next_value, last_value = self._blocks.pop(key, (1, 0))
+            take = min(count, last_value - next_value + 1)
+            sequences.extend(range(next_value, next_value + take))
+            next_value += take
+
+            if len(sequences) < count:
+                needed = count - len(sequences)
+                reserve = max(needed, self.block_size)
+                last_value = self._reserve(tenant_id, today, reserve)
+                next_value = last_value - reserve + 1
+                sequences.extend(range(next_value, next_value + needed))
+                next_value += needed
+
+            if next_value <= last_value:
+                self._blocks[key] = (next_value, last_value)
+
+        return self._format(today, sequences)
+
+    def _key_lock(self, key: Tuple[str, date]) -> threading.Lock:
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                # Blocks from earlier days can never be handed out again
+                for stale in [other for other in self._key_locks if other[1] != key[1]]:
+                    del self._key_locks[stale]
+                    self._blocks.pop(stale, None)
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    @staticmethod
+    def _format(day: date, sequences: List[int]) -> List[str]:
+        date_prefix = day.strftime("%Y%m%d")
+        return [f"ORD-{date_prefix}-{sequence:04d}" for sequence in sequences]
+
+    def _reserve(self, tenant_id: str, day: date, amount: int) -> int:
+        """Atomically advance the counter row by amount and return its new value"""
+        table = OrderNumberSequence.__table__
+        advanced = (
+            update(table)
+            .where(table.c.tenant_id == tenant_id, table.c.sequence_date == day)
+            .values(last_value=table.c.last_value + amount, updated_at=datetime.now(timezone.utc))
+            .returning(table.c.last_value)
+        )
+
+        with self.bind.begin() as conn:
+            last_value = conn.execute(advanced).scalar_one_or_none()
+            if last_value is not None:
+                return last_value
+
+            # First reservation of the day: seed from numbers already stored
+            insert_statement = insert(table).values(
+                id=uuid.uuid4(),
+                tenant_id=tenant_id,
+                sequence_date=day,
+                last_value=self._highest_existing(tenant_id, day) + amount
+            )
+            insert_statement = insert_statement.on_conflict_do_update(
+                index_elements=[table.c.tenant_id, table.c.sequence_date],
+                set_={
+                    'last_value': table.c.last_value + amount,
+                    'updated_at': datetime.now(timezone.utc)
+                }
+            ).returning(table.c.last_value)
+            return conn.execute(insert_statement).scalar_one()
+
+    @staticmethod
+    def _highest_existing(tenant_id: str, day: date):
+        """Highest sequence among the tenant's stored numbers for day (0 when none)"""
+        prefix = f"ORD-{day.strftime('%Y%m%d')}-"
+        return (
+            select(func.coalesce(func.max(cast(func.substr(Order.internal_order_number, len(prefix) + 1), Integer)), 0))
+            .where(
+                Order.tenant_id == tenant_id,
+                Order.internal_order_number.op('~')(f"^{prefix}[0-9]+$")
+            )
+            .scalar_subquery()
+        )
+
+_allocators: Dict[object, OrderNumberAllocator] = {}
+_allocators_lock = threading.Lock()
+
+def get_order_number_allocator(bind) -> OrderNumberAllocator:
+    """Process-wide allocator for a database, so reserved blocks outlive the request that reserved them"""
+    with _allocators_lock:
+        allocator = _allocators.get(bind)
+        if allocator is None:
+            allocator = _allocators[bind] = OrderNumberAllocator(bind)
+        return allocator
@@ -0,0 +1,212 @@
+from typing import List, Optional, Dict, Any
+from uuid import UUID
+from datetime import datetime, date, timezone, timedelta
+from decimal import Decimal
+import argparse
+import logging
+
+from sqlalchemy import func, extract, text, cast, BigInteger
+
+from database.entities import Order, DailyOrderRollup
+from database.rollups import REBUILD_SQL, ROLLUP_LOCK_KEY
+from .service import fold_order_buckets, REVENUE_STATUSES
+
+logger = logging.getLogger(__name__)
+
+class OrderRollupService:
+    """Reads and rebuilds the per-tenant daily order rollups.
+
+    Queries here scan one row per (day, platform, status) instead of every
+    order, so a year of history is a few hundred rows per user.
+    """
+
+    def __init__(self, db, tenant_id: str):
+        # db is a Session or DatabaseManager; only query/execute are used
+        self.db = db
+        self.tenant_id = tenant_id
+
+    def _rollup_query(self, *columns):
+        return self.db.query(*columns).filter(DailyOrderRollup.tenant_id == self.tenant_id)
+
+    def get_order_aggregates(
+        self,
+        user_id: UUID,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """Same shape as OrderService.get_order_aggregates, at day granularity.
+
+        recent_count keeps the exact rolling seven days: whole days come from
+        the rollups and the partial first day from orders, as in summarize_since.
+        """
+        now = datetime.now(timezone.utc)
+        month_start = now.date().replace(day=1)
+        week_ago = now - timedelta(days=7)
+        first_full_day = week_ago.date() + timedelta(days=1)
+
+        query = self._rollup_query(
+            DailyOrderRollup.status,
+            DailyOrderRollup.platform,
+            cast(func.sum(DailyOrderRollup.order_count), BigInteger).label('orders'),
+            func.coalesce(func.sum(DailyOrderRollup.total_amount), 0).label('amount'),
+            func.coalesce(
+                func.sum(DailyOrderRollup.total_amount).filter(DailyOrderRollup.day >= month_start), 0
+            ).label('month_amount'),
+            cast(func.coalesce(
+                func.sum(DailyOrderRollup.order_count).filter(DailyOrderRollup.day >= first_full_day), 0
+            ), BigInteger).label('recent')
+        ).filter(DailyOrderRollup.user_id == user_id)
+
+        if start_date:
+            query = query.filter(DailyOrderRollup.day >= start_date.date())
+        if end_date:
+            query = query.filter(DailyOrderRollup.day <= end_date.date())
+
+        rows = query.group_by(DailyOrderRollup.status, DailyOrderRollup.platform).all()
+        aggregates = fold_order_buckets(row for row in rows if row.orders)
+
+        partial = self.db.query(func.count(Order.id)).filter(
+            Order.tenant_id == self.tenant_id,
+            Order.user_id == user_id,
+            Order.created_at >= week_ago,
+            Order.created_at < datetime.combine(first_full_day, datetime.min.time(), tzinfo=timezone.utc),
+            Order.is_deleted == False
+        )
+        if start_date:
+            partial = partial.filter(Order.created_at >= start_date)
+        if end_date:
+            partial = partial.filter(Order.created_at <= end_date)
+        aggregates['recent_count'] += partial.scalar() or 0
+        return aggregates
+
+    def get_revenue_by_month(self, user_id: UUID, start_date: datetime, end_date: datetime) -> List[Dict[str, Any]]:
+        """Revenue and order counts per calendar month from the rollups"""
+        year = extract('year', DailyOrderRollup.day)
+        month = extract('month', DailyOrderRollup.day)
+
+        rows = self._rollup_query(
+            year.label('year'),
+            month.label('month'),
+            func.sum(DailyOrderRollup.total_amount).label('revenue'),
+            func.sum(DailyOrderRollup.order_count).label('orders')
+        ).filter(
+            DailyOrderRollup.user_id == user_id,
+            DailyOrderRollup.day >= start_date.date(),
+            DailyOrderRollup.day <= end_date.date(),
+            DailyOrderRollup.status.in_(REVENUE_STATUSES)
+        ).group_by(year, month).order_by(year, month).all()
+
+        return [
+            {
+                'year': int(row.year),
+                'month': int(row.month),
+                'revenue': float(row.revenue or 0),
+                'orders': int(row.orders or 0)
+            }
+            for row in rows
+            if row.orders
+        ]
+
+    def summarize_since(self, start_time: datetime) -> Dict[str, Any]:
+        """Tenant-wide order totals since start_time.
+
+        Whole days come from the rollups; only the partial first day is read
+        from orders, so the result stays exact for hour-based windows.
+        """
+        if start_time.tzinfo is None:
+            start_time = start_time.replace(tzinfo=timezone.utc)
+        start_time = start_time.astimezone(timezone.utc)
+        first_full_day = start_time.date() + timedelta(days=1)
+        first_full_day_start = datetime.combine(first_full_day, datetime.min.time(), tzinfo=timezone.utc)
+
+        rollup = self._rollup_query(
+            func.coalesce(func.sum(DailyOrderRollup.order_count), 0),
+            func.coalesce(func.sum(DailyOrderRollup.order_count).filter(DailyOrderRollup.status == 'completed'), 0),
+            func.coalesce(func.sum(DailyOrderRollup.total_amount), 0)
+        ).filter(DailyOrderRollup.day >= first_full_day).one()
+
+        partial = self.db.query(
+            func.count(Order.id),
+            func.count(Order.id).filter(Order.status == 'completed'),
+            func.coalesce(func.sum(Order.total_amount), 0)
+        ).filter(
+            Order.tenant_id == self.tenant_id,
+            Order.user_id.isnot(None),
+            Order.created_at >= start_time,
+            Order.created_at < first_full_day_start,
+            Order.is_deleted == False
+        ).one()
+
+        total = int(rollup[0]) + int(partial[0])
+        revenue = Decimal(rollup[2]) + Decimal(partial[2])
+
+        return {
+            'total': total,
+            'completed': int(rollup[1]) + int(partial[1]),
+            'average_value': float(revenue / total) if total else 0.0,
+            'total_revenue': float(revenue)
+        }
+
+    def rebuild(self, start_day: Optional[date] = None, end_day: Optional[date] = None) -> int:
+        """Recompute the tenant's rollups from orders, optionally for a day range.
+
+        Holds the tenant's rollup lock until the caller commits: this tenant's
+        writers wait in their triggers, so their deltas land after the
+        recomputation. Other tenants are not blocked.
+        """
+        params: Dict[str, Any] = {'tenant_id': self.tenant_id}
+        delete_filter = ""
+        order_filter = " AND tenant_id = :tenant_id"
+        if start_day:
+            params['start_day'] = start_day
+            delete_filter += " AND day >= :start_day"
+            order_filter += " AND (created_at AT TIME ZONE 'UTC')::date >= :start_day"
+        if end_day:
+            params['end_day'] = end_day
+            delete_filter += " AND day <= :end_day"
+            order_filter += " AND (created_at AT TIME ZONE 'UTC')::date <= :end_day"
+
+        lock_key = ROLLUP_LOCK_KEY.format(tenant_id='CAST(:tenant_id AS text)')
+        self.db.execute(text(f"SELECT pg_advisory_xact_lock({lock_key})"), {'tenant_id': self.tenant_id})
+        self.db.execute(
+            text(f"DELETE FROM daily_order_rollups WHERE tenant_id = :tenant_id{delete_filter}"),
+            params
+        )
+        result = self.db.execute(text(REBUILD_SQL.format(filters=order_filter)), params)
+
+        logger.info(f"Rebuilt {result.rowcount} daily order rollup rows for tenant {self.tenant_id}")
+        return result.rowcount
+
+def main():
+    """Backfill command: python -m services.order.rollups [--tenant-id ID] [--days N]"""
+    from database.core import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rebuild daily_order_rollups from orders")
+    parser.add_argument("--tenant-id", help="Tenant to rebuild (default: every tenant with orders)")
+    parser.add_argument("--days", type=int, help="Only rebuild the last N days")
+    args = parser.parse_args()
+
+    start_day = None
+    if args.days:
+        start_day = datetime.now(timezone.utc).date() - timedelta(days=args.days)
+
+    session = SessionLocal()
+    try:
+        if args.tenant_id:
+            tenant_ids = [args.tenant_id]
+        else:
+            tenant_ids = [row[0] for row in session.query(Order.tenant_id).distinct().all()]
+
+        for tenant_id in tenant_ids:
+            OrderRollupService(session, tenant_id).rebuild(start_day=start_day)
+            session.commit()
+            print(f"Rebuilt rollups for tenant {tenant_id}")
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
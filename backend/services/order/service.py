@@ -1,8 +1,10 @@
 from typing import List, Optional, Dict, Any, Tuple
-from uuid import UUID
+from uuid import UUID, uuid4
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func, desc, asc
-from datetime import datetime, timezone
+from sqlalchemy import and_, or_, func, desc, asc, update, insert, text, bindparam, String
+from sqlalchemy.dialects.postgresql import ARRAY
+from datetime import datetime, timezone, timedelta
+from collections import defaultdict
 import logging
 from decimal import Decimal
 
@@ -27,7 +29,7 @@ from .models import (
     OrderItemUpdate,
     OrderItemResponse
 )
-from database.entities import Order, OrderItem, OrderNote, OrderFulfillment, User
+from database.entities import Order, OrderItem, OrderNote, OrderFulfillment, OrderStatusHistory, User
 from common.exceptions import (
     OrderNotFound,
     OrderCreateError,
@@ -37,9 +39,40 @@ from common.exceptions import (
     ValidationError
 )
 from common.database import DatabaseManager
+from common.pagination import apply_keyset, fetch_keyset_page
+from .numbering import get_order_number_allocator
+from services.common.cache_tags import mark_cache_tags
 
 logger = logging.getLogger(__name__)
 
+# Statuses whose order totals count as realized revenue
+REVENUE_STATUSES = (OrderStatus.COMPLETED.value, OrderStatus.DELIVERED.value)
+
+def fold_order_buckets(rows) -> Dict[str, Any]:
+    """Fold (status, platform, orders, amount, month_amount, recent) rows into order stats"""
+    orders_by_status: Dict[str, int] = defaultdict(int)
+    orders_by_platform: Dict[str, int] = defaultdict(int)
+    total_revenue = Decimal('0')
+    this_month_revenue = Decimal('0')
+    recent_count = 0
+    
+    for row in rows:
+        orders_by_status[row.status] += row.orders
+        orders_by_platform[row.platform] += row.orders
+        recent_count += row.recent
+        if row.status in REVENUE_STATUSES:
+            total_revenue += Decimal(row.amount)
+            this_month_revenue += Decimal(row.month_amount)
+    
+    return {
+        'total_orders': sum(orders_by_status.values()),
+        'orders_by_status': dict(orders_by_status),
+        'orders_by_platform': dict(orders_by_platform),
+        'total_revenue': total_revenue,
+        'this_month_revenue': this_month_revenue,
+        'recent_count': recent_count
+    }
+
 class OrderService:
     """Service for managing orders"""
     
@@ -127,8 +160,7 @@ class OrderService:
                     customization_options=item_data.customization_options,
                     custom_design_uploaded=item_data.custom_design_uploaded,
                     production_notes=item_data.production_notes,
-                    estimated_production_time=item_data.estimated_production_time,
-                    created_by=user_id
+                    estimated_production_time=item_data.estimated_production_time
                 )
                 self.db.add(db_item)
                 order_items.append(db_item)
@@ -160,9 +192,18 @@ class OrderService:
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
         sort_by: str = "created_at",
-        sort_order: str = "desc"
+        sort_order: str = "desc",
+        cursor: Optional[str] = None,
+        use_cursor: bool = False,
+        include_total: Optional[bool] = None
     ) -> OrderListResponse:
-        """Get orders for user with filtering and pagination"""
+        """Get orders for user with filtering and pagination.
+
+        With use_cursor (or a cursor) set, pages are fetched by seeking on
+        (created_at, id) instead of OFFSET, and skip/sort_by are ignored.
+        include_total defaults to counting only in offset mode and on the
+        first cursor page; later cursor pages skip the count.
+        """
         try:
             # Base query
             query = self.db.query(Order).filter(
@@ -194,6 +235,28 @@ class OrderService:
             if end_date:
                 query = query.filter(Order.order_date <= end_date)
             
+            # Get total count (optional, it scans every matching row)
+            if include_total is None:
+                include_total = cursor is None
+            total_count = query.count() if include_total else None
+            
+            if cursor or use_cursor:
+                query = apply_keyset(
+                    query, Order.created_at, Order.id, cursor,
+                    descending=sort_order.lower() == "desc"
+                )
+                orders, next_cursor = fetch_keyset_page(query, limit)
+                
+                return OrderListResponse(
+                    orders=self._build_order_responses(orders),
+                    total_count=total_count,
+                    page=None,
+                    page_size=limit,
+                    has_next=next_cursor is not None,
+                    has_prev=cursor is not None,
+                    next_cursor=next_cursor
+                )
+            
             # Apply sorting
             sort_column = getattr(Order, sort_by, Order.created_at)
             if sort_order.lower() == "desc":
@@ -201,27 +264,25 @@ class OrderService:
             else:
                 query = query.order_by(asc(sort_column))
             
-            # Get total count
-            total_count = query.count()
-            
-            # Apply pagination
-            orders = query.offset(skip).limit(limit).all()
+            # Apply pagination, fetching one extra row to detect a next page
+            orders = query.offset(skip).limit(limit + 1).all()
+            has_next = len(orders) > limit
+            orders = orders[:limit]
             
             # Convert to response models
-            order_responses = []
-            for order in orders:
-                items = self.db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
-                order_responses.append(self._build_order_response(order, items))
+            order_responses = self._build_order_responses(orders)
             
             return OrderListResponse(
                 orders=order_responses,
                 total_count=total_count,
                 page=skip // limit + 1,
                 page_size=limit,
-                has_next=(skip + limit) < total_count,
+                has_next=has_next,
                 has_prev=skip > 0
             )
             
+        except ValidationError:
+            raise
         except Exception as e:
             logger.error(f"Error getting orders: {str(e)}")
             raise OrderCreateError(f"Failed to get orders: {str(e)}")
@@ -229,7 +290,7 @@ class OrderService:
     def get_order(self, order_id: UUID, user_id: UUID) -> OrderResponse:
         """Get order by ID"""
         order = self._get_user_order(order_id, user_id)
-        items = self.db.query(OrderItem).filter(OrderItem.order_id == order_id).all()
+        items = self._load_order_items([order_id])[order_id]
         return self._build_order_response(order, items)
 
     def update_order(
@@ -258,7 +319,7 @@ class OrderService:
             self.db.refresh(db_order)
             
             # Get updated items
-            items = self.db.query(OrderItem).filter(OrderItem.order_id == order_id).all()
+            items = self._load_order_items([order_id])[order_id]
             
             logger.info(f"Updated order {order_id} for user {user_id}")
             return self._build_order_response(db_order, items)
@@ -281,7 +342,7 @@ class OrderService:
             db_order.updated_by = user_id
             
             # Soft delete all items
-            items = self.db.query(OrderItem).filter(OrderItem.order_id == order_id).all()
+            items = self._load_order_items([order_id])[order_id]
             for item in items:
                 item.is_deleted = True
                 item.deleted_at = datetime.now(timezone.utc)
@@ -308,6 +369,18 @@ class OrderService:
         try:
             db_order = self._get_user_order(order_id, user_id)
             
+            # Record status history
+            self.db.add(OrderStatusHistory(
+                tenant_id=self.db.tenant_id,
+                user_id=user_id,
+                order_id=order_id,
+                changed_by=user_id,
+                old_status=db_order.status,
+                new_status=status_update.status.value,
+                notes=status_update.notes,
+                trigger_source='user'
+            ))
+            
             # Update status
             db_order.status = status_update.status.value
             db_order.updated_by = user_id
@@ -331,7 +404,7 @@ class OrderService:
             self.db.refresh(db_order)
             
             # Get items
-            items = self.db.query(OrderItem).filter(OrderItem.order_id == order_id).all()
+            items = self._load_order_items([order_id])[order_id]
             
             logger.info(f"Updated order {order_id} status to {status_update.status.value}")
             return self._build_order_response(db_order, items)
@@ -348,112 +421,93 @@ class OrderService:
         bulk_request: OrderBulkOperationRequest,
         user_id: UUID
     ) -> OrderBulkOperationResponse:
-        """Perform bulk operations on orders"""
-        successful = []
-        failed = []
+        """Perform bulk operations on orders with set-based statements"""
+        requested_ids = list(dict.fromkeys(bulk_request.order_ids))
+        
+        # Resolve which requested orders exist and belong to the user
+        owned = dict(self.db.query(Order.id, Order.status).filter(
+            Order.id.in_(requested_ids),
+            Order.user_id == user_id,
+            Order.is_deleted == False
+        ).all())
+        
+        failed = [
+            {"id": order_id, "error": f"Order {order_id} not found"}
+            for order_id in requested_ids if order_id not in owned
+        ]
+        order_ids = [order_id for order_id in requested_ids if order_id in owned]
         
-        for order_id in bulk_request.order_ids:
+        if order_ids:
             try:
                 if bulk_request.operation == 'update_status':
                     status = OrderStatus(bulk_request.parameters.get('status'))
-                    status_update = OrderStatusUpdateRequest(
-                        status=status,
+                    self._bulk_update_status(
+                        owned,
+                        order_ids,
+                        status,
+                        user_id,
                         notes=bulk_request.parameters.get('notes'),
                         notify_customer=bulk_request.parameters.get('notify_customer', False)
                     )
-                    self.update_order_status(order_id, status_update, user_id)
                 elif bulk_request.operation == 'assign':
-                    assigned_to = UUID(bulk_request.parameters.get('assigned_to'))
-                    order_update = OrderUpdate(assigned_to=assigned_to)
-                    self.update_order(order_id, order_update, user_id)
+                    assigned_to = UUID(str(bulk_request.parameters.get('assigned_to')))
+                    self.db.execute(
+                        update(Order)
+                        .where(Order.id.in_(order_ids))
+                        .values(assigned_to=assigned_to, updated_by=user_id)
+                        .execution_options(synchronize_session=False)
+                    )
                 elif bulk_request.operation == 'add_tags':
-                    tags = bulk_request.parameters.get('tags', [])
-                    self._add_tags_to_order(order_id, tags, user_id)
+                    self._add_tags_to_orders(order_ids, bulk_request.parameters.get('tags', []), user_id)
                 elif bulk_request.operation == 'remove_tags':
-                    tags = bulk_request.parameters.get('tags', [])
-                    self._remove_tags_from_order(order_id, tags, user_id)
+                    self._remove_tags_from_orders(order_ids, bulk_request.parameters.get('tags', []), user_id)
                 
-                successful.append(order_id)
+                # Core statements bypass the flush listener that tracks cache tags
+                mark_cache_tags(self.db, f"orders:{user_id}")
+                self.db.commit()
                 
             except Exception as e:
-                failed.append({"id": order_id, "error": str(e)})
-                logger.error(f"Bulk operation {bulk_request.operation} failed for {order_id}: {str(e)}")
-        
-        # Commit all successful operations
-        if successful:
-            self.db.commit()
+                self.db.rollback()
+                logger.error(f"Bulk operation {bulk_request.operation} failed for {len(order_ids)} orders: {str(e)}")
+                failed.extend({"id": order_id, "error": str(e)} for order_id in order_ids)
+                order_ids = []
         
         return OrderBulkOperationResponse(
-            successful=successful,
+            successful=order_ids,
             failed=failed,
-            total_requested=len(bulk_request.order_ids),
-            total_successful=len(successful),
+            total_requested=len(requested_ids),
+            total_successful=len(order_ids),
             total_failed=len(failed)
         )
 
     def get_order_stats(self, user_id: UUID) -> OrderStatsResponse:
         """Get order statistics for user"""
         try:
-            # Base query
-            base_query = self.db.query(Order).filter(
-                Order.user_id == user_id,
-                Order.is_deleted == False
-            )
-            
-            # Total orders and counts by status
-            total_orders = base_query.count()
-            pending_orders = base_query.filter(Order.status == OrderStatus.PENDING.value).count()
-            processing_orders = base_query.filter(Order.status == OrderStatus.PROCESSING.value).count()
-            completed_orders = base_query.filter(Order.status == OrderStatus.COMPLETED.value).count()
+            aggregates = self.get_order_aggregates(user_id)
+            orders_by_status = aggregates['orders_by_status']
             
-            # Revenue calculation
-            revenue_query = base_query.filter(Order.status.in_([
-                OrderStatus.COMPLETED.value,
-                OrderStatus.DELIVERED.value
-            ]))
-            total_revenue = revenue_query.with_entities(func.sum(Order.total_amount)).scalar() or Decimal('0')
+            total_orders = aggregates['total_orders']
+            total_revenue = aggregates['total_revenue']
             
             # Average order value
             avg_order_value = total_revenue / total_orders if total_orders > 0 else Decimal('0')
             
-            # Orders by status
-            status_stats = self.db.query(
-                Order.status,
-                func.count(Order.id).label('count')
-            ).filter(
-                Order.user_id == user_id,
-                Order.is_deleted == False
-            ).group_by(Order.status).all()
-            
-            orders_by_status = {status: count for status, count in status_stats}
-            
-            # Orders by platform
-            platform_stats = self.db.query(
-                Order.platform,
-                func.count(Order.id).label('count')
-            ).filter(
+            # Recent orders
+            recent_orders = self.db.query(Order).filter(
                 Order.user_id == user_id,
                 Order.is_deleted == False
-            ).group_by(Order.platform).all()
-            
-            orders_by_platform = {platform: count for platform, count in platform_stats}
-            
-            # Recent orders
-            recent_orders = base_query.order_by(desc(Order.created_at)).limit(10).all()
-            recent_order_responses = []
-            for order in recent_orders:
-                items = self.db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
-                recent_order_responses.append(self._build_order_response(order, items))
+            ).order_by(desc(Order.created_at)).limit(10).all()
+            recent_order_responses = self._build_order_responses(recent_orders)
             
             return OrderStatsResponse(
                 total_orders=total_orders,
-                pending_orders=pending_orders,
-                processing_orders=processing_orders,
-                completed_orders=completed_orders,
+                pending_orders=orders_by_status.get(OrderStatus.PENDING.value, 0),
+                processing_orders=orders_by_status.get(OrderStatus.PROCESSING.value, 0),
+                completed_orders=orders_by_status.get(OrderStatus.COMPLETED.value, 0),
                 total_revenue=total_revenue,
                 average_order_value=avg_order_value,
                 orders_by_status=orders_by_status,
-                orders_by_platform=orders_by_platform,
+                orders_by_platform=aggregates['orders_by_platform'],
                 recent_orders=recent_order_responses
             )
             
@@ -461,6 +515,43 @@ class OrderService:
             logger.error(f"Error getting order stats: {str(e)}")
             raise OrderCreateError(f"Failed to get order stats: {str(e)}")
 
+    def get_order_aggregates(
+        self,
+        user_id: UUID,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """Compute order counts and revenue buckets in a single aggregate query.
+
+        Groups by (status, platform), which yields a handful of rows, and uses
+        FILTER clauses for the time-windowed figures. Totals and the
+        per-status/per-platform breakdowns are folded from those rows.
+        """
+        now = datetime.now(timezone.utc)
+        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        week_ago = now - timedelta(days=7)
+        
+        query = self.db.query(
+            Order.status,
+            Order.platform,
+            func.count(Order.id).label('orders'),
+            func.coalesce(func.sum(Order.total_amount), 0).label('amount'),
+            func.coalesce(
+                func.sum(Order.total_amount).filter(Order.created_at >= month_start), 0
+            ).label('month_amount'),
+            func.count(Order.id).filter(Order.created_at >= week_ago).label('recent')
+        ).filter(
+            Order.user_id == user_id,
+            Order.is_deleted == False
+        )
+        
+        if start_date:
+            query = query.filter(Order.created_at >= start_date)
+        if end_date:
+            query = query.filter(Order.created_at <= end_date)
+        
+        return fold_order_buckets(query.group_by(Order.status, Order.platform).all())
+
     def add_order_note(
         self,
         order_id: UUID,
@@ -566,6 +657,29 @@ class OrderService:
         
         return order
 
+    def _load_order_items(self, order_ids: List[UUID]) -> Dict[UUID, List[OrderItem]]:
+        """Load items for many orders in a single query, grouped by order_id"""
+        items_by_order: Dict[UUID, List[OrderItem]] = defaultdict(list)
+        if not order_ids:
+            return items_by_order
+        
+        items = self.db.query(OrderItem).filter(
+            OrderItem.order_id.in_(order_ids)
+        ).order_by(OrderItem.order_id, OrderItem.created_at).all()
+        
+        for item in items:
+            items_by_order[item.order_id].append(item)
+        
+        return items_by_order
+
+    def _build_order_responses(self, orders: List[Order]) -> List[OrderResponse]:
+        """Build responses for a page of orders with one batched item fetch"""
+        items_by_order = self._load_order_items([order.id for order in orders])
+        return [
+            self._build_order_response(order, items_by_order.get(order.id, []))
+            for order in orders
+        ]
+
     def _build_order_response(self, order: Order, items: List[OrderItem]) -> OrderResponse:
         """Build order response with computed fields"""
         # Convert items to response models
@@ -600,33 +714,102 @@ class OrderService:
         return OrderResponse.model_validate(response_data)
 
     def _generate_internal_order_number(self) -> str:
-        """Generate internal order number"""
-        # Get current date for prefix
-        date_prefix = datetime.now().strftime("%Y%m%d")
+        """Generate internal order number from the tenant's daily counter"""
+        allocator = get_order_number_allocator(self.db.db.get_bind())
+        return allocator.next_number(self.db.tenant_id)
+
+    def _bulk_update_status(
+        self,
+        current_statuses: Dict[UUID, str],
+        order_ids: List[UUID],
+        status: OrderStatus,
+        user_id: UUID,
+        notes: Optional[str] = None,
+        notify_customer: bool = False
+    ) -> None:
+        """Set status on many orders and record history with multi-row inserts"""
+        self.db.execute(
+            update(Order)
+            .where(Order.id.in_(order_ids))
+            .values(status=status.value, updated_by=user_id)
+            .execution_options(synchronize_session=False)
+        )
         
-        # Get count of orders today for sequence
-        today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        today_count = self.db.query(Order).filter(
-            Order.created_at >= today_start,
-            Order.tenant_id == self.db.tenant_id
-        ).count()
+        self.db.execute(insert(OrderStatusHistory), [
+            {
+                'id': uuid4(),
+                'tenant_id': self.db.tenant_id,
+                'user_id': user_id,
+                'order_id': order_id,
+                'changed_by': user_id,
+                'old_status': current_statuses.get(order_id),
+                'new_status': status.value,
+                'notes': notes,
+                'trigger_source': 'bulk'
+            }
+            for order_id in order_ids
+        ])
         
-        sequence = today_count + 1
-        return f"ORD-{date_prefix}-{sequence:04d}"
+        if notes:
+            self.db.execute(insert(OrderNote), [
+                {
+                    'id': uuid4(),
+                    'tenant_id': self.db.tenant_id,
+                    'user_id': user_id,
+                    'order_id': order_id,
+                    'author_id': user_id,
+                    'title': f"Status changed to {status.value}",
+                    'content': notes,
+                    'note_type': "status_change",
+                    'is_customer_visible': notify_customer,
+                    'created_by': user_id
+                }
+                for order_id in order_ids
+            ])
 
-    def _add_tags_to_order(self, order_id: UUID, tags: List[str], user_id: UUID):
-        """Add tags to order"""
-        order = self._get_user_order(order_id, user_id)
-        # Implementation would depend on how tags are stored
-        # This is a placeholder
-        pass
+    def _add_tags_to_orders(self, order_ids: List[UUID], tags: List[str], user_id: UUID):
+        """Add tags to many orders in one UPDATE, keeping tags unique.
 
-    def _remove_tags_from_order(self, order_id: UUID, tags: List[str], user_id: UUID):
-        """Remove tags from order"""
-        order = self._get_user_order(order_id, user_id)
-        # Implementation would depend on how tags are stored
-        # This is a placeholder
-        pass
+        Existing tags keep their order; new ones are appended in request order.
+        """
+        if not tags:
+            return
+        
+        merged_tags = text(
+            "(SELECT COALESCE(json_agg(tag ORDER BY added, position), '[]'::json) FROM ("
+            "SELECT tag, FALSE AS added, position "
+            "FROM json_array_elements_text(COALESCE(orders.tags, '[]'::json)) WITH ORDINALITY AS existing(tag, position) "
+            "UNION ALL "
+            "SELECT tag, TRUE, MIN(position) FROM unnest(:tags) WITH ORDINALITY AS requested(tag, position) "
+            "WHERE NOT EXISTS (SELECT 1 FROM json_array_elements_text(COALESCE(orders.tags, '[]'::json)) AS present "
+            "WHERE present = requested.tag) "
+            "GROUP BY tag) AS merged)"
+        ).bindparams(bindparam('tags', value=list(tags), type_=ARRAY(String)))
+        
+        self.db.execute(
+            update(Order)
+            .where(Order.id.in_(order_ids))
+            .values(tags=merged_tags, updated_by=user_id)
+            .execution_options(synchronize_session=False)
+        )
+
+    def _remove_tags_from_orders(self, order_ids: List[UUID], tags: List[str], user_id: UUID):
+        """Remove tags from many orders in one UPDATE"""
+        if not tags:
+            return
+        
+        remaining_tags = text(
+            "(SELECT COALESCE(json_agg(tag), '[]'::json) "
+            "FROM json_array_elements_text(COALESCE(orders.tags, '[]'::json)) AS tag "
+            "WHERE tag <> ALL(:tags))"
+        ).bindparams(bindparam('tags', value=list(tags), type_=ARRAY(String)))
+        
+        self.db.execute(
+            update(Order)
+            .where(Order.id.in_(order_ids))
+            .values(tags=remaining_tags, updated_by=user_id)
+            .execution_options(synchronize_session=False)
+        )
     
     # Etsy Integration Methods
     
@@ -639,10 +822,7 @@ class OrderService:
                 Order.is_deleted == False
             ).order_by(desc(Order.created_at)).limit(limit).all()
             
-            order_responses = []
-            for order in orders:
-                items = self.db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
-                order_responses.append(self._build_order_response(order, items))
+            order_responses = self._build_order_responses(orders)
             
             return order_responses
             
@@ -668,7 +848,7 @@ class OrderService:
             order.updated_by = user_id
             self.db.commit()
             
-            items = self.db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
+            items = self._load_order_items([order.id])[order.id]
             return self._build_order_response(order, items)
             
         except Exception as e:
@@ -679,28 +859,19 @@ class OrderService:
     def get_orders_for_etsy_listing(self, user_id: UUID, etsy_listing_id: int) -> List[OrderResponse]:
         """Get orders that contain items from a specific Etsy listing"""
         try:
-            # Find order items with the Etsy listing ID
-            order_items = self.db.query(OrderItem).filter(
+            # Orders containing at least one item with the Etsy listing ID
+            listing_order_ids = self.db.query(OrderItem.order_id).filter(
                 OrderItem.user_id == user_id,
                 OrderItem.etsy_listing_id == etsy_listing_id,
                 OrderItem.is_deleted == False
-            ).all()
-            
-            # Get unique orders
-            order_ids = list(set(item.order_id for item in order_items))
-            
-            if not order_ids:
-                return []
+            ).distinct()
             
             orders = self.db.query(Order).filter(
-                Order.id.in_(order_ids),
+                Order.id.in_(listing_order_ids.scalar_subquery()),
                 Order.is_deleted == False
             ).all()
             
-            order_responses = []
-            for order in orders:
-                items = self.db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
-                order_responses.append(self._build_order_response(order, items))
+            order_responses = self._build_order_responses(orders)
             
             return order_responses
             
@@ -725,7 +896,7 @@ class OrderService:
                 existing_order.updated_at = datetime.now(timezone.utc)
                 self.db.commit()
                 
-                items = self.db.query(OrderItem).filter(OrderItem.order_id == existing_order.id).all()
+                items = self._load_order_items([existing_order.id])[existing_order.id]
                 return self._build_order_response(existing_order, items)
             
             # Create new order from Etsy data
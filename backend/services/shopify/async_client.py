@@ -0,0 +1,363 @@
+import asyncio
+import json
+import os
+import logging
+from typing import Optional, List, Dict, Any, Union, AsyncIterator, Sequence
+from datetime import datetime
+
+import httpx
+
+from .client import BaseShopifyClient, USER_AGENT, SHOPIFY_PAGE_SIZE
+from .models import (
+    ShopifyTokenResponse, ShopifyShop, ShopifyProduct, ShopifyProductCreate,
+    ShopifyProductUpdate, ShopifyOrder, ShopifyCustomer, ShopifyCollection,
+    ShopifyCollectionCreate, ShopifySmartCollection, ShopifyCustomCollection,
+    ShopifyBatchOperation, ShopifyBatchResult, OrderPreview, ShopifyOAuthCallbackRequest
+)
+from services.common.http import get_async_http_client, backoff_delay
+from services.common.rate_budget import RateBudgetExhausted
+from common.exceptions import ShopifyAPIError, ShopifyAuthenticationError, ShopifyRateLimitError
+
+logger = logging.getLogger(__name__)
+
+# Retries for 429s, 5xx responses and network errors before giving up
+SHOPIFY_MAX_RETRIES = int(os.getenv("SHOPIFY_MAX_RETRIES", "3"))
+# Longest Retry-After we are willing to wait inside a request
+SHOPIFY_MAX_RETRY_AFTER = float(os.getenv("SHOPIFY_MAX_RETRY_AFTER", "30"))
+# Product requests of one batch operation in flight at once; the shop's bucket still paces them
+SHOPIFY_BATCH_CONCURRENCY = int(os.getenv("SHOPIFY_BATCH_CONCURRENCY", "4"))
+
+class AsyncShopifyAPIClient(BaseShopifyClient):
+    """Non-blocking Shopify API client with the same method surface as ShopifyAPIClient.
+
+    Calls are paced by the shop's shared call budget rather than a fixed
+    interval, so requests burst up to the bucket size and only wait once
+    Shopify reports it full.
+    """
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        return get_async_http_client("shopify", headers={
+            'User-Agent': USER_AGENT,
+            'Accept': 'application/json',
+            'Content-Type': 'application/json'
+        })
+
+    async def _make_request(
+        self,
+        method: str,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+        data: Optional[Dict[str, Any]] = None
+    ) -> httpx.Response:
+        """Make a request to the Shopify API, retrying transient failures with backoff"""
+        if not self.access_token:
+            raise ShopifyAuthenticationError("Access token not set")
+
+        url = f"{self._get_base_url()}{endpoint}"
+        bucket = self.bucket
+        content = json.dumps(data) if data is not None else None
+
+        for attempt in range(SHOPIFY_MAX_RETRIES + 1):
+            try:
+                await bucket.acquire(priority=self.priority)
+            except RateBudgetExhausted as e:
+                raise ShopifyRateLimitError(str(e))
+            final_attempt = attempt == SHOPIFY_MAX_RETRIES
+
+            try:
+                logger.debug(f"Making {method} request to {url}")
+                response = await self.http.request(
+                    method,
+                    url,
+                    params=params,
+                    content=content,
+                    headers={'X-Shopify-Access-Token': self.access_token}
+                )
+            except httpx.TimeoutException:
+                if final_attempt:
+                    raise ShopifyAPIError("Request timeout")
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+            except httpx.HTTPError as e:
+                if final_attempt:
+                    raise ShopifyAPIError(f"Request failed: {str(e)}")
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+
+            await asyncio.to_thread(self._observe_call_limit, response.headers)
+
+            if response.status_code == 429:
+                retry_after = float(response.headers.get('Retry-After', 1))
+                await asyncio.to_thread(bucket.throttled, retry_after)
+                if not final_attempt and retry_after <= SHOPIFY_MAX_RETRY_AFTER:
+                    # The bucket now holds further calls until Shopify has drained
+                    continue
+
+            if response.status_code >= 500 and not final_attempt:
+                logger.warning(f"Shopify server error {response.status_code} on {endpoint}, retrying")
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+
+            self._check_response(response)
+            return response
+
+        raise ShopifyRateLimitError("Shopify request retries exhausted")
+
+    async def exchange_code_for_token(self, callback_data: ShopifyOAuthCallbackRequest) -> ShopifyTokenResponse:
+        """Exchange authorization code for access token"""
+        self._verify_callback_hmac(callback_data)
+        token_url, token_data = self._token_request(callback_data)
+
+        try:
+            response = await self.http.post(token_url, json=token_data)
+            response.raise_for_status()
+            token_response = response.json()
+        except httpx.HTTPError as e:
+            raise ShopifyAuthenticationError(f"Token exchange failed: {str(e)}")
+
+        return ShopifyTokenResponse(
+            access_token=token_response['access_token'],
+            scope=token_response['scope'],
+            shop_domain=callback_data.shop
+        )
+
+    # Shop Methods
+
+    async def get_shop_info(self) -> ShopifyShop:
+        """Get shop information"""
+        response = await self._make_request('GET', '/shop.json')
+        data = self._get_json_response(response)
+        return ShopifyShop(**data['shop'])
+
+    # Product Methods
+
+    async def get_products(
+        self,
+        limit: int = 50,
+        page_info: Optional[str] = None,
+        status: Optional[str] = None,
+        product_type: Optional[str] = None,
+        vendor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Get products with pagination"""
+        params = self._product_params(limit, page_info, status, product_type, vendor)
+        response = await self._make_request('GET', '/products.json', params=params)
+        return self._products_page(response)
+
+    async def get_product(self, product_id: int) -> ShopifyProduct:
+        """Get a specific product"""
+        response = await self._make_request('GET', f'/products/{product_id}.json')
+        data = self._get_json_response(response)
+        return ShopifyProduct(**data['product'])
+
+    async def create_product(self, product_data: ShopifyProductCreate) -> ShopifyProduct:
+        """Create a new product"""
+        data = {'product': product_data.model_dump(exclude_none=True)}
+        response = await self._make_request('POST', '/products.json', data=data)
+        result = self._get_json_response(response)
+        return ShopifyProduct(**result['product'])
+
+    async def update_product(self, product_id: int, product_data: ShopifyProductUpdate) -> ShopifyProduct:
+        """Update an existing product"""
+        data = {'product': product_data.model_dump(exclude_none=True)}
+        response = await self._make_request('PUT', f'/products/{product_id}.json', data=data)
+        result = self._get_json_response(response)
+        return ShopifyProduct(**result['product'])
+
+    async def delete_product(self, product_id: int) -> bool:
+        """Delete a product"""
+        response = await self._make_request('DELETE', f'/products/{product_id}.json')
+        return response.status_code == 200
+
+    # Batch Operations
+
+    async def _apply_batch_operation(self, batch_operation: ShopifyBatchOperation, product_id: int) -> None:
+        if batch_operation.operation == 'update':
+            await self.update_product(product_id, ShopifyProductUpdate(**batch_operation.data))
+        elif batch_operation.operation == 'delete':
+            await self.delete_product(product_id)
+        elif batch_operation.operation == 'publish':
+            await self.update_product(product_id, ShopifyProductUpdate(status='active'))
+        elif batch_operation.operation == 'unpublish':
+            await self.update_product(product_id, ShopifyProductUpdate(status='draft'))
+
+    async def batch_update_products(self, batch_operation: ShopifyBatchOperation,
+                                    concurrency: int = SHOPIFY_BATCH_CONCURRENCY) -> ShopifyBatchResult:
+        """Perform batch operations on products with at most concurrency requests in flight, paced by the shop's bucket"""
+        result = ShopifyBatchResult(total_requested=len(batch_operation.product_ids))
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def apply(product_id: int) -> None:
+            async with semaphore:
+                await self._apply_batch_operation(batch_operation, product_id)
+
+        outcomes = await asyncio.gather(
+            *(apply(product_id) for product_id in batch_operation.product_ids),
+            return_exceptions=True
+        )
+
+        for product_id, outcome in zip(batch_operation.product_ids, outcomes):
+            if isinstance(outcome, Exception):
+                result.failed.append({
+                    'product_id': product_id,
+                    'error': str(outcome)
+                })
+                result.total_failed += 1
+                logger.error(f"Batch operation failed for product {product_id}: {str(outcome)}")
+            else:
+                result.successful.append(product_id)
+                result.total_successful += 1
+
+        return result
+
+    # Order Methods
+
+    async def get_orders(
+        self,
+        limit: int = 50,
+        page_info: Optional[str] = None,
+        status: Optional[str] = None,
+        financial_status: Optional[str] = None,
+        fulfillment_status: Optional[str] = None,
+        created_at_min: Optional[datetime] = None,
+        created_at_max: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """Get orders with pagination and filtering"""
+        params = self._order_params(limit, page_info, status, financial_status, fulfillment_status,
+                                    created_at_min, created_at_max)
+        response = await self._make_request('GET', '/orders.json', params=params)
+        return self._orders_page(response)
+
+    async def get_order(self, order_id: int) -> ShopifyOrder:
+        """Get a specific order"""
+        response = await self._make_request('GET', f'/orders/{order_id}.json')
+        data = self._get_json_response(response)
+        return ShopifyOrder(**data['order'])
+
+    async def get_order_preview(self, order_id: int) -> OrderPreview:
+        """Get order preview with upload links and custom design data"""
+        return self._build_order_preview(await self.get_order(order_id))
+
+    # Collection Methods
+
+    async def _get_collection_list(self, resource: str, model) -> list:
+        response = await self._make_request('GET', f'/{resource}.json')
+        data = self._get_json_response(response)
+        return [model(**col) for col in data[resource]]
+
+    async def get_collections(self, collection_type: str = 'all') -> List[Union[ShopifyCollection, ShopifySmartCollection, ShopifyCustomCollection]]:
+        """Get collections (smart and custom)"""
+        fetches = []
+        if collection_type in ['all', 'smart']:
+            fetches.append(self._get_collection_list('smart_collections', ShopifySmartCollection))
+        if collection_type in ['all', 'custom']:
+            fetches.append(self._get_collection_list('custom_collections', ShopifyCustomCollection))
+
+        collections = []
+        for batch in await asyncio.gather(*fetches):
+            collections.extend(batch)
+        return collections
+
+    async def create_collection(self, collection_data: ShopifyCollectionCreate) -> Union[ShopifySmartCollection, ShopifyCustomCollection]:
+        """Create a new collection"""
+        resource, data = self._collection_payload(collection_data)
+        response = await self._make_request('POST', f'/{resource}s.json', data=data)
+        result = self._get_json_response(response)
+        if resource == 'smart_collection':
+            return ShopifySmartCollection(**result[resource])
+        return ShopifyCustomCollection(**result[resource])
+
+    # Customer Methods
+
+    async def get_customers(self, limit: int = 50, page_info: Optional[str] = None) -> Dict[str, Any]:
+        """Get customers with pagination"""
+        params = {'limit': min(limit, 250)}
+        if page_info:
+            params['page_info'] = page_info
+
+        response = await self._make_request('GET', '/customers.json', params=params)
+        return self._customers_page(response)
+
+    async def get_customer(self, customer_id: int) -> ShopifyCustomer:
+        """Get a specific customer"""
+        response = await self._make_request('GET', f'/customers/{customer_id}.json')
+        data = self._get_json_response(response)
+        return ShopifyCustomer(**data['customer'])
+
+    # Full-Catalog Iterators
+
+    async def _iter_collection(self, endpoint: str, key: str, params: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Yield every record of a cursor-paginated collection, following rel="next" links.
+
+        The next page is requested as soon as its cursor arrives, so fetching
+        overlaps with the caller processing the current page.
+        """
+        pending = asyncio.ensure_future(self._make_request('GET', endpoint, params=params))
+        try:
+            while pending is not None:
+                response = await pending
+                pending = None
+
+                page_info = self._page_info(response, 'next')
+                if page_info:
+                    params = self._next_page_params(params, page_info)
+                    pending = asyncio.ensure_future(self._make_request('GET', endpoint, params=params))
+
+                for record in self._get_json_response(response)[key]:
+                    yield record
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    async def iter_products(
+        self,
+        fields: Optional[Sequence[str]] = None,
+        status: Optional[str] = None,
+        product_type: Optional[str] = None,
+        vendor: Optional[str] = None,
+        page_size: int = SHOPIFY_PAGE_SIZE
+    ) -> AsyncIterator[Union[ShopifyProduct, Dict[str, Any]]]:
+        """Stream every product in the store (raw dicts when fields is given)"""
+        params = self._collection_params(
+            self._product_params(page_size, None, status, product_type, vendor), fields, page_size
+        )
+        async for product in self._iter_collection('/products.json', 'products', params):
+            yield product if fields else ShopifyProduct(**product)
+
+    async def iter_orders(
+        self,
+        fields: Optional[Sequence[str]] = None,
+        status: Optional[str] = None,
+        financial_status: Optional[str] = None,
+        fulfillment_status: Optional[str] = None,
+        created_at_min: Optional[datetime] = None,
+        created_at_max: Optional[datetime] = None,
+        page_size: int = SHOPIFY_PAGE_SIZE
+    ) -> AsyncIterator[Union[ShopifyOrder, Dict[str, Any]]]:
+        """Stream every order matching the filters (raw dicts when fields is given)"""
+        params = self._collection_params(
+            self._order_params(page_size, None, status, financial_status, fulfillment_status,
+                               created_at_min, created_at_max),
+            fields, page_size
+        )
+        async for order in self._iter_collection('/orders.json', 'orders', params):
+            yield order if fields else ShopifyOrder(**order)
+
+    async def iter_customers(self, fields: Optional[Sequence[str]] = None,
+                             page_size: int = SHOPIFY_PAGE_SIZE) -> AsyncIterator[Union[ShopifyCustomer, Dict[str, Any]]]:
+        """Stream every customer in the store (raw dicts when fields is given)"""
+        params = self._collection_params({}, fields, page_size)
+        async for customer in self._iter_collection('/customers.json', 'customers', params):
+            yield customer if fields else ShopifyCustomer(**customer)
+
+    # Utility Methods
+
+    async def test_connection(self) -> bool:
+        """Test the API connection"""
+        try:
+            await self.get_shop_info()
+            return True
+        except Exception as e:
+            logger.error(f"Connection test failed: {str(e)}")
+            return False
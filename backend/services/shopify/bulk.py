@@ -0,0 +1,96 @@
+# services/shopify/bulk.py
+"""
+GraphQL Bulk Operation queries and JSONL result handling.
+
+A bulk result file has one JSON object per line. Nested connections are
+flattened: each child line carries the parent's ID in __parentId and follows
+its parent, so an object and its children can be regrouped while holding
+only that one object in memory.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+PRODUCTS_BULK_QUERY = """
+{
+  products%s {
+    edges {
+      node {
+        id
+        title
+        handle
+        status
+        productType
+        vendor
+        tags
+        createdAt
+        updatedAt
+        variants {
+          edges {
+            node { id title sku price inventoryQuantity }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+ORDERS_BULK_QUERY = """
+{
+  orders%s {
+    edges {
+      node {
+        id
+        name
+        email
+        createdAt
+        updatedAt
+        cancelledAt
+        displayFinancialStatus
+        displayFulfillmentStatus
+        totalPriceSet { shopMoney { amount currencyCode } }
+        lineItems {
+          edges {
+            node { id title sku quantity variant { id } product { id } }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+def _search_filter(created_at_min: Optional[datetime], created_at_max: Optional[datetime]) -> str:
+    terms = []
+    if created_at_min:
+        terms.append(f"created_at:>='{created_at_min.isoformat()}'")
+    if created_at_max:
+        terms.append(f"created_at:<='{created_at_max.isoformat()}'")
+    if not terms:
+        return ""
+    return f'(query: "{" AND ".join(terms)}")'
+
+def products_query(created_at_min: Optional[datetime] = None, created_at_max: Optional[datetime] = None) -> str:
+    return PRODUCTS_BULK_QUERY % _search_filter(created_at_min, created_at_max)
+
+def orders_query(created_at_min: Optional[datetime] = None, created_at_max: Optional[datetime] = None) -> str:
+    return ORDERS_BULK_QUERY % _search_filter(created_at_min, created_at_max)
+
+def legacy_id(gid: str) -> str:
+    """REST ID of a GraphQL global ID (gid://shopify/Product/123 -> "123")"""
+    return gid.rsplit('/', 1)[-1]
+
+def group_bulk_records(records: Iterable[Dict[str, Any]]) -> Iterator[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+    """Yield (object, children) from flattened bulk lines, one object in memory at a time"""
+    parent: Optional[Dict[str, Any]] = None
+    children: List[Dict[str, Any]] = []
+    for record in records:
+        if '__parentId' not in record:
+            if parent is not None:
+                yield parent, children
+            parent, children = record, []
+        elif parent is not None and record['__parentId'] == parent['id']:
+            children.append(record)
+    if parent is not None:
+        yield parent, children
@@ -1,13 +1,15 @@
 import asyncio
+import base64
 import hashlib
 import hmac
 import json
+import os
 import time
 import uuid
-from typing import Optional, List, Dict, Any, Union
+from typing import Optional, List, Dict, Any, Union, Tuple, Iterator, Sequence
 from datetime import datetime, timezone
 import requests
-from urllib.parse import urlencode, urlparse
+from urllib.parse import urlencode, urlparse, parse_qs
 import logging
 
 from .models import (
@@ -18,40 +20,60 @@ from .models import (
     OrderPreview, OrderPreviewItem, ShopifyOAuthInitResponse,
     ShopifyOAuthCallbackRequest, ShopifyApiResponse
 )
+from services.common.rate_budget import Priority, RateBudget, RateBudgetExhausted, get_rate_budget
 from common.exceptions import ShopifyAPIError, ShopifyAuthenticationError, ShopifyRateLimitError
 
 logger = logging.getLogger(__name__)
 
-class ShopifyAPIClient:
-    """
-    Shopify API client with OAuth 2.0 support, rate limiting, and comprehensive error handling
-    """
+USER_AGENT = 'PrinterSaaS-ShopifyClient/1.0'
+CALL_LIMIT_HEADER = 'X-Shopify-Shop-Api-Call-Limit'
+DEFAULT_BUCKET_SIZE = 40
+# Shopify drains the REST bucket completely in 20 seconds (2 calls/s at size 40)
+BUCKET_DRAIN_SECONDS = 20.0
+# Largest page Shopify returns for cursor-paginated REST collections
+SHOPIFY_PAGE_SIZE = 250
+# GraphQL Admin API: cost points per shop, restored per second (standard plans)
+GRAPHQL_BUCKET_SIZE = 1000
+GRAPHQL_RESTORE_RATE = 50.0
+# Points reserved before a small query/mutation; the actual cost is reconciled from the response
+GRAPHQL_REQUEST_COST = 10
+BULK_POLL_SECONDS = float(os.getenv("SHOPIFY_BULK_POLL_SECONDS", "5"))
+BULK_TIMEOUT_SECONDS = float(os.getenv("SHOPIFY_BULK_TIMEOUT_SECONDS", "3600"))
+
+BULK_RUN_QUERY_MUTATION = """
+mutation bulkOperationRunQuery($query: String!) {
+  bulkOperationRunQuery(query: $query) {
+    bulkOperation { id status }
+    userErrors { field message }
+  }
+}
+"""
+
+BULK_OPERATION_QUERY = """
+query bulkOperation($id: ID!) {
+  node(id: $id) {
+    ... on BulkOperation { id status errorCode objectCount url }
+  }
+}
+"""
+
+class BaseShopifyClient:
+    """Credentials, OAuth helpers and response handling shared by the blocking and async clients"""
     
     def __init__(self, user_id: Optional[str] = None, tenant_id: Optional[str] = None):
         self.config = ShopifyAPIConfig()
-        self.session = requests.Session()
         self.user_id = user_id
         self.tenant_id = tenant_id
         self.access_token = None
         self.shop_domain = None
         
-        # Rate limiting
-        self.rate_limit_remaining = 40  # Shopify default bucket size
-        self.rate_limit_reset_time = time.time() + 1  # Reset every second
-        self.last_request_time = 0
+        # Background syncs yield the shop's call limit to interactive requests
+        self.priority = Priority.INTERACTIVE
         
         # API versioning
         self.api_version = "2023-10"
         
-        # Session configuration
-        self.session.headers.update({
-            'User-Agent': 'PrinterSaaS-ShopifyClient/1.0',
-            'Accept': 'application/json',
-            'Content-Type': 'application/json'
-        })
-        
         # Client credentials (should be loaded from environment)
-        import os
         self.client_id = os.getenv('SHOPIFY_CLIENT_ID')
         self.client_secret = os.getenv('SHOPIFY_CLIENT_SECRET')
         
@@ -62,10 +84,55 @@ class ShopifyAPIClient:
         """Set the access token and shop domain for API calls"""
         self.access_token = access_token
         self.shop_domain = shop_domain.replace('.myshopify.com', '')
-        
-        self.session.headers.update({
-            'X-Shopify-Access-Token': access_token
-        })
+    
+    @property
+    def bucket(self) -> RateBudget:
+        """Call-limit budget shared by every client and process for this shop"""
+        if not self.shop_domain:
+            raise ShopifyAuthenticationError("Shop domain not set")
+        return get_rate_budget('shopify', self.shop_domain, DEFAULT_BUCKET_SIZE,
+                               DEFAULT_BUCKET_SIZE / BUCKET_DRAIN_SECONDS)
+    
+    def _observe_call_limit(self, headers) -> None:
+        """Sync the shop's budget with the "used/size" Shopify reports"""
+        limit_info = headers.get(CALL_LIMIT_HEADER)
+        if not limit_info:
+            return
+        try:
+            used, size = map(int, limit_info.split('/'))
+        except (ValueError, TypeError):
+            logger.warning(f"Could not parse rate limit header: {limit_info}")
+            return
+        self.bucket.observe(size - used, capacity=size, refill_rate=size / BUCKET_DRAIN_SECONDS)
+    
+    @property
+    def graphql_bucket(self) -> RateBudget:
+        """GraphQL cost-point budget for this shop (separate from the REST call limit)"""
+        if not self.shop_domain:
+            raise ShopifyAuthenticationError("Shop domain not set")
+        return get_rate_budget('shopify-graphql', self.shop_domain, GRAPHQL_BUCKET_SIZE, GRAPHQL_RESTORE_RATE)
+    
+    def _observe_graphql_cost(self, payload: Dict[str, Any]) -> None:
+        """Sync the GraphQL budget with extensions.cost.throttleStatus"""
+        throttle = payload.get('extensions', {}).get('cost', {}).get('throttleStatus')
+        if not throttle:
+            return
+        self.graphql_bucket.observe(
+            throttle['currentlyAvailable'],
+            capacity=throttle['maximumAvailable'],
+            refill_rate=throttle['restoreRate']
+        )
+    
+    def _graphql_data(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the data of a GraphQL response, raising on top-level errors"""
+        self._observe_graphql_cost(payload)
+        errors = payload.get('errors')
+        if errors:
+            if any(error.get('extensions', {}).get('code') == 'THROTTLED' for error in errors):
+                self.graphql_bucket.throttled(GRAPHQL_REQUEST_COST / GRAPHQL_RESTORE_RATE)
+                raise ShopifyRateLimitError("GraphQL cost limit exceeded")
+            raise ShopifyAPIError(f"Shopify GraphQL error: {errors}")
+        return payload.get('data') or {}
     
     def _get_base_url(self) -> str:
         """Get the base URL for API calls"""
@@ -73,112 +140,218 @@ class ShopifyAPIClient:
             raise ShopifyAuthenticationError("Shop domain not set")
         return f"https://{self.shop_domain}.myshopify.com/admin/api/{self.api_version}"
     
-    def _wait_for_rate_limit(self):
-        """Implement rate limiting to respect Shopify's API limits"""
-        current_time = time.time()
-        
-        # Check if bucket needs to be reset
-        if current_time >= self.rate_limit_reset_time:
-            self.rate_limit_remaining = 40  # Reset bucket
-            self.rate_limit_reset_time = current_time + 1
-        
-        # If no calls remaining, wait until reset
-        if self.rate_limit_remaining <= 0:
-            sleep_time = self.rate_limit_reset_time - current_time
-            if sleep_time > 0:
-                logger.info(f"Rate limit reached, sleeping for {sleep_time:.2f} seconds")
-                time.sleep(sleep_time)
-                self.rate_limit_remaining = 40
-                self.rate_limit_reset_time = time.time() + 1
-        
-        # Minimum time between requests
-        time_since_last = current_time - self.last_request_time
-        if time_since_last < 0.5:  # Minimum 500ms between requests
-            time.sleep(0.5 - time_since_last)
-        
-        self.last_request_time = time.time()
-        self.rate_limit_remaining -= 1
-    
-    def _update_rate_limit_from_headers(self, headers: Dict[str, str]):
-        """Update rate limit info from response headers"""
-        if 'X-Shopify-Shop-Api-Call-Limit' in headers:
-            limit_info = headers['X-Shopify-Shop-Api-Call-Limit']
+    def _check_response(self, response) -> None:
+        """Raise the matching Shopify error for a failed response (requests or httpx)"""
+        if response.status_code == 401:
+            raise ShopifyAuthenticationError("Invalid or expired access token")
+        elif response.status_code == 403:
+            raise ShopifyAuthenticationError("Insufficient permissions")
+        elif response.status_code == 429:
+            retry_after = float(response.headers.get('Retry-After', 1))
+            raise ShopifyRateLimitError(f"Rate limit exceeded, retry after {retry_after} seconds")
+        elif response.status_code >= 400:
+            error_detail = "Unknown error"
             try:
-                current, maximum = map(int, limit_info.split('/'))
-                self.rate_limit_remaining = maximum - current
-            except (ValueError, TypeError):
-                logger.warning(f"Could not parse rate limit header: {limit_info}")
+                error_data = response.json()
+                error_detail = error_data.get('errors', error_data.get('error', str(error_data)))
+            except Exception:
+                error_detail = response.text or f"HTTP {response.status_code}"
+            
+            raise ShopifyAPIError(
+                detail=f"Shopify API error: {error_detail}",
+                status_code=response.status_code
+            )
     
-    def _make_request(
-        self,
-        method: str,
-        endpoint: str,
-        params: Optional[Dict[str, Any]] = None,
-        data: Optional[Dict[str, Any]] = None,
-        **kwargs
-    ) -> requests.Response:
-        """Make a request to the Shopify API with error handling and rate limiting"""
+    def _get_json_response(self, response) -> Dict[str, Any]:
+        """Extract JSON data from response"""
+        try:
+            return response.json()
+        except ValueError:
+            raise ShopifyAPIError("Invalid JSON response from Shopify API")
+    
+    @staticmethod
+    def _page_info(response, rel: str) -> Optional[str]:
+        """page_info cursor of the rel ("next"/"previous") link, or None on the last page"""
+        url = response.links.get(rel, {}).get('url')
+        if not url:
+            return None
+        values = parse_qs(urlparse(url).query).get('page_info')
+        return values[0] if values else None
+    
+    @staticmethod
+    def _next_page_params(params: Dict[str, Any], page_info: str) -> Dict[str, Any]:
+        """Shopify rejects filters alongside page_info; only limit and fields carry over"""
+        return {
+            key: value for key, value in params.items() if key in ('limit', 'fields')
+        } | {'page_info': page_info}
+    
+    @staticmethod
+    def _collection_params(params: Dict[str, Any], fields: Optional[Sequence[str]],
+                           page_size: int) -> Dict[str, Any]:
+        params = {key: value for key, value in params.items() if key not in ('page_info', 'limit')}
+        params['limit'] = min(page_size, SHOPIFY_PAGE_SIZE)
+        if fields:
+            params['fields'] = ','.join(fields)
+        return params
+    
+    @staticmethod
+    def _product_params(limit: int, page_info: Optional[str], status: Optional[str],
+                        product_type: Optional[str], vendor: Optional[str]) -> Dict[str, Any]:
+        params = {'limit': min(limit, 250)}  # Shopify max is 250
         
-        if not self.access_token:
-            raise ShopifyAuthenticationError("Access token not set")
+        if page_info:
+            params['page_info'] = page_info
+        if status:
+            params['status'] = status
+        if product_type:
+            params['product_type'] = product_type
+        if vendor:
+            params['vendor'] = vendor
+        return params
+    
+    @staticmethod
+    def _order_params(limit: int, page_info: Optional[str], status: Optional[str],
+                      financial_status: Optional[str], fulfillment_status: Optional[str],
+                      created_at_min: Optional[datetime], created_at_max: Optional[datetime]) -> Dict[str, Any]:
+        params = {'limit': min(limit, 250)}
         
-        self._wait_for_rate_limit()
+        if page_info:
+            params['page_info'] = page_info
+        if status:
+            params['status'] = status
+        if financial_status:
+            params['financial_status'] = financial_status
+        if fulfillment_status:
+            params['fulfillment_status'] = fulfillment_status
+        if created_at_min:
+            params['created_at_min'] = created_at_min.isoformat()
+        if created_at_max:
+            params['created_at_max'] = created_at_max.isoformat()
+        return params
+    
+    def _products_page(self, response) -> Dict[str, Any]:
+        data = self._get_json_response(response)
+        next_page_info = self._page_info(response, 'next')
+        prev_page_info = self._page_info(response, 'previous')
         
-        url = f"{self._get_base_url()}{endpoint}"
+        return {
+            'products': [ShopifyProduct(**product) for product in data['products']],
+            'has_next': next_page_info is not None,
+            'has_prev': prev_page_info is not None,
+            'next_page_info': next_page_info,
+            'prev_page_info': prev_page_info
+        }
+    
+    def _orders_page(self, response) -> Dict[str, Any]:
+        data = self._get_json_response(response)
+        next_page_info = self._page_info(response, 'next')
         
-        try:
-            # Prepare request data
-            request_kwargs = {
-                'params': params,
-                'timeout': kwargs.get('timeout', 30),
-                **kwargs
+        return {
+            'orders': [ShopifyOrder(**order) for order in data['orders']],
+            'has_next': next_page_info is not None,
+            'next_page_info': next_page_info
+        }
+    
+    def _customers_page(self, response) -> Dict[str, Any]:
+        data = self._get_json_response(response)
+        next_page_info = self._page_info(response, 'next')
+        
+        return {
+            'customers': [ShopifyCustomer(**customer) for customer in data['customers']],
+            'has_next': next_page_info is not None,
+            'next_page_info': next_page_info
+        }
+    
+    @staticmethod
+    def _collection_payload(collection_data: ShopifyCollectionCreate) -> Tuple[str, Dict[str, Any]]:
+        """Return (resource, request body) for a smart or custom collection"""
+        if collection_data.rules:
+            return 'smart_collection', {
+                'smart_collection': {
+                    **collection_data.model_dump(exclude_none=True, exclude={'rules', 'disjunctive'}),
+                    'rules': [rule.model_dump() for rule in collection_data.rules],
+                    'disjunctive': collection_data.disjunctive
+                }
             }
+        return 'custom_collection', {
+            'custom_collection': collection_data.model_dump(exclude_none=True, exclude={'rules', 'disjunctive'})
+        }
+    
+    @staticmethod
+    def _build_order_preview(order: ShopifyOrder) -> OrderPreview:
+        """Order preview with upload links and custom design data from line item properties"""
+        preview_items = []
+        has_uploads = False
+        total_items_with_uploads = 0
+        
+        for line_item in order.line_items:
+            upload_url = None
+            preview_image_url = None
+            custom_design_data = None
             
-            if data is not None:
-                request_kwargs['data'] = json.dumps(data)
-            
-            logger.debug(f"Making {method} request to {url}")
-            response = self.session.request(method, url, **request_kwargs)
-            
-            # Update rate limit info
-            self._update_rate_limit_from_headers(response.headers)
-            
-            # Handle common HTTP errors
-            if response.status_code == 401:
-                raise ShopifyAuthenticationError("Invalid or expired access token")
-            elif response.status_code == 403:
-                raise ShopifyAuthenticationError("Insufficient permissions")
-            elif response.status_code == 429:
-                retry_after = int(response.headers.get('Retry-After', 1))
-                raise ShopifyRateLimitError(f"Rate limit exceeded, retry after {retry_after} seconds")
-            elif response.status_code >= 400:
-                error_detail = "Unknown error"
-                try:
-                    error_data = response.json()
-                    error_detail = error_data.get('errors', error_data.get('error', str(error_data)))
-                except:
-                    error_detail = response.text or f"HTTP {response.status_code}"
-                
-                raise ShopifyAPIError(
-                    detail=f"Shopify API error: {error_detail}",
-                    status_code=response.status_code
-                )
-            
-            return response
+            # Check line item properties for upload links and custom data
+            for prop in line_item.properties:
+                if prop.get('name') == 'upload_url':
+                    upload_url = prop.get('value')
+                    has_uploads = True
+                    total_items_with_uploads += 1
+                elif prop.get('name') == 'preview_image':
+                    preview_image_url = prop.get('value')
+                elif prop.get('name') == 'custom_design':
+                    try:
+                        custom_design_data = json.loads(prop.get('value', '{}'))
+                    except:
+                        pass
             
-        except requests.exceptions.Timeout:
-            raise ShopifyAPIError("Request timeout")
-        except requests.exceptions.ConnectionError:
-            raise ShopifyAPIError("Connection error")
-        except requests.exceptions.RequestException as e:
-            raise ShopifyAPIError(f"Request failed: {str(e)}")
+            preview_items.append(OrderPreviewItem(
+                line_item_id=line_item.id,
+                product_title=line_item.title,
+                variant_title=line_item.variant_title,
+                quantity=line_item.quantity,
+                upload_url=upload_url,
+                preview_image_url=preview_image_url,
+                custom_design_data=custom_design_data,
+                mockup_urls=[],  # Could be populated from custom design data
+                processing_status='pending' if upload_url else 'completed'
+            ))
+        
+        return OrderPreview(
+            order_id=order.id,
+            order_name=order.name,
+            customer_email=order.email,
+            created_at=order.created_at,
+            items=preview_items,
+            has_uploads=has_uploads,
+            preview_ready=all(item.processing_status == 'completed' for item in preview_items),
+            total_items_with_uploads=total_items_with_uploads
+        )
     
-    def _get_json_response(self, response: requests.Response) -> Dict[str, Any]:
-        """Extract JSON data from response"""
-        try:
-            return response.json()
-        except ValueError:
-            raise ShopifyAPIError("Invalid JSON response from Shopify API")
+    def _verify_callback_hmac(self, callback_data: ShopifyOAuthCallbackRequest) -> None:
+        if not callback_data.hmac:
+            return
+        params_to_verify = {
+            'code': callback_data.code,
+            'shop': callback_data.shop,
+            'state': callback_data.state
+        }
+        query_string = urlencode(sorted(params_to_verify.items()))
+        
+        calculated_hmac = hmac.new(
+            self.client_secret.encode('utf-8'),
+            query_string.encode('utf-8'),
+            hashlib.sha256
+        ).hexdigest()
+        
+        if not hmac.compare_digest(calculated_hmac, callback_data.hmac):
+            raise ShopifyAuthenticationError("Invalid HMAC signature")
+    
+    def _token_request(self, callback_data: ShopifyOAuthCallbackRequest) -> Tuple[str, Dict[str, str]]:
+        token_url = f"https://{callback_data.shop}.myshopify.com/admin/oauth/access_token"
+        return token_url, {
+            'client_id': self.client_id,
+            'client_secret': self.client_secret,
+            'code': callback_data.code
+        }
     
     # OAuth Methods
     
@@ -206,47 +379,109 @@ class ShopifyAPIClient:
         )
     
     def verify_webhook_hmac(self, data: bytes, hmac_header: str) -> bool:
-        """Verify HMAC signature for webhooks"""
-        if not self.client_secret:
+        """Verify HMAC signature for webhooks (X-Shopify-Hmac-Sha256 is base64, unlike OAuth's hex)"""
+        if not self.client_secret or not hmac_header:
             return False
         
-        calculated_hmac = hmac.new(
+        calculated_hmac = base64.b64encode(hmac.new(
             self.client_secret.encode('utf-8'),
             data,
             hashlib.sha256
-        ).hexdigest()
+        ).digest()).decode('ascii')
         
         return hmac.compare_digest(calculated_hmac, hmac_header)
     
-    def exchange_code_for_token(self, callback_data: ShopifyOAuthCallbackRequest) -> ShopifyTokenResponse:
-        """Exchange authorization code for access token"""
+    def get_api_usage(self) -> Dict[str, Any]:
+        """Get API usage information"""
+        bucket = self.bucket if self.shop_domain else None
+        return {
+            'rate_limit_remaining': bucket.remaining() if bucket else None,
+            'rate_limit_bucket_size': bucket.capacity if bucket else None,
+            'user_id': self.user_id,
+            'shop_domain': self.shop_domain
+        }
+
+class ShopifyAPIClient(BaseShopifyClient):
+    """
+    Shopify API client with OAuth 2.0 support, rate limiting, and comprehensive error handling
+    """
+    
+    def __init__(self, user_id: Optional[str] = None, tenant_id: Optional[str] = None):
+        super().__init__(user_id=user_id, tenant_id=tenant_id)
+        self.session = requests.Session()
         
-        # Verify HMAC if provided
-        if callback_data.hmac:
-            params_to_verify = {
-                'code': callback_data.code,
-                'shop': callback_data.shop,
-                'state': callback_data.state
+        # Session configuration
+        self.session.headers.update({
+            'User-Agent': USER_AGENT,
+            'Accept': 'application/json',
+            'Content-Type': 'application/json'
+        })
+    
+    def set_credentials(self, access_token: str, shop_domain: str):
+        """Set the access token and shop domain for API calls"""
+        super().set_credentials(access_token, shop_domain)
+        
+        self.session.headers.update({
+            'X-Shopify-Access-Token': access_token
+        })
+    
+    def _make_request(
+        self,
+        method: str,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+        data: Optional[Dict[str, Any]] = None,
+        **kwargs
+    ) -> requests.Response:
+        """Make a request to the Shopify API with error handling and rate limiting"""
+        
+        if not self.access_token:
+            raise ShopifyAuthenticationError("Access token not set")
+        
+        try:
+            self.bucket.acquire_blocking(priority=self.priority)
+        except RateBudgetExhausted as e:
+            raise ShopifyRateLimitError(str(e))
+        
+        url = f"{self._get_base_url()}{endpoint}"
+        
+        try:
+            # Prepare request data
+            request_kwargs = {
+                'params': params,
+                'timeout': kwargs.get('timeout', 30),
+                **kwargs
             }
-            query_string = urlencode(sorted(params_to_verify.items()))
             
-            calculated_hmac = hmac.new(
-                self.client_secret.encode('utf-8'),
-                query_string.encode('utf-8'),
-                hashlib.sha256
-            ).hexdigest()
+            if data is not None:
+                request_kwargs['data'] = json.dumps(data)
             
-            if not hmac.compare_digest(calculated_hmac, callback_data.hmac):
-                raise ShopifyAuthenticationError("Invalid HMAC signature")
+            logger.debug(f"Making {method} request to {url}")
+            response = self.session.request(method, url, **request_kwargs)
+            
+            # Update rate limit info
+            self._observe_call_limit(response.headers)
+            if response.status_code == 429:
+                self.bucket.throttled(float(response.headers.get('Retry-After', 1)))
+            
+            self._check_response(response)
+            return response
+            
+        except requests.exceptions.Timeout:
+            raise ShopifyAPIError("Request timeout")
+        except requests.exceptions.ConnectionError:
+            raise ShopifyAPIError("Connection error")
+        except requests.exceptions.RequestException as e:
+            raise ShopifyAPIError(f"Request failed: {str(e)}")
+    
+    def exchange_code_for_token(self, callback_data: ShopifyOAuthCallbackRequest) -> ShopifyTokenResponse:
+        """Exchange authorization code for access token"""
         
-        # Exchange code for token
-        token_url = f"https://{callback_data.shop}.myshopify.com/admin/oauth/access_token"
+        # Verify HMAC if provided
+        self._verify_callback_hmac(callback_data)
         
-        token_data = {
-            'client_id': self.client_id,
-            'client_secret': self.client_secret,
-            'code': callback_data.code
-        }
+        # Exchange code for token
+        token_url, token_data = self._token_request(callback_data)
         
         try:
             response = requests.post(token_url, json=token_data, timeout=30)
@@ -282,46 +517,9 @@ class ShopifyAPIClient:
         vendor: Optional[str] = None
     ) -> Dict[str, Any]:
         """Get products with pagination"""
-        params = {'limit': min(limit, 250)}  # Shopify max is 250
-        
-        if page_info:
-            params['page_info'] = page_info
-        if status:
-            params['status'] = status
-        if product_type:
-            params['product_type'] = product_type
-        if vendor:
-            params['vendor'] = vendor
-        
+        params = self._product_params(limit, page_info, status, product_type, vendor)
         response = self._make_request('GET', '/products.json', params=params)
-        data = self._get_json_response(response)
-        
-        products = [ShopifyProduct(**product) for product in data['products']]
-        
-        # Extract pagination info from Link header
-        link_header = response.headers.get('Link', '')
-        next_page_info = None
-        prev_page_info = None
-        
-        if 'rel="next"' in link_header:
-            # Parse Link header for next page info
-            import re
-            next_match = re.search(r'<[^>]*page_info=([^&>]+)[^>]*>; rel="next"', link_header)
-            if next_match:
-                next_page_info = next_match.group(1)
-        
-        if 'rel="previous"' in link_header:
-            prev_match = re.search(r'<[^>]*page_info=([^&>]+)[^>]*>; rel="previous"', link_header)
-            if prev_match:
-                prev_page_info = prev_match.group(1)
-        
-        return {
-            'products': products,
-            'has_next': next_page_info is not None,
-            'has_prev': prev_page_info is not None,
-            'next_page_info': next_page_info,
-            'prev_page_info': prev_page_info
-        }
+        return self._products_page(response)
     
     def get_product(self, product_id: int) -> ShopifyProduct:
         """Get a specific product"""
@@ -392,41 +590,10 @@ class ShopifyAPIClient:
         created_at_max: Optional[datetime] = None
     ) -> Dict[str, Any]:
         """Get orders with pagination and filtering"""
-        params = {'limit': min(limit, 250)}
-        
-        if page_info:
-            params['page_info'] = page_info
-        if status:
-            params['status'] = status
-        if financial_status:
-            params['financial_status'] = financial_status
-        if fulfillment_status:
-            params['fulfillment_status'] = fulfillment_status
-        if created_at_min:
-            params['created_at_min'] = created_at_min.isoformat()
-        if created_at_max:
-            params['created_at_max'] = created_at_max.isoformat()
-        
+        params = self._order_params(limit, page_info, status, financial_status, fulfillment_status,
+                                    created_at_min, created_at_max)
         response = self._make_request('GET', '/orders.json', params=params)
-        data = self._get_json_response(response)
-        
-        orders = [ShopifyOrder(**order) for order in data['orders']]
-        
-        # Extract pagination info
-        link_header = response.headers.get('Link', '')
-        next_page_info = None
-        
-        if 'rel="next"' in link_header:
-            import re
-            next_match = re.search(r'<[^>]*page_info=([^&>]+)[^>]*>; rel="next"', link_header)
-            if next_match:
-                next_page_info = next_match.group(1)
-        
-        return {
-            'orders': orders,
-            'has_next': next_page_info is not None,
-            'next_page_info': next_page_info
-        }
+        return self._orders_page(response)
     
     def get_order(self, order_id: int) -> ShopifyOrder:
         """Get a specific order"""
@@ -436,53 +603,7 @@ class ShopifyAPIClient:
     
     def get_order_preview(self, order_id: int) -> OrderPreview:
         """Get order preview with upload links and custom design data"""
-        order = self.get_order(order_id)
-        
-        preview_items = []
-        has_uploads = False
-        total_items_with_uploads = 0
-        
-        for line_item in order.line_items:
-            upload_url = None
-            preview_image_url = None
-            custom_design_data = None
-            
-            # Check line item properties for upload links and custom data
-            for prop in line_item.properties:
-                if prop.get('name') == 'upload_url':
-                    upload_url = prop.get('value')
-                    has_uploads = True
-                    total_items_with_uploads += 1
-                elif prop.get('name') == 'preview_image':
-                    preview_image_url = prop.get('value')
-                elif prop.get('name') == 'custom_design':
-                    try:
-                        custom_design_data = json.loads(prop.get('value', '{}'))
-                    except:
-                        pass
-            
-            preview_items.append(OrderPreviewItem(
-                line_item_id=line_item.id,
-                product_title=line_item.title,
-                variant_title=line_item.variant_title,
-                quantity=line_item.quantity,
-                upload_url=upload_url,
-                preview_image_url=preview_image_url,
-                custom_design_data=custom_design_data,
-                mockup_urls=[],  # Could be populated from custom design data
-                processing_status='pending' if upload_url else 'completed'
-            ))
-        
-        return OrderPreview(
-            order_id=order.id,
-            order_name=order.name,
-            customer_email=order.email,
-            created_at=order.created_at,
-            items=preview_items,
-            has_uploads=has_uploads,
-            preview_ready=all(item.processing_status == 'completed' for item in preview_items),
-            total_items_with_uploads=total_items_with_uploads
-        )
+        return self._build_order_preview(self.get_order(order_id))
     
     # Collection Methods
     
@@ -504,24 +625,12 @@ class ShopifyAPIClient:
     
     def create_collection(self, collection_data: ShopifyCollectionCreate) -> Union[ShopifySmartCollection, ShopifyCustomCollection]:
         """Create a new collection"""
-        if collection_data.rules:
-            # Smart collection
-            data = {
-                'smart_collection': {
-                    **collection_data.model_dump(exclude_none=True, exclude={'rules', 'disjunctive'}),
-                    'rules': [rule.model_dump() for rule in collection_data.rules],
-                    'disjunctive': collection_data.disjunctive
-                }
-            }
-            response = self._make_request('POST', '/smart_collections.json', data=data)
-            result = self._get_json_response(response)
-            return ShopifySmartCollection(**result['smart_collection'])
-        else:
-            # Custom collection
-            data = {'custom_collection': collection_data.model_dump(exclude_none=True, exclude={'rules', 'disjunctive'})}
-            response = self._make_request('POST', '/custom_collections.json', data=data)
-            result = self._get_json_response(response)
-            return ShopifyCustomCollection(**result['custom_collection'])
+        resource, data = self._collection_payload(collection_data)
+        response = self._make_request('POST', f'/{resource}s.json', data=data)
+        result = self._get_json_response(response)
+        if resource == 'smart_collection':
+            return ShopifySmartCollection(**result[resource])
+        return ShopifyCustomCollection(**result[resource])
     
     # Customer Methods
     
@@ -533,14 +642,7 @@ class ShopifyAPIClient:
             params['page_info'] = page_info
         
         response = self._make_request('GET', '/customers.json', params=params)
-        data = self._get_json_response(response)
-        
-        customers = [ShopifyCustomer(**customer) for customer in data['customers']]
-        
-        return {
-            'customers': customers,
-            'has_next': 'Link' in response.headers and 'rel="next"' in response.headers['Link']
-        }
+        return self._customers_page(response)
     
     def get_customer(self, customer_id: int) -> ShopifyCustomer:
         """Get a specific customer"""
@@ -548,6 +650,123 @@ class ShopifyAPIClient:
         data = self._get_json_response(response)
         return ShopifyCustomer(**data['customer'])
     
+    # Full-Catalog Iterators
+    
+    def _iter_collection(self, endpoint: str, key: str, params: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Yield every record of a cursor-paginated collection, following rel="next" links"""
+        while True:
+            response = self._make_request('GET', endpoint, params=params)
+            yield from self._get_json_response(response)[key]
+            
+            page_info = self._page_info(response, 'next')
+            if not page_info:
+                return
+            params = self._next_page_params(params, page_info)
+    
+    def iter_products(
+        self,
+        fields: Optional[Sequence[str]] = None,
+        status: Optional[str] = None,
+        product_type: Optional[str] = None,
+        vendor: Optional[str] = None,
+        page_size: int = SHOPIFY_PAGE_SIZE
+    ) -> Iterator[Union[ShopifyProduct, Dict[str, Any]]]:
+        """Stream every product in the store, one page in memory at a time.
+        
+        With fields, Shopify returns only those attributes and raw dicts are
+        yielded instead of ShopifyProduct models.
+        """
+        params = self._collection_params(
+            self._product_params(page_size, None, status, product_type, vendor), fields, page_size
+        )
+        for product in self._iter_collection('/products.json', 'products', params):
+            yield product if fields else ShopifyProduct(**product)
+    
+    def iter_orders(
+        self,
+        fields: Optional[Sequence[str]] = None,
+        status: Optional[str] = None,
+        financial_status: Optional[str] = None,
+        fulfillment_status: Optional[str] = None,
+        created_at_min: Optional[datetime] = None,
+        created_at_max: Optional[datetime] = None,
+        page_size: int = SHOPIFY_PAGE_SIZE
+    ) -> Iterator[Union[ShopifyOrder, Dict[str, Any]]]:
+        """Stream every order matching the filters, one page in memory at a time (fields as in iter_products)"""
+        params = self._collection_params(
+            self._order_params(page_size, None, status, financial_status, fulfillment_status,
+                               created_at_min, created_at_max),
+            fields, page_size
+        )
+        for order in self._iter_collection('/orders.json', 'orders', params):
+            yield order if fields else ShopifyOrder(**order)
+    
+    def iter_customers(self, fields: Optional[Sequence[str]] = None,
+                       page_size: int = SHOPIFY_PAGE_SIZE) -> Iterator[Union[ShopifyCustomer, Dict[str, Any]]]:
+        """Stream every customer in the store, one page at a time"""
+        params = self._collection_params({}, fields, page_size)
+        for customer in self._iter_collection('/customers.json', 'customers', params):
+            yield customer if fields else ShopifyCustomer(**customer)
+    
+    # GraphQL Bulk Operations
+    
+    def graphql(self, query: str, variables: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Run a GraphQL Admin API query against the shop's cost-point budget"""
+        if not self.access_token:
+            raise ShopifyAuthenticationError("Access token not set")
+        
+        try:
+            self.graphql_bucket.acquire_blocking(cost=GRAPHQL_REQUEST_COST, priority=self.priority)
+        except RateBudgetExhausted as e:
+            raise ShopifyRateLimitError(str(e))
+        
+        try:
+            response = self.session.post(
+                f"{self._get_base_url()}/graphql.json",
+                data=json.dumps({'query': query, 'variables': variables or {}}),
+                timeout=30
+            )
+        except requests.exceptions.RequestException as e:
+            raise ShopifyAPIError(f"GraphQL request failed: {str(e)}")
+        
+        self._check_response(response)
+        return self._graphql_data(self._get_json_response(response))
+    
+    def run_bulk_query(self, query: str) -> str:
+        """Submit a bulk operation for a query and return its ID (one may run per shop at a time)"""
+        result = self.graphql(BULK_RUN_QUERY_MUTATION, {'query': query})['bulkOperationRunQuery']
+        if result['userErrors']:
+            messages = '; '.join(error['message'] for error in result['userErrors'])
+            raise ShopifyAPIError(f"Bulk operation rejected: {messages}")
+        return result['bulkOperation']['id']
+    
+    def wait_for_bulk_operation(self, operation_id: str, poll_interval: float = BULK_POLL_SECONDS,
+                                timeout: float = BULK_TIMEOUT_SECONDS) -> Dict[str, Any]:
+        """Poll a bulk operation until it completes; return it (url is None when nothing matched)"""
+        deadline = time.monotonic() + timeout
+        while True:
+            operation = self.graphql(BULK_OPERATION_QUERY, {'id': operation_id})['node']
+            status = operation['status']
+            if status == 'COMPLETED':
+                return operation
+            if status in ('FAILED', 'CANCELED', 'EXPIRED'):
+                raise ShopifyAPIError(f"Bulk operation {operation_id} {status.lower()}: {operation.get('errorCode')}")
+            if time.monotonic() >= deadline:
+                raise ShopifyAPIError(f"Bulk operation {operation_id} still {status.lower()} after {timeout:.0f}s")
+            time.sleep(poll_interval)
+    
+    def iter_bulk_results(self, url: str) -> Iterator[Dict[str, Any]]:
+        """Stream a bulk operation's JSONL result file, one parsed line at a time"""
+        # The signed result URL is not on the shop's API host and needs no token or budget
+        try:
+            with requests.get(url, stream=True, timeout=(10, 300)) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if line:
+                        yield json.loads(line)
+        except requests.exceptions.RequestException as e:
+            raise ShopifyAPIError(f"Bulk result download failed: {str(e)}")
+    
     # Utility Methods
     
     def test_connection(self) -> bool:
@@ -558,12 +777,3 @@ class ShopifyAPIClient:
         except Exception as e:
             logger.error(f"Connection test failed: {str(e)}")
             return False
-    
-    def get_api_usage(self) -> Dict[str, Any]:
-        """Get API usage information"""
-        return {
-            'rate_limit_remaining': self.rate_limit_remaining,
-            'rate_limit_reset_time': self.rate_limit_reset_time,
-            'user_id': self.user_id,
-            'shop_domain': self.shop_domain
-        }
\ No newline at end of file
@@ -1,5 +1,7 @@
-from fastapi import APIRouter, Depends, Query, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, Query, HTTPException, status, BackgroundTasks, Request
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Optional, Dict, Any, Union
+import json
 from uuid import UUID
 from datetime import datetime
 
@@ -12,6 +14,7 @@ from .models import (
     ShopifySyncRequest, ShopifySyncResponse
 )
 from .service import ShopifyService
+from .webhooks import request_drain
 from common.auth import UserOrAdminDep
 from common.database import get_database_manager, DatabaseManager
 from common.exceptions import (
@@ -108,7 +111,7 @@ async def get_shop_info(
 ):
     """Get shop information"""
     try:
-        return shopify_service.get_shop_info(current_user.get_uuid())
+        return await shopify_service.get_shop_info_async(current_user.get_uuid())
     except ShopifyAuthenticationError as e:
         raise HTTPException(status_code=401, detail=str(e))
     except ShopifyAPIError as e:
@@ -128,7 +131,7 @@ async def get_products(
 ):
     """Get products with pagination and filtering"""
     try:
-        return shopify_service.get_products(
+        return await shopify_service.get_products_async(
             user_id=current_user.get_uuid(),
             limit=limit,
             page_info=page_info,
@@ -211,7 +214,7 @@ async def batch_update_products(
 ):
     """Perform batch operations on products"""
     try:
-        return shopify_service.batch_update_products(current_user.get_uuid(), batch_operation)
+        return await shopify_service.batch_update_products_async(current_user.get_uuid(), batch_operation)
     except ValidationError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except ShopifyAuthenticationError as e:
@@ -237,7 +240,7 @@ async def get_orders(
 ):
     """Get orders with pagination and filtering"""
     try:
-        return shopify_service.get_orders(
+        return await shopify_service.get_orders_async(
             user_id=current_user.get_uuid(),
             limit=limit,
             page_info=page_info,
@@ -274,7 +277,7 @@ async def get_order_preview(
 ):
     """Get order preview with upload links and custom design data"""
     try:
-        return shopify_service.get_order_preview(current_user.get_uuid(), order_id)
+        return await shopify_service.get_order_preview_async(current_user.get_uuid(), order_id)
     except ShopifyAuthenticationError as e:
         raise HTTPException(status_code=401, detail=str(e))
     except ShopifyAPIError as e:
@@ -348,16 +351,20 @@ async def get_customer(
 # Sync Endpoints
 
 @router.post("/sync", response_model=ShopifySyncResponse)
-async def sync_data(
+def sync_data(
     sync_request: ShopifySyncRequest,
     background_tasks: BackgroundTasks,
     current_user: UserOrAdminDep,
     shopify_service: ShopifyService = Depends(get_shopify_service)
 ):
-    """Sync data from Shopify"""
+    """Sync data from Shopify.
+
+    A plain def route, so FastAPI runs it in the threadpool: an inline
+    orders/products sync walks the whole store and waits on the rate budget.
+    """
     try:
-        # For large syncs, run in background
-        if sync_request.sync_type == 'all' or sync_request.force_full_sync:
+        # For large syncs (and bulk operations, which poll until Shopify finishes), run in background
+        if sync_request.sync_type == 'all' or sync_request.force_full_sync or sync_request.use_bulk_operation:
             background_tasks.add_task(
                 shopify_service.sync_data,
                 current_user.get_uuid(),
@@ -379,10 +386,47 @@ async def sync_data(
     except ShopifyAPIError as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Webhook Endpoints
+
+@router.post("/webhooks")
+async def receive_webhook(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    shopify_service: ShopifyService = Depends(get_shopify_service)
+):
+    """Receive a Shopify webhook: verify, store and ack; a worker applies it"""
+    body = await request.body()
+    if not shopify_service.verify_webhook(body, request.headers.get("X-Shopify-Hmac-Sha256")):
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+    
+    topic = request.headers.get("X-Shopify-Topic")
+    shop_domain = request.headers.get("X-Shopify-Shop-Domain")
+    if not topic or not shop_domain:
+        raise HTTPException(status_code=400, detail="Missing Shopify webhook headers")
+    
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Webhook body is not valid JSON")
+    
+    headers = {
+        name: value for name, value in request.headers.items()
+        if name.lower().startswith("x-shopify-")
+    }
+    # The INSERT and commit block, so they run in the threadpool rather than on the event loop
+    if await run_in_threadpool(
+        shopify_service.record_webhook,
+        topic, shop_domain, request.headers.get("X-Shopify-Webhook-Id"), payload, headers
+    ):
+        # Runs after the response is sent
+        background_tasks.add_task(request_drain)
+    
+    return {"status": "accepted"}
+
 # Dashboard Endpoints
 
 @router.get("/dashboard", response_model=ShopifyDashboardData)
-async def get_dashboard_data(
+def get_dashboard_data(
     current_user: UserOrAdminDep,
     shopify_service: ShopifyService = Depends(get_shopify_service)
 ):
@@ -420,7 +464,7 @@ async def create_listing_from_template(
 # Analytics Endpoints
 
 @router.get("/analytics/summary")
-async def get_analytics_summary(
+def get_analytics_summary(
     current_user: UserOrAdminDep,
     shopify_service: ShopifyService = Depends(get_shopify_service),
     days: int = Query(30, ge=1, le=365, description="Number of days to analyze")
@@ -473,6 +517,7 @@ async def shopify_health_check():
             "order_preview",
             "dashboard_integration",
             "template_integration",
-            "data_synchronization"
+            "data_synchronization",
+            "webhook_ingestion"
         ]
     }
\ No newline at end of file
@@ -501,6 +501,7 @@ class ShopifySyncRequest(BaseModel):
     force_full_sync: bool = Field(False, description="Force full sync instead of incremental")
     date_range_start: Optional[datetime] = Field(None, description="Start date for sync")
     date_range_end: Optional[datetime] = Field(None, description="End date for sync")
+    use_bulk_operation: bool = Field(False, description="Import orders/products with a GraphQL bulk operation instead of REST pages")
 
 class ShopifySyncResponse(BaseModel):
     """Response from sync operation"""
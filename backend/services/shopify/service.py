@@ -2,6 +2,7 @@ from typing import List, Optional, Dict, Any, Tuple
 from uuid import UUID
 from datetime import datetime, timezone, timedelta
 from decimal import Decimal
+import asyncio
 import logging
 import json
 import uuid as uuid_lib
@@ -12,11 +13,26 @@ from .models import (
     ShopifyProductUpdate, ShopifyOrder, ShopifyCustomer, ShopifyCollection,
     ShopifyCollectionCreate, ShopifyBatchOperation, ShopifyBatchResult,
     OrderPreview, ShopifyDashboardData, ShopifyShopStats, ShopifyIntegrationStatus,
-    ShopifySyncRequest, ShopifySyncResponse
+    ShopifySyncRequest, ShopifySyncResponse, ShopifyAddress,
+    ShopifyFinancialStatus, ShopifyFulfillmentStatus
 )
+from . import bulk
 from .client import ShopifyAPIClient
-from database.entities import User, Order, ThirdPartyOAuthToken, ShopifyProductTemplate
+from .async_client import AsyncShopifyAPIClient
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
+from database.entities import (
+    User, Order, ThirdPartyOAuthToken, ShopifyProductTemplate, ShopifyWebhook,
+    ShopifyProductSync, ShopifyOrderSync
+)
 from common.database import DatabaseManager
+from services.common.cache import cache_tenant_data
+from services.common.rate_budget import Priority
+from services.order.ingest import OrderIngestor
+from services.order.models import (
+    MarketplaceOrder, MarketplaceOrderItem, OrderIngestResult,
+    OrderPlatform, OrderStatus, PaymentStatus, FulfillmentStatus
+)
 from common.exceptions import (
     UserNotFound, ShopifyAPIError, ShopifyAuthenticationError,
     DatabaseError, ValidationError
@@ -24,6 +40,21 @@ from common.exceptions import (
 
 logger = logging.getLogger(__name__)
 
+# Sync records written per lookup/write round trip while streaming a bulk result
+SHOPIFY_BULK_WRITE_BATCH_SIZE = 500
+
+SHOPIFY_PAYMENT_STATUS_MAP = {
+    'paid': PaymentStatus.PAID,
+    'partially_paid': PaymentStatus.PAID,
+    'partially_refunded': PaymentStatus.PAID,
+    'refunded': PaymentStatus.REFUNDED,
+    'voided': PaymentStatus.FAILED
+}
+SHOPIFY_FULFILLMENT_STATUS_MAP = {
+    'fulfilled': FulfillmentStatus.FULFILLED,
+    'partial': FulfillmentStatus.PARTIAL
+}
+
 class ShopifyService:
     """Service for managing Shopify integration and data synchronization"""
     
@@ -31,8 +62,8 @@ class ShopifyService:
         self.db = db_manager
         self.client = ShopifyAPIClient()
     
-    def _get_user_client(self, user_id: UUID) -> ShopifyAPIClient:
-        """Get authenticated Shopify client for user"""
+    def _get_user_token(self, user_id: UUID) -> ThirdPartyOAuthToken:
+        """Get the user's active Shopify OAuth token"""
         user = self.db.query(User).filter(User.id == user_id, User.is_active == True).first()
         if not user:
             raise UserNotFound(user_id)
@@ -40,8 +71,7 @@ class ShopifyService:
         # Get Shopify OAuth token
         token = self.db.query(ThirdPartyOAuthToken).filter(
             ThirdPartyOAuthToken.user_id == user_id,
-            ThirdPartyOAuthToken.platform == 'shopify',
-            ThirdPartyOAuthToken.is_active == True
+            ThirdPartyOAuthToken.provider == 'shopify'
         ).first()
         
         if not token:
@@ -50,11 +80,25 @@ class ShopifyService:
         if token.expires_at and token.expires_at <= datetime.now(timezone.utc):
             raise ShopifyAuthenticationError("Shopify token has expired")
         
+        return token
+    
+    def _get_user_client(self, user_id: UUID) -> ShopifyAPIClient:
+        """Get authenticated Shopify client for user"""
+        token = self._get_user_token(user_id)
         client = ShopifyAPIClient(user_id=str(user_id), tenant_id=self.db.tenant_id)
         client.set_credentials(token.access_token, token.shop_domain)
         
         return client
     
+    async def _get_async_user_client(self, user_id: UUID) -> AsyncShopifyAPIClient:
+        """Async client for user (connections are pooled; the shop's call budget is shared across processes)"""
+        # The token lookup is a blocking ORM query, so it runs off the event loop
+        token = await asyncio.to_thread(self._get_user_token, user_id)
+        client = AsyncShopifyAPIClient(user_id=str(user_id), tenant_id=self.db.tenant_id)
+        client.set_credentials(token.access_token, token.shop_domain)
+        
+        return client
+    
     # OAuth Methods
     
     def initiate_oauth_flow(self, oauth_request: ShopifyOAuthInitRequest, user_id: UUID) -> ShopifyOAuthInitResponse:
@@ -216,6 +260,11 @@ class ShopifyService:
         client = self._get_user_client(user_id)
         return client.get_shop_info()
     
+    async def get_shop_info_async(self, user_id: UUID) -> ShopifyShop:
+        """Get shop information without blocking the event loop"""
+        client = await self._get_async_user_client(user_id)
+        return await client.get_shop_info()
+    
     # Product Methods
     
     def get_products(
@@ -237,6 +286,25 @@ class ShopifyService:
             vendor=vendor
         )
     
+    async def get_products_async(
+        self,
+        user_id: UUID,
+        limit: int = 50,
+        page_info: Optional[str] = None,
+        status: Optional[str] = None,
+        product_type: Optional[str] = None,
+        vendor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Get products with pagination without blocking the event loop"""
+        client = await self._get_async_user_client(user_id)
+        return await client.get_products(
+            limit=limit,
+            page_info=page_info,
+            status=status,
+            product_type=product_type,
+            vendor=vendor
+        )
+    
     def get_product(self, user_id: UUID, product_id: int) -> ShopifyProduct:
         """Get a specific product"""
         client = self._get_user_client(user_id)
@@ -262,6 +330,17 @@ class ShopifyService:
         client = self._get_user_client(user_id)
         return client.batch_update_products(batch_operation)
     
+    async def batch_update_products_async(self, user_id: UUID, batch_operation: ShopifyBatchOperation) -> ShopifyBatchResult:
+        """Perform batch operations on products concurrently within the shop's call limit.
+        
+        A large batch outlasts the interactive wait, so it runs at background
+        priority: it queues for the bucket instead of failing, and leaves
+        headroom for interactive calls.
+        """
+        client = await self._get_async_user_client(user_id)
+        client.priority = Priority.BACKGROUND
+        return await client.batch_update_products(batch_operation)
+    
     # Order Methods
     
     def get_orders(
@@ -287,6 +366,29 @@ class ShopifyService:
             created_at_max=created_at_max
         )
     
+    async def get_orders_async(
+        self,
+        user_id: UUID,
+        limit: int = 50,
+        page_info: Optional[str] = None,
+        status: Optional[str] = None,
+        financial_status: Optional[str] = None,
+        fulfillment_status: Optional[str] = None,
+        created_at_min: Optional[datetime] = None,
+        created_at_max: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """Get orders with pagination and filtering without blocking the event loop"""
+        client = await self._get_async_user_client(user_id)
+        return await client.get_orders(
+            limit=limit,
+            page_info=page_info,
+            status=status,
+            financial_status=financial_status,
+            fulfillment_status=fulfillment_status,
+            created_at_min=created_at_min,
+            created_at_max=created_at_max
+        )
+    
     def get_order(self, user_id: UUID, order_id: int) -> ShopifyOrder:
         """Get a specific order"""
         client = self._get_user_client(user_id)
@@ -297,39 +399,120 @@ class ShopifyService:
         client = self._get_user_client(user_id)
         return client.get_order_preview(order_id)
     
-    def sync_order_from_shopify_order(self, user_id: UUID, shopify_order_data: Dict[str, Any]) -> 'OrderResponse':
-        """Convert Shopify order to internal order format"""
-        from services.order.service import OrderService
-        from services.order.models import OrderCreate
+    async def get_order_preview_async(self, user_id: UUID, order_id: int) -> OrderPreview:
+        """Get order preview without blocking the event loop"""
+        client = await self._get_async_user_client(user_id)
+        return await client.get_order_preview(order_id)
+    
+    def sync_order_from_shopify_order(self, user_id: UUID, shopify_order_data: Dict[str, Any]) -> OrderIngestResult:
+        """Upsert a single Shopify order (REST payload) into the internal order system"""
+        order = self._marketplace_order(ShopifyOrder(**shopify_order_data))
+        return OrderIngestor(self.db).ingest(user_id, [order])
+    
+    def _marketplace_order(self, shopify_order: ShopifyOrder) -> MarketplaceOrder:
+        """Normalize a Shopify order for bulk ingestion"""
+        billing = shopify_order.billing_address
+        shipping_set = shopify_order.total_shipping_price_set or {}
+        shipping_amount = shipping_set.get('shop_money', {}).get('amount', '0')
+        financial_status = shopify_order.financial_status.value if shopify_order.financial_status else None
+        fulfillment_status = shopify_order.fulfillment_status.value if shopify_order.fulfillment_status else None
         
-        order_service = OrderService(self.db)
-        
-        # Map Shopify order to internal order format
-        order_data = OrderCreate(
-            customer_email=shopify_order_data.get('email', ''),
-            customer_name=f"{shopify_order_data.get('billing_address', {}).get('first_name', '')} {shopify_order_data.get('billing_address', {}).get('last_name', '')}".strip(),
-            total_amount=Decimal(str(shopify_order_data.get('total_price', '0'))),
-            status='pending',
-            platform='shopify',
-            platform_order_id=str(shopify_order_data.get('id', '')),
-            shipping_address=shopify_order_data.get('shipping_address', {}),
-            billing_address=shopify_order_data.get('billing_address', {}),
-            items=[{
-                'name': item.get('title', ''),
-                'quantity': item.get('quantity', 1),
-                'price': Decimal(str(item.get('price', '0'))),
-                'sku': item.get('sku', ''),
-                'variant_id': item.get('variant_id')
-            } for item in shopify_order_data.get('line_items', [])],
+        return MarketplaceOrder(
+            platform=OrderPlatform.SHOPIFY,
+            external_id=str(shopify_order.id),
+            order_number=shopify_order.name,
+            status=self._map_shopify_status_to_internal(shopify_order),
+            payment_status=SHOPIFY_PAYMENT_STATUS_MAP.get(financial_status, PaymentStatus.PENDING),
+            fulfillment_status=SHOPIFY_FULFILLMENT_STATUS_MAP.get(fulfillment_status, FulfillmentStatus.UNFULFILLED),
+            total_amount=shopify_order.total_price,
+            subtotal=shopify_order.subtotal_price,
+            tax_amount=shopify_order.total_tax,
+            shipping_amount=Decimal(str(shipping_amount)),
+            discount_amount=shopify_order.total_discounts,
+            currency=shopify_order.currency,
+            customer_email=shopify_order.email or None,
+            customer_name=(billing.name or f"{billing.first_name or ''} {billing.last_name or ''}".strip() or None) if billing else None,
+            shipping_address=self._format_address(shopify_order.shipping_address),
+            billing_address=self._format_address(billing),
+            order_date=shopify_order.created_at,
+            processing_notes=shopify_order.note,
+            shopify_order_id=shopify_order.id,
             metadata={
-                'shopify_order_number': shopify_order_data.get('order_number'),
-                'shopify_financial_status': shopify_order_data.get('financial_status'),
-                'shopify_fulfillment_status': shopify_order_data.get('fulfillment_status'),
-                'shopify_order_created_at': shopify_order_data.get('created_at')
-            }
+                'shopify_order_number': shopify_order.order_number,
+                'shopify_financial_status': financial_status,
+                'shopify_fulfillment_status': fulfillment_status,
+                'shopify_updated_at': shopify_order.updated_at.isoformat()
+            },
+            items=[
+                MarketplaceOrderItem(
+                    product_name=item.title,
+                    quantity=item.quantity,
+                    unit_price=item.price,
+                    sku=item.sku or None,
+                    variant_name=item.variant_title,
+                    shopify_product_id=item.product_id,
+                    shopify_variant_id=item.variant_id
+                )
+                for item in shopify_order.line_items
+            ]
         )
+    
+    def _map_shopify_status_to_internal(self, shopify_order: ShopifyOrder) -> OrderStatus:
+        """Map Shopify cancellation/financial/fulfillment state to internal order status"""
+        if shopify_order.cancelled_at:
+            return OrderStatus.CANCELLED
+        if shopify_order.financial_status == ShopifyFinancialStatus.REFUNDED:
+            return OrderStatus.REFUNDED
+        if shopify_order.fulfillment_status == ShopifyFulfillmentStatus.FULFILLED:
+            return OrderStatus.SHIPPED
+        if shopify_order.financial_status in (
+            ShopifyFinancialStatus.PAID,
+            ShopifyFinancialStatus.PARTIALLY_PAID,
+            ShopifyFinancialStatus.PARTIALLY_REFUNDED
+        ):
+            return OrderStatus.PROCESSING
+        return OrderStatus.PENDING
+    
+    def _format_address(self, address: Optional[ShopifyAddress]) -> Dict[str, Any]:
+        """Format a Shopify address to the internal format"""
+        if not address:
+            return {}
+        return {
+            'name': address.name,
+            'line1': address.address1,
+            'line2': address.address2,
+            'city': address.city,
+            'state': address.province_code or address.province,
+            'zip': address.zip,
+            'country': address.country_code or address.country
+        }
+    
+    # Webhook Methods
+    
+    def verify_webhook(self, body: bytes, hmac_header: Optional[str]) -> bool:
+        """Check a webhook body against its X-Shopify-Hmac-Sha256 header"""
+        return self.client.verify_webhook_hmac(body, hmac_header or '')
+    
+    def record_webhook(self, topic: str, shop_domain: str, webhook_id: Optional[str],
+                       payload: Dict[str, Any], headers: Dict[str, str]) -> bool:
+        """Persist a verified webhook for the worker; return False for a redelivery already stored"""
+        table = ShopifyWebhook.__table__
+        statement = insert(table).values(
+            id=uuid_lib.uuid4(),
+            tenant_id=self.db.tenant_id,
+            webhook_id=webhook_id,
+            topic=topic,
+            shopify_shop_domain=shop_domain,
+            event_data=payload,
+            headers=headers,
+            processing_status='pending',
+            retry_count=0,
+            hmac_verified=True
+        ).on_conflict_do_nothing(index_elements=[table.c.webhook_id]).returning(table.c.id)
         
-        return order_service.create_order(user_id, order_data)
+        inserted = self.db.execute(statement).first() is not None
+        self.db.commit()
+        return inserted
     
     # Collection Methods
     
@@ -364,13 +547,27 @@ class ShopifyService:
         
         try:
             client = self._get_user_client(user_id)
+            client.priority = Priority.BACKGROUND
             
             records_processed = 0
             records_updated = 0
             records_created = 0
             errors = []
             
-            if sync_request.sync_type in ['orders', 'all']:
+            if sync_request.use_bulk_operation and sync_request.sync_type in ['orders', 'products', 'all']:
+                # One bulk operation per resource instead of one REST call per 250 records
+                for resource in ('orders', 'products'):
+                    if sync_request.sync_type not in [resource, 'all']:
+                        continue
+                    try:
+                        result = self._bulk_sync(client, user_id, resource, sync_request)
+                        records_created += result['created']
+                        records_updated += result['updated']
+                        records_processed += result['created'] + result['updated']
+                    except Exception as e:
+                        errors.append(f"Bulk {resource} sync failed: {str(e)}")
+            
+            if sync_request.sync_type in ['orders', 'all'] and not sync_request.use_bulk_operation:
                 try:
                     # Sync orders
                     order_params = {}
@@ -379,24 +576,27 @@ class ShopifyService:
                     if sync_request.date_range_end:
                         order_params['created_at_max'] = sync_request.date_range_end
                     
-                    orders_data = client.get_orders(**order_params)
+                    def marketplace_orders():
+                        for shopify_order in client.iter_orders(**order_params):
+                            try:
+                                yield self._marketplace_order(shopify_order)
+                            except Exception as e:
+                                errors.append(f"Order {shopify_order.id}: {str(e)}")
+                    
+                    # Pages stream straight into chunked upserts instead of one create per order
+                    result = OrderIngestor(self.db).ingest(user_id, marketplace_orders())
+                    records_created += result.created
+                    records_updated += result.updated
+                    records_processed += result.created + result.updated + result.unchanged
                     
-                    for shopify_order in orders_data['orders']:
-                        try:
-                            self.sync_order_from_shopify_order(user_id, shopify_order.model_dump())
-                            records_processed += 1
-                            records_created += 1
-                        except Exception as e:
-                            errors.append(f"Order {shopify_order.id}: {str(e)}")
-                            
                 except Exception as e:
                     errors.append(f"Order sync failed: {str(e)}")
             
-            if sync_request.sync_type in ['products', 'all']:
+            if sync_request.sync_type in ['products', 'all'] and not sync_request.use_bulk_operation:
                 try:
-                    # Sync products (basic sync - could be enhanced)
-                    products_data = client.get_products()
-                    records_processed += len(products_data['products'])
+                    # Sync products (basic sync - could be enhanced); ids only, across the whole catalog
+                    for _ in client.iter_products(fields=('id',)):
+                        records_processed += 1
                     
                 except Exception as e:
                     errors.append(f"Product sync failed: {str(e)}")
@@ -435,8 +635,94 @@ class ShopifyService:
                 message=f"Sync failed: {str(e)}"
             )
     
+    def _bulk_sync(self, client: ShopifyAPIClient, user_id: UUID, resource: str,
+                   sync_request: ShopifySyncRequest) -> Dict[str, int]:
+        """Run a bulk operation for orders or products and stream its JSONL into the sync table"""
+        build_query = bulk.orders_query if resource == 'orders' else bulk.products_query
+        operation_id = client.run_bulk_query(
+            build_query(sync_request.date_range_start, sync_request.date_range_end)
+        )
+        operation = client.wait_for_bulk_operation(operation_id)
+        logger.info(f"Bulk {resource} operation {operation_id} completed with {operation.get('objectCount')} objects")
+        
+        totals = {'created': 0, 'updated': 0}
+        if not operation.get('url'):
+            return totals
+        
+        write_batch = self._write_order_sync_batch if resource == 'orders' else self._write_product_sync_batch
+        batch: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]] = []
+        for record in bulk.group_bulk_records(client.iter_bulk_results(operation['url'])):
+            batch.append(record)
+            if len(batch) >= SHOPIFY_BULK_WRITE_BATCH_SIZE:
+                write_batch(user_id, batch, totals)
+                batch = []
+        if batch:
+            write_batch(user_id, batch, totals)
+        return totals
+    
+    def _write_product_sync_batch(self, user_id: UUID, batch: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]],
+                                  totals: Dict[str, int]) -> None:
+        now = datetime.now(timezone.utc)
+        rows = {
+            bulk.legacy_id(product['id']): {
+                'sync_status': 'synced',
+                'last_sync_at': now,
+                'sync_error_message': None,
+                'shopify_data': {**product, 'variants': variants}
+            }
+            for product, variants in batch
+        }
+        self._upsert_sync_rows(ShopifyProductSync, ShopifyProductSync.shopify_product_id, 'shopify_product_id', user_id, rows, totals)
+    
+    def _write_order_sync_batch(self, user_id: UUID, batch: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]],
+                                totals: Dict[str, int]) -> None:
+        now = datetime.now(timezone.utc)
+        order_ids = [bulk.legacy_id(order['id']) for order, _ in batch]
+        internal_ids = dict(self.db.query(Order.external_id, Order.id).filter(
+            Order.tenant_id == self.db.tenant_id,
+            Order.platform == 'shopify',
+            Order.external_id.in_(order_ids)
+        ).all())
+        rows = {
+            order_id: {
+                'internal_order_id': internal_ids.get(order_id),
+                'order_number': order.get('name'),
+                'financial_status': (order.get('displayFinancialStatus') or '').lower() or None,
+                'fulfillment_status': (order.get('displayFulfillmentStatus') or '').lower() or None,
+                'sync_status': 'synced',
+                'last_sync_at': now,
+                'sync_error_message': None,
+                'shopify_order_data': {**order, 'lineItems': line_items}
+            }
+            for order_id, (order, line_items) in zip(order_ids, batch)
+        }
+        self._upsert_sync_rows(ShopifyOrderSync, ShopifyOrderSync.shopify_order_id, 'shopify_order_id', user_id, rows, totals)
+    
+    def _upsert_sync_rows(self, model, key_column, key_name: str, user_id: UUID,
+                          rows: Dict[str, Dict[str, Any]], totals: Dict[str, int]) -> None:
+        """Update existing sync records by primary key and insert the rest, then commit"""
+        existing = dict(self.db.query(key_column, model.id).filter(
+            model.user_id == user_id,
+            key_column.in_(list(rows))
+        ).all())
+        
+        updates = [{'id': existing[key], **values} for key, values in rows.items() if key in existing]
+        inserts = [
+            {'id': uuid_lib.uuid4(), 'tenant_id': self.db.tenant_id, 'user_id': user_id, key_name: key, **values}
+            for key, values in rows.items() if key not in existing
+        ]
+        if updates:
+            self.db.execute(update(model), updates)
+        if inserts:
+            self.db.execute(insert(model), inserts)
+        self.db.commit()
+        
+        totals['updated'] += len(updates)
+        totals['created'] += len(inserts)
+    
     # Dashboard Methods
     
+    @cache_tenant_data(expire=300, namespace="shopify.dashboard", tags=("integration:shopify",), stale_ttl=900)
     def get_dashboard_data(self, user_id: UUID) -> ShopifyDashboardData:
         """Get dashboard data from Shopify"""
         try:
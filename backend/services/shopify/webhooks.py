@@ -0,0 +1,210 @@
+# services/shopify/webhooks.py
+"""
+Shopify webhook processing.
+
+The receiver only verifies the HMAC and inserts the raw event (redeliveries
+with a known X-Shopify-Webhook-Id are dropped by the unique index), so Shopify
+gets its 200 within milliseconds. The shopify_webhooks table is the durable
+queue: workers claim pending events in batches with FOR UPDATE SKIP LOCKED,
+collapse events for the same order to the newest payload, and apply them per
+shop through the bulk order upsert. A lost wake-up only delays an event until
+the next scheduled drain.
+"""
+
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import and_, case, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from database.core import SessionLocal
+from database.entities import ShopifyWebhook, ThirdPartyOAuthToken
+from common.database import DatabaseManager
+from services.order.ingest import OrderIngestor
+from .models import ShopifyOrder
+from .service import ShopifyService
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_BATCH_SIZE = int(os.getenv("SHOPIFY_WEBHOOK_BATCH_SIZE", "500"))
+# Batches per drain run, so one task never monopolizes a worker
+WEBHOOK_MAX_BATCHES = int(os.getenv("SHOPIFY_WEBHOOK_MAX_BATCHES", "20"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("SHOPIFY_WEBHOOK_MAX_ATTEMPTS", "5"))
+# Claimed events still unfinished after this long (worker died) are claimed again
+WEBHOOK_CLAIM_TIMEOUT = int(os.getenv("SHOPIFY_WEBHOOK_CLAIM_TIMEOUT", "300"))
+DRAIN_TASK = "sync.shopify_webhooks"
+
+ORDER_TOPICS = frozenset({
+    'orders/create',
+    'orders/updated',
+    'orders/paid',
+    'orders/cancelled',
+    'orders/fulfilled',
+    'orders/partially_fulfilled'
+})
+
+def request_drain() -> None:
+    """Wake a worker to drain pending webhooks (the scheduled drain covers a lost wake-up)"""
+    try:
+        from worker import celery_app
+        celery_app.send_task(DRAIN_TASK)
+    except Exception as e:
+        logger.warning(f"Could not enqueue Shopify webhook drain: {e}")
+
+def drain_webhooks(batch_size: int = WEBHOOK_BATCH_SIZE, max_batches: int = WEBHOOK_MAX_BATCHES) -> Dict[str, int]:
+    """Claim and apply pending webhooks until the queue is empty or max_batches is reached"""
+    totals = {'processed': 0, 'ignored': 0, 'failed': 0, 'retried': 0}
+    session = SessionLocal()
+    try:
+        for _ in range(max_batches):
+            events = _claim_batch(session, batch_size)
+            if not events:
+                break
+
+            by_shop = defaultdict(list)
+            for event in events:
+                by_shop[(event.tenant_id, event.shopify_shop_domain)].append(event)
+            for (tenant_id, shop_domain), shop_events in by_shop.items():
+                try:
+                    _apply_shop_events(session, str(tenant_id), shop_domain, shop_events, totals)
+                except Exception as e:
+                    # One broken shop must not strand the rest of the batch in processing
+                    session.rollback()
+                    logger.error(f"Draining {len(shop_events)} Shopify webhooks for {shop_domain} failed: {e}")
+                    _release(session, [event.id for event in shop_events], str(e))
+                    totals['retried'] += len(shop_events)
+    finally:
+        session.close()
+
+    if any(totals.values()):
+        logger.info(f"Drained Shopify webhooks: {totals}")
+    return totals
+
+def _claim_batch(session: Session, batch_size: int) -> list:
+    """Mark the oldest claimable events as processing and return them, oldest first"""
+    table = ShopifyWebhook.__table__
+    stale_before = datetime.now(timezone.utc) - timedelta(seconds=WEBHOOK_CLAIM_TIMEOUT)
+    # A worker that died on the last attempt leaves its events where no claim reaches them
+    session.execute(
+        update(table)
+        .where(
+            table.c.processing_status == 'processing',
+            table.c.retry_count >= WEBHOOK_MAX_ATTEMPTS,
+            table.c.updated_at < stale_before
+        )
+        .values(processing_status='failed', processed_at=func.now(),
+                processing_error="Worker stopped during the last attempt")
+    )
+    claimable = (
+        select(table.c.id)
+        .where(
+            table.c.retry_count < WEBHOOK_MAX_ATTEMPTS,
+            or_(
+                table.c.processing_status == 'pending',
+                and_(table.c.processing_status == 'processing', table.c.updated_at < stale_before)
+            )
+        )
+        .order_by(table.c.created_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    statement = (
+        update(table)
+        .where(table.c.id.in_(claimable.scalar_subquery()))
+        .values(processing_status='processing', retry_count=table.c.retry_count + 1, updated_at=func.now())
+        .returning(table.c.id, table.c.tenant_id, table.c.topic, table.c.shopify_shop_domain,
+                   table.c.event_data, table.c.retry_count, table.c.created_at)
+    )
+    events = session.execute(statement).all()
+    session.commit()
+    return sorted(events, key=lambda event: event.created_at)
+
+def _apply_shop_events(session: Session, tenant_id: str, shop_domain: str,
+                       events: list, totals: Dict[str, int]) -> None:
+    """Upsert every order event of one shop in a single ingest, then settle each event"""
+    db = DatabaseManager(session, tenant_id)
+    user_id = _shop_user_id(db, shop_domain)
+    if user_id is None:
+        _settle(session, [event.id for event in events], 'failed', f"No active Shopify connection for {shop_domain}")
+        totals['failed'] += len(events)
+        return
+
+    applied: List[UUID] = []
+    ignored: List[UUID] = []
+    failed: List[Tuple[UUID, str]] = []
+    latest: Dict[int, ShopifyOrder] = {}
+    for event in events:
+        if event.topic not in ORDER_TOPICS:
+            ignored.append(event.id)
+            continue
+        try:
+            order = ShopifyOrder(**event.event_data)
+        except Exception as e:
+            failed.append((event.id, f"Invalid order payload: {e}"))
+            continue
+        applied.append(event.id)
+        # Several events for one order collapse to the most recently updated payload
+        current = latest.get(order.id)
+        if current is None or order.updated_at >= current.updated_at:
+            latest[order.id] = order
+
+    if latest:
+        try:
+            service = ShopifyService(db)
+            OrderIngestor(db).ingest(
+                user_id, [service._marketplace_order(order) for order in latest.values()], trigger_source='webhook'
+            )
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Applying {len(applied)} Shopify webhooks for {shop_domain} failed: {e}")
+            _release(session, applied, str(e))
+            totals['retried'] += len(applied)
+            applied = []
+
+    _settle(session, applied, 'processed')
+    _settle(session, ignored, 'ignored')
+    for event_id, error in failed:
+        _settle(session, [event_id], 'failed', error)
+    totals['processed'] += len(applied)
+    totals['ignored'] += len(ignored)
+    totals['failed'] += len(failed)
+
+def _shop_user_id(db: DatabaseManager, shop_domain: str) -> Optional[UUID]:
+    """User whose Shopify connection owns the shop"""
+    row = db.query(ThirdPartyOAuthToken.user_id).filter(
+        ThirdPartyOAuthToken.tenant_id == db.tenant_id,
+        ThirdPartyOAuthToken.provider == 'shopify',
+        ThirdPartyOAuthToken.shop_domain == shop_domain
+    ).first()
+    return row.user_id if row else None
+
+def _settle(session: Session, event_ids: List[UUID], status: str, error: Optional[str] = None) -> None:
+    if not event_ids:
+        return
+    table = ShopifyWebhook.__table__
+    session.execute(
+        update(table)
+        .where(table.c.id.in_(event_ids))
+        .values(processing_status=status, processed_at=func.now(), processing_error=error)
+    )
+    session.commit()
+
+def _release(session: Session, event_ids: List[UUID], error: str) -> None:
+    """Return events to the queue after a transient failure, failing them once attempts run out"""
+    if not event_ids:
+        return
+    table = ShopifyWebhook.__table__
+    session.execute(
+        update(table)
+        # Events already settled before the failure keep their outcome
+        .where(table.c.id.in_(event_ids), table.c.processing_status == 'processing')
+        .values(
+            processing_status=case((table.c.retry_count >= WEBHOOK_MAX_ATTEMPTS, 'failed'), else_='pending'),
+            processing_error=error
+        )
+    )
+    session.commit()
@@ -73,7 +73,7 @@ async def get_templates(
     )
 
 @router.get("/stats", response_model=TemplateStatsResponse)
-async def get_template_stats(
+def get_template_stats(
     current_user: ActiveUserDep,
     template_service: TemplateService = Depends(get_template_service)
 ):
@@ -89,7 +89,7 @@ async def get_etsy_taxonomies(
     return template_service.get_etsy_taxonomies(current_user.get_uuid())
 
 @router.get("/etsy/shop-sections", response_model=List[EtsyShopSectionResponse])
-async def get_etsy_shop_sections(
+def get_etsy_shop_sections(
     current_user: ActiveUserDep,
     template_service: TemplateService = Depends(get_template_service)
 ):
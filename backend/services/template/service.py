@@ -28,6 +28,7 @@ from common.exceptions import (
     ValidationError
 )
 from common.database import DatabaseManager
+from services.common.cache import cache_tenant_data
 
 logger = logging.getLogger(__name__)
 
@@ -347,6 +348,7 @@ class TemplateService:
             total_failed=len(failed)
         )
 
+    @cache_tenant_data(expire=300, namespace="template.stats", tags=("templates:{user_id}",))
     def get_template_stats(self, user_id: UUID) -> TemplateStatsResponse:
         """Get template statistics for user"""
         try:
@@ -407,6 +409,7 @@ class TemplateService:
         logger.info(f"Getting Etsy taxonomies for user {user_id}")
         return []
 
+    @cache_tenant_data(expire=3600, namespace="template.etsy_shop_sections", tags=("integration:etsy",))
     def get_etsy_shop_sections(self, user_id: UUID) -> List[EtsyShopSectionResponse]:
         """Get Etsy shop sections via API"""
         # This would integrate with Etsy API using stored OAuth tokens
@@ -85,6 +85,11 @@ async def search_users(
     per_page: int = Query(10, ge=1, le=100, description="Items per page"),
     sort_by: str = Query("created_at", regex="^(created_at|last_login|email|shop_name)$"),
     sort_order: str = Query("desc", regex="^(asc|desc)$"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
+    use_cursor: bool = Query(False, description="Use cursor pagination (sorted by created_at, page ignored)"),
+    include_total: Optional[bool] = Query(
+        None, description="Include total_count (requires a full count query); by default only without a cursor"
+    ),
     user_service: UserService = Depends(get_user_service)
 ):
     """Search users with filters and pagination"""
@@ -99,7 +104,10 @@ async def search_users(
             page=page,
             per_page=per_page,
             sort_by=sort_by,
-            sort_order=sort_order
+            sort_order=sort_order,
+            cursor=cursor,
+            use_cursor=use_cursor,
+            include_total=include_total
         )
         
         return user_service.search_users(search_request)
@@ -109,6 +117,11 @@ async def search_users(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=str(e)
         )
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.detail
+        )
     except Exception as e:
         logger.error(f"Search users error: {str(e)}")
         raise HTTPException(
@@ -67,6 +67,9 @@ class UserSearchRequest(BaseModel):
     per_page: int = Field(10, ge=1, le=100)
     sort_by: Optional[str] = Field("created_at", pattern="^(created_at|last_login|email|shop_name)$")
     sort_order: Optional[str] = Field("desc", pattern="^(asc|desc)$")
+    cursor: Optional[str] = None  # Opaque keyset cursor, sorts by created_at
+    use_cursor: bool = False
+    include_total: Optional[bool] = None  # By default only without a cursor
 
 class BulkUserActionRequest(BaseModel):
     user_ids: List[UUID] = Field(..., min_items=1, max_items=100)
@@ -130,12 +133,13 @@ class UserWithProfileResponse(UserDetailResponse):
 
 class UserListResponse(BaseModel):
     users: List[UserResponse]
-    total_count: int
-    page: int
+    total_count: Optional[int] = None  # None when the count was skipped
+    page: Optional[int] = None  # None in cursor mode
     per_page: int
-    total_pages: int
+    total_pages: Optional[int] = None
     has_next: bool
     has_prev: bool
+    next_cursor: Optional[str] = None
 
 class UserStatsResponse(BaseModel):
     total_users: int
@@ -19,6 +19,7 @@ from database.entities import (
 )
 
 from common.auth import get_password_hash
+from common.pagination import apply_keyset, fetch_keyset_page
 from common.exceptions import (
     ValidationError, UserNotFound, DuplicateEmailError,
     PermissionError, ServiceError
@@ -430,8 +431,29 @@ class UserService:
             if search_data.created_before:
                 query = query.filter(User.created_at <= search_data.created_before)
             
-            # Get total count
-            total_count = query.count()
+            # Get total count (optional, it scans every matching row)
+            include_total = search_data.include_total
+            if include_total is None:
+                include_total = search_data.cursor is None
+            total_count = query.count() if include_total else None
+            
+            if search_data.cursor or search_data.use_cursor:
+                query = apply_keyset(
+                    query, User.created_at, User.id, search_data.cursor,
+                    descending=search_data.sort_order != "asc"
+                )
+                users, next_cursor = fetch_keyset_page(query, search_data.per_page)
+                
+                return UserListResponse(
+                    users=[UserResponse.from_orm(user) for user in users],
+                    total_count=total_count,
+                    page=None,
+                    per_page=search_data.per_page,
+                    total_pages=None,
+                    has_next=next_cursor is not None,
+                    has_prev=search_data.cursor is not None,
+                    next_cursor=next_cursor
+                )
             
             # Apply sorting
             if search_data.sort_by == "email":
@@ -448,13 +470,16 @@ class UserService:
             else:
                 query = query.order_by(desc(sort_column))
             
-            # Apply pagination
+            # Apply pagination, fetching one extra row to detect a next page
             offset = (search_data.page - 1) * search_data.per_page
-            users = query.offset(offset).limit(search_data.per_page).all()
+            users = query.offset(offset).limit(search_data.per_page + 1).all()
+            has_next = len(users) > search_data.per_page
+            users = users[:search_data.per_page]
             
             # Calculate pagination info
-            total_pages = (total_count + search_data.per_page - 1) // search_data.per_page
-            has_next = search_data.page < total_pages
+            total_pages = None
+            if total_count is not None:
+                total_pages = (total_count + search_data.per_page - 1) // search_data.per_page
             has_prev = search_data.page > 1
             
             user_responses = [UserResponse.from_orm(user) for user in users]
@@ -0,0 +1,194 @@
+"""
+Two-tier tenant cache against an in-memory Redis: reads fall through the
+local LRU to Redis to the wrapped method, entries expire, tag bumps (direct
+or after a commit) invalidate dependent entries, the recompute lock is only
+released by its owner, stale entries are served while another process
+refreshes, and results rejected by cache_if are never stored.
+"""
+
+import uuid
+from collections import Counter
+from types import SimpleNamespace
+from typing import Dict
+
+import fakeredis
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from services.common import cache
+from services.common.cache import TenantCache, cache_stats, cache_tenant_data, invalidate_tags
+from services.common.cache_tags import mark_cache_tags
+
+class Clock:
+    """Stands in for the time module inside cache, so expiry needs no sleeping"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(cache, 'redis_client', client)
+    monkeypatch.setattr(cache, '_redis_retry_at', 0.0)
+    monkeypatch.setattr(cache, '_local', cache._LocalLRU(100))
+    monkeypatch.setattr(cache, '_local_tags', cache._TagVersions(cache.TAG_VERSION_TTL))
+    monkeypatch.setattr(cache, '_flights', cache._SingleFlight())
+    monkeypatch.setattr(cache, '_stats', Counter())
+    return client
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, 'time', clock)
+    return clock
+
+class Totals:
+    """A service whose methods count how often they really ran"""
+
+    def __init__(self, tenant_id: str):
+        self.db = SimpleNamespace(tenant_id=tenant_id)
+        self.calls = 0
+        self.fail = False
+
+    def _compute(self, user_id: str) -> Dict[str, int]:
+        if self.fail:
+            raise RuntimeError("marketplace down")
+        self.calls += 1
+        return {'calls': self.calls}
+
+    @cache_tenant_data(expire=60, namespace="test.totals", tags=("orders:{user_id}",), early_refresh_beta=0)
+    def totals(self, user_id: str) -> Dict[str, int]:
+        return self._compute(user_id)
+
+    @cache_tenant_data(expire=60, namespace="test.stale", stale_ttl=300, early_refresh_beta=0)
+    def stale_totals(self, user_id: str) -> Dict[str, int]:
+        return self._compute(user_id)
+
+    @cache_tenant_data(expire=60, namespace="test.partial", cache_if=lambda result: result['calls'] > 1,
+                       early_refresh_beta=0)
+    def partial_totals(self, user_id: str) -> Dict[str, int]:
+        return self._compute(user_id)
+
+@pytest.fixture
+def service(tenant_id):
+    return Totals(tenant_id)
+
+def _cache_key(service: Totals, namespace: str, *args) -> str:
+    return TenantCache(service.db.tenant_id, namespace).cache_key(cache._argument_key(args, {}))
+
+def test_reads_fall_through_local_then_redis(fake_redis, clock, service):
+    assert service.totals('u1') == {'calls': 1}
+    assert service.totals('u1') == {'calls': 1}
+    assert cache_stats()['test.totals.local_hits'] == 1
+
+    # Another process: nothing local, the Redis copy is used and kept locally
+    cache._local = cache._LocalLRU(100)
+    assert service.totals('u1') == {'calls': 1}
+    assert cache_stats()['test.totals.redis_hits'] == 1
+
+    fake_redis.flushall()
+    assert service.totals('u1') == {'calls': 1}
+    assert cache_stats()['test.totals.local_hits'] == 2
+    assert service.calls == 1
+
+def test_entries_expire(fake_redis, clock, service):
+    service.totals('u1')
+
+    clock.sleep(59)
+    assert service.totals('u1') == {'calls': 1}
+
+    clock.sleep(2)
+    assert service.totals('u1') == {'calls': 2}
+
+def test_bumped_tag_invalidates_dependent_entries(fake_redis, clock, service):
+    service.totals('u1')
+    service.totals('u2')
+
+    invalidate_tags(service.db.tenant_id, ['orders:u1'])
+
+    assert service.totals('u1') == {'calls': 3}
+    assert service.totals('u2') == {'calls': 2}
+
+    # Another process learns the new version from Redis once its copy expires
+    cache._local_tags = cache._TagVersions(cache.TAG_VERSION_TTL)
+    assert service.totals('u1') == {'calls': 3}
+
+def test_tags_are_bumped_after_commit_only(fake_redis, clock, service):
+    session = Session(bind=create_engine("sqlite://"))
+    db = SimpleNamespace(db=session, tenant_id=service.db.tenant_id)
+    service.totals('u1')
+
+    session.execute(text("SELECT 1"))
+    mark_cache_tags(db, 'orders:u1')
+    session.rollback()
+    assert service.totals('u1') == {'calls': 1}
+
+    session.execute(text("SELECT 1"))
+    mark_cache_tags(db, 'orders:u1')
+    session.commit()
+    assert service.totals('u1') == {'calls': 2}
+    session.close()
+
+def test_lock_is_only_released_by_its_owner(fake_redis, tenant_id):
+    tenant_cache = TenantCache(tenant_id, "test.lock")
+    token = tenant_cache.acquire_lock('key')
+
+    assert token is not None
+    assert tenant_cache.acquire_lock('key') is None
+
+    tenant_cache.release_lock('key', uuid.uuid4().hex)
+    assert fake_redis.get(tenant_cache.lock_key('key')) == token.encode()
+
+    tenant_cache.release_lock('key', token)
+    assert fake_redis.get(tenant_cache.lock_key('key')) is None
+    assert tenant_cache.acquire_lock('key') is not None
+
+def test_recompute_releases_its_lock(fake_redis, clock, service):
+    service.totals('u1')
+    service.fail = True
+    clock.sleep(61)
+
+    with pytest.raises(RuntimeError):
+        service.totals('u1')
+
+    assert fake_redis.keys(f"{cache.KEY_VERSION}:tenant:{service.db.tenant_id}:lock:*") == []
+
+def test_stale_entry_served_while_another_process_refreshes(fake_redis, clock, service):
+    assert service.stale_totals('u1') == {'calls': 1}
+    clock.sleep(61)
+
+    # Another process holds the recompute lock
+    lock_key = TenantCache(service.db.tenant_id, "test.stale").lock_key(cache._argument_key(('u1',), {}))
+    fake_redis.set(lock_key, 'other-process')
+
+    assert service.stale_totals('u1') == {'calls': 1}
+    assert service.calls == 1
+    assert cache_stats()['test.stale.stale_served'] == 1
+
+    fake_redis.delete(lock_key)
+    assert service.stale_totals('u1') == {'calls': 2}
+
+def test_stale_entry_served_when_refresh_fails(fake_redis, clock, service):
+    service.stale_totals('u1')
+    service.fail = True
+    clock.sleep(61)
+
+    assert service.stale_totals('u1') == {'calls': 1}
+
+def test_rejected_results_are_not_stored(fake_redis, clock, service):
+    assert service.partial_totals('u1') == {'calls': 1}
+    assert fake_redis.get(_cache_key(service, "test.partial", 'u1')) is None
+
+    assert service.partial_totals('u1') == {'calls': 2}
+    assert service.partial_totals('u1') == {'calls': 2}
+    assert fake_redis.get(_cache_key(service, "test.partial", 'u1')) is not None
@@ -0,0 +1,89 @@
+"""
+Mockup compositing: the premultiplied blend modes match the W3C compositing
+formulas, rendered masks and opacity scale the design's coverage, and
+template pixels outside the design's region are copied unchanged.
+"""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from services.mockup.compositing import CompositeSettings, blend, composite_array, render_mask
+
+def _separable(mode, cb, cs):
+    """W3C B(Cb, Cs) on non-premultiplied colors"""
+    if mode == 'multiply':
+        return cb * cs
+    if mode == 'screen':
+        return cb + cs - cb * cs
+    if mode == 'overlay':
+        return np.where(cb <= 0.5, 2 * cb * cs, 1 - 2 * (1 - cb) * (1 - cs))
+    return cs
+
+def _random_layer(rng, shape):
+    """Non-premultiplied colors, alphas including fully transparent and opaque, and the premultiplied layer"""
+    color = rng.random(shape + (3,))
+    alpha = rng.choice([0.0, 0.25, 0.6, 1.0], size=shape + (1,))
+    return color, alpha, np.concatenate([color * alpha, alpha], axis=-1).astype(np.float32)
+
+@pytest.mark.parametrize('mode', ['normal', 'multiply', 'screen', 'overlay'])
+def test_blend_matches_w3c_formulas(mode):
+    rng = np.random.default_rng(7)
+    cb, ab, backdrop = _random_layer(rng, (6, 6))
+    cs, as_, source = _random_layer(rng, (6, 6))
+
+    result = blend(backdrop, source, mode)
+
+    # co = cs * (1 - ab) + cb * (1 - as) + as * ab * B(Cb, Cs), with cs and cb premultiplied
+    expected_color = cs * as_ * (1 - ab) + cb * ab * (1 - as_) + as_ * ab * _separable(mode, cb, cs)
+    np.testing.assert_allclose(result[..., :3], expected_color, atol=1e-5)
+    np.testing.assert_allclose(result[..., 3:], as_ + ab * (1 - as_), atol=1e-6)
+
+def test_render_mask_opacity_and_invert():
+    mask = np.asarray(render_mask([{'type': 'rect', 'x': 1, 'y': 1, 'width': 3, 'height': 2, 'opacity': 0.5}], (6, 4)))
+
+    expected = np.zeros((4, 6), dtype=np.uint8)
+    expected[1:3, 1:4] = 128
+    np.testing.assert_array_equal(mask, expected)
+
+    inverted = np.asarray(render_mask([{'type': 'rect', 'x': 1, 'y': 1, 'width': 3, 'height': 2, 'invert': True}], (6, 4)))
+    np.testing.assert_array_equal(inverted, np.where(expected, 0, 255))
+
+    assert render_mask([], (6, 4)) is None
+
+def _opaque_layer(size, rgb):
+    layer = np.ones((size, size, 4), dtype=np.float32)
+    layer[..., :3] = np.asarray(rgb, dtype=np.float32) / 255.0
+    return layer
+
+@pytest.mark.parametrize('mask_opacity, opacity', [(1.0, 1.0), (1.0, 0.5), (0.5, 1.0), (0.5, 0.5)])
+def test_mask_and_opacity_scale_coverage(mask_opacity, opacity):
+    template = np.full((8, 8, 4), 255, dtype=np.uint8)
+    template[..., :3] = 100
+    settings = CompositeSettings(
+        masks=[{'type': 'rect', 'x': 2, 'y': 2, 'width': 2, 'height': 4, 'opacity': mask_opacity}],
+        opacity=opacity
+    )
+
+    result = composite_array(template, Image.new('RGBA', (1, 1)), settings, layer=(_opaque_layer(4, (200, 40, 0)), 2, 2))
+
+    coverage = round(255 * mask_opacity) / 255 * opacity
+    expected = np.round(np.array([200, 40, 0]) * coverage + 100 * (1 - coverage))
+    np.testing.assert_allclose(result[2:6, 2:4, :3], np.broadcast_to(expected, (4, 2, 3)), atol=1)
+    # Inside the layer but outside the mask the template shows through
+    np.testing.assert_array_equal(result[2:6, 4:6], template[2:6, 4:6])
+    assert (result[..., 3] == 255).all()
+
+def test_pixels_outside_the_design_region_are_unchanged():
+    rng = np.random.default_rng(3)
+    template = rng.integers(0, 256, size=(10, 12, 4), dtype=np.uint8)
+    original = template.copy()
+
+    result = composite_array(template, Image.new('RGBA', (1, 1)), CompositeSettings(blend_mode='multiply'),
+                             layer=(_opaque_layer(3, (10, 20, 30)), 4, 5))
+
+    outside = np.ones((10, 12), dtype=bool)
+    outside[5:8, 4:7] = False
+    np.testing.assert_array_equal(result[outside], original[outside])
+    assert not np.array_equal(result[5:8, 4:7], original[5:8, 4:7])
+    np.testing.assert_array_equal(template, original)
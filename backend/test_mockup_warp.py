@@ -0,0 +1,79 @@
+"""
+Mockup warps: a four-corner homography maps the unit square onto its points,
+the cells of a mesh grid meet without gaps or jumps at their shared edges,
+and grids are cached per points and template size.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from services.mockup import warp
+from services.mockup.warp import WarpGrid, get_warp_grid, homography
+
+UNIT = [(0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0)]
+
+def _apply(matrix, point):
+    x, y, w = matrix @ np.array([point[0], point[1], 1.0])
+    return x / w, y / w
+
+def test_homography_maps_unit_square_onto_corners():
+    corners = [(12.0, 8.0), (90.5, 15.0), (80.0, 70.25), (5.0, 60.0)]
+
+    matrix = homography(UNIT, corners)
+
+    for source, target in zip(UNIT, corners):
+        np.testing.assert_allclose(_apply(matrix, source), target, atol=1e-9)
+    # The inverse direction, as WarpGrid.build uses it
+    inverse = homography(corners, UNIT)
+    for source, target in zip(corners, UNIT):
+        np.testing.assert_allclose(_apply(inverse, source), target, atol=1e-9)
+
+def _full(grid: WarpGrid, values):
+    full = np.full(grid.width * grid.height, np.nan, dtype=np.float32)
+    full[grid.positions] = values
+    return full.reshape(grid.height, grid.width)
+
+def test_mesh_cells_meet_without_seams():
+    # Straight outer edges, a displaced interior point so the four cells are different quads
+    points = [
+        [(0, 0), (11.3, 0), (24, 0)],
+        [(0, 9.7), (13.6, 7.2), (24, 8.4)],
+        [(0, 18), (10.2, 18), (24, 18)]
+    ]
+
+    grid = WarpGrid.build(points, (40, 30))
+    u, v = _full(grid, grid.u), _full(grid, grid.v)
+
+    # Every pixel center inside the outer rectangle falls in some cell
+    assert (grid.left, grid.top) == (0, 0)
+    assert not np.isnan(u[:18, :24]).any()
+    assert np.isnan(u[18:, :]).all() and np.isnan(u[:, 24:]).all()
+    # Design coordinates keep rising across the shared cell edges
+    assert (np.diff(u[:18, :24], axis=1) > 0).all()
+    assert (np.diff(v[:18, :24], axis=0) > 0).all()
+
+    # Mapping each pixel's design coordinates forward through its cell lands back on the pixel
+    for y in range(18):
+        for x in range(24):
+            column, row = min(int(u[y, x] * 2), 1), min(int(v[y, x] * 2), 1)
+            corners = [points[row][column], points[row][column + 1], points[row + 1][column + 1], points[row + 1][column]]
+            local = (u[y, x] * 2 - column, v[y, x] * 2 - row)
+            np.testing.assert_allclose(_apply(homography(UNIT, corners), local), (x + 0.5, y + 0.5), atol=1e-3)
+
+@pytest.fixture
+def grids(monkeypatch):
+    monkeypatch.setattr(warp, '_grids', OrderedDict())
+    return warp._grids
+
+def test_grids_are_cached_per_points_and_size(grids):
+    corners = [[10, 10], [50, 12], [48, 40], [8, 38]]
+
+    first = get_warp_grid(corners, (64, 48))
+
+    assert get_warp_grid(corners, (64, 48)) is first
+    assert get_warp_grid([{'x': x, 'y': y} for x, y in corners], (64, 48)) is first
+    assert get_warp_grid(corners, (64, 50)) is not first
+    assert len(grids) == 2
+    assert get_warp_grid(corners[:3], (64, 48)) is None
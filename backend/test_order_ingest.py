@@ -0,0 +1,113 @@
+"""
+Bulk marketplace ingestion: inserts are told apart from updates, unchanged
+re-imports write nothing, a key repeated within one chunk is applied once,
+status history is only added on a status change, and item-derived totals
+survive a later payload without items.
+"""
+
+import uuid
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import insert
+
+from common.database import DatabaseManager
+from database.entities import Order, OrderStatusHistory, User
+from services.order.ingest import OrderIngestor
+from services.order.models import MarketplaceOrder, MarketplaceOrderItem, OrderPlatform, OrderStatus
+
+def _order(external_id: str, status: OrderStatus = OrderStatus.PENDING, items: int = 2, **values) -> MarketplaceOrder:
+    return MarketplaceOrder(
+        platform=OrderPlatform.ETSY,
+        external_id=external_id,
+        status=status,
+        total_amount=Decimal('25'),
+        items=[
+            MarketplaceOrderItem(product_name=f"Print {index}", quantity=2, unit_price=Decimal('5'))
+            for index in range(items)
+        ],
+        **values
+    )
+
+@pytest.fixture
+def user_id(pg_session, tenant_id):
+    user_id = uuid.uuid4()
+    pg_session.execute(insert(User.__table__).values(
+        id=user_id, tenant_id=tenant_id, email=f"{user_id}@example.com", hashed_password='x', shop_name='Test shop'
+    ))
+    pg_session.commit()
+    return user_id
+
+@pytest.fixture
+def ingestor(pg_session, tenant_id):
+    return OrderIngestor(DatabaseManager(pg_session, tenant_id))
+
+def _orders(pg_session, tenant_id):
+    pg_session.expire_all()
+    return {order.external_id: order for order in pg_session.query(Order).filter(Order.tenant_id == tenant_id)}
+
+def _history(pg_session, order_id):
+    return [
+        (row.old_status, row.new_status) for row in pg_session.query(OrderStatusHistory)
+        .filter(OrderStatusHistory.order_id == order_id)
+        .order_by(OrderStatusHistory.created_at, OrderStatusHistory.old_status.nullsfirst())
+    ]
+
+def test_inserts_and_updates_are_told_apart(pg_session, tenant_id, user_id, ingestor):
+    first = ingestor.ingest(user_id, [_order('1'), _order('2')])
+    assert (first.created, first.updated, first.unchanged) == (2, 0, 0)
+
+    second = ingestor.ingest(user_id, [_order('1', OrderStatus.SHIPPED), _order('2'), _order('3')])
+    assert (second.created, second.updated, second.unchanged) == (1, 1, 1)
+    assert sorted(second.order_ids) == ['1', '3']
+
+    orders = _orders(pg_session, tenant_id)
+    assert second.order_ids['1'] == first.order_ids['1'] == orders['1'].id
+    assert orders['1'].status == 'shipped'
+    assert all(order.internal_order_number for order in orders.values())
+
+def test_unchanged_reimport_writes_nothing(pg_session, tenant_id, user_id, ingestor):
+    ingestor.ingest(user_id, [_order('1'), _order('2')])
+    updated_at = {external_id: order.updated_at for external_id, order in _orders(pg_session, tenant_id).items()}
+
+    result = ingestor.ingest(user_id, [_order('1'), _order('2')])
+
+    assert (result.created, result.updated, result.unchanged) == (0, 0, 2)
+    assert result.order_ids == {}
+    assert {external_id: order.updated_at for external_id, order in _orders(pg_session, tenant_id).items()} == updated_at
+
+def test_duplicate_key_in_one_chunk_keeps_the_last(pg_session, tenant_id, user_id, ingestor):
+    result = ingestor.ingest(user_id, [_order('1'), _order('1', OrderStatus.SHIPPED), _order('2')])
+
+    assert (result.created, result.updated, result.unchanged) == (2, 0, 0)
+    orders = _orders(pg_session, tenant_id)
+    assert sorted(orders) == ['1', '2']
+    assert orders['1'].status == 'shipped'
+
+def test_history_only_on_status_change(pg_session, tenant_id, user_id, ingestor):
+    order_id = ingestor.ingest(user_id, [_order('1')]).order_ids['1']
+    assert _history(pg_session, order_id) == [(None, 'pending')]
+
+    ingestor.ingest(user_id, [_order('1', customer_name='Renamed buyer')])
+    assert _history(pg_session, order_id) == [(None, 'pending')]
+
+    ingestor.ingest(user_id, [_order('1', OrderStatus.SHIPPED, customer_name='Renamed buyer')])
+    assert _history(pg_session, order_id) == [(None, 'pending'), ('pending', 'shipped')]
+
+def test_item_totals_survive_a_payload_without_items(pg_session, tenant_id, user_id, ingestor):
+    ingestor.ingest(user_id, [_order('1', items=3)])
+
+    result = ingestor.ingest(user_id, [_order('1', OrderStatus.SHIPPED, items=0)])
+
+    assert result.updated == 1
+    order = _orders(pg_session, tenant_id)['1']
+    assert order.status == 'shipped'
+    assert (order.items_count, order.total_quantity, order.subtotal) == (3, 6, Decimal('30'))
+
+def test_reported_subtotal_is_updated(pg_session, tenant_id, user_id, ingestor):
+    ingestor.ingest(user_id, [_order('1', subtotal=Decimal('20'))])
+
+    result = ingestor.ingest(user_id, [_order('1', subtotal=Decimal('18'))])
+
+    assert result.updated == 1
+    assert _orders(pg_session, tenant_id)['1'].subtotal == Decimal('18')
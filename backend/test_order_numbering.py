@@ -0,0 +1,87 @@
+"""
+Internal order numbers stay unique under concurrent allocation, including
+orders created in parallel through OrderService, and continue after numbers
+issued before the day's counter row existed.
+"""
+
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from common.database import DatabaseManager
+from database.entities import Order, User
+from services.order.models import OrderCreate, OrderItemCreate
+from services.order.numbering import OrderNumberAllocator
+from services.order.service import OrderService
+
+# Thousands of parallel allocations, so a lost update or double grant would show up
+ALLOCATIONS = 5000
+BLOCK_REQUESTS = 2000
+CREATED_ORDERS = 500
+
+def _sequence(number: str) -> int:
+    return int(number.rsplit('-', 1)[1])
+
+def test_concurrent_allocation_never_repeats(pg_engine, tenant_id):
+    allocator = OrderNumberAllocator(pg_engine)
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        numbers = list(pool.map(lambda _: allocator.next_number(tenant_id), range(ALLOCATIONS)))
+
+    assert len(set(numbers)) == ALLOCATIONS
+    assert sorted(_sequence(number) for number in numbers) == list(range(1, ALLOCATIONS + 1))
+
+def test_concurrent_block_allocation_never_repeats(pg_engine, tenant_id):
+    # Separate allocators stand in for separate processes, each holding its own blocks
+    allocators = [OrderNumberAllocator(pg_engine, block_size=7) for _ in range(4)]
+
+    def allocate(index: int):
+        return allocators[index % len(allocators)].allocate(tenant_id, 1 + index % 3)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        numbers = [number for batch in pool.map(allocate, range(BLOCK_REQUESTS)) for number in batch]
+
+    assert len(numbers) == sum(1 + index % 3 for index in range(BLOCK_REQUESTS))
+    assert len(set(numbers)) == len(numbers)
+
+def test_counter_continues_after_existing_numbers(pg_engine, tenant_id):
+    prefix = datetime.now(timezone.utc).strftime("%Y%m%d")
+    with pg_engine.begin() as conn:
+        conn.execute(insert(Order.__table__), [
+            {'tenant_id': tenant_id, 'platform': 'manual', 'total_amount': 10, 'internal_order_number': f"ORD-{prefix}-{sequence:04d}"}
+            for sequence in (1, 2, 12)
+        ])
+
+    allocator = OrderNumberAllocator(pg_engine)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        numbers = list(pool.map(lambda _: allocator.next_number(tenant_id), range(20)))
+
+    assert sorted(_sequence(number) for number in numbers) == list(range(13, 33))
+
+def test_concurrent_create_order_assigns_unique_numbers(pg_engine, tenant_id):
+    user_id = uuid.uuid4()
+    with pg_engine.begin() as conn:
+        conn.execute(insert(User.__table__).values(
+            id=user_id, tenant_id=tenant_id, email=f"{user_id}@example.com", hashed_password='x', shop_name='Test shop'
+        ))
+    make_session = sessionmaker(bind=pg_engine, autoflush=False)
+    order = OrderCreate(total_amount=Decimal('20'), items=[
+        OrderItemCreate(product_name='Print', quantity=2, unit_price=Decimal('10'), total_price=Decimal('20'))
+    ])
+
+    def create(_):
+        # One session per call, as each request gets its own
+        session = make_session()
+        try:
+            return OrderService(DatabaseManager(session, tenant_id)).create_order(order, user_id).internal_order_number
+        finally:
+            session.close()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        numbers = list(pool.map(create, range(CREATED_ORDERS)))
+
+    assert len(set(numbers)) == CREATED_ORDERS
+    assert sorted(_sequence(number) for number in numbers) == list(range(1, CREATED_ORDERS + 1))
@@ -0,0 +1,139 @@
+"""
+Listing orders issues a fixed number of queries, however many orders are on
+the page and however many items each has (no per-order item lookups), and
+cursor pages after the first skip the total count.
+"""
+
+import uuid
+from contextlib import contextmanager
+from typing import List, Optional
+
+import pytest
+from sqlalchemy import event, insert
+
+from common.database import DatabaseManager
+from database.entities import Order, OrderItem, User
+from services.order.service import OrderService
+
+ADDRESS = {'line1': '1 Main St', 'city': 'Portland', 'state': 'OR', 'zip': '97201', 'country': 'US'}
+
+def _create_user(pg_session, tenant_id: str) -> uuid.UUID:
+    user_id = uuid.uuid4()
+    pg_session.execute(insert(User.__table__).values(
+        id=user_id, tenant_id=tenant_id, email=f"{user_id}@example.com", hashed_password='x', shop_name='Test shop'
+    ))
+    return user_id
+
+def _create_orders(pg_session, tenant_id: str, user_id: uuid.UUID, count: int,
+                   platform: str = 'manual', etsy_listing_id: Optional[int] = None) -> None:
+    order_ids = [uuid.uuid4() for _ in range(count)]
+    pg_session.execute(insert(Order.__table__), [
+        {'id': order_id, 'tenant_id': tenant_id, 'user_id': user_id, 'platform': platform, 'total_amount': 30,
+         'billing_address': ADDRESS, 'shipping_address': ADDRESS}
+        for order_id in order_ids
+    ])
+    pg_session.execute(insert(OrderItem.__table__), [
+        {'tenant_id': tenant_id, 'user_id': user_id, 'order_id': order_id, 'product_name': f"Item {index}",
+         'quantity': 1, 'unit_price': 10, 'total_price': 10, 'etsy_listing_id': etsy_listing_id}
+        for order_id in order_ids for index in range(3)
+    ])
+    pg_session.flush()
+
+@contextmanager
+def _count_queries(engine):
+    statements: List[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+@pytest.fixture
+def service(pg_session, tenant_id):
+    return OrderService(DatabaseManager(pg_session, tenant_id))
+
+def test_order_page_query_count_does_not_grow_with_page_size(pg_engine, pg_session, tenant_id, service):
+    user_id = _create_user(pg_session, tenant_id)
+    _create_orders(pg_session, tenant_id, user_id, 40)
+
+    counts = {}
+    for page_size in (1, 10, 40):
+        with _count_queries(pg_engine) as statements:
+            page = service.get_orders(user_id, limit=page_size)
+        assert len(page.orders) == page_size
+        assert all(order.items_count == 3 for order in page.orders)
+        counts[page_size] = len(statements)
+
+    assert counts[1] == counts[10] == counts[40], counts
+
+def test_etsy_orders_query_count_does_not_grow_with_limit(pg_engine, pg_session, tenant_id, service):
+    user_id = _create_user(pg_session, tenant_id)
+    _create_orders(pg_session, tenant_id, user_id, 20, platform='etsy')
+
+    counts = {}
+    for limit in (1, 20):
+        with _count_queries(pg_engine) as statements:
+            orders = service.get_etsy_orders(user_id, limit=limit)
+        assert len(orders) == limit
+        assert all(len(order.items) == 3 for order in orders)
+        counts[limit] = len(statements)
+
+    assert counts[1] == counts[20], counts
+
+def test_listing_orders_query_count_does_not_grow_with_matches(pg_engine, pg_session, tenant_id, service):
+    user_id = _create_user(pg_session, tenant_id)
+    _create_orders(pg_session, tenant_id, user_id, 1, platform='etsy', etsy_listing_id=100)
+    _create_orders(pg_session, tenant_id, user_id, 20, platform='etsy', etsy_listing_id=200)
+
+    counts = {}
+    for listing_id, expected in ((100, 1), (200, 20)):
+        with _count_queries(pg_engine) as statements:
+            orders = service.get_orders_for_etsy_listing(user_id, listing_id)
+        assert len(orders) == expected
+        assert all(len(order.items) == 3 for order in orders)
+        counts[expected] = len(statements)
+
+    assert counts[1] == counts[20], counts
+
+def test_listing_orders_ignore_soft_deleted_items(pg_session, tenant_id, service):
+    user_id = _create_user(pg_session, tenant_id)
+    _create_orders(pg_session, tenant_id, user_id, 2, platform='etsy', etsy_listing_id=300)
+    deleted_order_id, kept_order_id = {
+        row.order_id for row in pg_session.query(OrderItem.order_id).filter(OrderItem.tenant_id == tenant_id)
+    }
+    pg_session.query(OrderItem).filter(OrderItem.order_id == deleted_order_id).update({'is_deleted': True})
+
+    orders = service.get_orders_for_etsy_listing(user_id, 300)
+
+    assert [order.id for order in orders] == [kept_order_id]
+
+def test_order_stats_query_count_does_not_grow_with_recent_orders(pg_engine, pg_session, tenant_id, service):
+    counts = {}
+    for order_count in (1, 10):
+        user_id = _create_user(pg_session, tenant_id)
+        _create_orders(pg_session, tenant_id, user_id, order_count)
+        with _count_queries(pg_engine) as statements:
+            stats = service.get_order_stats(user_id)
+        assert stats.total_orders == order_count
+        assert [len(order.items) for order in stats.recent_orders] == [3] * order_count
+        counts[order_count] = len(statements)
+
+    assert counts[1] == counts[10], counts
+
+def test_cursor_pages_skip_the_total_count(pg_engine, pg_session, tenant_id, service):
+    user_id = _create_user(pg_session, tenant_id)
+    _create_orders(pg_session, tenant_id, user_id, 5)
+
+    first = service.get_orders(user_id, limit=2, use_cursor=True)
+    assert first.total_count == 5
+
+    with _count_queries(pg_engine) as statements:
+        second = service.get_orders(user_id, limit=2, cursor=first.next_cursor)
+    assert second.total_count is None
+    assert not any('count(' in statement.lower() for statement in statements)
+
+    assert service.get_orders(user_id, limit=2, cursor=first.next_cursor, include_total=True).total_count == 5
@@ -0,0 +1,70 @@
+"""
+The orders triggers keep daily_order_rollups equal to a recount of orders
+through inserts, updates and deletes, and reinstalling them is a no-op once
+they are current.
+"""
+
+import uuid
+from decimal import Decimal
+
+from sqlalchemy import delete, event, insert, select, update
+
+from database.entities import DailyOrderRollup, Order, User
+from database.rollups import install_order_rollup_triggers
+
+def _rollups(conn, tenant_id: str):
+    rows = conn.execute(
+        select(DailyOrderRollup.platform, DailyOrderRollup.status,
+               DailyOrderRollup.order_count, DailyOrderRollup.total_amount)
+        .where(DailyOrderRollup.tenant_id == tenant_id, DailyOrderRollup.order_count != 0)
+    )
+    return {(row.platform, row.status): (row.order_count, row.total_amount) for row in rows}
+
+def test_rollups_follow_order_writes(pg_engine, tenant_id):
+    with pg_engine.begin() as conn:
+        install_order_rollup_triggers(conn)
+
+    user_id = uuid.uuid4()
+    order_ids = [uuid.uuid4() for _ in range(3)]
+    with pg_engine.begin() as conn:
+        conn.execute(insert(User.__table__).values(
+            id=user_id, tenant_id=tenant_id, email=f"{user_id}@example.com", hashed_password='x', shop_name='Test shop'
+        ))
+        conn.execute(insert(Order.__table__), [
+            {'id': order_id, 'tenant_id': tenant_id, 'user_id': user_id, 'platform': platform,
+             'status': 'pending', 'total_amount': amount}
+            for order_id, platform, amount in zip(order_ids, ('etsy', 'etsy', 'shopify'), (10, 15, 40))
+        ])
+        assert _rollups(conn, tenant_id) == {
+            ('etsy', 'pending'): (2, Decimal('25.00')),
+            ('shopify', 'pending'): (1, Decimal('40.00')),
+        }
+
+        conn.execute(update(Order.__table__).where(Order.id == order_ids[0]).values(status='completed', total_amount=12))
+        assert _rollups(conn, tenant_id) == {
+            ('etsy', 'pending'): (1, Decimal('15.00')),
+            ('etsy', 'completed'): (1, Decimal('12.00')),
+            ('shopify', 'pending'): (1, Decimal('40.00')),
+        }
+
+        conn.execute(update(Order.__table__).where(Order.id == order_ids[1]).values(is_deleted=True))
+        conn.execute(delete(Order.__table__).where(Order.id == order_ids[2]))
+        assert _rollups(conn, tenant_id) == {('etsy', 'completed'): (1, Decimal('12.00'))}
+
+def test_reinstall_skips_current_triggers(pg_engine):
+    with pg_engine.begin() as conn:
+        install_order_rollup_triggers(conn)
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(pg_engine, 'before_cursor_execute', record)
+    try:
+        with pg_engine.begin() as conn:
+            assert install_order_rollup_triggers(conn) is False
+    finally:
+        event.remove(pg_engine, 'before_cursor_execute', record)
+
+    assert not any('TRIGGER' in statement or 'FUNCTION' in statement for statement in statements)
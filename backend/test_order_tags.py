@@ -0,0 +1,25 @@
+"""
+Bulk "add tags" keeps each order's existing tags in their stored order and
+appends only the tags it does not have yet, in request order.
+"""
+
+import uuid
+
+from sqlalchemy import insert, select
+
+from common.database import DatabaseManager
+from database.entities import Order
+from services.order.service import OrderService
+
+def test_add_tags_keeps_existing_order_and_appends_new_tags(pg_session, tenant_id):
+    ids = [uuid.uuid4(), uuid.uuid4(), uuid.uuid4()]
+    pg_session.execute(insert(Order.__table__), [
+        {'id': ids[0], 'tenant_id': tenant_id, 'platform': 'manual', 'total_amount': 1, 'tags': ['zeta', 'alpha']},
+        {'id': ids[1], 'tenant_id': tenant_id, 'platform': 'manual', 'total_amount': 1, 'tags': []},
+        {'id': ids[2], 'tenant_id': tenant_id, 'platform': 'manual', 'total_amount': 1, 'tags': ['b', 'new', 'a']},
+    ])
+    OrderService(DatabaseManager(pg_session, tenant_id))._add_tags_to_orders(ids, ['new', 'm', 'new', 'alpha'], uuid.uuid4())
+    tags = dict(pg_session.execute(select(Order.id, Order.tags).where(Order.id.in_(ids))).all())
+    assert tags[ids[0]] == ['zeta', 'alpha', 'new', 'm']
+    assert tags[ids[1]] == ['new', 'm', 'alpha']
+    assert tags[ids[2]] == ['b', 'new', 'a', 'm', 'alpha']
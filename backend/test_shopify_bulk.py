@@ -0,0 +1,127 @@
+"""
+Shopify GraphQL bulk operations against a stub HTTP server: polling until a
+terminal status, streaming and regrouping the JSONL result, and writing it
+into the sync table as inserts then updates.
+"""
+
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from common.database import DatabaseManager
+from common.exceptions import ShopifyAPIError
+from database.entities import ShopifyProductSync
+from services.shopify import bulk
+from services.shopify.client import ShopifyAPIClient
+from services.shopify.models import ShopifySyncRequest
+from services.shopify.service import ShopifyService
+
+OPERATION_ID = "gid://shopify/BulkOperation/1"
+
+def _product(product_id: int, *variant_ids: int):
+    gid = f"gid://shopify/Product/{product_id}"
+    return [{'id': gid, 'title': f"Product {product_id}"}] + [
+        {'id': f"gid://shopify/ProductVariant/{variant_id}", 'sku': f"SKU-{variant_id}", '__parentId': gid}
+        for variant_id in variant_ids
+    ]
+
+class StubShopify(ThreadingHTTPServer):
+    """Answers the bulk mutation, reports scripted statuses and serves the JSONL file"""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.statuses = []
+        self.polls = 0
+        self.lines = []
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body: bytes, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if 'bulkOperationRunQuery' in payload['query']:
+            data = {'bulkOperationRunQuery': {'bulkOperation': {'id': OPERATION_ID, 'status': 'CREATED'}, 'userErrors': []}}
+        else:
+            status = self.server.statuses[min(self.server.polls, len(self.server.statuses) - 1)]
+            self.server.polls += 1
+            url = f"{self.server.url}/result.jsonl" if status == 'COMPLETED' else None
+            error_code = 'INTERNAL_SERVER_ERROR' if status == 'FAILED' else None
+            data = {'node': {'id': OPERATION_ID, 'status': status, 'errorCode': error_code, 'objectCount': '0', 'url': url}}
+        self._send(json.dumps({'data': data}).encode(), 'application/json')
+
+    def do_GET(self):
+        self._send(''.join(json.dumps(line) + '\n' for line in self.server.lines).encode(), 'application/jsonl')
+
+@pytest.fixture
+def stub():
+    server = StubShopify()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def client(stub, monkeypatch):
+    client = ShopifyAPIClient()
+    client.set_credentials('test-token', f"stub-{uuid.uuid4().hex[:8]}")
+    monkeypatch.setattr(client, '_get_base_url', lambda: stub.url)
+    return client
+
+def test_poll_stops_when_completed(stub, client):
+    stub.statuses = ['CREATED', 'RUNNING', 'COMPLETED', 'RUNNING']
+
+    operation = client.wait_for_bulk_operation(client.run_bulk_query(bulk.products_query()), poll_interval=0)
+
+    assert operation['status'] == 'COMPLETED'
+    assert operation['url'] == f"{stub.url}/result.jsonl"
+    assert stub.polls == 3
+
+def test_poll_stops_when_failed(stub, client):
+    stub.statuses = ['RUNNING', 'FAILED', 'COMPLETED']
+
+    with pytest.raises(ShopifyAPIError, match='failed: INTERNAL_SERVER_ERROR'):
+        client.wait_for_bulk_operation(OPERATION_ID, poll_interval=0)
+    assert stub.polls == 2
+
+def test_download_regroups_children_by_parent_id(stub, client):
+    stub.lines = _product(1, 11, 12) + _product(2) + _product(3, 31)
+
+    grouped = list(bulk.group_bulk_records(client.iter_bulk_results(f"{stub.url}/result.jsonl")))
+
+    assert [(bulk.legacy_id(parent['id']), [bulk.legacy_id(child['id']) for child in children])
+            for parent, children in grouped] == [('1', ['11', '12']), ('2', []), ('3', ['31'])]
+    assert all(child['__parentId'] == parent['id'] for parent, children in grouped for child in children)
+
+def test_bulk_sync_inserts_new_and_updates_existing_rows(stub, client, pg_session, tenant_id):
+    service = ShopifyService(DatabaseManager(pg_session, tenant_id))
+    user_id = uuid.uuid4()
+    request = ShopifySyncRequest(sync_type='products', use_bulk_operation=True)
+    stub.statuses = ['COMPLETED']
+
+    stub.lines = _product(1, 11) + _product(2, 21, 22)
+    assert service._bulk_sync(client, user_id, 'products', request) == {'created': 2, 'updated': 0}
+
+    stub.lines = _product(1, 11, 12) + _product(2) + _product(3)
+    assert service._bulk_sync(client, user_id, 'products', request) == {'created': 1, 'updated': 2}
+
+    rows = {
+        row.shopify_product_id: row for row in pg_session.query(ShopifyProductSync).filter(
+            ShopifyProductSync.tenant_id == tenant_id, ShopifyProductSync.user_id == user_id
+        )
+    }
+    assert sorted(rows) == ['1', '2', '3']
+    assert [variant['sku'] for variant in rows['1'].shopify_data['variants']] == ['SKU-11', 'SKU-12']
+    assert rows['2'].shopify_data['variants'] == []
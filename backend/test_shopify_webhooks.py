@@ -0,0 +1,191 @@
+"""
+Shopify webhook queue: redeliveries dropped on insert, claims that skip rows
+another worker holds, reclaiming events a dead worker left in processing (or
+failing them once attempts run out), several events for one order collapsing
+to the newest payload, and one failing shop not stranding the rest.
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import delete, insert, select, text, update
+from sqlalchemy.orm import sessionmaker
+
+from common.database import DatabaseManager
+from database.entities import Order, ShopifyWebhook, ThirdPartyOAuthToken, User
+from services.shopify import webhooks
+from services.shopify.service import ShopifyService
+
+SHOP = "webhook-test.myshopify.com"
+
+def _order_payload(order_id: int, updated_at: datetime, financial_status: str = 'pending'):
+    return {
+        'id': order_id, 'name': f"#{order_id}", 'number': order_id, 'order_number': order_id,
+        'email': 'buyer@example.com', 'token': uuid.uuid4().hex, 'financial_status': financial_status,
+        'created_at': '2026-01-01T00:00:00+00:00', 'updated_at': updated_at.isoformat(),
+        'current_subtotal_price': '10.00', 'current_total_price': '10.00', 'subtotal_price': '10.00',
+        'total_line_items_price': '10.00', 'total_price': '10.00'
+    }
+
+@pytest.fixture
+def make_session(pg_engine):
+    return sessionmaker(bind=pg_engine, autoflush=False)
+
+@pytest.fixture
+def queue(pg_engine, tenant_id):
+    """Insert events for this tenant; every event is removed afterwards so other tests never claim them"""
+    def add(*payloads, topic='orders/updated', **values):
+        rows = [
+            {'id': uuid.uuid4(), 'tenant_id': tenant_id, 'webhook_id': uuid.uuid4().hex, 'topic': topic,
+             'shopify_shop_domain': SHOP, 'event_data': payload, 'processing_status': 'pending',
+             'retry_count': 0, **values}
+            for payload in payloads
+        ]
+        with pg_engine.begin() as conn:
+            conn.execute(insert(ShopifyWebhook.__table__), rows)
+        return [row['id'] for row in rows]
+
+    yield add
+    with pg_engine.begin() as conn:
+        conn.execute(delete(ShopifyWebhook.__table__).where(ShopifyWebhook.__table__.c.tenant_id == tenant_id))
+
+@pytest.fixture
+def connect_shop(pg_engine, tenant_id):
+    """A user with a Shopify connection for the shop"""
+    def connect(shop_domain=SHOP):
+        user_id = uuid.uuid4()
+        with pg_engine.begin() as conn:
+            conn.execute(insert(User.__table__).values(
+                id=user_id, tenant_id=tenant_id, email=f"{user_id}@example.com", hashed_password='x', shop_name='Test shop'
+            ))
+            conn.execute(insert(ThirdPartyOAuthToken.__table__).values(
+                id=uuid.uuid4(), tenant_id=tenant_id, user_id=user_id, provider='shopify', shop_domain=shop_domain,
+                access_token='x', expires_at=datetime.now(timezone.utc) + timedelta(days=365)
+            ))
+        return user_id
+
+    return connect
+
+def _statuses(pg_engine, ids):
+    table = ShopifyWebhook.__table__
+    with pg_engine.connect() as conn:
+        rows = conn.execute(select(table.c.id, table.c.processing_status, table.c.retry_count).where(table.c.id.in_(ids)))
+        return {row.id: (row.processing_status, row.retry_count) for row in rows}
+
+def test_redelivery_is_dropped(pg_session, tenant_id, queue):
+    service = ShopifyService(DatabaseManager(pg_session, tenant_id))
+    webhook_id = uuid.uuid4().hex
+    payload = _order_payload(1, datetime.now(timezone.utc))
+
+    assert service.record_webhook('orders/create', SHOP, webhook_id, payload, {}) is True
+    assert service.record_webhook('orders/create', SHOP, webhook_id, payload, {}) is False
+
+    assert pg_session.query(ShopifyWebhook).filter(ShopifyWebhook.webhook_id == webhook_id).count() == 1
+
+def test_claim_skips_rows_locked_by_another_worker(pg_engine, make_session, queue):
+    locked_id, *free_ids = queue(*[_order_payload(order_id, datetime.now(timezone.utc)) for order_id in (1, 2, 3)])
+    holder = make_session()
+    claimer = make_session()
+    try:
+        # Another worker's claim transaction is still holding this row
+        holder.execute(select(ShopifyWebhook.id).where(ShopifyWebhook.id == locked_id).with_for_update())
+        claimer.execute(text("SET LOCAL lock_timeout = '2s'"))
+
+        claimed = {event.id for event in webhooks._claim_batch(claimer, batch_size=100)}
+    finally:
+        holder.rollback()
+        holder.close()
+        claimer.close()
+
+    assert set(free_ids) <= claimed
+    assert locked_id not in claimed
+    statuses = _statuses(pg_engine, [locked_id, *free_ids])
+    assert statuses[locked_id] == ('pending', 0)
+    assert all(statuses[event_id] == ('processing', 1) for event_id in free_ids)
+
+def test_stale_claims_are_reclaimed(pg_engine, make_session, queue):
+    stale_since = datetime.now(timezone.utc) - timedelta(seconds=webhooks.WEBHOOK_CLAIM_TIMEOUT + 60)
+    stale_id, = queue(_order_payload(1, stale_since), processing_status='processing', retry_count=1)
+    fresh_id, = queue(_order_payload(2, stale_since), processing_status='processing', retry_count=1)
+    with pg_engine.begin() as conn:
+        conn.execute(update(ShopifyWebhook.__table__).where(ShopifyWebhook.__table__.c.id == stale_id).values(updated_at=stale_since))
+
+    session = make_session()
+    try:
+        claimed = {event.id for event in webhooks._claim_batch(session, batch_size=100)}
+    finally:
+        session.close()
+
+    assert stale_id in claimed
+    assert fresh_id not in claimed
+    assert _statuses(pg_engine, [stale_id])[stale_id] == ('processing', 2)
+
+def test_stale_claims_out_of_attempts_fail(pg_engine, make_session, queue):
+    stale_since = datetime.now(timezone.utc) - timedelta(seconds=webhooks.WEBHOOK_CLAIM_TIMEOUT + 60)
+    exhausted_id, = queue(_order_payload(1, stale_since), processing_status='processing',
+                          retry_count=webhooks.WEBHOOK_MAX_ATTEMPTS)
+    with pg_engine.begin() as conn:
+        conn.execute(update(ShopifyWebhook.__table__).where(ShopifyWebhook.__table__.c.id == exhausted_id).values(updated_at=stale_since))
+
+    session = make_session()
+    try:
+        claimed = {event.id for event in webhooks._claim_batch(session, batch_size=100)}
+    finally:
+        session.close()
+
+    assert exhausted_id not in claimed
+    assert _statuses(pg_engine, [exhausted_id])[exhausted_id] == ('failed', webhooks.WEBHOOK_MAX_ATTEMPTS)
+
+def test_events_for_one_order_collapse_to_newest_payload(pg_engine, make_session, tenant_id, queue, connect_shop, monkeypatch):
+    connect_shop()
+    monkeypatch.setattr(webhooks, 'SessionLocal', make_session)
+
+    order_id = 1000 + uuid.uuid4().int % 10**9
+    newest = datetime.now(timezone.utc)
+    event_ids = queue(
+        _order_payload(order_id, newest - timedelta(minutes=2), 'pending'),
+        _order_payload(order_id, newest, 'refunded'),
+        _order_payload(order_id, newest - timedelta(minutes=1), 'paid')
+    )
+    ignored_id, = queue({'id': 1}, topic='products/update')
+
+    totals = webhooks.drain_webhooks(batch_size=100)
+
+    assert totals == {'processed': 3, 'ignored': 1, 'failed': 0, 'retried': 0}
+    statuses = _statuses(pg_engine, event_ids + [ignored_id])
+    assert [statuses[event_id][0] for event_id in event_ids] == ['processed'] * 3
+    assert statuses[ignored_id][0] == 'ignored'
+
+    session = make_session()
+    try:
+        orders = session.query(Order).filter(Order.tenant_id == tenant_id, Order.external_id == str(order_id)).all()
+    finally:
+        session.close()
+    assert len(orders) == 1
+    assert orders[0].order_metadata['shopify_financial_status'] == 'refunded'
+    assert orders[0].order_metadata['shopify_updated_at'] == newest.isoformat()
+
+def test_failing_shop_does_not_strand_the_batch(pg_engine, make_session, queue, connect_shop, monkeypatch):
+    broken_shop = "broken-test.myshopify.com"
+    connect_shop()
+    shop_user_id = webhooks._shop_user_id
+
+    def lookup(db, shop_domain):
+        if shop_domain == broken_shop:
+            raise RuntimeError("connection lost")
+        return shop_user_id(db, shop_domain)
+
+    monkeypatch.setattr(webhooks, 'SessionLocal', make_session)
+    monkeypatch.setattr(webhooks, '_shop_user_id', lookup)
+
+    broken_id, = queue(_order_payload(1, datetime.now(timezone.utc)), shopify_shop_domain=broken_shop)
+    order_id = 1000 + uuid.uuid4().int % 10**9
+    working_id, = queue(_order_payload(order_id, datetime.now(timezone.utc)))
+
+    totals = webhooks.drain_webhooks(batch_size=100, max_batches=1)
+
+    assert totals == {'processed': 1, 'ignored': 0, 'failed': 0, 'retried': 1}
+    statuses = _statuses(pg_engine, [broken_id, working_id])
+    assert statuses[broken_id] == ('pending', 1)
+    assert statuses[working_id][0] == 'processed'
@@ -0,0 +1,73 @@
+"""
+Shared template cache: templates are decoded once and then mapped read-only,
+hits and misses are counted, and once the directory exceeds its budget the
+least recently used files are evicted.
+"""
+
+import os
+import time
+from collections import Counter
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from services.mockup import template_cache
+from services.mockup.template_cache import load_template, template_cache_stats
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    directory = tmp_path / 'cache'
+    monkeypatch.setattr(template_cache, 'TEMPLATE_CACHE_DIR', str(directory))
+    monkeypatch.setattr(template_cache, 'TEMPLATE_CACHE_MB', 1)
+    monkeypatch.setattr(template_cache, 'TOUCH_INTERVAL', 0)
+    monkeypatch.setattr(template_cache, '_stats', Counter())
+    return directory
+
+def _template(tmp_path, name, seed):
+    """A 320x320 template, about 0.4 MB once decoded, so three exceed the 1 MB budget"""
+    path = tmp_path / f"{name}.png"
+    pixels = np.random.default_rng(seed).integers(0, 256, size=(320, 320, 4), dtype=np.uint8)
+    Image.fromarray(pixels, 'RGBA').save(path)
+    return str(path)
+
+def _cached(cache_dir, path):
+    return cache_dir / f"template-{template_cache._file_digest(path)}.npy"
+
+def _age(path, seconds):
+    stamp = time.time() - seconds
+    os.utime(path, (stamp, stamp))
+
+def test_second_load_is_a_read_only_mapping(tmp_path, cache_dir):
+    path = _template(tmp_path, 'shirt', 1)
+
+    first = load_template(path)
+    second = load_template(path)
+
+    np.testing.assert_array_equal(second, np.asarray(Image.open(path).convert('RGBA')))
+    assert isinstance(second, np.memmap)
+    assert not second.flags.writeable
+    assert template_cache.template_cache_counters() == {
+        'misses': 1, 'template.misses': 1, 'hits': 1, 'template.hits': 1
+    }
+    assert isinstance(first, np.memmap)
+
+def test_least_recently_used_file_is_evicted(tmp_path, cache_dir):
+    shirt, mug, poster = (_template(tmp_path, name, seed) for seed, name in enumerate(('shirt', 'mug', 'poster')))
+    load_template(shirt)
+    load_template(mug)
+    _age(_cached(cache_dir, shirt), 30)
+    _age(_cached(cache_dir, mug), 20)
+
+    # A hit makes the shirt the most recently used, so the mug goes first
+    load_template(shirt)
+    load_template(poster)
+
+    assert not _cached(cache_dir, mug).exists()
+    assert _cached(cache_dir, shirt).exists()
+    assert _cached(cache_dir, poster).exists()
+
+    stats = template_cache_stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['template.evictions']) == (1, 3, 1, 1)
+    assert stats['hit_rate'] == 0.25
+    assert (stats['entries'], stats['budget_mb']) == (2, 1)
@@ -23,12 +23,31 @@ celery_app.conf.update(
         'orders.*': {'queue': 'orders'},
         'sync.*': {'queue': 'sync'},
         'email.*': {'queue': 'email'},
+        'mockups.*': {'queue': 'mockups'},
     },
     task_default_queue='default',
     worker_prefetch_multiplier=1,
     task_acks_late=True,
     worker_disable_rate_limits=False,
     task_ignore_result=False,
+    beat_schedule={
+        'cache-sweep-stale-entries': {
+            'task': 'cache.sweep_stale_entries',
+            'schedule': float(config('CACHE_SWEEP_INTERVAL', default=300)),
+        },
+        'sync-drain-shopify-webhooks': {
+            'task': 'sync.shopify_webhooks',
+            'schedule': float(config('SHOPIFY_WEBHOOK_DRAIN_INTERVAL', default=30)),
+        },
+        'mockups-run-batches': {
+            'task': 'mockups.run_batches',
+            'schedule': float(config('MOCKUP_BATCH_RUN_INTERVAL', default=60)),
+        },
+        'designs-generate-variants': {
+            'task': 'designs.generate_variants',
+            'schedule': float(config('DESIGN_VARIANT_INTERVAL', default=15)),
+        },
+    },
 )
 
 # Auto-discover tasks (disabled for now)
@@ -50,5 +69,29 @@ def ping():
     """Simple ping task"""
     return 'pong'
 
+@celery_app.task(name='cache.sweep_stale_entries')
+def sweep_stale_cache_entries():
+    """Reclaim cache entries invalidated by tag bumps (SCAN-based, non-blocking)"""
+    from services.common.cache import sweep_stale_entries
+    return sweep_stale_entries()
+
+@celery_app.task(name='sync.shopify_webhooks')
+def drain_shopify_webhooks():
+    """Apply pending Shopify webhooks in batches (woken by the receiver, scheduled as a fallback)"""
+    from services.shopify.webhooks import drain_webhooks
+    return drain_webhooks()
+
+@celery_app.task(name='mockups.run_batches')
+def run_mockup_batches():
+    """Render pending mockup batches on a process pool (the mockups queue needs a solo-pool worker)"""
+    from services.mockup.batch import run_pending_batches
+    return run_pending_batches()
+
+@celery_app.task(name='designs.generate_variants')
+def generate_design_variants():
+    """Write thumbnail/web/print-ready variants for newly uploaded designs"""
+    from services.design.variants import generate_pending_variants
+    return generate_pending_variants()
+
 if __name__ == '__main__':
     celery_app.start()
\ No newline at end of file
@@ -185,7 +185,7 @@ deploy_services() {
     log "Deploying services..."
     
     # Deploy core services
-    docker-compose -f docker-compose.dev.yml up -d postgres redis backend celery-worker frontend
+    docker-compose -f docker-compose.dev.yml up -d postgres redis backend celery-worker celery-mockup-worker frontend
     
     # Deploy development tools if requested
     if [[ "$WITH_DEV_TOOLS" == true ]]; then
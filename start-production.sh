@@ -202,7 +202,7 @@ deploy_services() {
     log "Deploying services..."
     
     # Deploy core services
-    docker-compose -f docker-compose.production.yml up -d postgres redis backend celery-worker celery-beat frontend
+    docker-compose -f docker-compose.production.yml up -d postgres redis backend celery-worker celery-mockup-worker celery-beat frontend
     
     # Deploy nginx if requested
     if [[ "$WITH_NGINX" == true ]]; then